@@ -0,0 +1,122 @@
+""" `main:app` wired to local stand-ins, for `run_benchmarks.py`.
+
+Run with `backend/src` on PYTHONPATH. Environment (set by the runner):
+    BENCH_MONGO          "mock" for mongomock-motor, otherwise MONGO_URI_CELL_DEFAULT is used as-is
+    BENCH_AI_LATENCY     Stub AI latency in seconds (default 0.5)
+    BENCH_AI_JITTER      +/- jitter in seconds (default 0.1)
+    BENCH_AI_BATCH_LATENCY  Seconds until a stub provider batch completes (default 5)
+    BENCH_BOOKS          Number of regular books to seed (default 20)
+    BENCH_BOOK_PAGES     Pages per regular book (default 10)
+    BENCH_LARGE_PAGES    Pages in the large book used by the details scenario (default 1000)
+S3 goes to whatever AWS_ENDPOINT_URL_S3 points at (the runner starts a moto server).
+"""
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from bench_constants import BENCH_TENANT_SLUG, BENCH_USERNAME, BENCH_PASSWORD, LARGE_BOOK_ID
+
+_mock_clients = {}
+
+def _shared_mock_client(mongo_uri: str, **kwargs):
+    """mongomock keeps data per client instance, so every MongoService for a URI must share one."""
+    from mongomock_motor import AsyncMongoMockClient
+    if mongo_uri not in _mock_clients:
+        _mock_clients[mongo_uri] = AsyncMongoMockClient(tz_aware=True)
+    return _mock_clients[mongo_uri]
+
+if os.getenv("BENCH_MONGO", "mock") == "mock":
+    import cell.services.mongo_service as mongo_service
+    mongo_service.AsyncIOMotorClient = _shared_mock_client
+
+from main import app  # noqa: E402  (must come after the Mongo stand-in is installed)
+from ai.services import ai_registry  # noqa: E402
+from stub_ai import StubAiClient  # noqa: E402
+
+_latency = float(os.getenv("BENCH_AI_LATENCY", 0.5))
+_jitter = float(os.getenv("BENCH_AI_JITTER", 0.1))
+_batch_latency = float(os.getenv("BENCH_AI_BATCH_LATENCY", 5))
+for _name in ("mistral", "gemini"):
+    ai_registry._registry[_name] = StubAiClient(_name,
+                                                latency_seconds=_latency,
+                                                jitter_seconds=_jitter,
+                                                batch_latency_seconds=_batch_latency)
+
+
+def _page_doc(tenant_id: str, book_id: str, page_id: str, page_number: int) -> dict:
+    from page.models.page_model import Page, OcrData
+    text = f"Page {page_number} of {book_id}. " * 80
+    page = Page(id=page_id,
+                book_id=book_id,
+                page_number=page_number,
+                ocr=OcrData(language="Latin", model="mistral", data=text),
+                translation={"language": "English", "model": "gemini", "data": text},
+                photo=f"https://bench.invalid/{book_id}/{page_id}.jpg",
+                thumbnail=f"https://bench.invalid/{book_id}/{page_id}_thumb.jpg",
+                compressed_photo=f"https://bench.invalid/{book_id}/{page_id}_compressed.jpg")
+    return {**page.model_dump(exclude={"tenant"}), "tenant_id": tenant_id}
+
+
+def _book_doc(tenant_id: str, book_id: str, title: str) -> dict:
+    from book.models.book_model import Book
+    book = Book(id=book_id,
+                title=title,
+                author="Benchmark",
+                published="1600",
+                language="Latin",
+                thumbnail=f"https://bench.invalid/{book_id}/thumbnail.jpg")
+    return {**book.model_dump(exclude={"tenant"}), "tenant_id": tenant_id}
+
+
+async def seed() -> None:
+    """Creates the benchmark tenant, an admin user and the books/pages the scenarios read."""
+    from tenant.models.tenant_model import Tenant
+    from tenant.services.tenant_resolver import get_tenants_collection
+    from user.models.user_model import User, Identity
+    from core.models.primitives_model import RoleName, IdentityProvider
+    from cell.models.cell_registry import CellID
+    from cell.services.cell_manager import get_cell
+    from auth.services.hasher import hash_password
+
+    tenants = get_tenants_collection()
+    existing = await tenants.find_one({"slug": BENCH_TENANT_SLUG})
+    if existing:
+        return
+
+    tenant = Tenant(name="Benchmark Library", slug=BENCH_TENANT_SLUG)
+    await tenants.insert_one(tenant.model_dump())
+
+    db = get_cell(CellID.CELL_DEFAULT).mongo_service.db
+    user = User(tenant_id=tenant.id,
+                email="bench@bench.invalid",
+                username=BENCH_USERNAME,
+                roles=[RoleName.ADMIN],
+                identities=[Identity(provider=IdentityProvider.USERNAME, subject=BENCH_USERNAME)],
+                password_hash=hash_password(BENCH_PASSWORD))
+    await db.users.insert_one(user.model_dump())
+
+    books, pages = [], []
+    for b in range(int(os.getenv("BENCH_BOOKS", 20))):
+        book_id = f"bench-book-{b}"
+        books.append(_book_doc(tenant.id, book_id, f"Benchmark Book {b}"))
+        for n in range(1, int(os.getenv("BENCH_BOOK_PAGES", 10)) + 1):
+            pages.append(_page_doc(tenant.id, book_id, f"{book_id}-page-{n}", n))
+
+    books.append(_book_doc(tenant.id, LARGE_BOOK_ID, "Benchmark Large Book"))
+    for n in range(1, int(os.getenv("BENCH_LARGE_PAGES", 1000)) + 1):
+        pages.append(_page_doc(tenant.id, LARGE_BOOK_ID, f"{LARGE_BOOK_ID}-page-{n}", n))
+
+    await db.books.insert_many(books)
+    await db.pages.insert_many(pages)
+    print(f"Seeded {len(books)} books and {len(pages)} pages at {datetime.now(timezone.utc).isoformat()}")
+
+
+_app_lifespan = app.router.lifespan_context
+
+@asynccontextmanager
+async def _bench_lifespan(app_):
+    async with _app_lifespan(app_):
+        await seed()
+        yield
+
+app.router.lifespan_context = _bench_lifespan
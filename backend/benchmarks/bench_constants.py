@@ -0,0 +1,6 @@
+"""Identifiers shared by the seeded app (`bench_app.py`) and the load driver (`run_benchmarks.py`)."""
+
+BENCH_TENANT_SLUG = "bench"
+BENCH_USERNAME = "bench-admin"
+BENCH_PASSWORD = "bench-password"
+LARGE_BOOK_ID = "bench-book-large"
@@ -0,0 +1,142 @@
+""" Pages per minute and tokens per page of Gemini OCR with K pages packed into one request.
+
+    python backend/benchmarks/bench_gemini_ocr_batching.py --pages 64 --batch-sizes 1 4 8 --keys 1 2 4
+
+`GeminiClient.process_ocr_batch_async` runs against a stub `generate_content` that bills tokens like
+Gemini (258 per 768px image tile, ~1.3 per prompt word, --output-tokens per page) and answers after
+--rtt seconds plus --seconds-per-output-token, with at most --stub-concurrency requests served at once
+per API key (a stand-in for the per-project quota). Each batch size runs once per --keys pool size.
+Page images are generated locally, nothing leaves the machine.
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, SRC_DIR)
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+
+class StubModels:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.slots = asyncio.Semaphore(args.stub_concurrency)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    @staticmethod
+    def _image_tokens(part) -> int:
+        from PIL import Image
+        width, height = Image.open(BytesIO(part.inline_data.data)).size
+        return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+
+    async def generate_content(self, model: str, contents, config=None):
+        contents = contents if isinstance(contents, list) else [contents]
+        page_ids = [item.removeprefix("Page id: ") for item in contents
+                    if isinstance(item, str) and item.startswith("Page id: ")]
+        prompt_tokens = sum(int(len(item.split()) * 1.3) if isinstance(item, str) else self._image_tokens(item)
+                            for item in contents)
+        pages = max(len(page_ids), 1)
+        output_tokens = pages * self.args.output_tokens + (20 * pages if page_ids else 0)  # JSON framing
+
+        async with self.slots:
+            await asyncio.sleep(self.args.rtt + output_tokens * self.args.seconds_per_output_token)
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+
+        text = "lorem ipsum " * (self.args.output_tokens // 2)
+        if page_ids:
+            text = json.dumps([{"page_id": page_id, "text": text} for page_id in page_ids])
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def make_page_image(width: int, height: int) -> bytes:
+    from PIL import Image
+    output = BytesIO()
+    Image.new("L", (width, height), color=235).save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+async def run_batch_size(args: argparse.Namespace, batch_size: int, keys: int, image: bytes) -> Dict:
+    from ai.services.gemini_ai import GeminiClient, MAX_PARALLEL_REQUESTS
+    from ai.services.key_pool import KeyPool
+
+    client = GeminiClient()
+    stubs = [StubModels(args) for _ in range(keys)]
+    client.keys = KeyPool("gemini",
+                          [(f"bench{index}", SimpleNamespace(aio=SimpleNamespace(models=stub))) for index, stub in enumerate(stubs)],
+                          max_concurrency=MAX_PARALLEL_REQUESTS)
+
+    async def download(image_url: str) -> bytes:
+        return image
+
+    client._download_image_async = download
+    pages = [(f"page-{index}", f"https://bench.invalid/page-{index}.jpg") for index in range(args.pages)]
+
+    start = time.perf_counter()
+    results = await client.process_ocr_batch_async("bench-book", pages, "Latin", max_pages=batch_size)
+    elapsed = time.perf_counter() - start
+    await client.cleanup()
+    prompt_tokens = sum(stub.prompt_tokens for stub in stubs)
+    output_tokens = sum(stub.output_tokens for stub in stubs)
+    return {
+        "batch_size": batch_size,
+        "keys": keys,
+        "requests": sum(stub.requests for stub in stubs),
+        "seconds": round(elapsed, 2),
+        "pages_per_min": round(len(results) / elapsed * 60, 1),
+        "prompt_tokens_per_page": round(prompt_tokens / len(results), 1),
+        "output_tokens_per_page": round(output_tokens / len(results), 1),
+        "tokens_per_page": round((prompt_tokens + output_tokens) / len(results), 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    image = make_page_image(args.image_width, args.image_height)
+    results: Dict = {"settings": vars(args), "runs": []}
+    for keys in args.keys:
+        for batch_size in args.batch_sizes:
+            run_result = await run_batch_size(args, batch_size, keys, image)
+            print(json.dumps(run_result), file=sys.stderr)
+            results["runs"].append(run_result)
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--keys", type=int, nargs="+", default=[1], help="API keys in the pool, one stub quota each")
+    parser.add_argument("--image-width", type=int, default=1200)
+    parser.add_argument("--image-height", type=int, default=1800)
+    parser.add_argument("--output-tokens", type=int, default=800, help="OCR text tokens per page")
+    parser.add_argument("--rtt", type=float, default=1.5, help="Stub seconds per request before generating")
+    parser.add_argument("--seconds-per-output-token", type=float, default=0.004)
+    parser.add_argument("--stub-concurrency", type=int, default=4, help="Requests the stub serves at once, per key")
+    parser.add_argument("--output", default=None, help="Write results JSON here instead of stdout")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+""" Peak memory and wall time of handling the figures of a Mistral OCR response, for figure-heavy pages.
+
+    python backend/benchmarks/bench_ocr_figures.py --figures 60 --figure-kb 400 --duplicates 0.25
+
+Each mode runs in a fresh process against a stub S3 with --upload-latency seconds per upload, so the
+reported `peak_rss_mb` (ru_maxrss) and `added_rss_mb` (on top of the response itself) are comparable:
+    legacy    every figure base64-decoded on the event loop, all uploads started at once (the old code path)
+    pipeline  `OcrFigureUploader`: off-loop decoding, content-hash deduplication, bounded concurrency
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+import resource
+import subprocess
+from io import BytesIO
+from types import SimpleNamespace
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, SRC_DIR)
+
+MODES = ("legacy", "pipeline")
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def make_response(figures: int, figure_kb: int, duplicates: float) -> SimpleNamespace:
+    """One OCR page embedding `figures` JPEG data URLs of roughly `figure_kb` each."""
+    from PIL import Image
+
+    distinct: List[str] = []
+    images = []
+    for index in range(figures):
+        if distinct and random.random() < duplicates:
+            data_url = random.choice(distinct)
+        else:
+            side = int((figure_kb * 1024 / 3) ** 0.5)
+            image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+            output = BytesIO()
+            image.save(output, format="JPEG", quality=95)
+            data_url = "data:image/jpeg;base64," + base64.b64encode(output.getvalue()).decode()
+            distinct.append(data_url)
+        images.append(SimpleNamespace(id=f"img-{index}.jpeg", image_base64=data_url))
+
+    markdown = "\n\n".join(f"Figure {index}\n\n![img-{index}.jpeg](img-{index}.jpeg)" for index in range(figures))
+    return SimpleNamespace(pages=[SimpleNamespace(markdown=markdown, images=images)])
+
+
+class StubS3:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.uploaded_bytes = 0
+        self.uploads = 0
+
+    async def _store(self, data: bytes) -> None:
+        await asyncio.sleep(self.latency)
+        self.uploaded_bytes += len(data)
+        self.uploads += 1
+
+    async def upload_ocr_figure(self, book_id: str, page_id: str, filename: str, data: BytesIO, content_type: str) -> str:
+        await self._store(data.getvalue())
+        return f"https://bench.invalid/{book_id}/{page_id}/{filename}"
+
+    async def upload_ocr_image(self, book_id: str, page_id: str, base64_data_url: str) -> str:
+        _, encoded = base64_data_url.split(",", 1)
+        await self._store(base64.b64decode(encoded))
+        return f"https://bench.invalid/{book_id}/{page_id}/{random.random()}.jpeg"
+
+
+async def run_legacy(response: SimpleNamespace, s3: StubS3) -> str:
+    markdowns = []
+    for page in response.pages:
+        ids = [img.id for img in page.images if img.image_base64]
+        urls = await asyncio.gather(*(s3.upload_ocr_image("book", "page", img.image_base64)
+                                      for img in page.images if img.image_base64))
+        markdown = page.markdown
+        for img_id, url in zip(ids, urls):
+            markdown = markdown.replace(f"![{img_id}]({img_id})", f"![{img_id}]({url})")
+        markdowns.append(markdown)
+    return "\n\n".join(markdowns)
+
+
+async def run_pipeline(response: SimpleNamespace, s3: StubS3) -> str:
+    from ai.services.ocr_figures import OcrFigureUploader, link_figures
+
+    figures = OcrFigureUploader(s3, book_id="book", page_id="page")
+    for page in response.pages:
+        for img in page.images:
+            if img.image_base64:
+                await figures.add(img.id, img.image_base64)
+                img.image_base64 = None
+    urls = await figures.finish()
+    return link_figures("\n\n".join(page.markdown for page in response.pages), urls)
+
+
+def run_mode(args: argparse.Namespace) -> Dict:
+    # Imported up front in both modes: the backend modules weigh ~70 MB and a second of import time,
+    # which would otherwise be charged to the pipeline
+    import ai.services.ocr_figures  # noqa: F401
+
+    random.seed(args.seed)
+    response = make_response(args.figures, args.figure_kb, args.duplicates)
+    response_rss = _rss_mb()
+    s3 = StubS3(args.upload_latency)
+    run = run_legacy if args.mode == "legacy" else run_pipeline
+
+    start = time.perf_counter()
+    markdown = asyncio.run(run(response, s3))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": args.mode,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "added_rss_mb": round(_rss_mb() - response_rss, 1),
+        "uploads": s3.uploads,
+        "uploaded_mb": round(s3.uploaded_bytes / 2**20, 1),
+        "unlinked_placeholders": markdown.count("](img-"),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)  # Set for the per-mode child process
+    parser.add_argument("--figures", type=int, default=60, help="Figures on the page")
+    parser.add_argument("--figure-kb", type=int, default=400, help="Approximate size of a figure")
+    parser.add_argument("--duplicates", type=float, default=0.25, help="Share of figures repeating an earlier one")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="Stub S3 seconds per upload")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write results JSON here instead of stdout")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    results = {"settings": {key: value for key, value in vars(args).items() if key not in ("mode", "modes", "output")}}
+    for mode in args.modes:
+        command = [sys.executable, __file__, "--mode", mode, *sys.argv[1:]]
+        child = subprocess.run(command, capture_output=True, text=True, check=True)
+        results[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
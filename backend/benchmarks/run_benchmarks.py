@@ -0,0 +1,387 @@
+""" Boots `main:app` against local stand-ins and drives request scenarios, printing latency
+percentiles and throughput as JSON so runs can be compared across commits.
+
+    pip install -r backend/requirements.txt -r backend/benchmarks/requirements.txt
+    python backend/benchmarks/run_benchmarks.py --duration 20 --concurrency 16 --output bench.json
+    python backend/benchmarks/run_benchmarks.py --baseline bench.json   # adds deltas against a previous run
+
+Mongo is mongomock-motor unless --mongo-uri is given; S3 is a moto server unless --s3-endpoint is given;
+the AI providers are `StubAiClient`s with --ai-latency seconds of simulated latency.
+"""
+import os
+import io
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, BENCH_DIR)
+
+from bench_constants import BENCH_TENANT_SLUG, BENCH_USERNAME, BENCH_PASSWORD, LARGE_BOOK_ID  # noqa: E402
+
+BENCH_BUCKET = "bench-bucket"
+BENCH_REGION = "us-east-1"
+
+
+# ---------- Stand-ins ----------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_moto_server() -> tuple[object, str]:
+    from moto.server import ThreadedMotoServer
+    import boto3
+
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    endpoint = f"http://127.0.0.1:{port}"
+    boto3.client("s3", endpoint_url=endpoint, region_name=BENCH_REGION,
+                 aws_access_key_id="testing", aws_secret_access_key="testing").create_bucket(Bucket=BENCH_BUCKET)
+    return server, endpoint
+
+
+def app_environment(args: argparse.Namespace, s3_endpoint: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join([SRC_DIR, BENCH_DIR]),
+        "BENCH_MONGO": "real" if args.mongo_uri else "mock",
+        "MONGO_URI_CELL_DEFAULT": args.mongo_uri or "mongodb://bench-mock",
+        "MONGO_DB_CELL_DEFAULT": args.mongo_db,
+        "S3_BUCKET_CELL_DEFAULT": BENCH_BUCKET,
+        "S3_REGION_CELL_DEFAULT": BENCH_REGION,
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_ENDPOINT_URL_S3": s3_endpoint,
+        "JWT_SECRET_KEY": "bench-secret",
+        "JWT_ALGORITHM": "HS256",
+        "PASSWORD_PEPPER": "bench-pepper",
+        # Placeholders for the SDK clients built at import time; AI calls go to StubAiClient
+        "GEMINI_API_KEY": "bench-key",
+        "MISTRAL_API_KEY": "bench-key",
+        "BENCH_AI_LATENCY": str(args.ai_latency),
+        "BENCH_AI_JITTER": str(args.ai_jitter),
+        "BENCH_BOOKS": str(args.books),
+        "BENCH_BOOK_PAGES": str(args.book_pages),
+        "BENCH_LARGE_PAGES": str(args.large_book_pages),
+        "TRACE_SAMPLE_RATE": str(args.trace_sample_rate),
+    })
+    return env
+
+
+def start_app(args: argparse.Namespace, env: Dict[str, str], port: int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "bench_app:app",
+               "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BENCH_DIR, env=env)
+
+
+async def wait_until_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/book/", headers={"X-Tenant-Slug": BENCH_TENANT_SLUG})
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"App did not become ready within {timeout}s")
+
+
+# ---------- Scenarios ----------
+
+@dataclass
+class BenchContext:
+    client: httpx.AsyncClient
+    token: str
+    page_ids: List[str]
+    upload_image: bytes
+    page_counter: int = 100_000
+    etags: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"X-Tenant-Slug": BENCH_TENANT_SLUG, "Authorization": f"Bearer {self.token}"}
+
+
+async def scenario_login(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.post("/auth/login",
+                                 data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD},
+                                 headers={"X-Tenant-Slug": BENCH_TENANT_SLUG})
+
+async def scenario_library(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.get("/book/", headers=ctx.headers)
+
+async def scenario_book_details(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.get(f"/book/details/{LARGE_BOOK_ID}", headers=ctx.headers)
+
+async def scenario_page_upload(ctx: BenchContext) -> httpx.Response:
+    ctx.page_counter += 1
+    return await ctx.client.post("/page/",
+                                 data={"book_id": "bench-book-0", "page_number": str(ctx.page_counter)},
+                                 files={"photo": ("page.jpg", ctx.upload_image, "image/jpeg")},
+                                 headers=ctx.headers)
+
+async def scenario_ocr(ctx: BenchContext) -> httpx.Response:
+    page_id = random.choice(ctx.page_ids)
+    return await ctx.client.post("/ocr/",
+                                 json={"page_id": page_id,
+                                       "photo_url": f"https://bench.invalid/{page_id}.jpg",
+                                       "language": "Latin",
+                                       "ai_model": "mistral"},
+                                 headers=ctx.headers)
+
+async def scenario_translate(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.post("/translate/",
+                                 json={"text": "Lorem ipsum dolor sit amet. " * 100,
+                                       "source_lang": "Latin",
+                                       "target_lang": "English",
+                                       "ai_model": "gemini"},
+                                 headers=ctx.headers)
+
+async def scenario_discover(ctx: BenchContext) -> httpx.Response:
+    return await ctx.client.get("/discover/random-pages", params={"count": 4}, headers=ctx.headers)
+
+async def scenario_reader_navigation(ctx: BenchContext) -> httpx.Response:
+    """A reader flipping back and forth through a book, revalidating with the ETags it has seen."""
+    path = random.choice([f"/book/details/{LARGE_BOOK_ID}", f"/book/{LARGE_BOOK_ID}", "/book/", "/category/",
+                          *(f"/page/{page_id}" for page_id in ctx.page_ids[:20])])
+    headers = dict(ctx.headers)
+    if path in ctx.etags:
+        headers["If-None-Match"] = ctx.etags[path]
+    response = await ctx.client.get(path, headers=headers)
+    if "etag" in response.headers:
+        ctx.etags[path] = response.headers["etag"]
+    return response
+
+
+SCENARIOS: Dict[str, Callable[[BenchContext], Awaitable[httpx.Response]]] = {
+    "library": scenario_library,
+    "book_details": scenario_book_details,
+    "page_upload": scenario_page_upload,
+    "ocr": scenario_ocr,
+    "translate": scenario_translate,
+    "discover": scenario_discover,
+    "reader_navigation": scenario_reader_navigation,
+    "login": scenario_login,
+}
+
+# Scenarios needing what mongomock lacks: `ocr` saves the page, and page text updates use `$strLenCP`
+REAL_MONGO_SCENARIOS = {"ocr"}
+
+
+# ---------- Runner ----------
+
+@dataclass
+class ScenarioResult:
+    latencies: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+    elapsed: float = 0.0
+    bytes_received: int = 0
+    not_modified: int = 0
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.latencies)
+        requests = len(ordered) + sum(self.errors.values())
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+            return round(ordered[index] * 1000, 2)
+
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "throughput_rps": round(len(ordered) / self.elapsed, 2) if self.elapsed else 0.0,
+            "bytes_received": self.bytes_received,
+            "not_modified": self.not_modified,
+            "latency_ms": {
+                "mean": round(statistics.fmean(ordered) * 1000, 2) if ordered else None,
+                "p50": percentile(50),
+                "p90": percentile(90),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "max": round(ordered[-1] * 1000, 2) if ordered else None,
+            },
+        }
+
+
+async def run_scenario(ctx: BenchContext,
+                       scenario: Callable[[BenchContext], Awaitable[httpx.Response]],
+                       concurrency: int,
+                       duration: float,
+                       max_requests: Optional[int]) -> ScenarioResult:
+    result = ScenarioResult()
+    deadline = time.monotonic() + duration
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while time.monotonic() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            start = time.perf_counter()
+            try:
+                response = await scenario(ctx)
+                elapsed = time.perf_counter() - start
+                result.bytes_received += len(response.content)
+                if response.status_code == 304:
+                    result.not_modified += 1
+                if response.status_code < 400:
+                    result.latencies.append(elapsed)
+                else:
+                    key = str(response.status_code)
+                    result.errors[key] = result.errors.get(key, 0) + 1
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+                result.errors[key] = result.errors.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def make_upload_image(width: int = 1600, height: int = 2400) -> bytes:
+    from PIL import Image
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def compare(current: Dict, baseline: Dict) -> Dict:
+    """Relative change of p50/p95/throughput against a previous results file (negative latency = faster)."""
+    deltas = {}
+    for name, summary in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+
+        def change(new, old):
+            return round((new - old) / old * 100, 1) if new is not None and old else None
+
+        deltas[name] = {
+            "p50_pct": change(summary["latency_ms"]["p50"], previous["latency_ms"]["p50"]),
+            "p95_pct": change(summary["latency_ms"]["p95"], previous["latency_ms"]["p95"]),
+            "throughput_pct": change(summary["throughput_rps"], previous["throughput_rps"]),
+        }
+    return deltas
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    scenarios = args.scenarios
+    skipped = [] if args.mongo_uri else [name for name in scenarios if name in REAL_MONGO_SCENARIOS]
+    if skipped:
+        print(f"Skipping {', '.join(skipped)}: needs a real MongoDB (--mongo-uri)", file=sys.stderr)
+        scenarios = [name for name in scenarios if name not in skipped]
+
+    moto_server, s3_endpoint = (None, args.s3_endpoint) if args.s3_endpoint else start_moto_server()
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    app_process = start_app(args, app_environment(args, s3_endpoint), port)
+
+    try:
+        await wait_until_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+            login = await client.post("/auth/login",
+                                      data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD},
+                                      headers={"X-Tenant-Slug": BENCH_TENANT_SLUG})
+            login.raise_for_status()
+
+            ctx = BenchContext(client=client,
+                               token=login.json()["access_token"],
+                               page_ids=[f"{LARGE_BOOK_ID}-page-{n}" for n in range(1, args.large_book_pages + 1)],
+                               upload_image=make_upload_image())
+
+            results = {}
+            for name in scenarios:
+                # A short warm-up so connection setup and first-call caches do not skew the numbers
+                await run_scenario(ctx, SCENARIOS[name], args.concurrency, args.warmup, None)
+                result = await run_scenario(ctx, SCENARIOS[name], args.concurrency, args.duration, args.max_requests)
+                results[name] = result.summary()
+                print(f"{name}: {json.dumps(results[name]['latency_ms'])} "
+                      f"{results[name]['throughput_rps']} req/s", file=sys.stderr)
+    finally:
+        app_process.terminate()
+        app_process.wait(timeout=30)
+        if moto_server is not None:
+            moto_server.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "scenarios": results,
+        "skipped": skipped,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds per scenario")
+    parser.add_argument("--max-requests", type=int, default=None, help="Stop a scenario after this many requests")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--ai-latency", type=float, default=0.5, help="Stub AI latency in seconds")
+    parser.add_argument("--ai-jitter", type=float, default=0.1)
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--book-pages", type=int, default=10)
+    parser.add_argument("--large-book-pages", type=int, default=1000)
+    parser.add_argument("--trace-sample-rate", type=float, default=0.0)
+    parser.add_argument("--mongo-uri", default=None, help="Real MongoDB instead of mongomock-motor")
+    parser.add_argument("--mongo-db", default="bench")
+    parser.add_argument("--s3-endpoint", default=None, help="Existing S3-compatible endpoint instead of moto")
+    parser.add_argument("--output", default=None, help="Write results JSON here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="Previous results JSON to compare against")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["delta_vs_baseline"] = compare(results, json.load(f))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import uuid
+import asyncio
+import random
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ai.services.ai_client_interface import AiClientInterface, BatchResult, BatchState, BatchStatus
+from cell.services.s3_service import S3Service
+
+
+class StubAiClient(AiClientInterface):
+    """ Stand-in AI provider that sleeps for a configurable latency and returns canned text,
+    so benchmarks measure the API rather than the provider.
+    Also fakes a provider batch API in memory: a submitted batch completes `batch_latency_seconds` later.
+    """
+    supports_batch = True
+
+    def __init__(self,
+                 name: str,
+                 latency_seconds: float = 0.5,
+                 jitter_seconds: float = 0.1,
+                 output_chars: int = 3000,
+                 batch_latency_seconds: float = 5.0):
+        self.name = name
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.output_chars = output_chars
+        self.batch_latency_seconds = batch_latency_seconds
+        self._batches: Dict[str, Tuple[List[str], float]] = {}  # batch id -> (page ids, completion time)
+
+    async def _simulate_latency(self) -> None:
+        jitter = random.uniform(-self.jitter_seconds, self.jitter_seconds)
+        await asyncio.sleep(max(0.0, self.latency_seconds + jitter))
+
+    def _text(self, seed: str) -> str:
+        line = f"{seed} lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+        return (line * (self.output_chars // len(line) + 1))[:self.output_chars]
+
+    async def process_ocr_async(self,
+                                book_id: str,
+                                page_id: str,
+                                image_url: str,
+                                language: str,
+                                custom_prompt: Optional[str] = None,
+                                s3_service: Optional[S3Service] = None
+                               ) -> Tuple[str, List[str]]:
+        await self._simulate_latency()
+        return self._text(f"# OCR {page_id}"), []
+
+    async def process_translation_async(self, prompt: str) -> str:
+        await self._simulate_latency()
+        return self._text("Translation")
+
+    async def submit_ocr_batch(self,
+                               pages: List[Tuple[str, str]],
+                               language: str,
+                               custom_prompt: Optional[str] = None
+                              ) -> str:
+        await self._simulate_latency()
+        batch_id = f"batch-{uuid.uuid4()}"
+        ready_at = asyncio.get_running_loop().time() + self.batch_latency_seconds
+        self._batches[batch_id] = ([page_id for page_id, _ in pages], ready_at)
+        return batch_id
+
+    async def get_batch_status(self, batch_id: str) -> BatchStatus:
+        if batch_id not in self._batches:
+            return BatchStatus(BatchState.FAILED, error=f"Unknown batch '{batch_id}'")
+        page_ids, ready_at = self._batches[batch_id]
+        remaining = ready_at - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            return BatchStatus(BatchState.SUCCEEDED, len(page_ids), len(page_ids))
+        done = int(len(page_ids) * (1 - remaining / max(self.batch_latency_seconds, 1e-9)))
+        return BatchStatus(BatchState.RUNNING, done, len(page_ids))
+
+    async def iter_ocr_batch_results(self,
+                                     batch_id: str,
+                                     book_id: str,
+                                     s3_service: Optional[S3Service] = None
+                                    ) -> AsyncIterator[BatchResult]:
+        page_ids, _ = self._batches.pop(batch_id, ([], 0.0))
+        for page_id in page_ids:
+            yield BatchResult(page_id, text=self._text(f"# OCR {page_id}"), image_urls=[])
+
+    async def cleanup(self):
+        pass
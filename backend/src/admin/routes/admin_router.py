@@ -1,15 +1,46 @@
 import os
+from datetime import timedelta
 from fastapi import APIRouter, HTTPException, Depends
 
 from core.dependency import request_context_dependency
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
 
 from core.dependency import s3_service_dependency
+from core.models.primitives_model import RoleName
+from book.book_repo import BookRepo, get_books_repo
+from page.page_repo import PageRepo, get_pages_repo
+from jobs.job_repo import JobRepo, get_jobs_repo
+from jobs.flight_repo import FlightRepo, get_flights_repo
+from translation_memory.translation_memory_repo import (
+    TranslationMemoryRepo,
+    TranslationMemoryStatsRepo,
+    get_translation_memory_repo,
+    get_translation_memory_stats_repo
+)
+from jobs.models.job_model import Job
+from jobs.services.job_runner import JobProgress, start_job
+from content.content_request_repo import EditRequestRepo, get_edit_request_repo
+from tenant.services.tenant_service import purge_tenant_data
+from tenant.services.storage_gc_service import StorageGc, S3_GC_GRACE_HOURS
+from telemetry.services.loop_watchdog import watchdog
 
 router = APIRouter()
 
-@router.delete("/clear/{password}", dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.DELETE))])
-async def clear_collection(password: str, req_ctx: request_context_dependency, s3: s3_service_dependency):    
+@router.delete("/clear/{password}",
+               status_code=202,
+               response_model=Job,
+               dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.DELETE))])
+async def clear_collection(password: str,
+                           req_ctx: request_context_dependency,
+                           s3: s3_service_dependency,
+                           book_repo: BookRepo = Depends(get_books_repo),
+                           page_repo: PageRepo = Depends(get_pages_repo),
+                           tm_repo: TranslationMemoryRepo = Depends(get_translation_memory_repo),
+                           tm_stats_repo: TranslationMemoryStatsRepo = Depends(get_translation_memory_stats_repo),
+                           flights_repo: FlightRepo = Depends(get_flights_repo),
+                           jobs_repo: JobRepo = Depends(get_jobs_repo),
+                           concurrent: bool = True):
+    """Starts clearing all of the tenant's books, pages, translation memory, jobs and files; poll `/jobs/{id}` for progress."""
     expected_hash = os.getenv("NUKE_PROJECT")  # SHA256
     
     from hashlib import sha256
@@ -18,9 +49,54 @@ async def clear_collection(password: str, req_ctx: request_context_dependency, s
     if password_hash != expected_hash:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    query = {"tenant_id": req_ctx.tenant_id}
-    await req_ctx.db.books.delete_many(query)
-    await req_ctx.db.pages.delete_many(query)
-    await s3.delete_tenant_files(req_ctx.tenant_id)
-        
-    return {"message": "All data cleared"}
\ No newline at end of file
+    async def run(progress: JobProgress):
+        await purge_tenant_data(req_ctx.tenant_id, book_repo, page_repo, tm_repo, tm_stats_repo, jobs_repo, flights_repo,
+                                s3, progress, concurrent)
+
+    return await start_job("tenant_clear", jobs_repo, run, req_ctx.user_id)
+
+
+@router.post("/storage-gc",
+             status_code=202,
+             response_model=Job,
+             dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.DELETE))])
+async def collect_storage_garbage(req_ctx: request_context_dependency,
+                                  s3: s3_service_dependency,
+                                  book_repo: BookRepo = Depends(get_books_repo),
+                                  page_repo: PageRepo = Depends(get_pages_repo),
+                                  requests_repo: EditRequestRepo = Depends(get_edit_request_repo),
+                                  jobs_repo: JobRepo = Depends(get_jobs_repo),
+                                  grace_hours: float = S3_GC_GRACE_HOURS,
+                                  dry_run: bool = False):
+    """ Starts deleting the tenant's S3 files that no book, page or edit request references and that
+    are older than `grace_hours`. With `dry_run` orphans are only counted. Poll `/jobs/{id}` for the
+    reclaimed bytes.
+    """
+    if grace_hours < 1:
+        raise HTTPException(status_code=400, detail="The grace period must be at least one hour")
+
+    async def run(progress: JobProgress):
+        gc = StorageGc(book_repo, page_repo, requests_repo, s3, progress, timedelta(hours=grace_hours), dry_run)
+        await gc.run()
+
+    return await start_job("storage_gc", jobs_repo, run, req_ctx.user_id)
+
+
+@router.get("/loop-blocking", dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.UPDATE))])
+async def get_loop_blocking_report(req_ctx: request_context_dependency, limit: int = 50):
+    """ Code locations that blocked this worker's event loop, ordered by stack samples.
+    The report is per worker process (see `pid`); query each worker to get the full picture.
+    """
+    if RoleName.SUPERADMIN not in req_ctx.user_roles:
+        raise HTTPException(status_code=403, detail="Insufficient permissions to read the loop report")
+
+    return watchdog.report(limit=limit)
+
+
+@router.delete("/loop-blocking", dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.UPDATE))])
+async def reset_loop_blocking_report(req_ctx: request_context_dependency):
+    if RoleName.SUPERADMIN not in req_ctx.user_roles:
+        raise HTTPException(status_code=403, detail="Insufficient permissions to reset the loop report")
+
+    watchdog.reset()
+    return {"message": "Loop blocking report cleared"}
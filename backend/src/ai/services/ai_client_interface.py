@@ -1,12 +1,50 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple, List
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import AsyncIterator, Optional, Tuple, List
 from cell.services.s3_service import S3Service
 
+class Priority(StrEnum):
+    """How bulk work is sent to a provider: regular requests, or the provider's batch API
+    (results within hours, at a fraction of the quota and price)."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+class BatchState(StrEnum):
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class BatchStatus:
+    state: BatchState
+    completed: int = 0
+    total: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request of a provider batch; `custom_id` is the page id it was submitted with."""
+    custom_id: str
+    text: str = ""
+    image_urls: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
 class AiClientInterface(ABC):
     """Abstract Base Class for AI clients."""
 
     name: str
 
+    # Whether the provider's batch API is implemented (`submit_ocr_batch` and friends)
+    supports_batch: bool = False
+    # Whether `process_document_ocr_async` is implemented (multi-page PDFs in one request)
+    supports_document_ocr: bool = False
+
     @abstractmethod
     async def process_ocr_async(
         self,
@@ -24,6 +62,63 @@ class AiClientInterface(ABC):
         """
         pass
 
+    async def process_ocr_batch_async(
+        self,
+        book_id: str,
+        pages: List[Tuple[str, str]],
+        language: str,
+        custom_prompt: Optional[str] = None,
+        s3_service: Optional[S3Service] = None
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        OCR of several page images, given as (page_id, image_url); results come in the same order.
+        Providers able to pack pages into fewer requests override this; by default each page is its own request.
+        """
+        return list(await asyncio.gather(*(
+            self.process_ocr_async(book_id, page_id, image_url, language, custom_prompt, s3_service)
+            for page_id, image_url in pages
+        )))
+
+    async def process_document_ocr_async(
+        self,
+        book_id: str,
+        page_ids: List[str],
+        document_url: str,
+        s3_service: Optional[S3Service] = None
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        OCR of a multi-page PDF (URL or data URL) in a single request.
+        Returns one (text, image URLs) result per page, in document order;
+        the document's pages belong to `page_ids` in that order.
+        Only called on clients declaring `supports_document_ocr`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support document OCR")
+
+    async def submit_ocr_batch(
+        self,
+        pages: List[Tuple[str, str]],
+        language: str,
+        custom_prompt: Optional[str] = None
+    ) -> str:
+        """
+        Submits OCR of (page_id, image_url) pages as one provider batch job; returns the provider's batch id.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support batch jobs")
+
+    async def get_batch_status(self, batch_id: str) -> BatchStatus:
+        raise NotImplementedError(f"{type(self).__name__} does not support batch jobs")
+
+    def iter_ocr_batch_results(
+        self,
+        batch_id: str,
+        book_id: str,
+        s3_service: Optional[S3Service] = None
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Results of a finished OCR batch, streamed one page at a time (figures uploaded as with `process_ocr_async`).
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support batch jobs")
+
     @abstractmethod
     async def process_translation_async(self, prompt: str) -> str:
         """
@@ -31,6 +126,19 @@ class AiClientInterface(ABC):
         """
         pass
 
+    async def process_translation_with_context_async(
+        self,
+        instructions: str,
+        text: str,
+        cache_key: Optional[str] = None
+    ) -> str:
+        """
+        Translates `text` following `instructions`, which repeat across many calls (same book, same languages).
+        Providers with context caching register the instructions once per `cache_key` and reuse them;
+        the default sends them first, so providers that cache repeated prompt prefixes can do so.
+        """
+        return await self.process_translation_async(f"{instructions}\n\n{text}")
+
     @abstractmethod
     async def cleanup(self):
         """
@@ -1,10 +1,17 @@
-from typing import Optional, Dict
+import os
+from typing import Optional, Dict, List
 import traceback
 
 # Import existing clients (may be None)
-from ai.services.ai_client_interface import AiClientInterface
+from ai.services.ai_client_interface import AiClientInterface, Priority
 from ai.services.gemini_ai import gemini_client
 from ai.services.mistral_ai import mistral_client
+from ai.services.circuit_breaker import get_breaker
+from telemetry.services.metrics import AI_FAILOVERS
+
+# Providers tried, in order, when the requested one's circuit is open
+AI_FAILOVER_ORDER: List[str] = [name.strip().lower() for name in os.getenv("AI_FAILOVER_ORDER", "mistral,gemini").split(",")
+                                if name.strip()]
 
 # Build registry of available clients (name -> client instance)
 _registry: Dict[str, AiClientInterface] = {}
@@ -15,15 +22,67 @@ if mistral_client:
 if gemini_client:
     _registry["gemini"] = gemini_client
 
-def get_ai_client(model_name: Optional[str]) -> AiClientInterface:
+for _name, _client in _registry.items():
+    _client.name = _name
+
+def _can_serve(client: AiClientInterface, priority: Priority, document_ocr: bool) -> bool:
+    return ((priority != Priority.BATCH or client.supports_batch)
+            and (not document_ocr or client.supports_document_ocr))
+
+def get_ai_client(model_name: Optional[str],
+                  priority: Priority = Priority.INTERACTIVE,
+                  document_ocr: bool = False
+) -> AiClientInterface:
+    """ The client of `model_name`, or while that provider's circuit is open, the first healthy provider
+    of `AI_FAILOVER_ORDER` able to serve the request (batch priority, with `document_ocr` a whole PDF).
+    `client.name` tells which provider was picked.
+    """
     if not model_name:
         raise Exception("Model name must be provided")
     name = model_name.lower()
     client = _registry.get(name)
     if not client:
         raise Exception(f"Unknown or unavailable model '{model_name}'. Supported: {', '.join(sorted(_registry.keys()))}")    
+    if priority == Priority.BATCH and not client.supports_batch:
+        batch_models = sorted(batch_name for batch_name, registered in _registry.items() if registered.supports_batch)
+        raise Exception(f"Model '{model_name}' has no batch mode. Supported: {', '.join(batch_models) or 'none'}")
+    if document_ocr and not client.supports_document_ocr:
+        document_models = sorted(document_name for document_name, registered in _registry.items()
+                                 if registered.supports_document_ocr)
+        raise Exception(f"Model '{model_name}' has no document OCR. Supported: {', '.join(document_models) or 'none'}")
+    if get_breaker(name).available:
+        return client
+
+    for fallback_name in AI_FAILOVER_ORDER:
+        fallback = _registry.get(fallback_name)
+        if (fallback is None or fallback_name == name or not get_breaker(fallback_name).available
+                or not _can_serve(fallback, priority, document_ocr)):
+            continue
+        print(f"AI provider '{name}' is unavailable, failing over to '{fallback_name}'")
+        AI_FAILOVERS.inc(requested=name, served=fallback_name)
+        return fallback
+    # Nothing healthy to fail over to: the call fails fast on the open circuit
     return client
 
+def get_provider_client(name: str) -> AiClientInterface:
+    """ The client of provider `name` itself, never a failover: for work bound to that provider,
+    like collecting a batch it was submitted.
+    """
+    client = _registry.get(name.lower())
+    if not client:
+        raise Exception(f"Unknown or unavailable model '{name}'. Supported: {', '.join(sorted(_registry.keys()))}")
+    return client
+
+def get_hedge_client(client: AiClientInterface, same: bool = False) -> Optional[AiClientInterface]:
+    """Where to send a hedge of a call to `client`: itself, or the next healthy provider of `AI_FAILOVER_ORDER`."""
+    if same:
+        return client if get_breaker(client.name).available else None
+    for name in AI_FAILOVER_ORDER:
+        fallback = _registry.get(name)
+        if fallback is not None and name != client.name and get_breaker(name).available:
+            return fallback
+    return None
+
 async def shutdown_all_ai_clients():
     """
     Shutdown/cleanup all registered AI clients.    
@@ -0,0 +1,163 @@
+import os
+import time
+import asyncio
+import aiohttp
+import httpx
+from enum import StrEnum
+from typing import Dict, Optional
+
+from telemetry.services.metrics import AI_CIRCUIT_STATE, AI_CIRCUIT_TRANSITIONS
+
+# Consecutive provider failures that open a provider's circuit
+AI_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("AI_CIRCUIT_FAILURE_THRESHOLD", 5))
+# Seconds an open circuit rejects calls before letting one probe call through
+AI_CIRCUIT_RESET_SECONDS: float = float(os.getenv("AI_CIRCUIT_RESET_SECONDS", 30))
+
+
+class ErrorKind(StrEnum):
+    RATE_LIMITED = "rate_limited"         # 429 / quota: retry later
+    TRANSIENT = "transient"               # 5xx, timeouts, dropped connections: retry
+    AUTH = "auth"                         # 401 / 403: the provider is unusable with our credentials
+    INVALID_REQUEST = "invalid_request"   # Other 4xx: our request is at fault, the provider is fine
+    UNAVAILABLE = "unavailable"           # Rejected by an open circuit, never reached the provider
+    UNKNOWN = "unknown"
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+_TRANSIENT_ERRORS = (TimeoutError, ConnectionError, httpx.TransportError, aiohttp.ClientConnectionError)
+
+
+class ProviderUnavailableError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"AI provider '{provider}' is unavailable, retry in {retry_in:.0f}s")
+        self.provider = provider
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    # google-genai APIError has `code`, mistralai SDKError `status_code`, aiohttp `status`, httpx `response`
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def classify_error(exc: BaseException) -> ErrorKind:
+    """ Kind of a provider call failure, from the SDK exception's HTTP status or type.
+    Wrapping exceptions are followed through `__cause__` / `__context__`.
+    """
+    seen = 0
+    current: Optional[BaseException] = exc
+    while current is not None and seen < 8:
+        if isinstance(current, ProviderUnavailableError):
+            return ErrorKind.UNAVAILABLE
+        status = _status_code(current)
+        if status is not None:
+            if status == 429:
+                return ErrorKind.RATE_LIMITED
+            if status in (401, 403):
+                return ErrorKind.AUTH
+            if status == 408 or status >= 500:
+                return ErrorKind.TRANSIENT
+            if status >= 400:
+                return ErrorKind.INVALID_REQUEST
+        if isinstance(current, _TRANSIENT_ERRORS):
+            return ErrorKind.TRANSIENT
+        current = current.__cause__ or current.__context__
+        seen += 1
+    return ErrorKind.UNKNOWN
+
+
+def is_retryable(kind: ErrorKind) -> bool:
+    return kind in (ErrorKind.RATE_LIMITED, ErrorKind.TRANSIENT)
+
+
+class CircuitBreaker:
+    """ Per-provider circuit: after `AI_CIRCUIT_FAILURE_THRESHOLD` consecutive failures it opens and calls
+    fail fast for `AI_CIRCUIT_RESET_SECONDS`; then a single probe call is let through (half-open), which
+    closes the circuit on success or reopens it on failure. Invalid requests do not count against the provider.
+    """
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        AI_CIRCUIT_STATE.set(_STATE_VALUES[self._state], provider=provider)
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def _transition(self, state: CircuitState) -> None:
+        if state == self._state:
+            return
+        print(f"AI provider '{self.provider}' circuit {self._state} -> {state}")
+        self._state = state
+        AI_CIRCUIT_STATE.set(_STATE_VALUES[state], provider=self.provider)
+        AI_CIRCUIT_TRANSITIONS.inc(provider=self.provider, state=str(state))
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + AI_CIRCUIT_RESET_SECONDS - time.monotonic())
+
+    @property
+    def available(self) -> bool:
+        """Whether a call would be let through now (without taking the half-open probe slot)."""
+        if self._state == CircuitState.OPEN:
+            return self._retry_in() == 0
+        return not (self._state == CircuitState.HALF_OPEN and self._probing)
+
+    def before_call(self) -> None:
+        """Raises `ProviderUnavailableError` when the circuit rejects the call."""
+        if self._state == CircuitState.OPEN and self._retry_in() == 0:
+            self._transition(CircuitState.HALF_OPEN)
+            self._probing = False
+        if self._state == CircuitState.OPEN or (self._state == CircuitState.HALF_OPEN and self._probing):
+            raise ProviderUnavailableError(self.provider, self._retry_in())
+        if self._state == CircuitState.HALF_OPEN:
+            self._probing = True
+
+    def record(self, exc: Optional[BaseException]) -> None:
+        kind = classify_error(exc) if exc is not None else None
+        if isinstance(exc, asyncio.CancelledError) or kind == ErrorKind.UNAVAILABLE:
+            self._probing = False  # Says nothing about the provider
+            return
+        if kind is None or kind == ErrorKind.INVALID_REQUEST:
+            self._failures = 0
+            self._probing = False
+            self._transition(CircuitState.CLOSED)
+            return
+
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._failures >= AI_CIRCUIT_FAILURE_THRESHOLD:
+            self._opened_at = time.monotonic()
+            self._probing = False
+            self._transition(CircuitState.OPEN)
+
+    def __enter__(self) -> "CircuitBreaker":
+        self.before_call()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.record(exc)
+        return False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """The worker-wide breaker of a provider. Use as `with get_breaker("gemini"): <provider call>`."""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = _breakers[provider] = CircuitBreaker(provider)
+    return breaker
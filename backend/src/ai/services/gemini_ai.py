@@ -1,36 +1,80 @@
 import os
+import json
+import math
 import asyncio
+import hashlib
 import aiohttp
 import ssl
 import certifi
 from google import genai
+from google.genai import types
 from google.genai.types import UploadFileConfig
-from typing import Optional, Any, Tuple, List
+from dataclasses import dataclass
+from typing import Optional, Any, Dict, Tuple, List
 import random
-from contextlib import asynccontextmanager
+from io import BytesIO
+from PIL import Image
+from pydantic import BaseModel
 
 from ai.services.ai_client_interface import AiClientInterface
+from ai.services.circuit_breaker import ErrorKind, classify_error, get_breaker, is_retryable
+from ai.services.key_pool import KeyPool, PooledKey
 from cell.services.s3_service import S3Service
+from telemetry.services.instrumentation import instrument_ai_call, record_ai_tokens
+
+MAX_PARALLEL_REQUESTS = 100  # Max concurrent requests, per API key
+API_REQUESTS_PER_SECOND = 100  # Max requests per second, per API key
+
+# Packing several pages into one OCR request (see `GeminiClient.plan_ocr_batches`)
+GEMINI_OCR_BATCH_MAX_PAGES = int(os.getenv("GEMINI_OCR_BATCH_MAX_PAGES", 8))
+GEMINI_OCR_BATCH_MAX_BYTES = int(os.getenv("GEMINI_OCR_BATCH_MAX_BYTES", 14 * 1024 * 1024))  # Inline data is capped at 20 MB per request
+GEMINI_OCR_TOKENS_PER_PAGE = int(os.getenv("GEMINI_OCR_TOKENS_PER_PAGE", 2000))  # Expected OCR text per page
+GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", 65536))
+GEMINI_CONTEXT_TOKENS = int(os.getenv("GEMINI_CONTEXT_TOKENS", 1_000_000))
+_TOKENS_PER_TILE = 258  # Gemini bills an image as 258 tokens per 768x768 tile
+
+# Context caching of repeated translation instructions (see `GeminiClient.process_translation_with_context_async`)
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", 3600))
+GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", 1024))  # Smallest context Gemini caches
+# After a failed cache creation, calls of that cache key send their instructions uncached for this long
+GEMINI_CONTEXT_CACHE_RETRY_SECONDS = float(os.getenv("GEMINI_CONTEXT_CACHE_RETRY_SECONDS", 60))
+
+_OCR_PROMPT = "OCR the page in {language} only return ocr. If two pages, ocr the left page first and then the right page."
+_OCR_BATCH_PROMPT = ("The {count} images below are book pages, each preceded by its page id. OCR every page in {language}. "
+                     "For each page return its page id and only its OCR text. "
+                     "If an image shows two pages, ocr the left page first and then the right page.")
+
+
+class _PageText(BaseModel):
+    page_id: str
+    text: str
+
+
+@dataclass
+class _ContextCache:
+    digest: str  # Of the cached instructions, so edited ones get a new cache
+    # Creation returning the cache name, shared by the calls that arrive meanwhile; None once it failed
+    task: Optional["asyncio.Task[str]"]
+    expires_at: float  # Of the cache, or of the failure until creating it is tried again
 
-MAX_PARALLEL_REQUESTS = 100  # Max concurrent requests
-API_REQUESTS_PER_SECOND = 100  # Max requests per second
 
 class GeminiClient(AiClientInterface):
     def __init__(self):
         try:
-            api_key = os.getenv('GEMINI_API_KEY')
-            if not api_key:                
-                raise Exception("GEMINI_API_KEY not found")
-            
             # Set SSL_CERT_FILE to use certifi's CA bundle for all SSL connections
             os.environ['SSL_CERT_FILE'] = certifi.where()
-                        
-            self.client = genai.Client(api_key=api_key)
+
+            # One client per key of GEMINI_API_KEYS (or the single GEMINI_API_KEY), each with its own limits
+            self.keys: KeyPool[genai.Client] = KeyPool.from_env("gemini",
+                                                                "GEMINI_API_KEY",
+                                                                lambda api_key: genai.Client(api_key=api_key),
+                                                                max_concurrency=MAX_PARALLEL_REQUESTS,
+                                                                requests_per_second=API_REQUESTS_PER_SECOND)
             self.model_name = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
-            
-            # Concurrency control
-            self.semaphore = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
-            self.rate_limiter = asyncio.Semaphore(API_REQUESTS_PER_SECOND)
+
+            # (key label, cache key) -> cached content; caches live in the project of the key that made them
+            self._context_caches: Dict[Tuple[str, str], _ContextCache] = {}
+            self._context_caches_swept_at = 0.0
             
             # HTTP session for file uploads
             self._session: Optional[aiohttp.ClientSession] = None
@@ -78,14 +122,6 @@ class GeminiClient(AiClientInterface):
         except Exception as e:
             raise Exception(f"Failed to close aiohttp session: {str(e)}")            
 
-    @asynccontextmanager
-    async def _rate_limit(self):
-        """Rate limiting context manager"""
-        async with self.rate_limiter:            
-            yield
-            # Small delay to prevent hitting rate limits
-            await asyncio.sleep(1/API_REQUESTS_PER_SECOND)
-
     async def _download_image_async(self, image_url: str) -> bytes:
         """Download image asynchronously with proper error handling"""
         session = await self.get_session()
@@ -126,54 +162,68 @@ class GeminiClient(AiClientInterface):
             # Fallback to image/jpeg if HEAD request fails
             return "image/jpeg"
 
-    async def _generate_content_async(self, prompt: str, image_file: Optional[Any] = None) -> Any:
-        """Generate content with concurrency control and retries"""        
+    async def _generate_content_async(self,
+                                      prompt: str,
+                                      image_file: Optional[Any] = None,
+                                      parts: Optional[List[Any]] = None,
+                                      config: Optional[types.GenerateContentConfig] = None,
+                                      key: Optional[PooledKey[genai.Client]] = None
+                                      ) -> Any:
+        """Generate content with per-key concurrency control and retries.
+        `parts` (images and their labels) follow the prompt for multi-page requests.
+        `key` pins the call to a key the caller holds (an uploaded `image_file` belongs to that key's project)."""        
         
-        async with self.semaphore:  # Limit concurrent requests            
-            async with self._rate_limit():  # Rate limiting
-                max_retries = 3
-                base_delay = 1.0
-                                
-                for attempt in range(max_retries):
-                    try:                        
-                        if image_file:
-                            content = [prompt, image_file]  # For OCR with image                                                        
-                        else:
-                            content = prompt  # For translation without image                            
+        max_retries = 3
+        base_delay = 1.0
                         
-                        result = await self.client.aio.models.generate_content(
+        for attempt in range(max_retries):
+            try:                        
+                if parts:
+                    content = [prompt, *parts]  # For OCR of several pages
+                elif image_file:
+                    content = [prompt, image_file]  # For OCR with image                                                        
+                else:
+                    content = prompt  # For translation without image                            
+                
+                operation = "ocr_batch" if parts else "ocr" if image_file else "translation"
+                if config is not None and config.cached_content:
+                    operation += "_cached"
+                # A key that hits its quota is quarantined, so a retry goes to another key of the pool
+                async with self.keys.acquire(key) as pooled:
+                    with get_breaker("gemini"), instrument_ai_call("gemini", self.model_name, operation):
+                        result = await pooled.client.aio.models.generate_content(
                             model=self.model_name,
                             contents=content,
+                            config=config,
                         )
 
-                        return result
-                        
-                    except Exception as e:                        
-                        error_message = str(e).lower()
-                        
-                        # Handle rate limiting
-                        if "quota exceeded" in error_message or "rate limit" in error_message:                            
-                            if attempt == max_retries - 1:                                
-                                raise Exception("Gemini API rate limit exceeded. Please try again later.")
-                            
-                            # Exponential backoff with jitter for rate limits
-                            delay = base_delay * (2 ** attempt) + random.uniform(0, 2)                            
-                            await asyncio.sleep(delay)
-                            continue
-                        
-                        # Handle temporary errors
-                        elif any(term in error_message for term in ["timeout", "connection", "network", "503", "502", "500"]):                            
-                            if attempt == max_retries - 1:
-                                raise Exception(f"Gemini API temporary error: {str(e)}")
-                            
-                            # Shorter delay for temporary errors
-                            delay = base_delay + random.uniform(0, 1)
-                            await asyncio.sleep(delay)
-                            continue
-                        
-                        # For other errors, fail immediately
-                        else:
-                            raise Exception(f"Gemini API Error: {str(e)}")
+                usage = getattr(result, "usage_metadata", None)
+                if usage:
+                    record_ai_tokens("gemini", self.model_name, usage.prompt_token_count, usage.candidates_token_count,
+                                     getattr(usage, "cached_content_token_count", None))
+
+                return result
+                
+            except Exception as e:                        
+                kind = classify_error(e)
+                # Open circuit, bad request or credentials: retrying cannot help
+                if not is_retryable(kind):
+                    raise Exception(f"Gemini API Error ({kind}): {str(e)}") from e
+
+                if attempt == max_retries - 1:
+                    if kind == ErrorKind.RATE_LIMITED:
+                        raise Exception("Gemini API rate limit exceeded. Please try again later.") from e
+                    raise Exception(f"Gemini API temporary error: {str(e)}") from e
+
+                if kind == ErrorKind.RATE_LIMITED and key is None and self.keys.healthy():
+                    continue  # Straight to another key, one not over its quota
+                if kind == ErrorKind.RATE_LIMITED:
+                    # Exponential backoff with jitter for rate limits
+                    delay = base_delay * (2 ** attempt) + random.uniform(0, 2)
+                else:
+                    # Shorter delay for temporary errors
+                    delay = base_delay + random.uniform(0, 1)
+                await asyncio.sleep(delay)
 
     async def process_ocr_async(self,
                                 book_id: str,
@@ -195,45 +245,142 @@ class GeminiClient(AiClientInterface):
             from io import BytesIO
             image_buffer = BytesIO(image_data)
             
-            # Use asyncio.to_thread for file upload (blocking operation)            
-            sample_file = await asyncio.to_thread(
-                self.client.files.upload, 
-                file=image_buffer,
-                config=UploadFileConfig(                    
-                    mime_type=mime_type,                    
-                )
-            )
-            
-            try:
-                # Get file reference
-                file = None
-                if sample_file and sample_file.name:
-                    file = await asyncio.to_thread(self.client.files.get, name=sample_file.name)                            
-                
-                # Prepare prompt
-                if custom_prompt:
-                    prompt = custom_prompt
-                else:
-                    prompt = f"OCR the page in {language} only return ocr. If two pages, ocr the left page first and then the right page."                    
-                
-                # Generate content                
-                result = await self._generate_content_async(prompt, file)                
-                ocr_text = str(result.text)
-
-                return ocr_text, []
+            # The uploaded file only exists in the project of the key that uploaded it
+            async with self.keys.acquire() as key:
+                # Use asyncio.to_thread for file upload (blocking operation)            
+                with get_breaker("gemini"), instrument_ai_call("gemini", self.model_name, "file_upload"):
+                    sample_file = await asyncio.to_thread(
+                        key.client.files.upload, 
+                        file=image_buffer,
+                        config=UploadFileConfig(                    
+                            mime_type=mime_type,                    
+                        )
+                    )
                 
-            finally:
-                # Clean up uploaded file
                 try:
+                    # Get file reference
+                    file = None
                     if sample_file and sample_file.name:
-                        await asyncio.to_thread(self.client.files.delete, name=sample_file.name)                    
-                except Exception as cleanup_error:
-                    raise Exception(f"Failed to cleanup Gemini file {sample_file.name}: {cleanup_error}")
+                        file = await asyncio.to_thread(key.client.files.get, name=sample_file.name)                            
+                    
+                    # Prepare prompt
+                    if custom_prompt:
+                        prompt = custom_prompt
+                    else:
+                        prompt = _OCR_PROMPT.format(language=language)
+                    
+                    # Generate content                
+                    result = await self._generate_content_async(prompt, file, key=key)                
+                    ocr_text = str(result.text)
+
+                    return ocr_text, []
+                    
+                finally:
+                    # Clean up uploaded file
+                    try:
+                        if sample_file and sample_file.name:
+                            await asyncio.to_thread(key.client.files.delete, name=sample_file.name)                    
+                    except Exception as cleanup_error:
+                        raise Exception(f"Failed to cleanup Gemini file {sample_file.name}: {cleanup_error}")
                     
         except Exception as e:            
             import traceback
             raise Exception(f"OCR processing failed: {str(e)}\nFull Traceback: {traceback.format_exc()}")
 
+    def _page_size(self, image_data: bytes) -> Tuple[int, str]:
+        """Estimated prompt tokens and MIME type of a page image. Runs in a worker thread."""
+        try:
+            image = Image.open(BytesIO(image_data))  # Reads the header only
+            width, height = image.size
+            mime_type = Image.MIME.get(image.format or "", "image/jpeg")
+        except Exception:
+            return 4 * _TOKENS_PER_TILE, "image/jpeg"
+        if width <= 384 and height <= 384:
+            return _TOKENS_PER_TILE, mime_type
+        return _TOKENS_PER_TILE * math.ceil(width / 768) * math.ceil(height / 768), mime_type
+
+    def plan_ocr_batches(self, sizes: List[Tuple[int, int]], max_pages: Optional[int] = None) -> List[List[int]]:
+        """ Splits pages, given as (prompt tokens, bytes), into consecutive batches that fit one request:
+        at most `max_pages` (default GEMINI_OCR_BATCH_MAX_PAGES) pages, GEMINI_OCR_BATCH_MAX_BYTES of inline
+        images, the model's context and, with GEMINI_OCR_TOKENS_PER_PAGE of text per page, its output limit.
+        Returns the page indices of each batch.
+        """
+        max_pages = max(1, min(max_pages or GEMINI_OCR_BATCH_MAX_PAGES,
+                               GEMINI_MAX_OUTPUT_TOKENS // GEMINI_OCR_TOKENS_PER_PAGE))
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        batch_tokens = batch_bytes = 0
+        for index, (tokens, size) in enumerate(sizes):
+            if batch and (len(batch) >= max_pages
+                          or batch_bytes + size > GEMINI_OCR_BATCH_MAX_BYTES
+                          or batch_tokens + tokens + len(batch) * GEMINI_OCR_TOKENS_PER_PAGE > GEMINI_CONTEXT_TOKENS):
+                batches.append(batch)
+                batch, batch_tokens, batch_bytes = [], 0, 0
+            batch.append(index)
+            batch_tokens += tokens
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _ocr_pages(self,
+                         pages: List[Tuple[str, bytes, str]],
+                         language: str,
+                         custom_prompt: Optional[str]
+                         ) -> List[str]:
+        """ OCR of (page_id, image, MIME type) pages in one request with a JSON answer keyed by page id.
+        A batch whose answer can't be parsed or misses pages is split in half and retried.
+        """
+        if len(pages) == 1:
+            _, image_data, mime_type = pages[0]
+            prompt = custom_prompt or _OCR_PROMPT.format(language=language)
+            result = await self._generate_content_async(prompt, types.Part.from_bytes(data=image_data, mime_type=mime_type))
+            return [str(result.text)]
+
+        parts: List[Any] = []
+        for page_id, image_data, mime_type in pages:
+            parts += [f"Page id: {page_id}", types.Part.from_bytes(data=image_data, mime_type=mime_type)]
+        prompt = _OCR_BATCH_PROMPT.format(count=len(pages), language=language)
+        if custom_prompt:
+            prompt = f"{custom_prompt}\n\n{prompt}"
+        config = types.GenerateContentConfig(response_mime_type="application/json", response_schema=list[_PageText])
+
+        try:
+            result = await self._generate_content_async(prompt, parts=parts, config=config)
+            texts = {entry["page_id"]: str(entry["text"]) for entry in json.loads(result.text)}
+            return [texts[page_id] for page_id, _, _ in pages]
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Splitting Gemini OCR batch of {len(pages)} pages, answer unusable: {e}")
+            half = len(pages) // 2
+            first, second = await asyncio.gather(self._ocr_pages(pages[:half], language, custom_prompt),
+                                                 self._ocr_pages(pages[half:], language, custom_prompt))
+            return first + second
+
+    async def process_ocr_batch_async(self,
+                                      book_id: str,
+                                      pages: List[Tuple[str, str]],
+                                      language: str,
+                                      custom_prompt: Optional[str] = None,
+                                      s3_service: Optional[S3Service] = None,
+                                      max_pages: Optional[int] = None
+                                      ) -> List[Tuple[str, List[str]]]:
+        """ OCR of several pages, packed into as few `generate_content` requests as `plan_ocr_batches` allows,
+        so the prompt and a round trip are paid per batch rather than per page. Images are sent inline.
+        """
+        try:
+            images = await asyncio.gather(*(self._download_image_async(image_url) for _, image_url in pages))
+            sizes = await asyncio.gather(*(asyncio.to_thread(self._page_size, data) for data in images))
+            batches = self.plan_ocr_batches([(tokens, len(data)) for (tokens, _), data in zip(sizes, images)], max_pages)
+
+            texts = await asyncio.gather(*(
+                self._ocr_pages([(pages[i][0], images[i], sizes[i][1]) for i in batch], language, custom_prompt)
+                for batch in batches
+            ))
+            return [(text, []) for batch_texts in texts for text in batch_texts]
+
+        except Exception as e:
+            raise Exception(f"Batched OCR processing failed: {str(e)}")
+
     async def process_translation_async(self, prompt: str) -> str:
         """Process translation asynchronously"""
         try:            
@@ -245,6 +392,94 @@ class GeminiClient(AiClientInterface):
         except Exception as e:            
             raise Exception(f"Translation processing failed: {str(e)}")
 
+    async def process_translation_with_context_async(self,
+                                                     instructions: str,
+                                                     text: str,
+                                                     cache_key: Optional[str] = None
+                                                     ) -> str:
+        """ Translation with `instructions` as the system instruction. Long enough instructions are put in
+        a context cache once per key and `cache_key`, and each call then only sends `text`: cached tokens
+        are billed at a discount and the prompt is not processed again. Edited instructions replace the cache.
+        """
+        try:
+            async with self.keys.acquire() as key:
+                cache_name = await self._context_cache(key, cache_key, instructions) if cache_key else None
+                if cache_name:
+                    try:
+                        result = await self._generate_content_async(
+                            text, config=types.GenerateContentConfig(cached_content=cache_name), key=key)
+                        return str(result.text)
+                    except Exception as e:
+                        # Most likely the cache expired or was deleted: forget it and send the instructions
+                        if classify_error(e) != ErrorKind.INVALID_REQUEST:
+                            raise
+                        print(f"Translating without context cache '{cache_name}': {e}")
+                        self._context_caches.pop((key.label, cache_key), None)
+
+                result = await self._generate_content_async(
+                    text, config=types.GenerateContentConfig(system_instruction=instructions), key=key)
+                return str(result.text)
+
+        except Exception as e:
+            raise Exception(f"Translation processing failed: {str(e)}")
+
+    def _sweep_context_caches(self, now: float) -> None:
+        """Forgets expired caches and failures (once a minute at most), so cache keys no longer used do not pile up."""
+        if now - self._context_caches_swept_at < 60:
+            return
+        self._context_caches_swept_at = now
+        for cache_id, entry in list(self._context_caches.items()):
+            if entry.expires_at < now and (entry.task is None or entry.task.done()):
+                del self._context_caches[cache_id]
+
+    async def _context_cache(self, key: PooledKey[genai.Client], cache_key: str, instructions: str) -> Optional[str]:
+        """ Name of the cached content holding `instructions` in the key's project; None when too short to cache,
+        or while a failed creation is remembered (`GEMINI_CONTEXT_CACHE_RETRY_SECONDS`).
+        """
+        if len(instructions) // 4 < GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+            return None  # Gemini still caches repeated prompt prefixes implicitly
+
+        digest = hashlib.sha256(instructions.encode()).hexdigest()
+        now = asyncio.get_running_loop().time()
+        self._sweep_context_caches(now)
+        cache_id = (key.label, cache_key)
+        entry = self._context_caches.get(cache_id)
+        if entry is not None and entry.digest == digest and entry.task is None and now < entry.expires_at:
+            return None
+        if entry is None or entry.digest != digest or entry.task is None or entry.expires_at - 60 < now:
+            replaces = entry.task if entry is not None and entry.digest != digest else None
+            entry = _ContextCache(digest,
+                                  asyncio.ensure_future(self._create_context_cache(key, instructions, replaces)),
+                                  now + GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+            self._context_caches[cache_id] = entry
+        try:
+            return await asyncio.shield(entry.task)
+        except Exception as e:
+            print(f"Context cache '{cache_key}' not available: {e}")
+            if self._context_caches.get(cache_id) is entry:
+                retry_at = asyncio.get_running_loop().time() + GEMINI_CONTEXT_CACHE_RETRY_SECONDS
+                self._context_caches[cache_id] = _ContextCache(digest, None, retry_at)
+            return None
+
+    async def _create_context_cache(self,
+                                    key: PooledKey[genai.Client],
+                                    instructions: str,
+                                    replaces: Optional["asyncio.Task[str]"]
+                                    ) -> str:
+        with get_breaker("gemini"), instrument_ai_call("gemini", self.model_name, "context_cache"):
+            cache = await key.client.aio.caches.create(
+                model=self.model_name,
+                config=types.CreateCachedContentConfig(system_instruction=instructions,
+                                                       ttl=f"{GEMINI_CONTEXT_CACHE_TTL_SECONDS}s")
+            )
+        if replaces is not None and replaces.done() and not replaces.cancelled() and replaces.exception() is None:
+            try:
+                await key.client.aio.caches.delete(name=replaces.result())
+            except Exception as e:
+                print(f"Failed to delete replaced Gemini context cache: {e}")  # It expires with its TTL anyway
+        return cache.name
+
+
 # Global client instance
 try:
     gemini_client = GeminiClient()
@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from ai.services.ai_client_interface import AiClientInterface
+from ai.services.ai_registry import get_hedge_client
+from ai.services.ocr_figures import UploadGate, upload_gate
+from telemetry.services.metrics import AI_HEDGES
+
+T = TypeVar("T")
+
+# Hedging of interactive AI calls: a late call gets a duplicate, the first answer wins
+AI_HEDGE_ENABLED: bool = os.getenv("AI_HEDGE_ENABLED", "false").lower() == "true"
+# Latency quantile of a provider/operation after which the duplicate is sent
+AI_HEDGE_QUANTILE: float = float(os.getenv("AI_HEDGE_QUANTILE", 0.9))
+# Duplicate to another healthy provider of AI_FAILOVER_ORDER ("secondary") or to the same one ("same")
+AI_HEDGE_TARGET: str = os.getenv("AI_HEDGE_TARGET", "secondary").lower()
+# Hedges a tenant earns per interactive call, and the most it can save up
+AI_HEDGE_BUDGET_RATIO: float = float(os.getenv("AI_HEDGE_BUDGET_RATIO", 0.1))
+AI_HEDGE_BUDGET_BURST: float = float(os.getenv("AI_HEDGE_BUDGET_BURST", 5))
+
+_WINDOW = 200        # Recent latencies kept per provider/operation
+_MIN_SAMPLES = 20    # No hedging until the quantile means something
+_MIN_DELAY = 0.5     # Never hedge sooner than this, however fast the provider usually is
+_MAX_BUDGETS = 10_000  # Tenants whose budget is tracked; the least recently active start over from zero
+
+_latencies: Dict[Tuple[str, str], Deque[float]] = {}
+_budgets: "OrderedDict[str, float]" = OrderedDict()  # tenant id -> hedges available, least recently active first
+
+
+def _observe(provider: str, operation: str, seconds: float) -> None:
+    samples = _latencies.get((provider, operation))
+    if samples is None:
+        samples = _latencies[(provider, operation)] = deque(maxlen=_WINDOW)
+    samples.append(seconds)
+
+
+def hedge_delay(provider: str, operation: str) -> Optional[float]:
+    """Seconds to wait before hedging a call, from recent latencies; None while too few are known."""
+    samples = _latencies.get((provider, operation))
+    if not samples or len(samples) < _MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return max(_MIN_DELAY, ordered[min(len(ordered) - 1, int(len(ordered) * AI_HEDGE_QUANTILE))])
+
+
+def _earn(tenant_id: str) -> None:
+    _budgets[tenant_id] = min(AI_HEDGE_BUDGET_BURST, _budgets.get(tenant_id, 0.0) + AI_HEDGE_BUDGET_RATIO)
+    _budgets.move_to_end(tenant_id)
+    while len(_budgets) > _MAX_BUDGETS:
+        _budgets.popitem(last=False)
+
+
+def _spend(tenant_id: str) -> bool:
+    if _budgets.get(tenant_id, 0.0) < 1:
+        return False
+    _budgets[tenant_id] -= 1
+    return True
+
+
+async def _timed(provider: str, operation: str, call: Awaitable[T], gate: Optional[UploadGate] = None) -> T:
+    """ Awaits `call`, recording its latency. A call cancelled as the loser of a hedge is recorded too
+    when it already ran past the hedge delay: its latency is at least that long, and leaving the slow
+    calls out would pull the quantile down. Shorter losers say nothing about the quantile and are left out.
+    """
+    upload_gate.set(gate)
+    start = time.perf_counter()
+    try:
+        result = await call
+    except asyncio.CancelledError:
+        elapsed = time.perf_counter() - start
+        if elapsed >= (hedge_delay(provider, operation) or 0.0):
+            _observe(provider, operation, elapsed)
+        raise
+    _observe(provider, operation, time.perf_counter() - start)
+    return result
+
+
+async def hedged_call(tenant_id: str,
+                      operation: str,
+                      client: AiClientInterface,
+                      call: Callable[[AiClientInterface], Awaitable[T]]
+) -> Tuple[T, AiClientInterface]:
+    """ Runs `call(client)`; returns its result and the client that produced it.
+    When hedging is enabled and the call outlives the provider's recent `AI_HEDGE_QUANTILE` latency,
+    `call` is also started on the hedge client (if the tenant's hedge budget allows) and the first
+    successful answer is returned, the other call being cancelled. Both calls go through their
+    client's own rate limiting and circuit breaker.
+    A call is picked as soon as it has its answer: OCR figures are only uploaded by the picked call
+    (see `ocr_figures.UploadGate`), so a hedged page does not store its figures twice.
+    """
+    _earn(tenant_id)
+    primary_gate = UploadGate()
+    primary = asyncio.create_task(_timed(client.name, operation, call(client), primary_gate))
+    delay = hedge_delay(client.name, operation) if AI_HEDGE_ENABLED else None
+    if delay is None:
+        primary_gate.opened.set()
+        return await primary, client
+
+    reached = asyncio.create_task(primary_gate.reached.wait())
+    try:
+        await asyncio.wait({primary, reached}, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        reached.cancel()
+    if primary.done() or primary_gate.reached.is_set():
+        primary_gate.opened.set()
+        return await primary, client
+
+    hedge_client = get_hedge_client(client, same=AI_HEDGE_TARGET == "same")
+    if hedge_client is None or not _spend(tenant_id):
+        AI_HEDGES.inc(provider=client.name, operation=operation, outcome="skipped")
+        primary_gate.opened.set()
+        return await primary, client
+
+    AI_HEDGES.inc(provider=hedge_client.name, operation=operation, outcome="sent")
+    hedge_gate = UploadGate()
+    hedge = asyncio.create_task(_timed(hedge_client.name, operation, call(hedge_client), hedge_gate))
+    owners = {primary: client, hedge: hedge_client}
+    gates = {primary: primary_gate, hedge: hedge_gate}
+    # Calls about to upload figures, waiting to be picked
+    waiting = {asyncio.create_task(gate.reached.wait()): task for task, gate in gates.items()}
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending | waiting.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in (primary, hedge):
+                if task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        AI_HEDGES.inc(provider=hedge_client.name, operation=operation,
+                                      outcome="won" if task is hedge else "lost")
+                        return task.result(), owners[task]
+            for task in (primary, hedge):
+                if task in pending and gates[task].reached.is_set():
+                    AI_HEDGES.inc(provider=hedge_client.name, operation=operation,
+                                  outcome="won" if task is hedge else "lost")
+                    for other in pending - {task}:
+                        other.cancel()
+                    gates[task].opened.set()
+                    return await task, owners[task]
+            for waiter in done & waiting.keys():
+                del waiting[waiter]
+        # Both failed: report the original call's error
+        return primary.result(), client
+    finally:
+        for task in (primary, hedge, *waiting):
+            task.cancel()
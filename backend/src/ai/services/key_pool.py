@@ -0,0 +1,153 @@
+import os
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from ai.services.circuit_breaker import ErrorKind, classify_error
+from telemetry.services.metrics import AI_KEY_IN_FLIGHT, AI_KEY_QUARANTINES, AI_KEY_REQUESTS
+
+C = TypeVar("C")
+
+# "least_loaded" (fewest calls in flight) or "round_robin"
+AI_KEY_SELECTION: str = os.getenv("AI_KEY_SELECTION", "least_loaded").lower()
+# Seconds a key sits out after hitting its quota, or after being rejected (bad or revoked key)
+AI_KEY_QUARANTINE_SECONDS: float = float(os.getenv("AI_KEY_QUARANTINE_SECONDS", 60))
+AI_KEY_AUTH_QUARANTINE_SECONDS: float = float(os.getenv("AI_KEY_AUTH_QUARANTINE_SECONDS", 600))
+
+
+def load_api_keys(env_name: str) -> List[Tuple[str, str]]:
+    """ (label, key) pairs from `<env_name>S`, a comma-separated list whose entries are `key` or `label:key`
+    (label it after the key's project to tell them apart in metrics), falling back to the single `<env_name>`.
+    Keys themselves never appear in labels.
+    """
+    entries = [entry.strip() for entry in os.getenv(f"{env_name}S", "").split(",") if entry.strip()]
+    if not entries and os.getenv(env_name):
+        entries = [os.getenv(env_name, "")]
+    keys = []
+    for index, entry in enumerate(entries):
+        label, _, key = entry.rpartition(":")
+        keys.append((label or f"key{index}", key))
+    return keys
+
+
+class PooledKey(Generic[C]):
+    """One API key of a pool: its SDK client, concurrency slots, request pacing and quarantine."""
+    def __init__(self, provider: str, label: str, client: C, max_concurrency: int, requests_per_second: float):
+        self.provider = provider
+        self.label = label
+        self.client = client
+        self.in_flight = 0
+        self.quarantined_until = 0.0
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._interval = 1 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_at = 0.0
+
+    def quarantined(self, now: float) -> bool:
+        return now < self.quarantined_until
+
+    async def _pace(self) -> None:
+        if not self._interval:
+            return
+        now = asyncio.get_running_loop().time()
+        wait = self._next_at - now
+        self._next_at = max(now, self._next_at) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _record(self, exc: Optional[BaseException]) -> None:
+        if exc is None:
+            AI_KEY_REQUESTS.inc(provider=self.provider, key=self.label, outcome="ok")
+            return
+        kind = classify_error(exc)
+        AI_KEY_REQUESTS.inc(provider=self.provider, key=self.label, outcome=str(kind))
+        if kind in (ErrorKind.RATE_LIMITED, ErrorKind.AUTH):
+            seconds = AI_KEY_QUARANTINE_SECONDS if kind == ErrorKind.RATE_LIMITED else AI_KEY_AUTH_QUARANTINE_SECONDS
+            self.quarantined_until = asyncio.get_running_loop().time() + seconds
+            AI_KEY_QUARANTINES.inc(provider=self.provider, key=self.label, reason=str(kind))
+            print(f"Quarantining {self.provider} API key '{self.label}' for {seconds:.0f}s ({kind})")
+
+
+class KeyPool(Generic[C]):
+    """ API keys of one provider, each with its own client and limits, so throughput grows with the number of keys.
+    `acquire()` picks a key that is not quarantined (per `AI_KEY_SELECTION`) and takes one of its slots;
+    a call failing on quota or credentials puts the key in quarantine so the next calls go to the others,
+    as long as there are others: a pool never waits for a quarantine to end.
+    """
+    def __init__(self,
+                 provider: str,
+                 clients: List[Tuple[str, C]],
+                 max_concurrency: int,
+                 requests_per_second: float = 0):
+        if not clients:
+            raise Exception(f"No API key configured for {provider}")
+        self.provider = provider
+        self.keys: List[PooledKey[C]] = [PooledKey(provider, label, client, max_concurrency, requests_per_second)
+                                         for label, client in clients]
+        self._by_label: Dict[str, PooledKey[C]] = {key.label: key for key in self.keys}
+        self._turns = itertools.cycle(range(len(self.keys)))
+
+    @classmethod
+    def from_env(cls,
+                 provider: str,
+                 env_name: str,
+                 make_client: Callable[[str], C],
+                 max_concurrency: int,
+                 requests_per_second: float = 0) -> "KeyPool[C]":
+        clients = [(label, make_client(key)) for label, key in load_api_keys(env_name)]
+        if not clients:
+            raise Exception(f"{env_name} not found")
+        return cls(provider, clients, max_concurrency, requests_per_second)
+
+    def get(self, label: str) -> PooledKey[C]:
+        key = self._by_label.get(label)
+        if key is None:
+            raise Exception(f"No {self.provider} API key labelled '{label}' in the pool")
+        return key
+
+    def healthy(self) -> bool:
+        """Whether some key is not quarantined: a call made now would go to a key not known to be refused."""
+        now = asyncio.get_running_loop().time()
+        return any(not key.quarantined(now) for key in self.keys)
+
+    def _select(self) -> PooledKey[C]:
+        now = asyncio.get_running_loop().time()
+        available = [key for key in self.keys if not key.quarantined(now)]
+        if not available:
+            # Quarantine only steers calls to the other keys, it never holds them: with every key quarantined
+            # (or a single key) the call goes to the key back first, and backs off its own way if refused again
+            return min(self.keys, key=lambda key: key.quarantined_until)
+        if AI_KEY_SELECTION == "round_robin":
+            while True:
+                key = self.keys[next(self._turns)]
+                if not key.quarantined(now):
+                    return key
+        return min(available, key=lambda key: key.in_flight)
+
+    @asynccontextmanager
+    async def acquire(self, pinned: Optional[PooledKey[C]] = None) -> AsyncIterator[PooledKey[C]]:
+        """ A key for one provider call. `pinned` reuses a key the caller already holds (for calls that must
+        stay on one key, like using a file uploaded with it): no other slot is taken, and the outcome is
+        left for the holder to record.
+        """
+        if pinned is not None:
+            await pinned._pace()
+            yield pinned
+            return
+
+        key = self._select()
+        key.in_flight += 1
+        AI_KEY_IN_FLIGHT.inc(provider=self.provider, key=key.label)
+        try:
+            async with key._slots:
+                await key._pace()
+                try:
+                    yield key
+                except BaseException as e:
+                    if not isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                        key._record(e)
+                    raise
+                key._record(None)
+        finally:
+            key.in_flight -= 1
+            AI_KEY_IN_FLIGHT.dec(provider=self.provider, key=key.label)
@@ -1,18 +1,34 @@
 import os
+import json
 from fastapi import HTTPException
-from typing import Optional, Tuple, List
+from typing import AsyncIterator, Optional, Tuple, List
 import asyncio
-from mistralai import Mistral, Document, ImageURLChunk
-from mistralai.models import OCRResponse, UserMessage
+from mistralai import Mistral, Document, DocumentURLChunk, File, ImageURLChunk
+from mistralai.models import Messages, OCRPageObject, OCRResponse, SystemMessage, UserMessage
 
-from ai.services.ai_client_interface import AiClientInterface
+from ai.services.ai_client_interface import AiClientInterface, BatchResult, BatchState, BatchStatus
 from cell.services.s3_service import S3Service
+from ai.services.ocr_figures import OcrFigureUploader, link_figures, OCR_FIGURE_CONCURRENCY
+from ai.services.circuit_breaker import get_breaker
+from ai.services.key_pool import KeyPool, PooledKey, load_api_keys
+from telemetry.services.instrumentation import instrument_ai_call, record_ai_tokens
+
+MISTRAL_MAX_PARALLEL_REQUESTS = int(os.getenv("MISTRAL_MAX_PARALLEL_REQUESTS", 50))  # Per API key
+MISTRAL_REQUESTS_PER_SECOND = float(os.getenv("MISTRAL_REQUESTS_PER_SECOND", 0))  # Per API key, 0 for no pacing
+
+_BATCH_FAILED_STATES = {"FAILED", "TIMEOUT_EXCEEDED", "CANCELLATION_REQUESTED", "CANCELLED"}
 
 class MistralClient(AiClientInterface):    
-    __api_key = os.getenv("MISTRAL_API_KEY")
     __ocr_model = os.getenv("MISTRAL_OCR_MODEL", "mistral-ocr-latest")
     __chat_model = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
-    __client = Mistral(api_key=__api_key)
+    # One client per key of MISTRAL_API_KEYS (or the single MISTRAL_API_KEY); without any, calls fail on use
+    __keys: KeyPool[Mistral] = KeyPool("mistral",
+                                       [(label, Mistral(api_key=api_key)) for label, api_key in load_api_keys("MISTRAL_API_KEY")]
+                                       or [("key0", Mistral(api_key=None))],
+                                       max_concurrency=MISTRAL_MAX_PARALLEL_REQUESTS,
+                                       requests_per_second=MISTRAL_REQUESTS_PER_SECOND)
+    supports_batch = True
+    supports_document_ocr = True
 
     async def process_ocr_async(
             self,
@@ -31,35 +47,155 @@ class MistralClient(AiClientInterface):
 
     async def process_translation_async(self, prompt: str) -> str:
         """Process translation asynchronously"""        
+        return await self._chat([UserMessage(content=prompt)])
+
+    async def process_translation_with_context_async(self,
+                                                     instructions: str,
+                                                     text: str,
+                                                     cache_key: Optional[str] = None
+        ) -> str:
+        # No explicit context cache API: the instructions go first as the system message, a stable prefix
+        return await self._chat([SystemMessage(content=instructions), UserMessage(content=text)])
+
+    async def _chat(self, messages: List[Messages]) -> str:
         try:
-            with self.__client:
-                result = await self.__client.chat.complete_async(
-                    model=self.__chat_model,
-                    messages=[UserMessage(content=prompt)],                
-                )
-                translation_text = str(result.choices[0].message.content)            
-                return translation_text
+            async with self.__keys.acquire() as key:
+                with key.client:
+                    with get_breaker("mistral"), instrument_ai_call("mistral", self.__chat_model, "translation"):
+                        result = await key.client.chat.complete_async(
+                            model=self.__chat_model,
+                            messages=messages,                
+                        )
+                    if result.usage:
+                        record_ai_tokens("mistral", self.__chat_model, result.usage.prompt_tokens, result.usage.completion_tokens)
+                    translation_text = str(result.choices[0].message.content)            
+                    return translation_text
         
         except Exception as e:
             raise Exception(f"Translation processing failed: {str(e)}")
 
+    async def submit_ocr_batch(self,
+                               pages: List[Tuple[str, str]],
+                               language: str,
+                               custom_prompt: Optional[str] = None
+        ) -> str:
+        lines = [json.dumps({"custom_id": page_id,
+                             "body": {"document": {"type": "image_url", "image_url": image_url},
+                                      "include_image_base64": True}})
+                 for page_id, image_url in pages]
+        try:
+            # The batch, its files and its results belong to the key's workspace: its label goes in the batch id
+            async with self.__keys.acquire() as key:
+                with key.client:
+                    with get_breaker("mistral"), instrument_ai_call("mistral", self.__ocr_model, "batch_submit"):
+                        input_file = await key.client.files.upload_async(
+                            file=File(file_name="ocr-batch.jsonl", content="\n".join(lines).encode()),
+                            purpose="batch"
+                        )
+                        job = await key.client.batch.jobs.create_async(
+                            input_files=[input_file.id],
+                            model=self.__ocr_model,
+                            endpoint="/v1/ocr"
+                        )
+            return f"{key.label}/{job.id}"
+        except Exception as e:
+            raise Exception(f"Submitting OCR batch failed: {str(e)}")
+
+    def _batch_key(self, batch_id: str) -> Tuple[PooledKey[Mistral], str]:
+        label, _, job_id = batch_id.rpartition("/")
+        return (self.__keys.get(label) if label else self.__keys.keys[0]), job_id
+
+    async def get_batch_status(self, batch_id: str) -> BatchStatus:
+        key, job_id = self._batch_key(batch_id)
+        with key.client:
+            job = await key.client.batch.jobs.get_async(job_id=job_id)
+        completed = (job.succeeded_requests or 0) + (job.failed_requests or 0)
+        if job.status == "SUCCESS":
+            return BatchStatus(BatchState.SUCCEEDED, completed, job.total_requests or 0)
+        if job.status in _BATCH_FAILED_STATES:
+            return BatchStatus(BatchState.FAILED, completed, job.total_requests or 0, error=f"Batch {job.status.lower()}")
+        return BatchStatus(BatchState.RUNNING, completed, job.total_requests or 0)
+
+    async def iter_ocr_batch_results(self,
+                                     batch_id: str,
+                                     book_id: str,
+                                     s3_service: S3Service | None = None
+        ) -> AsyncIterator[BatchResult]:
+        key, job_id = self._batch_key(batch_id)
+        with key.client:
+            job = await key.client.batch.jobs.get_async(job_id=job_id)
+            if not job.output_file:
+                return
+            # The output holds every page's figures as base64, so it is read line by line
+            response = await key.client.files.download_async(file_id=job.output_file)
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                page_id = entry.get("custom_id", "")
+                body = (entry.get("response") or {}).get("body")
+                if entry.get("error") or not body:
+                    yield BatchResult(page_id, error=str(entry.get("error") or "No response"))
+                    continue
+                try:
+                    ocr_response = OCRResponse.model_validate(body)
+                    text, image_urls = await self._get_markdown_with_images(book_id=book_id,
+                                                                            page_id=page_id,
+                                                                            pages=ocr_response.pages,
+                                                                            s3=s3_service)
+                    yield BatchResult(page_id, text=text, image_urls=image_urls)
+                except Exception as e:
+                    yield BatchResult(page_id, error=str(e))
+
+    async def process_document_ocr_async(
+            self,
+            book_id: str,
+            page_ids: List[str],
+            document_url: str,
+            s3_service: S3Service | None = None
+        ) -> List[Tuple[str, List[str]]]:
+        try:
+            async with self.__keys.acquire() as key:
+                with key.client:
+                    with get_breaker("mistral"), instrument_ai_call("mistral", self.__ocr_model, "ocr_document"):
+                        response = await key.client.ocr.process_async(
+                            model=self.__ocr_model,
+                            document=DocumentURLChunk(document_url=document_url),
+                            include_image_base64=True
+                        )
+        except Exception as e:
+            raise Exception(f"Document OCR processing failed: {str(e)}")
+
+        pages = sorted(response.pages, key=lambda page: page.index) if response else []
+        if len(pages) != len(page_ids):
+            raise ValueError(f"The document has {len(pages)} pages but {len(page_ids)} were expected")
+
+        # One figure window across all pages, so a figure-heavy document stays bounded too
+        window = asyncio.Semaphore(OCR_FIGURE_CONCURRENCY)
+        return list(await asyncio.gather(*(
+            self._get_markdown_with_images(book_id=book_id, page_id=page_id, pages=[page], s3=s3_service, window=window)
+            for page_id, page in zip(page_ids, pages)
+        )))
 
     async def _run_ocr(self, book_id: str, page_id: str, document: Document, s3: S3Service | None) -> Tuple[str, List[str]]:
         try:
-            with self.__client:
-                image_response = await self.__client.ocr.process_async(
-                    model=self.__ocr_model,
-                    document=document,
-                    include_image_base64=True
-                )
-                if not image_response:
-                    return "", []
-
-                return await self._get_markdown_with_images(book_id=book_id,
-                                                            page_id=page_id,
-                                                            ocr_response=image_response,
-                                                            s3=s3
-                                                           )
+            async with self.__keys.acquire() as key:
+                with key.client:
+                    with get_breaker("mistral"), instrument_ai_call("mistral", self.__ocr_model, "ocr"):
+                        image_response = await key.client.ocr.process_async(
+                            model=self.__ocr_model,
+                            document=document,
+                            include_image_base64=True
+                        )
+            if not image_response:
+                return "", []
+
+            # Figures are uploaded after the key's slot is released
+            return await self._get_markdown_with_images(book_id=book_id,
+                                                        page_id=page_id,
+                                                        pages=image_response.pages,
+                                                        s3=s3
+                                                       )
         
         except Exception as e:
             raise Exception(f"OCR processing failed: {str(e)}")
@@ -67,47 +203,23 @@ class MistralClient(AiClientInterface):
     async def _get_markdown_with_images(self,
                                          book_id: str,
                                          page_id: str,
-                                         ocr_response: OCRResponse,
-                                         s3: S3Service | None
+                                         pages: List[OCRPageObject],
+                                         s3: S3Service | None,
+                                         window: Optional[asyncio.Semaphore] = None
                                     ) -> Tuple[str, List[str]]:
         if s3 is None:
             raise Exception("S3 Service is required for uploading images.")
-        
-        markdowns: list[str] = []
-        all_s3_urls: list[str] = []
-
-        for page in ocr_response.pages:
-            image_data = {}
-            upload_tasks = []
-            img_ids = []
 
-            # Prepare upload tasks for all images in the page            
+        figures = OcrFigureUploader(s3, book_id=book_id, page_id=page_id, window=window)
+        for page in pages:
             for img in page.images:
-                if not img.image_base64:
-                    continue
-                upload_tasks.append(s3.upload_ocr_image(book_id=book_id,
-                                                        page_id=page_id,
-                                                        base64_data_url=img.image_base64
-                                                       ))
-                img_ids.append(img.id)
-
-            # Upload all images concurrently
-            s3_urls = await asyncio.gather(*upload_tasks)
-            all_s3_urls.extend(s3_urls)
-
-            # Map image IDs to their S3 URLs
-            for img_id, s3_url in zip(img_ids, s3_urls):
-                image_data[img_id] = s3_url
-
-            # Replace base64 in markdown with S3 URLs
-            markdowns.append(self.__replace_base64_with_url_in_markdown(page.markdown, image_data))
-
-        return "\n\n".join(markdowns), all_s3_urls
+                if img.image_base64:
+                    await figures.add(img.id, img.image_base64)
+                    img.image_base64 = None  # The uploader holds the only reference, dropped once decoded
 
-    def __replace_base64_with_url_in_markdown(self, markdown_string: str, images_dict: dict) -> str:
-        for img_name, s3_url in images_dict.items():
-            markdown_string = markdown_string.replace(f"![{img_name}]({img_name})", f"![{img_name}]({s3_url})")
-        return markdown_string
+        urls = await figures.finish()
+        markdown = link_figures("\n\n".join(page.markdown for page in pages), urls)
+        return markdown, figures.urls
 
     async def cleanup(self):
         return # No specific cleanup as using context manager (with)
@@ -0,0 +1,145 @@
+import os
+import re
+import base64
+import asyncio
+import hashlib
+from io import BytesIO
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+
+from cell.services.s3_service import S3Service
+from telemetry.services.metrics import IMAGE_PROCESSING_LATENCY
+from telemetry.services.instrumentation import instrument
+
+# Figures decoded and uploaded at the same time, per OCR call
+OCR_FIGURE_CONCURRENCY: int = int(os.getenv("OCR_FIGURE_CONCURRENCY", 4))
+# Re-encode figures to this format ("webp" or "jpeg") when that makes them smaller; empty keeps them as returned
+OCR_FIGURE_FORMAT: str = os.getenv("OCR_FIGURE_FORMAT", "").lower()
+OCR_FIGURE_QUALITY: int = int(os.getenv("OCR_FIGURE_QUALITY", 80))
+
+_DATA_URL = re.compile(r"^data:image/(?P<ext>\w+);base64,")
+_MARKDOWN_IMAGE = re.compile(r"!\[(?P<alt>[^\]]*)\]\((?P<target>[^)\s]+)\)")
+_FORMATS = {"webp": ("WEBP", "webp"), "jpeg": ("JPEG", "jpg"), "jpg": ("JPEG", "jpg")}
+
+
+class UploadGate:
+    """ Holds the figure uploads of one of several racing calls (see `hedging.hedged_call`) until it is picked:
+    `reached` is set once the call has its answer and is about to upload, `opened` lets it go ahead.
+    """
+    def __init__(self):
+        self.reached = asyncio.Event()
+        self.opened = asyncio.Event()
+
+
+# Gate of the current call; outside hedged calls there is none and figures upload right away
+upload_gate: ContextVar[Optional[UploadGate]] = ContextVar("ocr_figure_upload_gate", default=None)
+
+
+def _on_white(image: Image.Image) -> Image.Image:
+    """RGB version of an image, transparent parts composited onto white (a plain conversion turns them black)."""
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _decode(data_url: str) -> Tuple[bytes, str]:
+    """Figure bytes and file extension of a base64 data URL, re-encoded per `OCR_FIGURE_FORMAT`. Runs in a worker thread."""
+    match = _DATA_URL.match(data_url)
+    ext = match.group("ext").lower() if match else "jpeg"
+    data = base64.b64decode(data_url[match.end():] if match else data_url.split(",", 1)[-1])
+
+    target = _FORMATS.get(OCR_FIGURE_FORMAT)
+    if target and ext not in (target[1], OCR_FIGURE_FORMAT):
+        try:
+            with instrument("image.ocr_figure", IMAGE_PROCESSING_LATENCY, operation="ocr_figure"):
+                image = Image.open(BytesIO(data))
+                if target[0] == "JPEG" and image.mode not in ("RGB", "L"):
+                    image = _on_white(image)
+                output = BytesIO()
+                image.save(output, format=target[0], quality=OCR_FIGURE_QUALITY)
+            if output.tell() < len(data):
+                return output.getvalue(), target[1]
+        except Exception as e:
+            print(f"Keeping OCR figure as {ext}, re-encoding failed: {e}")
+    return data, "jpg" if ext == "jpeg" else ext
+
+
+class OcrFigureUploader:
+    """ Uploads the figures an OCR response embeds as base64 and maps their ids to S3 URLs.
+    Decoding happens off the event loop. A figure holds one slot of the window from decoding to
+    the end of its upload, and `add` waits for a free slot: at most `OCR_FIGURE_CONCURRENCY`
+    figures are decoded or uploaded at once, and the others wait undecoded with the caller.
+    Identical figures are stored once: files are named by content hash, which also makes
+    re-running OCR on a page overwrite rather than add files.
+    """
+    def __init__(self, s3: S3Service, book_id: str, page_id: str, window: Optional[asyncio.Semaphore] = None):
+        """`window` can be shared by the uploaders of several pages to bound them together."""
+        self._s3 = s3
+        self._book_id = book_id
+        self._page_id = page_id
+        self._window = window or asyncio.Semaphore(OCR_FIGURE_CONCURRENCY)
+        self._uploads: Dict[str, asyncio.Task] = {}  # content hash -> upload returning the URL
+        self._tasks: List[asyncio.Task] = []
+        self._urls: Dict[str, str] = {}  # figure id -> URL
+
+    async def add(self, figure_id: str, data_url: str) -> None:
+        """Starts processing the figure once the window has a free slot."""
+        await self._window.acquire()
+        try:
+            self._tasks.append(asyncio.create_task(self._process(figure_id, data_url)))
+        except BaseException:
+            self._window.release()
+            raise
+
+    async def _process(self, figure_id: str, data_url: str) -> None:
+        try:
+            data, ext = await asyncio.to_thread(_decode, data_url)
+            del data_url  # Only the decoded bytes are needed from here on
+
+            digest = hashlib.sha256(data).hexdigest()[:32]
+            upload = self._uploads.get(digest)
+            if upload is None:
+                upload = self._uploads[digest] = asyncio.create_task(self._upload(data, digest, ext))
+            self._urls[figure_id] = await upload
+        finally:
+            self._window.release()
+
+    async def _upload(self, data: bytes, digest: str, ext: str) -> str:
+        # Runs on the slot of the figure that started it
+        gate = upload_gate.get()
+        if gate is not None:
+            gate.reached.set()
+            await gate.opened.wait()
+        return await self._s3.upload_ocr_figure(self._book_id,
+                                                self._page_id,
+                                                f"ocr_{digest}.{ext}",
+                                                BytesIO(data),
+                                                f"image/{'jpeg' if ext == 'jpg' else ext}")
+
+    async def finish(self) -> Dict[str, str]:
+        """Waits for all figures; returns figure id -> URL. A failed upload fails the whole OCR call."""
+        try:
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            for task in self._tasks:
+                task.cancel()
+            raise
+        return self._urls
+
+    @property
+    def urls(self) -> List[str]:
+        """Distinct URLs uploaded, in upload order."""
+        return [upload.result() for upload in self._uploads.values()
+                if upload.done() and not upload.cancelled() and upload.exception() is None]
+
+
+def link_figures(markdown: str, urls: Dict[str, str]) -> str:
+    """Points `![id](id)` placeholders at the uploaded figures, in a single pass over the text."""
+    def replace(match: re.Match) -> str:
+        url: Optional[str] = urls.get(match.group("target"))
+        return f"![{match.group('alt')}]({url})" if url else match.group(0)
+    return _MARKDOWN_IMAGE.sub(replace, markdown)
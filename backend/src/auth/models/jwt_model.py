@@ -34,7 +34,9 @@ class RevokedRefreshToken(BaseModel):
     """ Represents a revoked refresh token record.
     Attributes:
         id: JWT ID.
-        expires_at: datetime
+        expires_at: datetime after which the record is pruned by the TTL index.
+        revoked_at: datetime used by workers to incrementally sync their revocation filters.
     """
     id: str = Field(default_factory=lambda: str(ObjectId()))  
-    expires_at: datetime    
\ No newline at end of file
+    expires_at: datetime
+    revoked_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
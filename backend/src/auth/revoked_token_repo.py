@@ -2,10 +2,25 @@ from core.base_repo import BaseRepo
 from core.dependency import request_context_dependency
 from core.models.req_context_model import RequestContext
 
+from auth.models.jwt_model import RevokedRefreshToken
+from auth.services.revoked_token_filter import get_revoked_token_filter, REVOKED_TOKENS_COLLECTION
+
 class RevokedTokenRepo(BaseRepo):
     def __init__(self, ctx: RequestContext):
-        super().__init__("revoked_tokens", ctx)    
-    # Add revoked token repository methods here if needed
+        super().__init__(REVOKED_TOKENS_COLLECTION, ctx)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """Checks the worker-local revocation filter first.
+        The collection is only queried when the filter reports a possible hit."""
+        if not get_revoked_token_filter(self._ctx.cell).might_contain(jti):
+            return False
+        return await self.find_one({"id": jti}, projection={"_id": 1}) is not None
+
+    async def revoke(self, revoked_token: RevokedRefreshToken):
+        """Adds the token to the blocklist collection and to this worker's filter."""
+        result = await self.insert_one(revoked_token.model_dump())
+        get_revoked_token_filter(self._ctx.cell).add(revoked_token.id)
+        return result
 
 def get_revoked_token_repo(request_ctx: request_context_dependency) -> RevokedTokenRepo:
-    return RevokedTokenRepo(ctx=request_ctx)
\ No newline at end of file
+    return RevokedTokenRepo(ctx=request_ctx)
@@ -0,0 +1,170 @@
+import os
+import math
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from cell.services.cell_manager import Cell, on_cell_closed
+
+REVOKED_TOKENS_COLLECTION: str = "revoked_tokens"
+
+# How often each worker pulls newly revoked JTIs written by other workers.
+# A token revoked on another worker is accepted here for at most this long.
+REVOCATION_SYNC_SECONDS: float = float(os.getenv("REVOCATION_SYNC_SECONDS", 10))
+# How often the filter is rebuilt from scratch, dropping JTIs whose tokens have expired.
+REVOCATION_REBUILD_SECONDS: float = float(os.getenv("REVOCATION_REBUILD_SECONDS", 3600))
+
+_DEFAULT_CAPACITY: int = int(os.getenv("REVOCATION_FILTER_CAPACITY", 100_000))
+_FALSE_POSITIVE_RATE: float = 0.001
+_SYNC_OVERLAP = timedelta(seconds=5)  # Re-reads a small window to tolerate clock skew between workers
+
+
+class BloomFilter:
+    """ Fixed-size Bloom filter over strings.
+    Never gives false negatives; false positives happen at roughly `error_rate` while
+    the number of added items stays below `capacity`.
+    """
+    def __init__(self, capacity: int, error_rate: float = _FALSE_POSITIVE_RATE):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing (Kirsch-Mitzenmacher) from a single 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevokedTokenFilter:
+    """ Per-worker Bloom filter of revoked refresh token JTIs for one cell.
+
+    A miss means the token is definitely not revoked (as of the last sync), so the
+    common refresh path costs no I/O. A hit must be confirmed against the collection.
+    Until the first successful load every lookup is reported as a possible hit.
+    """
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self._col = collection
+        self._bloom = BloomFilter(_DEFAULT_CAPACITY)
+        self._loaded = False
+        self._synced_at: Optional[datetime] = None
+        self._rebuilt_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    def might_contain(self, jti: str) -> bool:
+        if not self._loaded:
+            return True
+        return jti in self._bloom
+
+    def add(self, jti: str) -> None:
+        self._bloom.add(jti)
+
+    async def rebuild(self) -> None:
+        """Reloads all unexpired revoked JTIs into a freshly sized filter."""
+        async with self._lock:
+            now = datetime.now(timezone.utc)
+            cursor = self._col.find({"expires_at": {"$gt": now}}, projection={"id": 1, "_id": 0})
+            jtis = [doc["id"] async for doc in cursor if doc.get("id")]
+
+            bloom = BloomFilter(max(_DEFAULT_CAPACITY, 2 * len(jtis)))
+            for jti in jtis:
+                bloom.add(jti)
+
+            self._bloom = bloom
+            self._loaded = True
+            self._synced_at = now
+            self._rebuilt_at = now
+
+    async def sync(self) -> None:
+        """Adds JTIs revoked since the previous sync; rebuilds when the filter is stale or overfull."""
+        now = datetime.now(timezone.utc)
+        needs_rebuild = (
+            not self._loaded
+            or self._rebuilt_at is None
+            or (now - self._rebuilt_at).total_seconds() >= REVOCATION_REBUILD_SECONDS
+            or self._bloom.count > self._bloom.capacity
+        )
+        if needs_rebuild:
+            await self.rebuild()
+            return
+
+        async with self._lock:
+            since = (self._synced_at or now) - _SYNC_OVERLAP
+            cursor = self._col.find({"revoked_at": {"$gte": since}}, projection={"id": 1, "_id": 0})
+            async for doc in cursor:
+                if doc.get("id"):
+                    self._bloom.add(doc["id"])
+            self._synced_at = now
+
+
+_filters: Dict[str, RevokedTokenFilter] = {}
+_sync_task: Optional[asyncio.Task] = None
+
+
+def get_revoked_token_filter(cell: Cell) -> RevokedTokenFilter:
+    """Returns the worker-local filter for the cell, creating an (unloaded) one on first use."""
+    cell_id = cell.config.cell_id
+    revoked_filter = _filters.get(cell_id)
+    if revoked_filter is None:
+        collection = cell.mongo_service.get_db()[REVOKED_TOKENS_COLLECTION]
+        revoked_filter = RevokedTokenFilter(collection)
+        _filters[cell_id] = revoked_filter
+    return revoked_filter
+
+
+def _drop_filter(cell: Cell) -> None:
+    # The filter reads through the closed cell's client; a new one is created on the cell's next use
+    _filters.pop(cell.config.cell_id, None)
+
+
+on_cell_closed(_drop_filter)
+
+
+async def _sync_all_filters() -> None:
+    for cell_id, revoked_filter in list(_filters.items()):
+        try:
+            await revoked_filter.sync()
+        except Exception as e:
+            print(f"Failed to sync revoked token filter for cell '{cell_id}': {e}")
+
+
+async def _sync_loop() -> None:
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
+        await _sync_all_filters()
+
+
+async def start_revoked_token_sync(cells: Iterable[Cell]) -> None:
+    """Loads the filters for the given cells and starts the periodic background sync."""
+    global _sync_task
+    for cell in cells:
+        get_revoked_token_filter(cell)
+    await _sync_all_filters()
+
+    if _sync_task is None or _sync_task.done():
+        _sync_task = asyncio.create_task(_sync_loop())
+
+
+async def stop_revoked_token_sync() -> None:
+    global _sync_task
+    if _sync_task:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
@@ -46,7 +46,7 @@ async def revoke_refresh_token(refresh_request: Request,
         expires_at=refresh_token.exp if refresh_token.exp else datetime.now(timezone.utc) + expire_delta
     )
 
-    await revoked_token_repo.insert_one(revoked_token.model_dump())
+    await revoked_token_repo.revoke(revoked_token)
 
 
 def generate_token(token_type: TokenType,
@@ -107,8 +107,7 @@ async def refresh_access_token(refresh_request: Request,
     refresh_token = await _get_refresh_token_from_request(refresh_request)
 
     # Validating if the refresh token is revoked (present in the blocklist collection)
-    db_record = await refresh_token_repo.find_one({"id": refresh_token.jit})
-    if db_record:
+    if await refresh_token_repo.is_revoked(refresh_token.jit):
         raise HTTPException(status_code=401, detail="Refresh token has been revoked")
 
     user = await get_user_by_id(user_id=refresh_token.sub, user_repo=user_repo)
@@ -3,6 +3,8 @@ from core.dependency import request_context_dependency
 from core.models.req_context_model import RequestContext
 
 class BookRepo(BaseRepo):
+    touch_updated_at = True
+
     def __init__(self, ctx: RequestContext):
         super().__init__("books", ctx)    
     # Add book-specific repository methods here if needed
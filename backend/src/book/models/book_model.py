@@ -1,10 +1,16 @@
 from bson import ObjectId
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime, timezone
 
 from core.models.models import Tenant
 
+class TranslationContext(BaseModel):
+    """Per-book guidance sent with every page translation of the book."""
+    notes: str = ""  # Conventions of the source text (spelling, abbreviations, ...)
+    glossary: Dict[str, str] = {}  # Source term -> how to translate it
+
+
 class BookBase(BaseModel):
     tenant: Optional[Tenant] = None
     title: str
@@ -12,6 +18,7 @@ class BookBase(BaseModel):
     author: str
     published: str
     language: str
+    translation_context: Optional[TranslationContext] = None
 
 class Book(BookBase):    
     id: str = Field(default_factory=lambda: str(ObjectId()))
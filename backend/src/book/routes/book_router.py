@@ -1,22 +1,28 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Depends, BackgroundTasks, Request, Response, Query
 from typing import Optional, List, Annotated
 
-from book.models.book_model import Book, DeleteBookRequest
+from book.models.book_model import Book, DeleteBookRequest, TranslationContext
 
 from book.book_repo import BookRepo, get_books_repo
 from page.page_repo import PageRepo, get_pages_repo
 from core.dependency import s3_service_dependency
+from core.http_cache import CACHE_REVALIDATE, not_modified_response, set_cache_headers
 
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
 from book.services.book_service import (
     create_book_service,
     get_book_service,
     update_book_service,
+    update_translation_context_service,
     delete_book_service,
     get_books_service,
     get_book_details_service,
-    get_next_page_number_service
+    get_next_page_number_service,
+    get_books_cache_validators,
+    get_book_cache_validators
 )
+from book.services.book_archive_service import export_book_archive_service, import_book_archive_service
+from pdf.services.book_pdf_service import export_book_pdf_service, get_book_pdf_cache_validators
 
 router = APIRouter()
 
@@ -57,9 +63,17 @@ async def create_book(
 
 @router.get("/{book_id}", response_model=Book)
 async def get_book(book_id: str,
+                   request: Request,
+                   response: Response,
                    books_repo: book_repo_dep,
                    pages_repo: page_repo_dep
 ) -> Book:
+    validators = await get_book_cache_validators(book_id=book_id, books_repo=books_repo, pages_repo=pages_repo)
+    not_modified = not_modified_response(request, validators, CACHE_REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    set_cache_headers(response, validators, CACHE_REVALIDATE)
     return await get_book_service(book_id=book_id,
                                   books_repo=books_repo,
                                   pages_repo=pages_repo
@@ -95,6 +109,17 @@ async def update_book(
                                     )
 
 
+@router.put("/{book_id}/translation-context",
+            response_model=TranslationContext,
+            dependencies=[Depends(need_permission(ResourceType.BOOK, ActionType.UPDATE))]
+)
+async def update_translation_context(book_id: str,
+                                     context: TranslationContext,
+                                     books_repo: book_repo_dep
+) -> TranslationContext:
+    return await update_translation_context_service(book_id=book_id, context=context, books_repo=books_repo)
+
+
 @router.delete("/{book_id}",
                dependencies=[Depends(need_permission(ResourceType.BOOK, ActionType.DELETE))]
 )
@@ -113,16 +138,38 @@ async def delete_book(book_id: str,
 
 
 @router.get("/", response_model=List[Book])
-async def get_books(books_repo: book_repo_dep, pages_repo: page_repo_dep) -> List[Book]:
+async def get_books(request: Request,
+                    response: Response,
+                    books_repo: book_repo_dep,
+                    pages_repo: page_repo_dep
+) -> List[Book]:
+    validators = await get_books_cache_validators(books_repo=books_repo, pages_repo=pages_repo)
+    not_modified = not_modified_response(request, validators, CACHE_REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    set_cache_headers(response, validators, CACHE_REVALIDATE)
     return await get_books_service(books_repo=books_repo, pages_repo=pages_repo)
 
 
 @router.get("/details/{book_id}", description="Get book data along with pages data.")
 async def get_book_details(book_id: str,
+                           request: Request,
+                           response: Response,
                            books_repo: book_repo_dep,
                            pages_repo: page_repo_dep,
                            s3_service: s3_service_dependency
 ) -> dict:
+    # Checked before loading every page of the book
+    validators = await get_book_cache_validators(book_id=book_id,
+                                                 books_repo=books_repo,
+                                                 pages_repo=pages_repo,
+                                                 with_pages=True)
+    not_modified = not_modified_response(request, validators, CACHE_REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    set_cache_headers(response, validators, CACHE_REVALIDATE)
     return await get_book_details_service(book_id=book_id,
                                           books_repo=books_repo,
                                           pages_repo=pages_repo,
@@ -137,4 +184,65 @@ async def get_next_page_number(book_id: str,
     return await get_next_page_number_service(book_id=book_id,
                                               books_repo=books_repo,
                                               pages_repo=pages_repo
-                                            )
\ No newline at end of file
+                                            )
+
+@router.get("/{book_id}/export.pdf",
+            description="Book as a PDF with page scans, searchable OCR and translations.",
+            dependencies=[Depends(need_permission(ResourceType.BOOK, ActionType.READ))]
+)
+async def export_book_pdf(book_id: str,
+                          request: Request,
+                          books_repo: book_repo_dep,
+                          pages_repo: page_repo_dep,
+                          s3_service: s3_service_dependency,
+                          original_images: bool = Query(False, description="Embed original scans instead of compressed copies")
+) -> Response:
+    validators = await get_book_pdf_cache_validators(book_id=book_id,
+                                                     books_repo=books_repo,
+                                                     pages_repo=pages_repo,
+                                                     original_images=original_images)
+    not_modified = not_modified_response(request, validators, CACHE_REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    response = await export_book_pdf_service(book_id=book_id,
+                                             validators=validators,
+                                             books_repo=books_repo,
+                                             pages_repo=pages_repo,
+                                             s3=s3_service,
+                                             original_images=original_images)
+    set_cache_headers(response, validators, CACHE_REVALIDATE)
+    return response
+
+
+@router.get("/{book_id}/export.zip",
+            description="Book, pages and (optionally) their files as an archive, for backups and moving books.",
+            dependencies=[Depends(need_permission(ResourceType.BOOK, ActionType.READ))]
+)
+async def export_book_archive(book_id: str,
+                              books_repo: book_repo_dep,
+                              pages_repo: page_repo_dep,
+                              s3_service: s3_service_dependency,
+                              include_files: bool = Query(True, description="Embed the book's images instead of referencing them")
+) -> Response:
+    return await export_book_archive_service(book_id=book_id,
+                                             books_repo=books_repo,
+                                             pages_repo=pages_repo,
+                                             s3=s3_service,
+                                             include_files=include_files)
+
+
+@router.post("/import",
+             response_model=Book,
+             description="Create a book from an archive made by `/book/{book_id}/export.zip`.",
+             dependencies=[Depends(need_permission(ResourceType.BOOK, ActionType.CREATE))]
+)
+async def import_book_archive(books_repo: book_repo_dep,
+                              pages_repo: page_repo_dep,
+                              s3_service: s3_service_dependency,
+                              file: UploadFile = File(...)
+) -> Book:
+    return await import_book_archive_service(file=file,
+                                             books_repo=books_repo,
+                                             pages_repo=pages_repo,
+                                             s3=s3_service)
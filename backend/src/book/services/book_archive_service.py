@@ -0,0 +1,317 @@
+import io
+import os
+import json
+import asyncio
+import zipfile
+import mimetypes
+from io import BytesIO
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List
+from bson import ObjectId
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from book.models.book_model import Book
+from page.models.page_model import Page
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from cell.services.s3_service import S3Service
+
+# Book archives are zips holding
+#   manifest.json          format, version, source book id
+#   book.json              {"book": {...}, "files": {<url>: <archive path>}}
+#   pages/00001.ndjson     one {"page": {...}, "files": {...}} line per page, in page order
+#   files/<path>           the book's own S3 files (scans, derivatives, OCR clippings), stored uncompressed
+# Pages are split over several NDJSON entries so each batch's files can follow it:
+# a zip entry must be finished before the next one starts.
+
+ARCHIVE_FORMAT: str = "sourcelibrary-book"
+ARCHIVE_VERSION: int = 1
+
+# Pages per NDJSON entry (export) and per `insert_many` (import)
+BOOK_ARCHIVE_PAGE_BATCH: int = int(os.getenv("BOOK_ARCHIVE_PAGE_BATCH", 200))
+# Image downloads in flight while exporting
+BOOK_ARCHIVE_DOWNLOAD_WINDOW: int = int(os.getenv("BOOK_ARCHIVE_DOWNLOAD_WINDOW", 16))
+# Concurrent S3 uploads while importing
+BOOK_ARCHIVE_UPLOAD_CONCURRENCY: int = int(os.getenv("BOOK_ARCHIVE_UPLOAD_CONCURRENCY", 16))
+# Limits on imported archives (413 above them): the upload, the sum of its entries' uncompressed sizes
+# and the number of entries. Checked on the zip's central directory before anything is extracted.
+BOOK_ARCHIVE_MAX_BYTES: int = int(os.getenv("BOOK_ARCHIVE_MAX_BYTES", 2 * 1024 ** 3))
+BOOK_ARCHIVE_MAX_UNCOMPRESSED_BYTES: int = int(os.getenv("BOOK_ARCHIVE_MAX_UNCOMPRESSED_BYTES", 4 * 1024 ** 3))
+BOOK_ARCHIVE_MAX_ENTRIES: int = int(os.getenv("BOOK_ARCHIVE_MAX_ENTRIES", 100_000))
+
+# Fixed timestamp for entries, so archives of the same book content are identical
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable target for `zipfile`; what it receives is drained and streamed to the client."""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _entry(name: str, compress_type: int = zipfile.ZIP_DEFLATED) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=_ZIP_DATE_TIME)
+    info.compress_type = compress_type
+    return info
+
+
+def _json_line(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode() + b"\n"
+
+
+def _page_file_urls(page: Page) -> List[str]:
+    return [url for url in [page.photo, page.compressed_photo, page.thumbnail, *(page.ocr.image_urls or [])] if url]
+
+
+# --- Export ---
+
+async def _write_files(urls: List[str],
+                       book_id: str,
+                       s3: S3Service,
+                       archive: zipfile.ZipFile,
+                       sink: _ZipSink,
+                       files: Dict[str, str]
+) -> AsyncIterator[bytes]:
+    """ Adds the book's own files among `urls` to the archive, recording url -> archive path in `files`.
+    Yields the zip bytes after each file, so only one is ever held by the sink.
+    URLs outside the book (or failing to download) stay plain references."""
+    paths = {url: s3.book_relative_path(url, book_id) for url in dict.fromkeys(urls)}
+    owned = [url for url, path in paths.items() if path]
+
+    index = 0
+    async for data in s3.iter_files(owned, window=BOOK_ARCHIVE_DOWNLOAD_WINDOW):
+        url = owned[index]
+        index += 1
+        if data is not None:
+            name = f"files/{paths[url]}"
+            archive.writestr(_entry(name, zipfile.ZIP_STORED), data)  # Images are already compressed
+            files[url] = name
+            del data
+            yield sink.drain()
+
+
+async def _write_pages(pages: List[Page],
+                       entry_number: int,
+                       book_id: str,
+                       s3: S3Service,
+                       include_files: bool,
+                       archive: zipfile.ZipFile,
+                       sink: _ZipSink
+) -> AsyncIterator[bytes]:
+    files: Dict[str, str] = {}
+    if include_files:
+        urls = [url for page in pages for url in _page_file_urls(page)]
+        async for chunk in _write_files(urls, book_id, s3, archive, sink, files):
+            yield chunk
+
+    lines = []
+    for page in pages:
+        page_files = {url: files[url] for url in _page_file_urls(page) if url in files}
+        lines.append(_json_line({"page": page.model_dump(mode="json"), "files": page_files}))
+    archive.writestr(_entry(f"pages/{entry_number:05d}.ndjson"), b"".join(lines))
+    yield sink.drain()
+
+
+async def _stream_archive(book: Book, pages_repo: PageRepo, s3: S3Service, include_files: bool) -> AsyncIterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", allowZip64=True) as archive:
+        archive.writestr(_entry("manifest.json"), json.dumps({
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "book_id": book.id,
+            "include_files": include_files,
+        }))
+        book_files: Dict[str, str] = {}
+        if include_files and book.thumbnail:
+            async for chunk in _write_files([book.thumbnail], book.id, s3, archive, sink, book_files):
+                yield chunk
+        archive.writestr(_entry("book.json"), _json_line({"book": book.model_dump(mode="json"), "files": book_files}))
+        yield sink.drain()
+
+        entry_number = 1
+        batch: List[Page] = []
+        cursor = pages_repo.find({"book_id": book.id}, {"_id": 0}).sort("page_number", 1)
+        async for doc in cursor:
+            batch.append(Page.model_validate(doc))
+            if len(batch) >= BOOK_ARCHIVE_PAGE_BATCH:
+                async for chunk in _write_pages(batch, entry_number, book.id, s3, include_files, archive, sink):
+                    yield chunk
+                entry_number, batch = entry_number + 1, []
+        if batch:
+            async for chunk in _write_pages(batch, entry_number, book.id, s3, include_files, archive, sink):
+                yield chunk
+    yield sink.drain()  # Remaining entries and the central directory
+
+
+async def export_book_archive_service(book_id: str,
+                                      books_repo: BookRepo,
+                                      pages_repo: PageRepo,
+                                      s3: S3Service,
+                                      include_files: bool = True
+) -> StreamingResponse:
+    """ Streams the book, its pages and (with `include_files`) its S3 files as a zip archive.
+    Memory stays bounded by one page batch's documents plus the images being downloaded: each file
+    is streamed out as soon as it is added.
+    """
+    book_data = await books_repo.find_one({"id": book_id})
+    if not book_data:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book = Book(**book_data)
+
+    return StreamingResponse(_stream_archive(book, pages_repo, s3, include_files),
+                             media_type="application/zip",
+                             headers={"Content-Disposition": f'attachment; filename="book-{book_id}.zip"'})
+
+
+# --- Import ---
+
+async def _upload_files(files: Dict[str, str],
+                        book_id: str,
+                        id_map: Dict[str, str],
+                        archive: zipfile.ZipFile,
+                        s3: S3Service,
+                        semaphore: asyncio.Semaphore
+) -> Dict[str, str]:
+    """Uploads archived files under the new book (ids in their paths remapped); returns old url -> new url."""
+    async def upload(url: str, name: str) -> tuple[str, str]:
+        parts = name.removeprefix("files/").split("/")
+        if len(parts) > 2 and parts[0] == "pages":
+            parts[1] = id_map.get(parts[1], parts[1])
+        relative_path = "/".join(parts)
+        async with semaphore:
+            data = await asyncio.to_thread(archive.read, name)
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            return url, await s3.upload_book_file(book_id, relative_path, BytesIO(data), content_type)
+
+    return dict(await asyncio.gather(*(upload(url, name) for url, name in files.items())))
+
+
+def _remap_page(page: Page, book_id: str, urls: Dict[str, str]) -> Page:
+    page.book_id = book_id
+    page.photo = urls.get(page.photo, page.photo)
+    page.compressed_photo = urls.get(page.compressed_photo, page.compressed_photo)
+    page.thumbnail = urls.get(page.thumbnail, page.thumbnail)
+    page.ocr.image_urls = [urls.get(url, url) for url in page.ocr.image_urls or []]
+
+    # OCR clippings are also referenced from the markdown text
+    translation_text = page.translation.get("data")
+    for old_url, new_url in urls.items():
+        if page.ocr.data:
+            page.ocr.data = page.ocr.data.replace(old_url, new_url)
+        if translation_text:
+            translation_text = translation_text.replace(old_url, new_url)
+    if translation_text is not None:
+        page.translation["data"] = translation_text
+    return page
+
+
+def _upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(position)
+    return size
+
+
+def _check_limits(archive: zipfile.ZipFile) -> None:
+    """ Rejects zip bombs by the sizes the central directory declares; reading an entry
+    never yields more than its declared size (zipfile fails the entry's CRC check instead)."""
+    entries = archive.infolist()
+    if len(entries) > BOOK_ARCHIVE_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f"Archive has more than {BOOK_ARCHIVE_MAX_ENTRIES} entries")
+    if sum(entry.file_size for entry in entries) > BOOK_ARCHIVE_MAX_UNCOMPRESSED_BYTES:
+        raise HTTPException(status_code=413, detail=f"Archive expands beyond {BOOK_ARCHIVE_MAX_UNCOMPRESSED_BYTES} bytes")
+
+
+def _open_archive(file) -> zipfile.ZipFile:
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Not a book archive")
+    try:
+        _check_limits(archive)
+        manifest = json.loads(archive.read("manifest.json"))
+    except (zipfile.BadZipFile, KeyError, ValueError):
+        archive.close()
+        raise HTTPException(status_code=400, detail="Not a book archive")
+    except HTTPException:
+        archive.close()
+        raise
+    if manifest.get("format") != ARCHIVE_FORMAT or manifest.get("version") != ARCHIVE_VERSION:
+        raise HTTPException(status_code=400, detail=f"Unsupported archive format: {manifest.get('format')} v{manifest.get('version')}")
+    return archive
+
+
+def _read_lines(archive: zipfile.ZipFile, name: str) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in archive.read(name).splitlines() if line.strip()]
+
+
+async def import_book_archive_service(file: UploadFile,
+                                      books_repo: BookRepo,
+                                      pages_repo: PageRepo,
+                                      s3: S3Service
+) -> Book:
+    """ Creates a new book (fresh book and page ids) from an archive made by `export_book_archive_service`,
+    uploading its files to this tenant's bucket and bulk-inserting pages batch by batch.
+    Anything already written is removed again if the import fails.
+    Archives above the `BOOK_ARCHIVE_MAX_*` limits are rejected with 413 before any entry is extracted.
+    """
+    if _upload_size(file) > BOOK_ARCHIVE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Archive exceeds {BOOK_ARCHIVE_MAX_BYTES} bytes")
+    archive = await asyncio.to_thread(_open_archive, file.file)
+    semaphore = asyncio.Semaphore(BOOK_ARCHIVE_UPLOAD_CONCURRENCY)
+
+    book_entry = json.loads(await asyncio.to_thread(archive.read, "book.json"))
+    book = Book.model_validate(book_entry["book"])
+    book.id = str(ObjectId())
+    book.created_at = book.updated_at = datetime.now(timezone.utc)
+    page_entries = sorted(name for name in archive.namelist() if name.startswith("pages/") and name.endswith(".ndjson"))
+
+    try:
+        book_urls = await _upload_files(book_entry.get("files", {}), book.id, {}, archive, s3, semaphore)
+        book.thumbnail = book_urls.get(book.thumbnail, book.thumbnail)
+
+        pages_count = 0
+        for name in page_entries:
+            lines = await asyncio.to_thread(_read_lines, archive, name)
+            pages = [Page.model_validate(line["page"]) for line in lines]
+            id_map = {page.id: str(ObjectId()) for page in pages}
+
+            files = {url: path for line in lines for url, path in line.get("files", {}).items()}
+            urls = await _upload_files(files, book.id, id_map, archive, s3, semaphore)
+
+            docs = []
+            for page, line in zip(pages, lines):
+                page.id = id_map[page.id]
+                page_urls = {url: urls[url] for url in line.get("files", {})}
+                docs.append(_remap_page(page, book.id, page_urls).model_dump())
+            if docs:
+                await pages_repo.insert_many(docs)
+            pages_count += len(docs)
+
+        await books_repo.insert_one(book.model_dump())
+    except Exception as e:
+        await pages_repo.delete_many({"book_id": book.id})
+        await s3.delete_book_files(book.id)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Failed to import book: {e}")
+    finally:
+        archive.close()
+
+    book.pages_count = pages_count
+    return book
@@ -1,16 +1,20 @@
 import os
+import asyncio
 from fastapi import UploadFile, HTTPException, BackgroundTasks
 from typing import Optional
 from datetime import datetime, timezone
 
 from page.models.page_model import Page
-from book.models.book_model import Book
+from book.models.book_model import Book, TranslationContext
 from core.models.models import Tenant
 
 from book.book_repo import BookRepo
 from page.page_repo import PageRepo
 
 from cell.services.s3_service import S3Service
+from core.base_repo import BaseRepo
+from core.http_cache import CacheValidators, make_etag
+from discover.services.discover_pool import invalidate_discover_pool
 from utils.helpers import (
     compress_image, 
     get_compressed_image_from_url,
@@ -145,6 +149,16 @@ async def update_book_service(book_id: str,
     
     return updated_book
 
+async def update_translation_context_service(book_id: str,
+                                             context: TranslationContext,
+                                             books_repo: BookRepo
+) -> TranslationContext:
+    """Replaces the book's translation notes and glossary; later page translations pick them up."""
+    result = await books_repo.update_one({"id": book_id}, {"$set": {"translation_context": context.model_dump()}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return context
+
 async def delete_book_service(book_id: str,
                               password: str,
                               books_repo: BookRepo,
@@ -164,6 +178,7 @@ async def delete_book_service(book_id: str,
     
     # Delete the book itself
     await books_repo.delete_one({"id": book_id})
+    invalidate_discover_pool(books_repo.tenant_id)
 
     # Delete all files associated with the book from S3
     try:
@@ -173,6 +188,45 @@ async def delete_book_service(book_id: str,
 
     return {"message": "Book and associated pages deleted"}
 
+async def _latest_updated_at(repo: BaseRepo, filter: dict) -> Optional[datetime]:
+    latest = await repo.find(filter, {"_id": 0, "updated_at": 1}).sort("updated_at", -1).limit(1).to_list(1)
+    return latest[0].get("updated_at") if latest else None
+
+async def get_books_cache_validators(books_repo: BookRepo, pages_repo: PageRepo) -> CacheValidators:
+    """ Version of the library listing: book/page counts and latest `updated_at` of each.
+    Counts catch deletions, which leave no `updated_at` behind.
+    """
+    books_count, books_updated, pages_count, pages_updated = await asyncio.gather(
+        books_repo.count_documents({}),
+        _latest_updated_at(books_repo, {}),
+        pages_repo.count_documents({}),
+        _latest_updated_at(pages_repo, {}),
+    )
+    return CacheValidators(etag=make_etag("books", books_count, books_updated, pages_count, pages_updated))
+
+async def get_book_cache_validators(book_id: str,
+                                    books_repo: BookRepo,
+                                    pages_repo: PageRepo,
+                                    with_pages: bool = False
+) -> CacheValidators:
+    """ Version of a book: its `updated_at` and page count, plus the latest page `updated_at`
+    when the representation embeds the pages (`/book/details`).
+    """
+    book_data = await books_repo.find_one({"id": book_id}, {"_id": 0, "updated_at": 1})
+    if not book_data:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    if with_pages:
+        pages_count, pages_updated = await asyncio.gather(
+            pages_repo.count_documents({"book_id": book_id}),
+            _latest_updated_at(pages_repo, {"book_id": book_id}),
+        )
+    else:
+        pages_count, pages_updated = await pages_repo.count_documents({"book_id": book_id}), None
+
+    kind = "book_details" if with_pages else "book"
+    return CacheValidators(etag=make_etag(kind, book_id, book_data.get("updated_at"), pages_count, pages_updated))
+
 async def get_books_service(books_repo: BookRepo, pages_repo: PageRepo) -> list[Book]:
     books_cursor = books_repo.find({})
     books_data = await books_cursor.to_list(None)
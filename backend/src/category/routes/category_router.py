@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from typing import List, Annotated
 
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
@@ -6,6 +6,7 @@ from category.models.category_model import Category, CategoryCreate
 
 from book.book_repo import BookRepo, get_books_repo
 from category.category_repo import CategoryRepo, get_category_repo
+from core.http_cache import CACHE_SHORT, CacheValidators, make_etag, not_modified_response, set_cache_headers
 
 router = APIRouter()
 
@@ -13,9 +14,20 @@ category_repo_dep = Annotated[CategoryRepo, Depends(get_category_repo)]
 book_repo_dep = Annotated[BookRepo, Depends(get_books_repo)]
 
 @router.get("/", response_model=List[Category])
-async def get_categories(category_repo: category_repo_dep) -> List[Category]:
-    categories = await category_repo.find({}).to_list(None)
-    return [Category(**cat) for cat in categories if cat]
+async def get_categories(request: Request,
+                         response: Response,
+                         category_repo: category_repo_dep
+) -> List[Category]:
+    categories = [Category(**cat) for cat in await category_repo.find({}).to_list(None) if cat]
+
+    # Categories carry no updated_at and the list is small, so the ETag hashes the content itself
+    validators = CacheValidators(etag=make_etag("categories", *(c.model_dump_json() for c in categories)))
+    not_modified = not_modified_response(request, validators, CACHE_SHORT)
+    if not_modified:
+        return not_modified
+
+    set_cache_headers(response, validators, CACHE_SHORT)
+    return categories
 
 
 @router.get("/{category_id}", response_model=Category)
@@ -67,7 +79,7 @@ async def delete_category(category_id: str,
     result = await category_repo.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
-    await books_repo.update_many({}, {"$pull": {"categories": category_id}})
+    await books_repo.update_many({"categories": category_id}, {"$pull": {"categories": category_id}})
     return {"message": "Category deleted"}
 
 
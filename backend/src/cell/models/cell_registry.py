@@ -1,4 +1,5 @@
-import os, re
+import os, re, json
+from typing import Any, Dict, List
 from pydantic import BaseModel, field_validator
 from enum import StrEnum
 
@@ -15,6 +16,10 @@ class CellConfig(BaseModel):
     s3_secret_key: str | None
     s3_bucket: str | None
     s3_region: str | None
+    # Connection pool sizing, per worker
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 0
+    s3_max_pool_connections: int = 20
 
     @field_validator("cell_id")
     @classmethod
@@ -24,18 +29,43 @@ class CellConfig(BaseModel):
             raise ValueError("Invalid cell ID format")
         return value
 
-def _get_cell_config(cell_id: str) -> CellConfig:
+def _env_config(cell_id: str) -> Dict[str, Any]:
     suffix = cell_id.replace("-", "_").upper()
-    return CellConfig(
-        cell_id=cell_id,
-        mongo_uri=os.getenv(f"MONGO_URI_{suffix}"),
-        mongo_db_name=os.getenv(f"MONGO_DB_{suffix}"),
-        s3_access_key=os.getenv("AWS_ACCESS_KEY_ID"),
-        s3_secret_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        s3_bucket=os.getenv(f"S3_BUCKET_{suffix}"),
-        s3_region=os.getenv(f"S3_REGION_{suffix}")
-    )
-
-CELL_REGISTRY = {
-    CellID.CELL_DEFAULT: _get_cell_config("cell-default"),
-}
\ No newline at end of file
+    return {
+        "cell_id": cell_id,
+        "mongo_uri": os.getenv(f"MONGO_URI_{suffix}"),
+        "mongo_db_name": os.getenv(f"MONGO_DB_{suffix}"),
+        "s3_access_key": os.getenv("AWS_ACCESS_KEY_ID"),
+        "s3_secret_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
+        "s3_bucket": os.getenv(f"S3_BUCKET_{suffix}"),
+        "s3_region": os.getenv(f"S3_REGION_{suffix}"),
+    }
+
+def cell_config_from(data: Dict[str, Any]) -> CellConfig:
+    """Builds a config from a file/control-plane entry; fields it leaves out come from the cell's env vars."""
+    values = _env_config(data["cell_id"])
+    values.update({key: value for key, value in data.items() if value is not None})
+    return CellConfig(**values)
+
+def _get_cell_config(cell_id: str) -> CellConfig:
+    return CellConfig(**_env_config(cell_id))
+
+def _is_configured(cell_id: str) -> bool:
+    return bool(os.getenv(f"MONGO_URI_{cell_id.replace('-', '_').upper()}"))
+
+def _load_config_file(path: str) -> List[CellConfig]:
+    """Cells listed in a JSON file: `[{"cell_id": "cell-us-east", "mongo_uri": ..., ...}, ...]`."""
+    with open(path) as f:
+        return [cell_config_from(entry) for entry in json.load(f)]
+
+# Cells known to this worker (cell id -> config): the default cell, every other cell whose Mongo URI
+# is configured, and the cells in CELLS_CONFIG_FILE. The control-plane `cells` collection adds more
+# at startup and periodically (see `cell_manager.refresh_cell_registry`). Connections are opened lazily.
+CELL_REGISTRY: Dict[str, CellConfig] = {
+    cell_id: _get_cell_config(cell_id)
+    for cell_id in CellID
+    if cell_id == CellID.CELL_DEFAULT or _is_configured(cell_id)
+}
+
+if os.getenv("CELLS_CONFIG_FILE"):
+    CELL_REGISTRY.update({config.cell_id: config for config in _load_config_file(os.environ["CELLS_CONFIG_FILE"])})
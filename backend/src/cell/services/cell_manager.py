@@ -1,21 +1,260 @@
-from functools import lru_cache
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from contextlib import AsyncExitStack, contextmanager
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, TypeVar
+import aioboto3
+from botocore.config import Config as BotoConfig
 
 from cell.services.mongo_service import MongoService
+from cell.models.cell_registry import CellConfig, CELL_REGISTRY, CellID, cell_config_from
+from telemetry.services.metrics import CELL_HEALTHY, CELLS_OPEN
+from telemetry.services.tracing import create_untraced_task
 
-from cell.models.cell_registry import CellConfig, CELL_REGISTRY, CellID
+# Idle cells kept connected; beyond this the least recently used idle ones are closed
+CELL_MAX_WARM: int = int(os.getenv("CELL_MAX_WARM", 8))
+# Cells unused for this long are closed even below CELL_MAX_WARM
+CELL_IDLE_SECONDS: float = float(os.getenv("CELL_IDLE_SECONDS", 900))
+# A cell counts as idle (evictable) once unused and unheld for this long
+_MIN_IDLE_BEFORE_EVICTION: float = 60.0
+CELL_MAINTENANCE_SECONDS: float = float(os.getenv("CELL_MAINTENANCE_SECONDS", 30))
+CELL_HEALTH_TIMEOUT_SECONDS: float = float(os.getenv("CELL_HEALTH_TIMEOUT_SECONDS", 5))
+# Cells connected (indexes, migrations) during startup; the others connect on first use
+CELLS_ON_STARTUP: List[str] = [cell_id.strip() for cell_id in os.getenv("CELLS_ON_STARTUP", CellID.CELL_DEFAULT).split(",") if cell_id.strip()]
+# Control-plane collection (in the default cell) listing additional cells
+CELLS_COLLECTION: str = "cells"
+
+T = TypeVar("T")
 
 class Cell:
+    """ Connections to one cell. The Mongo client and the S3 client are created on first use
+    and shared by every request routed to the cell until it is closed.
+    Requests, jobs and background tasks hold the cell while they use it (`hold`, `holding`):
+    a held cell is never closed; one retired while held is closed when its last holder lets go.
+    """
     def __init__(self, config: CellConfig):
         self.config = config
-        
-        self.mongo_service = MongoService(
-            mongo_uri=config.mongo_uri,
-            mongo_db_name=config.mongo_db_name
-        )
-
-@lru_cache()
-def get_cell(cell_id: CellID) -> Cell:
-    config = CELL_REGISTRY.get(cell_id)
-    if not config:
-        raise ValueError(f"Cell with ID '{cell_id}' not found in registry")
-    return Cell(config)
\ No newline at end of file
+        self.last_used = time.monotonic()
+        self.healthy = True
+        self.holders = 0
+        self.closed = False
+        self._retired = False
+        self._mongo_service: Optional[MongoService] = None
+        self._s3_client: Any = None
+        self._s3_stack: Optional[AsyncExitStack] = None
+        self._s3_lock = asyncio.Lock()
+
+    def acquire(self) -> None:
+        self.holders += 1
+        self.last_used = time.monotonic()
+
+    def release(self) -> None:
+        self.holders -= 1
+        self.last_used = time.monotonic()
+        if self.holders == 0 and self._retired and not self.closed:
+            _spawn(self.close())
+
+    @contextmanager
+    def hold(self) -> Iterator["Cell"]:
+        """Keeps the cell open while the block runs."""
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def holding(self, coro: Awaitable[T]) -> Awaitable[T]:
+        """ `coro`, holding the cell from now until it finishes. For tasks started by a request
+        or job that may outlive it: the hold is taken before the task is even scheduled.
+        """
+        self.acquire()
+        async def run() -> T:
+            try:
+                return await coro
+            finally:
+                self.release()
+        return run()
+
+    def _check_open(self) -> None:
+        if self.closed:
+            # Reconnecting would create clients nothing tracks or closes
+            raise RuntimeError(f"Cell '{self.config.cell_id}' is closed; get it again with get_cell()")
+
+    @property
+    def mongo_service(self) -> MongoService:
+        if self._mongo_service is None:
+            self._check_open()
+            self._mongo_service = MongoService(
+                mongo_uri=self.config.mongo_uri,
+                mongo_db_name=self.config.mongo_db_name,
+                max_pool_size=self.config.mongo_max_pool_size,
+                min_pool_size=self.config.mongo_min_pool_size
+            )
+        return self._mongo_service
+
+    async def s3_client(self):
+        """The cell's shared aioboto3 S3 client (safe for concurrent use within the event loop)."""
+        if self._s3_client is None:
+            self._check_open()
+            async with self._s3_lock:
+                if self._s3_client is None:
+                    session = aioboto3.Session(
+                        aws_access_key_id=self.config.s3_access_key,
+                        aws_secret_access_key=self.config.s3_secret_key,
+                        region_name=self.config.s3_region,
+                    )
+                    botoconfig = BotoConfig(retries={'max_attempts': 3, 'mode': 'standard'},
+                                            max_pool_connections=self.config.s3_max_pool_connections)
+                    stack = AsyncExitStack()
+                    self._s3_client = await stack.enter_async_context(session.client('s3', config=botoconfig))
+                    self._s3_stack = stack
+        return self._s3_client
+
+    async def check_health(self) -> bool:
+        try:
+            await asyncio.wait_for(self.mongo_service.ping(), CELL_HEALTH_TIMEOUT_SECONDS)
+            self.healthy = True
+        except Exception as e:
+            if self.healthy:
+                print(f"Cell '{self.config.cell_id}' failed its health check: {e}")
+            self.healthy = False
+        CELL_HEALTHY.set(1 if self.healthy else 0, cell=self.config.cell_id)
+        return self.healthy
+
+    async def close(self) -> None:
+        self.closed = True
+        if self._mongo_service is not None:
+            self._mongo_service.close()
+            self._mongo_service = None
+        if self._s3_stack is not None:
+            stack, self._s3_stack, self._s3_client = self._s3_stack, None, None
+            await stack.aclose()
+
+
+_cells: "OrderedDict[str, Cell]" = OrderedDict()  # Least recently used first
+_open_hooks: List[Callable[[Cell], Awaitable[None]]] = []
+_close_hooks: List[Callable[[Cell], None]] = []
+_maintenance_task: Optional[asyncio.Task] = None
+_background_tasks: set = set()
+
+
+def on_cell_opened(hook: Callable[[Cell], Awaitable[None]]) -> None:
+    """Registers a coroutine run in the background whenever a cell is first used (e.g. ensuring indexes)."""
+    _open_hooks.append(hook)
+
+def on_cell_closed(hook: Callable[[Cell], None]) -> None:
+    """Registers a callback for when a cell is closed, to drop state bound to its connections."""
+    _close_hooks.append(hook)
+
+def _spawn(coro: Awaitable[None]) -> None:
+    try:
+        task = create_untraced_task(coro)
+    except RuntimeError:
+        coro.close()  # No loop (e.g. scripts building cells before asyncio.run); nothing to run it on
+        return
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def _run_open_hooks(cell: Cell) -> None:
+    with cell.hold():
+        for hook in _open_hooks:
+            try:
+                await hook(cell)
+            except Exception as e:
+                print(f"Failed to prepare cell '{cell.config.cell_id}': {e}")
+
+def _close(cell_id: str) -> None:
+    """Retires the cell: the next `get_cell` opens a new one, and this one closes once no longer held."""
+    cell = _cells.pop(cell_id, None)
+    if cell is None:
+        return
+    for hook in _close_hooks:
+        hook(cell)
+    CELLS_OPEN.set(len(_cells))
+    cell._retired = True
+    if cell.holders == 0:
+        _spawn(cell.close())
+
+def _idle(cell_id: str, cell: Cell, now: float, idle_seconds: float) -> bool:
+    return cell_id != CellID.CELL_DEFAULT and cell.holders == 0 and now - cell.last_used >= idle_seconds
+
+def _evict_idle(max_warm: int) -> None:
+    """Closes least recently used idle cells until at most `max_warm` remain open (idle or not)."""
+    now = time.monotonic()
+    for cell_id, cell in list(_cells.items()):
+        if len(_cells) <= max_warm:
+            break
+        if _idle(cell_id, cell, now, _MIN_IDLE_BEFORE_EVICTION):
+            _close(cell_id)
+
+def get_cell(cell_id: CellID | str) -> Cell:
+    cell = _cells.get(cell_id)
+    if cell is None:
+        config = CELL_REGISTRY.get(cell_id)
+        if not config:
+            raise ValueError(f"Cell with ID '{cell_id}' not found in registry")
+        cell = Cell(config)
+        _cells[cell_id] = cell
+        CELLS_OPEN.set(len(_cells))
+        if _open_hooks:
+            _spawn(_run_open_hooks(cell))
+        _evict_idle(CELL_MAX_WARM)
+    else:
+        _cells.move_to_end(cell_id)
+    cell.last_used = time.monotonic()
+    return cell
+
+def open_cells() -> List[Cell]:
+    return list(_cells.values())
+
+async def refresh_cell_registry() -> None:
+    """ Adds/updates cells listed in the control-plane collection. A cell whose config changed
+    is closed, so its next use connects with the new settings.
+    """
+    docs = await get_cell(CellID.CELL_DEFAULT).mongo_service.get_db()[CELLS_COLLECTION].find({}, {"_id": 0}).to_list(None)
+    for doc in docs:
+        try:
+            config = cell_config_from(doc)
+        except Exception as e:
+            print(f"Ignoring invalid cell config {doc.get('cell_id')!r}: {e}")
+            continue
+        if CELL_REGISTRY.get(config.cell_id) != config:
+            CELL_REGISTRY[config.cell_id] = config
+            if config.cell_id != CellID.CELL_DEFAULT:
+                _close(config.cell_id)
+
+async def _maintain_cells(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_cell_registry()
+        except Exception as e:
+            print(f"Failed to refresh the cell registry: {e}")
+
+        now = time.monotonic()
+        for cell_id, cell in list(_cells.items()):
+            if _idle(cell_id, cell, now, CELL_IDLE_SECONDS):
+                _close(cell_id)
+        _evict_idle(CELL_MAX_WARM)
+        await asyncio.gather(*(cell.check_health() for cell in open_cells()))
+
+def start_cell_maintenance(interval: float = CELL_MAINTENANCE_SECONDS) -> None:
+    """Starts the background loop refreshing the registry, health-checking open cells and closing idle ones."""
+    global _maintenance_task
+    if _maintenance_task is None or _maintenance_task.done():
+        _maintenance_task = asyncio.create_task(_maintain_cells(interval))
+
+async def stop_cell_maintenance() -> None:
+    global _maintenance_task
+    if _maintenance_task:
+        _maintenance_task.cancel()
+        try:
+            await _maintenance_task
+        except asyncio.CancelledError:
+            pass
+        _maintenance_task = None
+    for cell_id in list(_cells):
+        cell = _cells.pop(cell_id)
+        await cell.close()
+    CELLS_OPEN.set(0)
@@ -3,7 +3,11 @@ from datetime import timezone
 import certifi
 
 class MongoService:
-    def __init__(self, mongo_uri: str | None, mongo_db_name: str | None):
+    def __init__(self,
+                 mongo_uri: str | None,
+                 mongo_db_name: str | None,
+                 max_pool_size: int = 100,
+                 min_pool_size: int = 0):
         if not mongo_uri:
             raise ValueError("MongoDB URI must be provided")
         if not mongo_db_name:
@@ -13,10 +17,18 @@ class MongoService:
             mongo_uri,
             tlsCAFile=certifi.where(),
             tz_aware=True,
-            tzinfo=timezone.utc
+            tzinfo=timezone.utc,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size
         )
         
         self.db = self.client.get_database(mongo_db_name)
 
     def get_db(self):
-        return self.db
\ No newline at end of file
+        return self.db
+
+    async def ping(self) -> None:
+        await self.client.admin.command("ping")
+
+    def close(self) -> None:
+        self.client.close()
@@ -1,17 +1,36 @@
 import asyncio
-import base64
 from io import BytesIO
 import os
-import re
-from typing import List
-from urllib.parse import urlparse
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+from urllib.parse import unquote, urlparse
 import uuid
-import aioboto3
-from botocore.config import Config as BotoConfig
 from fastapi import HTTPException, UploadFile
 
 from utils.helpers import MockUploadFile
 from core.models.req_context_model import RequestContext
+from cell.services.cell_manager import Cell
+from telemetry.services.metrics import S3_OPERATION_LATENCY
+from telemetry.services.instrumentation import instrument
+
+# Batches of 1,000 keys deleted in parallel (prefix purges, garbage collection)
+S3_DELETE_CONCURRENCY: int = int(os.getenv("S3_DELETE_CONCURRENCY", 8))
+# Attempts per batch for keys `delete_objects` reports back as failed
+S3_DELETE_RETRIES: int = int(os.getenv("S3_DELETE_RETRIES", 3))
+
+_END = object()  # Marks the end of an iterator whose items may be None
+
+
+@dataclass
+class ObjectDeletion:
+    """Running totals of a batched delete."""
+    listed: int = 0
+    deleted: int = 0
+    deleted_bytes: int = 0
+    failed_keys: List[str] = field(default_factory=list)
+
 
 class S3Service:
     def __init__(self,
@@ -30,16 +49,42 @@ class S3Service:
         if not bucket_name:
             raise ValueError("S3 bucket name must be provided")
         
-        self.botoconfig = BotoConfig(retries={'max_attempts': 3, 'mode': 'standard'})
-        self.session = aioboto3.Session(
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=region_name,
-        )
+        self._cell = ctx.cell
         self.tenant_id = ctx.tenant_id
         self.bucket_name = bucket_name
         self._public_base = f"https://{bucket_name}.s3.{region_name}.amazonaws.com"
     
+    @property
+    def cell(self) -> Cell:
+        return self._cell
+
+    @asynccontextmanager
+    async def _client(self):
+        """The cell's shared S3 client (created on first use, kept open across requests)."""
+        yield await self._cell.s3_client()
+
+    def owns_url(self, url: str) -> bool:
+        """Whether `url` is a public URL of an object of this tenant in this bucket."""
+        parsed = urlparse(url)
+        return (parsed.scheme == "https"
+                and f"{parsed.scheme}://{parsed.netloc}" == self._public_base
+                and parsed.path.startswith(f"/tenants/{self.tenant_id}/")
+                and ".." not in parsed.path)
+
+    def object_key(self, url: str) -> Optional[str]:
+        """Key of the object behind `url` if it is one of this tenant's files in this bucket, else None."""
+        if not self.owns_url(url):
+            return None
+        return unquote(urlparse(url).path).lstrip("/")
+
+    def book_relative_path(self, url: str, book_id: str) -> Optional[str]:
+        """Path of a file below `../books/<book_id>/` if `url` is one of this book's files, else None."""
+        if not self.owns_url(url):
+            return None
+        prefix = f"/tenants/{self.tenant_id}/books/{book_id}/"
+        path = unquote(urlparse(url).path)
+        return path[len(prefix):] if path.startswith(prefix) and len(path) > len(prefix) else None
+
     async def _upload_file_to_s3(self, object_name: str, file_or_data, content_type: str = 'image/jpeg') -> str:
         """
         Handles uploading a file-like object or UploadFile to S3 at the given object_name.
@@ -51,13 +96,14 @@ class S3Service:
             else:
                 file_obj = file_or_data  # e.g., BytesIO
 
-            async with self.session.client('s3', config=self.botoconfig) as s3:
-                await s3.upload_fileobj(
-                    file_obj,
-                    self.bucket_name,
-                    obj_key_with_tenant,
-                    ExtraArgs={'ACL': 'public-read', 'ContentType': content_type}
-                )
+            with instrument("s3.upload", S3_OPERATION_LATENCY, operation="upload"):
+                async with self._client() as s3:
+                    await s3.upload_fileobj(
+                        file_obj,
+                        self.bucket_name,
+                        obj_key_with_tenant,
+                        ExtraArgs={'ACL': 'public-read', 'ContentType': content_type}
+                    )
             return f"{self._public_base}/{obj_key_with_tenant}"
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error uploading thumbnail: {str(e)}")
@@ -72,6 +118,11 @@ class S3Service:
         obj_name = f"books/{book_id}/thumbnails/{filename}"
         return await self._upload_file_to_s3(obj_name, file.file, file.content_type or 'image/jpeg')
 
+    # --- Book File Upload ---
+    async def upload_book_file(self, book_id: str, relative_path: str, data: BytesIO, content_type: str) -> str:
+        """Uploads a file of a book to path `../books/<book_id>/<relative_path>` (e.g. when importing a book)."""
+        return await self._upload_file_to_s3(f"books/{book_id}/{relative_path}", data, content_type)
+
     # --- Page Image Upload ---
     async def upload_page_image(self, book_id: str, page_id: str, file: MockUploadFile) -> str:
         """Uploads a page image to path
@@ -100,26 +151,79 @@ class S3Service:
         object_name = f"books/{book_id}/pages/{page_id}/compressed/{new_filename}"
         return await self._upload_file_to_s3(object_name, compressed_data, 'image/jpeg')
 
-    # --- Base64 Image of OCR Clippings Upload ---
-    async def upload_ocr_image(self, book_id: str, page_id: str, base64_data_url: str) -> str:
+    # --- OCR Figure Upload ---
+    async def upload_ocr_figure(self, book_id: str, page_id: str, filename: str, data: BytesIO, content_type: str) -> str:
+        """Uploads a figure clipped by OCR to path
+        `../books/<book_id>/pages/<page_id>/content/<filename>`
         """
-        Decodes a base64 data URL, uploads the image to S3, and returns the public URL.
-        Stored at `../books/<book_id>/pages/<page_id>/content/ocr_<uuid>.<ext>`
+        object_name = f"books/{book_id}/pages/{page_id}/content/{filename}"
+        return await self._upload_file_to_s3(object_name, data, content_type)
+
+    # --- Download ---
+    async def iter_files(self, file_urls: Iterable[str], window: int = 8) -> AsyncIterator[Optional[bytes]]:
+        """
+        Downloads this tenant's files in the order given, keeping at most `window` downloads in flight
+        over a single client. Yields None for empty URLs, URLs outside the tenant's prefix and failed downloads.
         """
+        async with self._client() as s3:
+            async def fetch(url: str) -> Optional[bytes]:
+                if not url or not self.owns_url(url):
+                    return None
+                try:
+                    with instrument("s3.get", S3_OPERATION_LATENCY, operation="get"):
+                        response = await s3.get_object(Bucket=self.bucket_name, Key=unquote(urlparse(url).path.lstrip('/')))
+                        return await response['Body'].read()
+                except Exception as e:
+                    print(f"Error downloading {url} from S3: {str(e)}")
+                    return None
+
+            urls = iter(file_urls)
+            pending = deque(asyncio.create_task(fetch(url)) for url, _ in zip(urls, range(window)))
+            try:
+                while pending:
+                    data = await pending.popleft()
+                    next_url = next(urls, _END)
+                    if next_url is not _END:
+                        pending.append(asyncio.create_task(fetch(next_url)))
+                    yield data
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    # --- Book Exports ---
+    def _book_export_key(self, book_id: str, kind: str, filename: str) -> str:
+        return f"tenants/{self.tenant_id}/books/{book_id}/exports/{kind}/{filename}"
+
+    async def get_book_export_size(self, book_id: str, kind: str, filename: str) -> Optional[int]:
+        """Size of a stored book export, or None if it was not generated yet."""
         try:
-            header, encoded = base64_data_url.split(",", 1)
-            match = re.search(r"data:image/(?P<ext>\w+);base64", header)
-            
-            ext = match.group("ext") if match else "jpg"
-            content_type = f"image/{ext}"
-            
-            image_data = base64.b64decode(encoded)
-            image_bytes_io = BytesIO(image_data)
-            
-            object_name = f"books/{book_id}/pages/{page_id}/content/ocr_{uuid.uuid4()}.{ext}"
-            return await self._upload_file_to_s3(object_name, image_bytes_io, content_type)            
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error uploading to S3: {str(e)}")
+            with instrument("s3.head", S3_OPERATION_LATENCY, operation="head"):
+                async with self._client() as s3:
+                    response = await s3.head_object(Bucket=self.bucket_name, Key=self._book_export_key(book_id, kind, filename))
+            return response['ContentLength']
+        except Exception:
+            return None
+
+    async def stream_book_export(self, book_id: str, kind: str, filename: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        async with self._client() as s3:
+            response = await s3.get_object(Bucket=self.bucket_name, Key=self._book_export_key(book_id, kind, filename))
+            async for chunk in response['Body'].iter_chunks(chunk_size):
+                yield chunk
+
+    async def upload_book_export(self, book_id: str, kind: str, filename: str, file_path: str, content_type: str) -> None:
+        """
+        Stores a generated export (private, served through the API) at
+        `../books/<book_id>/exports/<kind>/<filename>`, then deletes the older exports of the same kind.
+        Other kinds (e.g. variants of one format) are kept.
+        """
+        key = self._book_export_key(book_id, kind, filename)
+        with instrument("s3.upload", S3_OPERATION_LATENCY, operation="upload"):
+            async with self._client() as s3:
+                await s3.upload_file(file_path, self.bucket_name, key, ExtraArgs={'ContentType': content_type})
+
+        stale = ({obj['Key']: obj.get('Size', 0) for obj in page if obj['Key'] != key}
+                 async for page in self._list_objects(self._book_export_key(book_id, kind, "")))
+        await self.delete_object_batches(stale)
 
     # --- Delete by URLs ---
     async def delete_files(self, file_urls: List[str]):
@@ -149,20 +253,24 @@ class S3Service:
 
         delete_payload = {'Objects': keys_to_delete}
         try:
-            async with self.session.client('s3', config=self.botoconfig) as s3:
-                await s3.delete_objects(
-                    Bucket=self.bucket_name,
-                    Delete=delete_payload
-                )
+            with instrument("s3.delete_objects", S3_OPERATION_LATENCY, operation="delete_objects"):
+                async with self._client() as s3:
+                    await s3.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete=delete_payload
+                    )
         except Exception as e:
             # Log the error instead of crashing the request for a failed cleanup
             print(f"Error batch deleting from S3: {str(e)}")
     
     # --- Delete by Prefix ---
-    async def delete_tenant_files(self, tenant_id: str):
+    async def delete_tenant_files(self,
+                                  tenant_id: str,
+                                  on_progress: Optional[Callable[[ObjectDeletion], Awaitable[None]]] = None
+    ) -> ObjectDeletion:
         """Deletes all files for a given tenant."""
         prefix = f"tenants/{tenant_id}/"
-        await self._delete_prefix_from_s3(prefix)
+        return await self._delete_prefix_from_s3(prefix, on_progress)
 
     async def delete_book_files(self, book_id: str):
         """Deletes all files for a given book.
@@ -176,9 +284,103 @@ class S3Service:
         prefix = f"tenants/{self.tenant_id}/books/{book_id}/pages/{page_id}/"
         await self._delete_prefix_from_s3(prefix)
 
-    async def _delete_prefix_from_s3(self, prefix: str):
+    async def _delete_keys(self, s3, keys: List[str]) -> List[str]:
+        """Deletes up to 1,000 keys, retrying the ones S3 reports in `Errors`; returns those that still failed."""
+        pending = keys
+        for attempt in range(S3_DELETE_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            try:
+                with instrument("s3.delete_objects", S3_OPERATION_LATENCY, operation="delete_objects"):
+                    response = await s3.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={'Objects': [{'Key': k} for k in pending], 'Quiet': True}
+                    )
+            except Exception as e:
+                if attempt == S3_DELETE_RETRIES:
+                    raise
+                print(f"Retrying S3 delete of {len(pending)} objects: {e}")
+                continue
+            pending = [error['Key'] for error in response.get('Errors', [])]
+            if not pending:
+                break
+        return pending
+
+    async def _list_objects(self, prefix: str) -> AsyncIterator[List[dict]]:
+        """Pages of up to 1,000 objects (`Key`, `Size`, `LastModified`, `ETag`) under a bucket-wide prefix."""
+        async with self._client() as s3:
+            paginator = s3.get_paginator('list_objects_v2')
+            async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                contents = page.get('Contents', [])
+                if contents:
+                    yield contents
+
+    def list_book_objects(self) -> AsyncIterator[List[dict]]:
+        """Pages of the objects stored under this tenant's books, `../books/`."""
+        return self._list_objects(f"tenants/{self.tenant_id}/books/")
+
+    async def delete_object_batches(self,
+                                    batches: AsyncIterator[Dict[str, int]],
+                                    on_progress: Optional[Callable[[ObjectDeletion], Awaitable[None]]] = None,
+                                    before_delete: Optional[Callable[[Dict[str, int]], Awaitable[Dict[str, int]]]] = None
+    ) -> ObjectDeletion:
+        """
+        Deletes the keys of `batches` (up to 1,000 `key -> size` each) as they arrive: while further
+        batches are produced, up to `S3_DELETE_CONCURRENCY` of them are being deleted.
+        `before_delete` is awaited with each batch right before it is deleted and returns the keys to delete after all.
+        `on_progress` is awaited after every batch. Raises if keys are left that S3 kept refusing.
+        """
+        result = ObjectDeletion()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=S3_DELETE_CONCURRENCY)
+
+        async def produce():
+            async for batch in batches:
+                if batch:
+                    result.listed += len(batch)
+                    await queue.put(batch)
+            for _ in range(S3_DELETE_CONCURRENCY):
+                await queue.put(None)
+
+        async def delete(s3):
+            while (batch := await queue.get()) is not None:
+                if before_delete:
+                    listed = len(batch)
+                    batch = await before_delete(batch)
+                    result.listed -= listed - len(batch)
+                    if not batch:
+                        continue
+                failed = await self._delete_keys(s3, list(batch))
+                result.deleted += len(batch) - len(failed)
+                result.deleted_bytes += sum(size for key, size in batch.items() if key not in failed)
+                result.failed_keys.extend(failed)
+                if on_progress:
+                    await on_progress(result)
+
+        try:
+            with instrument("s3.delete_batches", S3_OPERATION_LATENCY, operation="delete_batches"):
+                async with self._client() as s3:
+                    # A failing task cancels the others, so the producer never waits on a full queue
+                    async with asyncio.TaskGroup() as group:
+                        group.create_task(produce())
+                        for _ in range(S3_DELETE_CONCURRENCY):
+                            group.create_task(delete(s3))
+        except* Exception as e:
+            errors = "; ".join(str(error) for error in e.exceptions)
+            raise HTTPException(status_code=500, detail=f"Error deleting from S3: {errors}")
+
+        if result.failed_keys:
+            raise HTTPException(status_code=500,
+                                detail=f"Failed to delete {len(result.failed_keys)} of {result.listed} objects, "
+                                       f"e.g. '{result.failed_keys[0]}'")
+        return result
+
+    async def _delete_prefix_from_s3(self,
+                                     prefix: str,
+                                     on_progress: Optional[Callable[[ObjectDeletion], Awaitable[None]]] = None
+    ) -> ObjectDeletion:
         """
         Deletes all objects under a given prefix (e.g., 'tenants/<tenant_id>/' or 'books/<book_id>/').
+        Listing and deleting are pipelined, see `delete_object_batches`.
         
         >Example Usage:\n
         >Delete all files for a tenant: `await delete_prefix_from_s3(f"tenants/{tenant_id}/")`\n
@@ -186,25 +388,5 @@ class S3Service:
         >Delete all files for a page: `await delete_prefix_from_s3(f"tenants/{tenant_id}/books/{book_id}/pages/{page_id}/")`\n
         >Delete specific files (old way, e.g. for replacing a thumbnail): `await delete_files_from_s3([old_thumbnail_url])`
         """
-        try:
-            async with self.session.client('s3', config=self.botoconfig) as s3:
-                paginator = s3.get_paginator('list_objects_v2')
-                
-                async def delete_batch(keys):
-                    if keys:
-                        await s3.delete_objects(
-                            Bucket=self.bucket_name,
-                            Delete={'Objects': [{'Key': k} for k in keys]}
-                        )
-
-                keys = []
-                async for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
-                    for obj in page.get('Contents', []):
-                        keys.append(obj['Key'])
-                        if len(keys) >= 1000:
-                            await delete_batch(keys)
-                            keys = []
-                if keys:
-                    await delete_batch(keys)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error deleting prefix from S3: {str(e)}")
\ No newline at end of file
+        batches = ({obj['Key']: obj.get('Size', 0) for obj in page} async for page in self._list_objects(prefix))
+        return await self.delete_object_batches(batches, on_progress)
@@ -6,6 +6,8 @@ import uuid
 from book.book_repo import BookRepo, get_books_repo
 from page.page_repo import PageRepo, get_pages_repo
 from content.content_request_repo import EditRequestRepo, get_edit_request_repo
+from translation_memory.translation_memory_repo import TranslationMemoryRepo, get_translation_memory_repo
+from translation_memory.services.translation_memory_service import learn_page_translation
 
 from content.models.edit_request_model import EditRequest, RequestUpdate
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
@@ -15,6 +17,7 @@ router = APIRouter()
 book_repo_dep = Annotated[BookRepo, Depends(get_books_repo)]
 page_repo_dep = Annotated[PageRepo, Depends(get_pages_repo)]
 edit_request_repo_dep = Annotated[EditRequestRepo, Depends(get_edit_request_repo)]
+tm_repo_dep = Annotated[TranslationMemoryRepo, Depends(get_translation_memory_repo)]
 
 @router.post("/",
              response_model=EditRequest,
@@ -90,7 +93,9 @@ async def get_all_requests(edit_request_repo: edit_request_repo_dep) -> List[Edi
 )
 async def update_request(request_id: str,
                          update: RequestUpdate,
-                         edit_request_repo: edit_request_repo_dep
+                         edit_request_repo: edit_request_repo_dep,
+                         page_repo: page_repo_dep,
+                         tm_repo: tm_repo_dep
 ) -> EditRequest:
     update_data = {k: v for k, v in update.model_dump().items() if v is not None}
     if not update_data:
@@ -101,7 +106,14 @@ async def update_request(request_id: str,
     updated = await edit_request_repo.find_one({"id": request_id})
     if not updated:
         raise HTTPException(status_code=404, detail="Request not found after update")
-    return EditRequest(**updated)
+    edit_request = EditRequest(**updated)
+    # Approved translations feed the translation memory
+    if update.status == "accepted" and edit_request.requestType == "translation":
+        try:
+            await learn_page_translation(edit_request.page_id, edit_request.newText, page_repo, tm_repo)
+        except Exception as e:
+            print(f"Failed to add request {request_id} to the translation memory: {e}")
+    return edit_request
 
 
 @router.delete("/{request_id}",
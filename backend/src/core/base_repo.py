@@ -1,16 +1,37 @@
+from datetime import datetime, timezone
 from typing import Any, Mapping, MutableMapping, Optional, Dict
+from pymongo import UpdateOne
 from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorCursor, AsyncIOMotorCommandCursor
 from core.middlewares.req_context_middleware import RequestContext
+from cell.services.cell_manager import Cell
+from telemetry.services.metrics import DB_OPERATION_LATENCY
+from telemetry.services.instrumentation import instrument, TimedCursor
 
 class BaseRepo:
     """Base repository providing tenant-scoped MongoDB operations.
     Ensures that all operations are scoped to the tenant by automatically adding _tenant_id_ filters.\n
     All collections apart from the ones used for tenant management should extend this class.\n
+    Every operation is timed into the `db_operation_duration_seconds` histogram by collection/operation
+    and recorded as a `mongo.<operation>` span when the request is traced.\n
+    Subclasses setting `touch_updated_at = True` get `updated_at` bumped on every update (HTTP caching relies on it).\n
     """
+    touch_updated_at: bool = False
+
     def __init__(self, collection_name: str, ctx: RequestContext):    
         self._ctx = ctx
         self._tenant_id = ctx.tenant_id
         self._col: AsyncIOMotorCollection = ctx.db[collection_name]
+        self._collection_name = collection_name
+
+    @property
+    def cell(self) -> Cell:
+        """The cell this repository reads from (hold it for work outliving the request)."""
+        return self._ctx.cell
+
+    @property
+    def tenant_id(self) -> str:
+        """The tenant every query of this repository is scoped to."""
+        return self._tenant_id
 
     # ---------- Helpers ----------
 
@@ -27,18 +48,32 @@ class BaseRepo:
         doc["tenant_id"] = self._tenant_id
         return doc
 
+    def _touch(self, update):
+        """Adds `updated_at = now` to an update document or pipeline, unless the caller already sets it."""
+        if not self.touch_updated_at:
+            return update
+        now = datetime.now(timezone.utc)
+        if isinstance(update, Mapping):
+            return {**update, "$set": {"updated_at": now, **update.get("$set", {})}}
+        return [*update, {"$set": {"updated_at": now}}]
+
+    def _timed(self, operation: str):
+        return instrument(f"mongo.{operation}", DB_OPERATION_LATENCY, collection=self._collection_name, operation=operation)
+
     # ---------- Query Methods ----------
 
     async def insert_one(self, doc: MutableMapping[str, Any]):
         """Insert a single document into the collection, attaching _tenant_id_ internally."""
         self._attach_tenant(doc)
-        return await self._col.insert_one(doc)
+        with self._timed("insert_one"):
+            return await self._col.insert_one(doc)
 
     async def insert_many(self, docs: list[MutableMapping[str, Any]]):
         """Insert multiple documents into the collection, attaching _tenant_id_ internally."""
         for d in docs:
             self._attach_tenant(d)
-        return await self._col.insert_many(docs)
+        with self._timed("insert_many"):
+            return await self._col.insert_many(docs)
 
     async def find_one(
         self,
@@ -48,7 +83,8 @@ class BaseRepo:
     ):
         """Find a single document in the collection, scoped to the tenant.
         Adds _tenant_id_ to the filter internally."""
-        return await self._col.find_one(self._with_tenant_filter(filter), *args, **kwargs)
+        with self._timed("find_one"):
+            return await self._col.find_one(self._with_tenant_filter(filter), *args, **kwargs)
 
     def find(
         self,
@@ -59,7 +95,8 @@ class BaseRepo:
         """Find multiple documents in the collection, scoped to the tenant.\n
         Adds _tenant_id_ to the filter internally.\n
         Supports sort, limit, skip, etc. via kwargs."""        
-        return self._col.find(self._with_tenant_filter(filter), *args, **kwargs)
+        cursor = self._col.find(self._with_tenant_filter(filter), *args, **kwargs)
+        return TimedCursor(cursor, "mongo.find", DB_OPERATION_LATENCY, collection=self._collection_name, operation="find")
 
     async def update_one(
         self,
@@ -70,12 +107,13 @@ class BaseRepo:
     ):
         """Updates a single document in the collection, scoped to the tenant.\n
         Adds _tenant_id_ to the filter internally."""
-        return await self._col.update_one(
-            self._with_tenant_filter(filter),
-            update,
-            *args,
-            **kwargs,
-        )
+        with self._timed("update_one"):
+            return await self._col.update_one(
+                self._with_tenant_filter(filter),
+                self._touch(update),
+                *args,
+                **kwargs,
+            )
 
     async def update_many(
         self,
@@ -86,12 +124,28 @@ class BaseRepo:
     ):
         """Updates multiple documents in the collection, scoped to the tenant.\n
         Adds _tenant_id_ to the filter internally."""
-        return await self._col.update_many(
-            self._with_tenant_filter(filter),
-            update,
-            *args,
-            **kwargs,
-        )
+        with self._timed("update_many"):
+            return await self._col.update_many(
+                self._with_tenant_filter(filter),
+                self._touch(update),
+                *args,
+                **kwargs,
+            )
+
+    async def bulk_update(
+        self,
+        updates: list[tuple[Mapping[str, Any], Mapping[str, Any]]],
+        ordered: bool = False,
+        upsert: bool = False,
+    ):
+        """Applies `(filter, update)` pairs as `UpdateOne`s in a single `bulk_write`, scoped to the tenant.\n
+        Adds _tenant_id_ to every filter internally (so upserted documents get it too)."""
+        if not updates:
+            return None
+        operations = [UpdateOne(self._with_tenant_filter(filter), self._touch(update), upsert=upsert)
+                      for filter, update in updates]
+        with self._timed("bulk_write"):
+            return await self._col.bulk_write(operations, ordered=ordered)
 
     async def delete_one(
         self,
@@ -101,11 +155,12 @@ class BaseRepo:
     ):
         """Deletes a single document in the collection, scoped to the tenant.\n
         Adds _tenant_id_ to the filter internally."""
-        return await self._col.delete_one(
-            self._with_tenant_filter(filter),
-            *args,
-            **kwargs,
-        )
+        with self._timed("delete_one"):
+            return await self._col.delete_one(
+                self._with_tenant_filter(filter),
+                *args,
+                **kwargs,
+            )
 
     async def delete_many(
         self,
@@ -115,11 +170,12 @@ class BaseRepo:
     ):
         """Deletes multiple documents in the collection, scoped to the tenant.\n
         Adds _tenant_id_ to the filter internally."""
-        return await self._col.delete_many(
-            self._with_tenant_filter(filter),
-            *args,
-            **kwargs,
-        )
+        with self._timed("delete_many"):
+            return await self._col.delete_many(
+                self._with_tenant_filter(filter),
+                *args,
+                **kwargs,
+            )
 
     async def count_documents(
         self,
@@ -129,19 +185,19 @@ class BaseRepo:
     ) -> int:
         """Counts documents in the collection, scoped to the tenant.\n
         Adds _tenant_id_ to the filter internally."""
-        return await self._col.count_documents(
-            self._with_tenant_filter(filter),
-            *args,
-            **kwargs,
-        )
+        with self._timed("count_documents"):
+            return await self._col.count_documents(
+                self._with_tenant_filter(filter),
+                *args,
+                **kwargs,
+            )
 
     async def aggregate(self, pipeline: list[dict], *args, **kwargs) -> AsyncIOMotorCommandCursor:
         """
         Runs an aggregation pipeline on the collection, scoped to the tenant.\n
         Automatically prepends a $match stage for _tenant_id_ to the pipeline.
         """
-        # TODO: Uncomment after testing and all collections have tenant_id
-        # tenant_match = {"$match": {"tenant_id": self._tenant_id}}
-        # full_pipeline = [tenant_match, *pipeline]
-        full_pipeline = [*pipeline]
-        return self._col.aggregate(full_pipeline, *args, **kwargs)
+        tenant_match = {"$match": {"tenant_id": self._tenant_id}}
+        full_pipeline = [tenant_match, *pipeline]
+        cursor = self._col.aggregate(full_pipeline, *args, **kwargs)
+        return TimedCursor(cursor, "mongo.aggregate", DB_OPERATION_LATENCY, collection=self._collection_name, operation="aggregate")
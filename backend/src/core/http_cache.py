@@ -0,0 +1,76 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from fastapi import Request, Response
+
+# Bump when the JSON representation of cached resources changes, so clients drop old copies
+CONTENT_VERSION: str = "1"
+
+# Cache-Control policies. Responses are tenant- and token-scoped, so shared caches must not store them.
+CACHE_REVALIDATE: str = "private, no-cache"  # Always revalidate; cheap 304s while unchanged
+CACHE_SHORT: str = "private, max-age=60, must-revalidate"
+
+_VARY: str = "X-Tenant-Slug, Authorization"
+
+
+@dataclass
+class CacheValidators:
+    """ETag (and optionally Last-Modified) describing the current version of a resource."""
+    etag: str
+    last_modified: Optional[datetime] = None
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the parts that determine a representation (ids, `updated_at`, counts...)."""
+    digest = hashlib.blake2b("|".join([CONTENT_VERSION, *map(str, parts)]).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP dates have second precision
+    return last_modified.replace(microsecond=0) <= since
+
+
+def set_cache_headers(response: Response, validators: CacheValidators, cache_control: str) -> None:
+    response.headers["ETag"] = validators.etag
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = _VARY
+    if validators.last_modified:
+        response.headers["Last-Modified"] = format_datetime(validators.last_modified.astimezone(timezone.utc), usegmt=True)
+
+
+def not_modified_response(request: Request, validators: CacheValidators, cache_control: str) -> Optional[Response]:
+    """ A `304 Not Modified` when the client's copy is current, otherwise None.
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, validators.etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = bool(if_modified_since and validators.last_modified
+                     and _not_modified_since(if_modified_since, validators.last_modified))
+    if not fresh:
+        return None
+
+    response = Response(status_code=304)
+    set_cache_headers(response, validators, cache_control)
+    return response
@@ -0,0 +1,66 @@
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from cell.services.cell_manager import Cell, get_cell, CELLS_ON_STARTUP
+
+# Indexes every cell database is expected to have (collection -> indexes).
+CELL_INDEXES: Dict[str, List[IndexModel]] = {
+    "revoked_tokens": [
+        # Records are removed by Mongo once the refresh token itself has expired
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+    ],
+    "pages": [
+        # Covers the /discover sampling pipeline (match discoverable, project id, $sample)
+        IndexModel([("tenant_id", ASCENDING), ("discoverable", ASCENDING), ("id", ASCENDING)],
+                   name="tenant_discoverable_id"),
+        # Latest updated_at per tenant / per book, for ETags
+        IndexModel([("tenant_id", ASCENDING), ("updated_at", DESCENDING)], name="tenant_updated_at"),
+        IndexModel([("tenant_id", ASCENDING), ("book_id", ASCENDING), ("updated_at", DESCENDING)],
+                   name="tenant_book_updated_at"),
+    ],
+    "books": [
+        IndexModel([("tenant_id", ASCENDING), ("updated_at", DESCENDING)], name="tenant_updated_at"),
+    ],
+    "jobs": [
+        IndexModel([("tenant_id", ASCENDING), ("id", ASCENDING)], name="tenant_id"),
+        IndexModel([("tenant_id", ASCENDING), ("created_at", DESCENDING)], name="tenant_created_at"),
+        # Finished jobs are kept for a week
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600, name="finished_at_ttl"),
+    ],
+    "flights": [
+        # One lease per in-flight call; expired leases (and results) are removed by Mongo
+        IndexModel([("tenant_id", ASCENDING), ("key", ASCENDING)], unique=True, name="tenant_key"),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "translation_memory": [
+        # One translation per source segment and language pair: exact lookups, and upserts on approval
+        IndexModel([("tenant_id", ASCENDING), ("source_lang", ASCENDING), ("target_lang", ASCENDING),
+                    ("source_hash", ASCENDING)], unique=True, name="tenant_langs_source_hash"),
+        # Multikey index over the MinHash bands, for fuzzy lookups
+        IndexModel([("tenant_id", ASCENDING), ("source_lang", ASCENDING), ("target_lang", ASCENDING),
+                    ("fuzzy_keys", ASCENDING)], name="tenant_langs_fuzzy_keys"),
+    ],
+    "translation_memory_stats": [
+        IndexModel([("tenant_id", ASCENDING), ("book_id", ASCENDING)], unique=True, name="tenant_book"),
+    ],
+}
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """Creates the indexes in `CELL_INDEXES` on the given database. Existing indexes are left as-is."""
+    for collection_name, indexes in CELL_INDEXES.items():
+        await db[collection_name].create_indexes(indexes)
+
+async def ensure_cell_indexes() -> List[Cell]:
+    """Ensures indexes on the cells opened at startup (`CELLS_ON_STARTUP`); other cells get them when first used.
+    Returns the cells that were reachable; failures are logged and skipped so startup is not blocked."""
+    cells: List[Cell] = []
+    for cell_id in CELLS_ON_STARTUP:
+        try:
+            cell = get_cell(cell_id)
+            await ensure_indexes(cell.mongo_service.get_db())
+            cells.append(cell)
+        except Exception as e:
+            print(f"Failed to ensure indexes for cell '{cell_id}': {e}")
+    return cells
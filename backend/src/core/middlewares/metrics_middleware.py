@@ -0,0 +1,41 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from telemetry.services.metrics import HTTP_REQUEST_LATENCY
+
+_UNMATCHED_ROUTE: str = "unmatched"
+
+class MetricsMiddleware:
+    """ Records request latency by route template (e.g. `/book/{book_id}`).
+
+    Written as a plain ASGI middleware rather than an `@app.middleware("http")` function
+    to keep the per-request overhead to a timer and a dict lookup.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI stores the matched route in the (shared) scope during routing
+            route = scope.get("route")
+            HTTP_REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", _UNMATCHED_ROUTE),
+                status=status_code,
+            )
@@ -1,17 +1,23 @@
+import json
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.responses import JSONResponse, Response
+from typing import AsyncIterator, List, Optional
+
+from core.models.primitives_model import RoleName
 
 from core.security import oauth2_scheme
 from core.models.req_context_model import RequestContext
 from tenant.models.tenant_model import TenantRolePermissions
 
-from cell.services.cell_manager import get_cell
+from cell.services.cell_manager import Cell, get_cell
 from tenant.services.tenant_resolver import resolve_tenant
 from auth.services.token_services import decode_access_token
 
 from user.user_repo import get_user_repo
 from user.services.user_services import get_user_roles
+from telemetry.services.tracing import (
+    Span, span, start_trace, finish_trace, detach_trace, TRACE_ID_HEADER, TRACEPARENT_HEADER
+)
 
 DOCUMENTATION_PATHS = {
     "/docs",
@@ -19,49 +25,153 @@ DOCUMENTATION_PATHS = {
     "/openapi.json"
 }
 
-async def context_middleware(request: Request, call_next):
-    ctx: RequestContext | None = None
+DEBUG_TIMING_ROLES = {RoleName.ADMIN, RoleName.SUPERADMIN}
 
-    # Skip middleware for documentation paths
-    if request.url.path in DOCUMENTATION_PATHS:
+# Paths served without a tenant (no X-Tenant-Slug header)
+UNSCOPED_PATHS = DOCUMENTATION_PATHS | {
+    "/metrics"
+}
+
+async def context_middleware(request: Request, call_next):
+    # Skip middleware for documentation and other tenant-less paths
+    if request.url.path in UNSCOPED_PATHS:
         return await call_next(request)
 
+    debug_timing = request.query_params.get("debug_timing") == "1"
+    root, token = start_trace(f"{request.method} {request.url.path}",
+                              traceparent=request.headers.get(TRACEPARENT_HEADER),
+                              force=debug_timing,
+                              method=request.method)
     try:
-        raw_token = await oauth2_scheme(request)        
-        
-        decoded_token = await decode_access_token(raw_token) if raw_token else None        
+        return await _handle_request(request, call_next, root, debug_timing)
+    finally:
+        detach_trace(token)
+
+async def _handle_request(request: Request, call_next, root: Optional[Span], debug_timing: bool) -> Response:
+    ctx: RequestContext | None = None
+    held = False
+
+    try:
+        with span("auth.decode_token"):
+            raw_token = await oauth2_scheme(request)        
+            
+            decoded_token = await decode_access_token(raw_token) if raw_token else None        
         
         # 1) resolve tenant
         tenant_id_from_token = decoded_token.tenant_id if decoded_token else None        
-        tenant = await resolve_tenant(request, tenant_id_from_token)
+        with span("tenant.resolve"):
+            tenant = await resolve_tenant(request, tenant_id_from_token)
 
         # 2) resolve user using JWT
         user_id = decoded_token.sub if decoded_token else None        
         
+        cell = get_cell(tenant.cell_id)
+        if not cell.healthy:
+            # Fail fast instead of waiting for Mongo server selection to time out
+            raise HTTPException(503, "Service temporarily unavailable for this tenant")
+        # Held until the response body is sent, so the cell is not closed under a streaming response
+        cell.acquire()
+        held = True
+
         ctx = RequestContext(
             tenant_id=tenant.id,
             tenant_slug=tenant.slug,
             tenant_name=tenant.name,
             tenant_permissions=_permissions_dict_from_list(tenant.role_permissions),            
-            cell=get_cell(tenant.cell_id),
+            cell=cell,
             user_id=user_id,
             user_roles=[]
         )
         
         # 3) if user is present, get user roles
         if user_id:
-            ctx.user_roles = await get_user_roles(user_id, get_user_repo(ctx))
+            with span("user.roles"):
+                ctx.user_roles = await get_user_roles(user_id, get_user_repo(ctx))
 
         request.state.ctx = ctx
 
     except HTTPException as e:
         # no tenant, bad token, etc.
-        return JSONResponse(content=e.detail, status_code=e.status_code)
+        if held:
+            cell.release()
+        response = JSONResponse(content=e.detail, status_code=e.status_code)
+        return _finish_request_trace(request, response, root)
+    except BaseException:
+        if held:
+            cell.release()
+        raise
+
+    if root is not None:
+        root.set_attribute("tenant_id", ctx.tenant_id)
 
     # 3) proceed with the request
-    response = await call_next(request)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        cell.release()
+        raise
+    response.body_iterator = _ReleasingBody(response.body_iterator, cell)
+
+    if root is not None and debug_timing and DEBUG_TIMING_ROLES & set(ctx.user_roles):
+        return await _with_debug_timing(request, response, root)
+    return _finish_request_trace(request, response, root)
+
+class _ReleasingBody:
+    """ A response body releasing the request's hold on its cell once fully sent, failed, or dropped
+    (a body never iterated, e.g. the client went away first, would not run a generator's `finally`).
+    """
+    def __init__(self, body: AsyncIterator[bytes], cell: Cell):
+        self._body = body.__aiter__()
+        self._cell: Optional[Cell] = cell
+
+    def _release(self) -> None:
+        cell, self._cell = self._cell, None
+        if cell is not None:
+            cell.release()
+
+    def __aiter__(self) -> "_ReleasingBody":
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            return await self._body.__anext__()
+        except BaseException:
+            self._release()
+            raise
+
+    def __del__(self):
+        self._release()
+
+def _finish_request_trace(request: Request, response: Response, root: Optional[Span]) -> Response:
+    if root is None:
+        return response
+
+    # Name the trace after the route template (e.g. `GET /book/{book_id}`) once routing has happened
+    route = request.scope.get("route")
+    if route is not None:
+        root.name = f"{request.method} {route.path}"
+    root.set_attribute("status", response.status_code)
+    finish_trace(root)
+
+    response.headers[TRACE_ID_HEADER] = root.trace_id
     return response
 
+async def _with_debug_timing(request: Request, response: Response, root: Span) -> Response:
+    """ Wraps a JSON response as `{"data": ..., "timing": <span tree>}` for admins passing `?debug_timing=1`.
+    Non-JSON responses (images, files, streams) are returned untouched.
+    """
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return _finish_request_trace(request, response, root)
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    _finish_request_trace(request, response, root)
+
+    headers = {key: value for key, value in response.headers.items()
+               if key.lower() not in ("content-length", "content-type")}
+    return JSONResponse(content={"data": json.loads(body) if body else None, "timing": root.to_dict()},
+                        status_code=response.status_code,
+                        headers=headers)
+
 def _permissions_dict_from_list(permissions_list: List[TenantRolePermissions]):
     permissions_dict = {}
     for perm in permissions_list:
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from cell.services.cell_manager import Cell
+
+MIGRATIONS_COLLECTION: str = "migrations"
+
+
+async def _backfill_page_text_stats(db: AsyncIOMotorDatabase) -> None:
+    """Adds `ocr_length`, `translation_length` and `discoverable` to pages written before they existed."""
+    # Imported here: page.page_repo pulls in core.base_repo, which is not loaded yet when main imports this module
+    from page.page_repo import TEXT_STATS_STAGES
+    result = await db.pages.update_many({"discoverable": {"$exists": False}}, TEXT_STATS_STAGES)
+    print(f"Backfilled text stats on {result.modified_count} pages")
+
+
+# Data migrations applied once per cell database, in order (name -> migration).
+CELL_MIGRATIONS: Dict[str, Callable[[AsyncIOMotorDatabase], Awaitable[None]]] = {
+    "pages_text_stats": _backfill_page_text_stats,
+}
+
+
+async def run_migrations(db: AsyncIOMotorDatabase) -> None:
+    """Runs the migrations in `CELL_MIGRATIONS` that are not yet recorded in the `migrations` collection."""
+    applied = {doc["_id"] async for doc in db[MIGRATIONS_COLLECTION].find({}, {"_id": 1})}
+    for name, migration in CELL_MIGRATIONS.items():
+        if name in applied:
+            continue
+        await migration(db)
+        await db[MIGRATIONS_COLLECTION].insert_one({"_id": name, "applied_at": datetime.now(timezone.utc)})
+
+
+async def run_cell_migrations(cells: List[Cell]) -> None:
+    """Runs pending migrations on each cell; failures are logged and retried on the next startup."""
+    for cell in cells:
+        try:
+            await run_migrations(cell.mongo_service.get_db())
+        except Exception as e:
+            print(f"Failed to run migrations for cell '{cell.config.cell_id}': {e}")
@@ -0,0 +1,200 @@
+import os
+import time
+import random
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from page.models.page_model import Page
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from core.models.req_context_model import RequestContext
+from tenant.services.tenant_resolver import get_system_context
+from telemetry.services.tracing import create_untraced_task
+
+# Passages kept per tenant; requests sample from this pool instead of querying Mongo
+DISCOVER_POOL_SIZE: int = int(os.getenv("DISCOVER_POOL_SIZE", 200))
+# At most this many passages of the same book go into a pool (diversity across books)
+DISCOVER_POOL_MAX_PER_BOOK: int = int(os.getenv("DISCOVER_POOL_MAX_PER_BOOK", 3))
+# Pools older than this are rebuilt in the background; requests keep using the old pool meanwhile
+DISCOVER_POOL_TTL_SECONDS: float = float(os.getenv("DISCOVER_POOL_TTL_SECONDS", 300))
+# Pools not requested for this long are dropped instead of refreshed
+DISCOVER_POOL_IDLE_SECONDS: float = float(os.getenv("DISCOVER_POOL_IDLE_SECONDS", 3600))
+
+
+@dataclass
+class DiscoverPool:
+    """ Pre-sampled discoverable passages of one tenant, with their book metadata joined.
+    Only the tenant is kept: refreshes run in a context of their own, not the request that built the pool.
+    """
+    tenant_id: str
+    passages: List[Dict[str, Any]] = field(default_factory=list)
+    built_at: float = 0.0
+    last_used: float = field(default_factory=time.monotonic)
+    refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.built_at
+
+    def sample(self, count: int) -> List[Dict[str, Any]]:
+        """Random passages, preferring distinct books before repeating one."""
+        candidates = random.sample(self.passages, len(self.passages))
+        selected: List[Dict[str, Any]] = []
+        used_book_ids = set()
+        for passage in candidates:
+            if len(selected) >= count:
+                break
+            if passage["book_id"] not in used_book_ids:
+                selected.append(passage)
+                used_book_ids.add(passage["book_id"])
+
+        if len(selected) < count:
+            chosen_ids = {passage["id"] for passage in selected}
+            selected.extend([p for p in candidates if p["id"] not in chosen_ids][:count - len(selected)])
+        return selected
+
+
+_pools: Dict[str, DiscoverPool] = {}
+_build_locks: Dict[str, asyncio.Lock] = {}
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def load_discover_passages(pages_repo: PageRepo,
+                                 books_repo: BookRepo,
+                                 size: int = DISCOVER_POOL_SIZE,
+                                 max_per_book: int = DISCOVER_POOL_MAX_PER_BOOK) -> List[Dict[str, Any]]:
+    """ Samples discoverable pages (oversampling so the per-book cap can still fill the pool)
+    and joins book title/author/language with a single `$in` query.
+    """
+    sampled_ids = await pages_repo.sample_discoverable_ids(size * 2)
+    if not sampled_ids:
+        return []
+
+    raw_pages = await pages_repo.find({"id": {"$in": sampled_ids}}).to_list(len(sampled_ids))
+    random.shuffle(raw_pages)  # $in returns index order
+
+    pages: List[Page] = []
+    per_book: Dict[str, int] = {}
+    for doc in raw_pages:
+        if len(pages) >= size:
+            break
+        doc.pop("_id", None)
+        try:
+            page = Page.model_validate(doc)
+        except Exception:
+            continue  # Skip documents that don't validate as Page
+        if per_book.get(page.book_id, 0) >= max_per_book:
+            continue
+        per_book[page.book_id] = per_book.get(page.book_id, 0) + 1
+        pages.append(page)
+
+    book_ids = list(per_book)
+    books = await books_repo.find({"id": {"$in": book_ids}},
+                                  {"_id": 0, "id": 1, "title": 1, "author": 1, "language": 1}
+                                 ).to_list(len(book_ids))
+    books_by_id = {book["id"]: book for book in books}
+
+    passages = []
+    for page in pages:
+        book = books_by_id.get(page.book_id)
+        if book:
+            passages.append({
+                "id": page.id,
+                "book_id": page.book_id,
+                "page_number": page.page_number,
+                "photo": page.photo,
+                "thumbnail": page.thumbnail,
+                "ocr": page.ocr,
+                "translation": page.translation,
+                "book_title": book.get("title", ""),
+                "book_author": book.get("author", ""),
+                "book_language": book.get("language", "")
+            })
+    return passages
+
+
+async def _rebuild(pool: DiscoverPool, ctx: RequestContext) -> None:
+    pool.passages = await load_discover_passages(PageRepo(ctx), BookRepo(ctx))
+    pool.built_at = time.monotonic()
+
+
+def _schedule_refresh(pool: DiscoverPool) -> None:
+    if pool.refresh_task is None or pool.refresh_task.done():
+        pool.refresh_task = create_untraced_task(_refresh_quietly(pool))
+
+
+async def _refresh_quietly(pool: DiscoverPool) -> None:
+    try:
+        ctx = await get_system_context(pool.tenant_id)
+        if ctx is None:
+            # Tenant deleted or deactivated
+            if _pools.get(pool.tenant_id) is pool:
+                _drop(pool.tenant_id)
+            return
+        with ctx.cell.hold():
+            await _rebuild(pool, ctx)
+    except Exception as e:
+        # Keep serving the previous pool; the next request or sweep retries
+        print(f"Failed to refresh discover pool for tenant '{pool.tenant_id}': {e}")
+
+
+async def get_discover_pool(ctx: RequestContext) -> DiscoverPool:
+    """ The tenant's pool. The first request builds it (concurrent requests wait for the same build);
+    afterwards stale pools are served as-is while a background refresh runs.
+    """
+    pool = _pools.get(ctx.tenant_id)
+    if pool is None:
+        lock = _build_locks.setdefault(ctx.tenant_id, asyncio.Lock())
+        async with lock:
+            pool = _pools.get(ctx.tenant_id)
+            if pool is None:
+                pool = DiscoverPool(tenant_id=ctx.tenant_id)
+                await _rebuild(pool, ctx)
+                _pools[ctx.tenant_id] = pool
+    elif pool.age > DISCOVER_POOL_TTL_SECONDS:
+        _schedule_refresh(pool)
+
+    pool.last_used = time.monotonic()
+    return pool
+
+
+def _drop(tenant_id: str) -> None:
+    _pools.pop(tenant_id, None)
+    lock = _build_locks.get(tenant_id)
+    if lock is not None and not lock.locked():
+        _build_locks.pop(tenant_id)
+
+
+def invalidate_discover_pool(tenant_id: str) -> None:
+    """Drops a tenant's pool so the next request rebuilds it without the deleted books and pages."""
+    _drop(tenant_id)
+
+
+async def _refresh_pools_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        for tenant_id, pool in list(_pools.items()):
+            if now - pool.last_used > DISCOVER_POOL_IDLE_SECONDS:
+                _drop(tenant_id)
+            elif pool.age > DISCOVER_POOL_TTL_SECONDS:
+                _schedule_refresh(pool)
+
+
+def start_discover_pool_refresh(interval: float = DISCOVER_POOL_TTL_SECONDS) -> None:
+    """Starts the background sweep that refreshes stale pools and drops idle ones."""
+    global _refresh_task
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.create_task(_refresh_pools_periodically(interval))
+
+
+async def stop_discover_pool_refresh() -> None:
+    global _refresh_task
+    if _refresh_task:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
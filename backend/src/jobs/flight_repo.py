@@ -0,0 +1,10 @@
+from core.base_repo import BaseRepo
+from core.dependency import request_context_dependency
+from core.models.req_context_model import RequestContext
+
+class FlightRepo(BaseRepo):
+    def __init__(self, ctx: RequestContext):
+        super().__init__("flights", ctx)
+
+def get_flights_repo(ctx: request_context_dependency) -> FlightRepo:
+    return FlightRepo(ctx)
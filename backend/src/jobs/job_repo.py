@@ -0,0 +1,11 @@
+
+from core.base_repo import BaseRepo
+from core.dependency import request_context_dependency
+from core.models.req_context_model import RequestContext
+
+class JobRepo(BaseRepo):
+    def __init__(self, ctx: RequestContext):
+        super().__init__("jobs", ctx)
+
+def get_jobs_repo(ctx: request_context_dependency) -> JobRepo:
+    return JobRepo(ctx)
@@ -0,0 +1,23 @@
+from enum import StrEnum
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+class JobStatus(StrEnum):
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class Job(BaseModel):
+    """A long-running operation executed in the background; polled through `/jobs/{id}`."""
+    id: str = Field(default_factory=lambda: str(ObjectId()))
+    kind: str
+    status: JobStatus = JobStatus.RUNNING
+    progress: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
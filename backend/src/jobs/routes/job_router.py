@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List, Annotated
+
+from auth.services.rbac_service import need_permission, ResourceType, ActionType
+from jobs.job_repo import JobRepo, get_jobs_repo
+from jobs.models.job_model import Job
+
+router = APIRouter()
+
+jobs_repo_dep = Annotated[JobRepo, Depends(get_jobs_repo)]
+
+@router.get("/",
+            response_model=List[Job],
+            dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.UPDATE))]
+)
+async def get_jobs(jobs_repo: jobs_repo_dep, limit: int = 50) -> List[Job]:
+    """The tenant's most recent background jobs."""
+    docs = await jobs_repo.find({}, {"_id": 0}).sort("created_at", -1).to_list(min(max(limit, 1), 500))
+    return [Job(**doc) for doc in docs]
+
+
+@router.get("/{job_id}",
+            response_model=Job,
+            dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.UPDATE))]
+)
+async def get_job(job_id: str, jobs_repo: jobs_repo_dep) -> Job:
+    doc = await jobs_repo.find_one({"id": job_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return Job(**doc)
@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional, Set
+from fastapi import HTTPException
+
+from jobs.job_repo import JobRepo
+from jobs.models.job_model import Job, JobStatus
+from telemetry.services.tracing import create_untraced_task
+
+# Minimum time between two progress writes of the same job
+JOB_PROGRESS_INTERVAL_SECONDS: float = float(os.getenv("JOB_PROGRESS_INTERVAL_SECONDS", 2))
+
+# Running jobs, referenced until done so they are not garbage collected
+_tasks: Set[asyncio.Task] = set()
+
+
+class JobProgress:
+    """ Progress counters of a running job. Updates are cheap; they reach the job document
+    at most every `JOB_PROGRESS_INTERVAL_SECONDS` (and once more when the job ends).
+    """
+    def __init__(self, job: Job, jobs_repo: JobRepo):
+        self._job = job
+        self._repo = jobs_repo
+        self._last_flush = time.monotonic()
+
+    @property
+    def job_id(self) -> str:
+        return self._job.id
+
+    async def add(self, **counters: int) -> None:
+        for name, value in counters.items():
+            self._job.progress[name] = self._job.progress.get(name, 0) + value
+        await self._maybe_flush()
+
+    async def set(self, **values: Any) -> None:
+        self._job.progress.update(values)
+        await self._maybe_flush()
+
+    async def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= JOB_PROGRESS_INTERVAL_SECONDS:
+            await self.flush()
+
+    async def flush(self, **fields: Any) -> None:
+        self._last_flush = time.monotonic()
+        self._job.updated_at = datetime.now(timezone.utc)
+        try:
+            await self._repo.update_one({"id": self._job.id}, {"$set": {
+                "progress": dict(self._job.progress),
+                "updated_at": self._job.updated_at,
+                **fields,
+            }})
+        except Exception as e:
+            # Progress is informational; a failed write must not fail the job
+            print(f"Failed to record progress of job '{self._job.id}': {e}")
+
+
+async def _run(job: Job, progress: JobProgress, run: Callable[[JobProgress], Awaitable[None]]) -> None:
+    status, error = JobStatus.SUCCEEDED, None
+    try:
+        await run(progress)
+    except asyncio.CancelledError:
+        status, error = JobStatus.FAILED, "Interrupted by a server shutdown"
+        raise
+    except HTTPException as e:
+        status, error = JobStatus.FAILED, str(e.detail)
+    except Exception as e:
+        status, error = JobStatus.FAILED, str(e)
+    finally:
+        if error:
+            print(f"Job '{job.id}' ({job.kind}) failed: {error}")
+        await progress.flush(status=status, error=error, finished_at=datetime.now(timezone.utc))
+
+
+async def start_job(kind: str,
+                    jobs_repo: JobRepo,
+                    run: Callable[[JobProgress], Awaitable[None]],
+                    created_by: Optional[str] = None
+) -> Job:
+    """ Records a job and runs `run(progress)` in the background on this worker.
+    Returns the job right away; its status and progress are read back through `/jobs/{id}`.
+    """
+    job = Job(kind=kind, created_by=created_by)
+    await jobs_repo.insert_one(job.model_dump())
+    _spawn(job, jobs_repo, run)
+    return job
+
+
+async def resume_job(job: Job,
+                     jobs_repo: JobRepo,
+                     run: Callable[[JobProgress], Awaitable[None]]
+) -> Job:
+    """ Runs `run(progress)` again for a failed job (e.g. interrupted by a server shutdown), keeping its id
+    and progress so far. The job is claimed atomically: 409 if it is not failed, or another caller resumed it.
+    """
+    now = datetime.now(timezone.utc)
+    result = await jobs_repo.update_one({"id": job.id, "status": JobStatus.FAILED}, {"$set": {
+        "status": JobStatus.RUNNING,
+        "error": None,
+        "updated_at": now,
+        "finished_at": None,
+    }})
+    if result.modified_count == 0:
+        raise HTTPException(status_code=409, detail=f"Job '{job.id}' is not failed, or is resumed already")
+
+    job = job.model_copy(update={"status": JobStatus.RUNNING, "error": None, "updated_at": now, "finished_at": None})
+    _spawn(job, jobs_repo, run)
+    return job
+
+
+def _spawn(job: Job, jobs_repo: JobRepo, run: Callable[[JobProgress], Awaitable[None]]) -> None:
+    progress = JobProgress(job, jobs_repo)
+    # The job holds the tenant's cell until it ends, so idle-cell eviction does not close it underneath
+    task = create_untraced_task(jobs_repo.cell.holding(_run(job, progress, run)))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def stop_jobs() -> None:
+    """Cancels jobs still running on this worker (they are recorded as failed)."""
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,139 @@
+import os
+import json
+import uuid
+import socket
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from pymongo.errors import DuplicateKeyError
+
+from jobs.flight_repo import FlightRepo
+from telemetry.services.metrics import SINGLE_FLIGHT_COALESCED
+from telemetry.services.tracing import create_untraced_task
+
+# Lease of the worker making a call, renewed while the call runs; a crashed worker's lease is taken over once expired
+SINGLE_FLIGHT_LEASE_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", 60))
+# How long a finished call's result answers duplicates that arrive after it
+SINGLE_FLIGHT_RESULT_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_RESULT_SECONDS", 30))
+# How often a duplicate waiting on another worker checks for the result
+SINGLE_FLIGHT_POLL_SECONDS: float = float(os.getenv("SINGLE_FLIGHT_POLL_SECONDS", 0.5))
+
+_WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Calls in flight on this worker, by key
+_flights: Dict[str, asyncio.Task] = {}
+
+
+def flight_key(tenant_id: str, page_id: Optional[str], operation: str, model: str, *inputs: Any) -> str:
+    """Identifies a call by page, operation, model and a hash of everything else it depends on."""
+    digest = hashlib.blake2b(json.dumps(inputs, default=str).encode(), digest_size=16).hexdigest()
+    return f"{tenant_id}:{page_id or '-'}:{operation}:{model}:{digest}"
+
+
+async def single_flight(flights_repo: FlightRepo,
+                        operation: str,
+                        key: str,
+                        call: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """ Runs `call()` once for concurrent requests with the same `key` (see `flight_key`), whichever worker they
+    reach. Duplicates on this worker share the call in progress; on other workers, they wait on its Mongo lease
+    and get the result it stored. The result must be a BSON-serializable dict.
+    If the call fails, duplicates on this worker get the error; those on other workers make the call themselves.
+    """
+    flight = _flights.get(key)
+    if flight is not None:
+        SINGLE_FLIGHT_COALESCED.inc(operation=operation, scope="local")
+    else:
+        # Held by the call itself, outside the request's trace: it may outlive the request that started it
+        flight = _flights[key] = create_untraced_task(flights_repo.cell.holding(_fly(flights_repo, operation, key, call)))
+        flight.add_done_callback(lambda _: _flights.pop(key, None))
+    # A caller going away does not cancel the call the others are waiting for
+    return await asyncio.shield(flight)
+
+
+async def _fly(flights_repo: FlightRepo,
+               operation: str,
+               key: str,
+               call: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    owner = f"{_WORKER}:{uuid.uuid4().hex[:8]}"
+    while True:
+        acquired, lease = await _acquire(flights_repo, key, owner)
+        if acquired:
+            return await _lead(flights_repo, key, owner, call)
+        if lease is None:
+            continue  # Released between our attempt and the read
+        SINGLE_FLIGHT_COALESCED.inc(operation=operation, scope="remote")
+        result = await _follow(flights_repo, key)
+        if result is not None:
+            return result
+        # The other worker failed or went away: try again to make the call
+
+
+async def _acquire(flights_repo: FlightRepo, key: str, owner: str) -> Tuple[bool, Optional[dict]]:
+    """ Takes the lease of `key` if it is free or expired; otherwise returns the current one.
+    An unexpired lease fails the filter, so the upsert collides with it on the unique key.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await flights_repo.update_one({"key": key, "expires_at": {"$lt": now}}, {"$set": {
+            "owner": owner,
+            "done": False,
+            "result": None,
+            "expires_at": now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS),
+        }}, upsert=True)
+        return True, None
+    except DuplicateKeyError:
+        return False, await flights_repo.find_one({"key": key}, {"_id": 0})
+
+
+async def _renew(flights_repo: FlightRepo, key: str, owner: str) -> None:
+    while True:
+        await asyncio.sleep(SINGLE_FLIGHT_LEASE_SECONDS / 3)
+        try:
+            await flights_repo.update_one({"key": key, "owner": owner}, {"$set": {
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS),
+            }})
+        except Exception as e:
+            print(f"Failed to renew lease '{key}': {e}")
+
+
+async def _lead(flights_repo: FlightRepo,
+                key: str,
+                owner: str,
+                call: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    renewal = asyncio.create_task(_renew(flights_repo, key, owner))
+    try:
+        result = await call()
+    except BaseException:
+        renewal.cancel()
+        try:
+            await flights_repo.delete_one({"key": key, "owner": owner})
+        except Exception as e:
+            print(f"Failed to release lease '{key}': {e}")
+        raise
+    renewal.cancel()
+    try:
+        await flights_repo.update_one({"key": key, "owner": owner}, {"$set": {
+            "done": True,
+            "result": result,
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=SINGLE_FLIGHT_RESULT_SECONDS),
+        }})
+    except Exception as e:
+        # Duplicates elsewhere will make the call themselves once the lease expires
+        print(f"Failed to store the result of '{key}': {e}")
+    return result
+
+
+async def _follow(flights_repo: FlightRepo, key: str) -> Optional[Dict[str, Any]]:
+    """The result of another worker's call, or None once its lease is released or expired."""
+    while True:
+        lease = await flights_repo.find_one({"key": key, "expires_at": {"$gte": datetime.now(timezone.utc)}},
+                                            {"_id": 0, "done": 1, "result": 1})
+        if lease is None:
+            return None
+        if lease.get("done"):
+            return lease["result"]
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
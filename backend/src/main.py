@@ -9,7 +9,17 @@ from fastapi.middleware.cors import CORSMiddleware
 load_dotenv()
 
 from ai.services.ai_registry import shutdown_all_ai_clients
+from core.indexes import ensure_cell_indexes, ensure_indexes
+from core.migrations import run_cell_migrations, run_migrations
+from cell.services.cell_manager import Cell, on_cell_opened, refresh_cell_registry, start_cell_maintenance, stop_cell_maintenance
 from core.middlewares.req_context_middleware import context_middleware
+from core.middlewares.metrics_middleware import MetricsMiddleware
+from telemetry.services.loop_monitor import start_loop_monitor, stop_loop_monitor
+from telemetry.services.tracing import configure_exporters_from_env, shutdown_exporters, TRACE_ID_HEADER
+from auth.services.revoked_token_filter import start_revoked_token_sync, stop_revoked_token_sync, get_revoked_token_filter
+from discover.services.discover_pool import start_discover_pool_refresh, stop_discover_pool_refresh
+from pdf.services.image_proxy_service import close_image_proxy_client
+from jobs.services.job_runner import stop_jobs
 
 from auth.routes import auth_router
 from admin.routes import admin_router
@@ -26,15 +36,44 @@ from npc_chat.routes import npc_chat_router
 from content.routes import edit_request_router
 from pdf.routes import pdf_creator_router
 from permission.routes import permission_router
+from telemetry.routes import metrics_router
+from jobs.routes import job_router
+from translation_memory.routes import translation_memory_router
+
+async def prepare_cell(cell: Cell) -> None:
+    """Readies a cell first used after startup, as startup does for `CELLS_ON_STARTUP`."""
+    db = cell.mongo_service.get_db()
+    await ensure_indexes(db)
+    await run_migrations(db)
+    await get_revoked_token_filter(cell).sync()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Starting Book Translation API...")
+    start_loop_monitor()
+    configure_exporters_from_env()
+    try:
+        await refresh_cell_registry()
+    except Exception as e:
+        print(f"Failed to load cells from the control plane: {e}")
+    cells = await ensure_cell_indexes()
+    await run_cell_migrations(cells)
+    await start_revoked_token_sync(cells)
+    start_discover_pool_refresh()
+    on_cell_opened(prepare_cell)
+    start_cell_maintenance()
     yield
 
     # Shutdown
     print("Shutting down Book Translation API...")
+    await stop_jobs()  # Before the cells close, so interrupted jobs are still recorded
+    await stop_revoked_token_sync()
+    await stop_discover_pool_refresh()
+    await stop_cell_maintenance()
+    await stop_loop_monitor()
+    await shutdown_exporters()
+    await close_image_proxy_client()
     await shutdown_all_ai_clients()
 
 app = FastAPI(
@@ -51,9 +90,13 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["Authorization", "Content-Type", "X-Tenant-Slug"],
+    allow_headers=["Authorization", "Content-Type", "X-Tenant-Slug", "traceparent"],
+    expose_headers=[TRACE_ID_HEADER],
 )
 
+# Outermost, so latency includes the other middlewares
+app.add_middleware(MetricsMiddleware)
+
 # ROUTERS
 app.include_router(book_router.router, prefix="/book", tags=["Books"])
 app.include_router(page_router.router, prefix="/page", tags=["Pages"])
@@ -70,6 +113,9 @@ app.include_router(divination_router.router, prefix="/astrology", tags=["Astrolo
 app.include_router(npc_chat_router.router, prefix="/chat", tags=["NPC Chat"])
 app.include_router(pdf_creator_router.router, prefix="/pdf-create", tags=["PDF Creation"])
 app.include_router(permission_router.router, prefix="/permissions", tags=["Permissions"])
+app.include_router(job_router.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(translation_memory_router.router, prefix="/translation-memory", tags=["Translation Memory"])
+app.include_router(metrics_router.router, tags=["Telemetry"])
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8080))
@@ -0,0 +1,56 @@
+""" Moves a tenant to another cell. Run from backend/src:
+
+    python migrate_tenant.py <tenant-slug> <target-cell-id> copy      # bulk copy while online; resumable
+    python migrate_tenant.py <tenant-slug> <target-cell-id> cutover   # final sync and switch of `cell_id`
+    python migrate_tenant.py <tenant-slug> <target-cell-id> all       # both
+
+Both cells must be registered: through env vars (MONGO_URI_<CELL>, MONGO_DB_<CELL>, S3_BUCKET_<CELL>, S3_REGION_<CELL>),
+CELLS_CONFIG_FILE or the control-plane `cells` collection.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from cell.services.cell_manager import refresh_cell_registry
+from tenant.services.tenant_migration_service import TenantMigration, get_tenant_by_slug
+
+
+async def _run(slug: str, target: str, phase: str, suspend: bool) -> None:
+    await refresh_cell_registry()
+    migration = TenantMigration(await get_tenant_by_slug(slug), target)
+    start = time.perf_counter()
+
+    with migration.source.hold(), migration.target.hold():
+        if phase in ("copy", "all"):
+            print(f"Copying tenant '{slug}' from '{migration.source.config.cell_id}' to '{target}'...")
+            await migration.copy()
+        if phase in ("cutover", "all"):
+            print(f"Cutting tenant '{slug}' over to '{target}'...")
+            await migration.cutover(suspend=suspend)
+
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    migration.report.print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move a tenant's data to another cell.")
+    parser.add_argument("tenant_slug")
+    parser.add_argument("target_cell")
+    parser.add_argument("phase", choices=["copy", "cutover", "all"])
+    parser.add_argument("--no-suspend", action="store_true",
+                        help="Don't suspend the tenant during cut-over (writes made meanwhile may be lost)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_run(args.tenant_slug, args.target_cell, args.phase, suspend=not args.no_suspend))
+    except (ValueError, RuntimeError) as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
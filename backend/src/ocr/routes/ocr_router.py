@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Form, HTTPException, Request, Depends
+from fastapi import APIRouter, File, Form, HTTPException, Request, Depends, UploadFile
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -7,9 +7,21 @@ from page.models.page_model import Page
 
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
 from ai.services.ai_registry import get_ai_client
-from core.dependency import s3_service_dependency
+from ai.services.ai_client_interface import Priority
+from ai.services.hedging import hedged_call
+from core.dependency import s3_service_dependency, request_context_dependency
 
 from page.page_repo import get_pages_repo
+from book.book_repo import get_books_repo
+from jobs.job_repo import get_jobs_repo
+from jobs.flight_repo import get_flights_repo
+from jobs.services.single_flight import flight_key, single_flight
+from jobs.models.job_model import Job
+from ocr.services.document_ocr_service import (
+    read_document_upload,
+    resume_book_batch_ocr_service,
+    start_book_document_ocr_service
+)
 
 router = APIRouter()
 
@@ -18,6 +30,7 @@ async def get_ocr(
     # Accept either JSON body or form data
     request: Request,
     s3: s3_service_dependency,
+    req_ctx: request_context_dependency,
     page_id: Optional[str] = Form(None),
     photo_url: Optional[str] = Form(None),
     language: Optional[str] = Form(None),
@@ -25,6 +38,7 @@ async def get_ocr(
     auto_save: Optional[bool] = Form(False),
     ai_model: Optional[str] = Form(None),
     pages_repo = Depends(get_pages_repo),
+    flights_repo = Depends(get_flights_repo),
 ):        
     # Parse request data
     content_type = request.headers.get("content-type", "")    
@@ -69,41 +83,112 @@ async def get_ocr(
             raise HTTPException(status_code=500, detail="AI service not available")
                 
         # Process OCR using the client (unified interface returns (ocr_text, image_urls))
-        ocr_text, image_urls = await client.process_ocr_async(
-            book_id=page.book_id, 
-            page_id=page.id,
-            image_url=photo_url_final, 
-            language=language_final, 
-            custom_prompt=custom_prompt_final,
-            s3_service=s3
-        )
-                
-        # Auto-save to database if requested
-        # if auto_save_final and page_id_final:
-        if page_id_final: # TODO: Remove when approval/disapproval workflow is robust
-            try:
-                    ocr_result = OcrData(
-                        language=language_final,
-                        model=chosen_model,
-                        data=ocr_text,
-                        image_urls=image_urls,
-                        updated_at=datetime.now(timezone.utc)
-                    )
+        async def run_ocr() -> dict:
+            # Interactive: a late answer may be hedged with a duplicate call, `ai` is whichever answered
+            (ocr_text, image_urls), ai = await hedged_call(req_ctx.tenant_id, "ocr", client, lambda ai: ai.process_ocr_async(
+                book_id=page.book_id, 
+                page_id=page.id,
+                image_url=photo_url_final, 
+                language=language_final, 
+                custom_prompt=custom_prompt_final,
+                s3_service=s3
+            ))
+                    
+            # Auto-save to database if requested
+            # if auto_save_final and page_id_final:
+            if page_id_final: # TODO: Remove when approval/disapproval workflow is robust
+                try:
+                        ocr_result = OcrData(
+                            language=language_final,
+                            model=ai.name,
+                            data=ocr_text,
+                            image_urls=image_urls,
+                            updated_at=datetime.now(timezone.utc)
+                        )
+
+                        # Delete previously stored OCR images from S3 (figures named by content hash may be reused)
+                        if page.ocr and page.ocr.image_urls:
+                            await s3.delete_files([url for url in page.ocr.image_urls if url not in image_urls])
 
-                    # Delete previously stored OCR images from S3
-                    if page.ocr and page.ocr.image_urls:                        
-                        await s3.delete_files(page.ocr.image_urls)
+                        await pages_repo.update_one(
+                            {"id": page_id_final},
+                            {"$set": {"ocr": ocr_result.model_dump()}}
+                        )
 
-                    await pages_repo.update_one(
-                        {"id": page_id_final},
-                        {"$set": {"ocr": ocr_result.model_dump()}}
-                    )
+                except Exception as db_error:
+                        raise HTTPException(status_code=500, detail=f"Failed to update OCR data in database: {db_error}")
+            return {"ocr": ocr_text}
 
-            except Exception as db_error:
-                    raise HTTPException(status_code=500, detail=f"Failed to update OCR data in database: {db_error}")
-                            
+        # Identical requests in flight (double clicks, two editors) share one provider call and one save
+        key = flight_key(req_ctx.tenant_id, page.id, "ocr", chosen_model, photo_url_final, language_final, custom_prompt_final)
+        ocr_text = (await single_flight(flights_repo, "ocr", key, run_ocr))["ocr"]
                 
         return {"ocr": ocr_text}
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/book/{book_id}",
+             status_code=202,
+             response_model=Job,
+             dependencies=[Depends(need_permission(ResourceType.PAGE, ActionType.UPDATE))])
+async def ocr_book_pages(
+    book_id: str,
+    req_ctx: request_context_dependency,
+    s3: s3_service_dependency,
+    language: str = Form(...),
+    start_page: int = Form(1),
+    end_page: Optional[int] = Form(None),
+    ai_model: str = Form("mistral"),
+    custom_prompt: Optional[str] = Form(None),
+    priority: Priority = Form(Priority.INTERACTIVE),
+    file: Optional[UploadFile] = File(None),
+    books_repo = Depends(get_books_repo),
+    pages_repo = Depends(get_pages_repo),
+    jobs_repo = Depends(get_jobs_repo),
+) -> Job:
+    """ Starts OCR of the book's pages `start_page..end_page` with multi-page requests; poll `/jobs/{id}`.
+    An uploaded PDF (document OCR models only) is used as the document, its pages matching the range in order.
+    `priority=batch` sends the pages through the provider's batch API, for bulk work that can wait hours.
+    """
+    try:
+        # An uploaded PDF can only fail over to providers taking whole documents
+        client = get_ai_client(ai_model, priority, document_ocr=file is not None)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pdf = await read_document_upload(file) if file else None
+    return await start_book_document_ocr_service(book_id=book_id,
+                                                 language=language,
+                                                 client=client,
+                                                 model=client.name,
+                                                 books_repo=books_repo,
+                                                 pages_repo=pages_repo,
+                                                 jobs_repo=jobs_repo,
+                                                 s3=s3,
+                                                 start_page=start_page,
+                                                 end_page=end_page,
+                                                 pdf=pdf,
+                                                 custom_prompt=custom_prompt,
+                                                 priority=priority,
+                                                 created_by=req_ctx.user_id)
+
+
+@router.post("/book/jobs/{job_id}/resume",
+             status_code=202,
+             response_model=Job,
+             dependencies=[Depends(need_permission(ResourceType.PAGE, ActionType.UPDATE))])
+async def resume_book_batch_ocr(
+    job_id: str,
+    s3: s3_service_dependency,
+    pages_repo = Depends(get_pages_repo),
+    jobs_repo = Depends(get_jobs_repo),
+) -> Job:
+    """ Resumes a failed `priority=batch` book OCR job (e.g. interrupted by a restart) from its provider batch:
+    the batch already submitted is polled and collected, not submitted again. Poll `/jobs/{id}` as before.
+    """
+    return await resume_book_batch_ocr_service(job_id=job_id,
+                                               jobs_repo=jobs_repo,
+                                               pages_repo=pages_repo,
+                                               s3=s3)
@@ -0,0 +1,249 @@
+import os
+import base64
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+
+from page.models.page_model import OcrData
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from jobs.job_repo import JobRepo
+from jobs.models.job_model import Job
+from jobs.services.job_runner import JobProgress, resume_job, start_job
+from cell.services.s3_service import S3Service
+from ai.services.ai_client_interface import AiClientInterface, BatchResult, BatchState, Priority
+from ai.services.ai_registry import get_provider_client
+from pdf.services.book_pdf_service import render_scans_pdf
+
+# Book pages OCRed per step of a book OCR job (one generated PDF, or one call of `process_ocr_batch_async`)
+OCR_DOCUMENT_BATCH_PAGES: int = int(os.getenv("OCR_DOCUMENT_BATCH_PAGES", 30))
+# Largest PDF accepted for upload (Mistral OCR takes up to 50 MB)
+OCR_DOCUMENT_MAX_BYTES: int = int(os.getenv("OCR_DOCUMENT_MAX_BYTES", 50 * 1024 * 1024))
+# Seconds between two status checks of a provider batch (batch priority jobs)
+AI_BATCH_POLL_SECONDS: float = float(os.getenv("AI_BATCH_POLL_SECONDS", 30))
+
+_PAGE_PROJECTION = {"_id": 0, "id": 1, "page_number": 1, "photo": 1, "compressed_photo": 1, "ocr.image_urls": 1}
+
+
+async def read_document_upload(file: UploadFile) -> bytes:
+    """ The uploaded PDF, rejected with 413 above `OCR_DOCUMENT_MAX_BYTES` without reading it all into memory:
+    by its size when the multipart part gives one, otherwise after reading one byte past the limit.
+    """
+    if file.size is not None and file.size > OCR_DOCUMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"PDF exceeds {OCR_DOCUMENT_MAX_BYTES} bytes")
+    pdf = await file.read(OCR_DOCUMENT_MAX_BYTES + 1)
+    if len(pdf) > OCR_DOCUMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"PDF exceeds {OCR_DOCUMENT_MAX_BYTES} bytes")
+    return pdf
+
+
+def _pdf_data_url(data: bytes) -> str:
+    return "data:application/pdf;base64," + base64.b64encode(data).decode()
+
+
+async def _save_results(pages: List[Dict[str, Any]],
+                        results: List[Tuple[str, List[str]]],
+                        language: str,
+                        model: str,
+                        pages_repo: PageRepo,
+                        s3: S3Service
+) -> None:
+    """Stores the OCR of a batch of pages in one bulk write, then drops figures the new results no longer use."""
+    now = datetime.now(timezone.utc)
+    updates = []
+    stale_urls = []
+    for page, (text, image_urls) in zip(pages, results):
+        ocr = OcrData(language=language, model=model, data=text, image_urls=image_urls, updated_at=now)
+        updates.append(({"id": page["id"]}, {"$set": {"ocr": ocr.model_dump()}}))
+        previous = (page.get("ocr") or {}).get("image_urls") or []
+        stale_urls.extend(url for url in previous if url not in image_urls)
+
+    await pages_repo.bulk_update(updates)
+    await s3.delete_files(stale_urls)
+
+
+async def _ocr_batch(client: AiClientInterface,
+                     book_id: str,
+                     batch: List[Dict[str, Any]],
+                     language: str,
+                     custom_prompt: Optional[str],
+                     pdf: Optional[bytes],
+                     s3: S3Service
+) -> List[Tuple[str, List[str]]]:
+    if pdf is not None or client.supports_document_ocr:
+        document = pdf if pdf is not None else await render_scans_pdf(batch, s3)
+        return await client.process_document_ocr_async(book_id=book_id,
+                                                       page_ids=[page["id"] for page in batch],
+                                                       document_url=_pdf_data_url(document),
+                                                       s3_service=s3)
+    # Providers without document OCR get the page images, packed into as few requests as they can take
+    return await client.process_ocr_batch_async(book_id=book_id,
+                                                pages=[(page["id"], page.get("compressed_photo") or page["photo"])
+                                                       for page in batch],
+                                                language=language,
+                                                custom_prompt=custom_prompt,
+                                                s3_service=s3)
+
+
+async def _submit_provider_batch(client: AiClientInterface,
+                                 pages: List[Dict[str, Any]],
+                                 language: str,
+                                 custom_prompt: Optional[str],
+                                 progress: JobProgress
+) -> str:
+    """Submits all pages as one provider batch; returns its id."""
+    batch_id = await client.submit_ocr_batch(pages=[(page["id"], page.get("compressed_photo") or page["photo"])
+                                                    for page in pages],
+                                             language=language,
+                                             custom_prompt=custom_prompt)
+    # What collecting the batch takes, recorded right away so an interrupted job can be resumed
+    # (`resume_book_batch_ocr_service`) instead of paying for a new batch
+    await progress.set(provider=client.name, provider_batch_id=batch_id, language=language)
+    await progress.flush()
+    return batch_id
+
+
+async def _collect_provider_batch(client: AiClientInterface,
+                                  book_id: str,
+                                  batch_id: str,
+                                  language: str,
+                                  pages_repo: PageRepo,
+                                  s3: S3Service,
+                                  progress: JobProgress
+) -> None:
+    """Waits for a provider batch, then saves its results as they stream in."""
+    while True:
+        status = await client.get_batch_status(batch_id)
+        await progress.set(provider_completed=status.completed)
+        if status.state == BatchState.SUCCEEDED:
+            break
+        if status.state == BatchState.FAILED:
+            raise Exception(status.error or f"Provider batch '{batch_id}' failed")
+        await asyncio.sleep(AI_BATCH_POLL_SECONDS)
+
+    await progress.set(pages_done=0, pages_failed=0)
+    results: List[BatchResult] = []
+    async for result in client.iter_ocr_batch_results(batch_id=batch_id, book_id=book_id, s3_service=s3):
+        if result.error:
+            print(f"Batch OCR of page '{result.custom_id}' failed: {result.error}")
+            await progress.add(pages_failed=1)
+            continue
+        results.append(result)
+        if len(results) >= OCR_DOCUMENT_BATCH_PAGES:
+            await _save_batch_results(book_id, results, language, client.name, pages_repo, s3, progress)
+            results = []
+    if results:
+        await _save_batch_results(book_id, results, language, client.name, pages_repo, s3, progress)
+
+
+async def _save_batch_results(book_id: str,
+                              results: List[BatchResult],
+                              language: str,
+                              model: str,
+                              pages_repo: PageRepo,
+                              s3: S3Service,
+                              progress: JobProgress
+) -> None:
+    """Saves results of a provider batch on the pages they were submitted for (pages deleted since are skipped)."""
+    pages = await pages_repo.find({"book_id": book_id, "id": {"$in": [result.custom_id for result in results]}},
+                                  _PAGE_PROJECTION).to_list(None)
+    pages_by_id = {page["id"]: page for page in pages}
+    found = [(pages_by_id[result.custom_id], result) for result in results if result.custom_id in pages_by_id]
+    if len(found) < len(results):
+        print(f"Batch OCR of {len(results) - len(found)} page(s) of book '{book_id}' failed: unknown page")
+        await progress.add(pages_failed=len(results) - len(found))
+    if found:
+        await _save_results([page for page, _ in found],
+                            [(result.text, result.image_urls or []) for _, result in found],
+                            language, model, pages_repo, s3)
+        await progress.add(pages_done=len(found))
+
+
+async def start_book_document_ocr_service(book_id: str,
+                                          language: str,
+                                          client: AiClientInterface,
+                                          model: str,
+                                          books_repo: BookRepo,
+                                          pages_repo: PageRepo,
+                                          jobs_repo: JobRepo,
+                                          s3: S3Service,
+                                          start_page: int = 1,
+                                          end_page: Optional[int] = None,
+                                          pdf: Optional[bytes] = None,
+                                          custom_prompt: Optional[str] = None,
+                                          priority: Priority = Priority.INTERACTIVE,
+                                          created_by: Optional[str] = None
+) -> Job:
+    """ Runs OCR over a book's page range as a background job, sending many pages per request.
+    With `pdf`, that document is submitted as is and its pages are matched to the range's pages by order.
+    Otherwise pages go `OCR_DOCUMENT_BATCH_PAGES` at a time, as a PDF of their scans to providers with
+    document OCR, or as images to `process_ocr_batch_async`.
+    With `Priority.BATCH` the pages go to the provider's batch API instead: cheaper and outside the
+    interactive quota, but results can take hours, so it suits bulk jobs nobody is waiting on.
+    """
+    if not await books_repo.find_one({"id": book_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Book not found")
+    if pdf is not None:
+        if not client.supports_document_ocr:
+            raise HTTPException(status_code=400, detail=f"Model '{model}' does not support document OCR")
+        if len(pdf) > OCR_DOCUMENT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"PDF exceeds {OCR_DOCUMENT_MAX_BYTES} bytes")
+    if priority == Priority.BATCH:
+        if not client.supports_batch:
+            raise HTTPException(status_code=400, detail=f"Model '{model}' does not support batch priority")
+        if pdf is not None:
+            raise HTTPException(status_code=400, detail="Batch priority OCRs the page scans, not an uploaded PDF")
+
+    page_range: Dict[str, Any] = {"$gte": start_page}
+    if end_page is not None:
+        page_range["$lte"] = end_page
+    pages = await pages_repo.find({"book_id": book_id, "page_number": page_range},
+                                  _PAGE_PROJECTION).sort("page_number", 1).to_list(None)
+    if not pages:
+        raise HTTPException(status_code=404, detail="No pages in the requested range")
+
+    async def run(progress: JobProgress):
+        await progress.set(book_id=book_id, pages_total=len(pages), priority=str(priority))
+        if priority == Priority.BATCH:
+            batch_id = await _submit_provider_batch(client, pages, language, custom_prompt, progress)
+            await _collect_provider_batch(client, book_id, batch_id, language, pages_repo, s3, progress)
+            return
+        batch_size = len(pages) if pdf is not None else OCR_DOCUMENT_BATCH_PAGES
+        for start in range(0, len(pages), batch_size):
+            batch = pages[start:start + batch_size]
+            results = await _ocr_batch(client, book_id, batch, language, custom_prompt, pdf, s3)
+            await _save_results(batch, results, language, model, pages_repo, s3)
+            await progress.add(pages_done=len(batch))
+
+    return await start_job("book_ocr", jobs_repo, run, created_by)
+
+
+async def resume_book_batch_ocr_service(job_id: str,
+                                        jobs_repo: JobRepo,
+                                        pages_repo: PageRepo,
+                                        s3: S3Service
+) -> Job:
+    """ Resumes a batch priority book OCR job that failed after submitting its provider batch, typically
+    interrupted by a server shutdown while waiting on it: the same batch is polled again and its results
+    saved, on the provider it was submitted to, so the pages are not paid for twice.
+    """
+    doc = await jobs_repo.find_one({"id": job_id, "kind": "book_ocr"}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = Job(**doc)
+    book_id = job.progress.get("book_id")
+    batch_id = job.progress.get("provider_batch_id")
+    provider = job.progress.get("provider")
+    language = job.progress.get("language")
+    if not (book_id and batch_id and provider and language):
+        raise HTTPException(status_code=400, detail="Job has no provider batch to collect")
+    try:
+        client = get_provider_client(provider)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def run(progress: JobProgress):
+        await _collect_provider_batch(client, book_id, batch_id, language, pages_repo, s3, progress)
+
+    return await resume_job(job, jobs_repo, run)
@@ -1,11 +1,100 @@
+from typing import Any, Mapping, MutableMapping, Dict, List, Union
+
 from core.base_repo import BaseRepo
 from core.dependency import request_context_dependency
 from core.models.req_context_model import RequestContext
 
+# A page is shown on /discover once it has this much OCR and translated text
+DISCOVER_MIN_OCR_CHARS: int = 100
+DISCOVER_MIN_TRANSLATION_CHARS: int = 200
+
+# `$set` keys that change a page's text, and so its lengths and `discoverable` flag
+_TEXT_FIELDS = {"ocr", "ocr.data", "translation", "translation.data"}
+
+# Pipeline stages recomputing the text stats server-side after an update (same rule as `text_stats`)
+TEXT_STATS_STAGES: List[Dict[str, Any]] = [
+    {"$set": {
+        "ocr_length": {"$strLenCP": {"$ifNull": ["$ocr.data", ""]}},
+        "translation_length": {"$strLenCP": {"$ifNull": ["$translation.data", ""]}},
+    }},
+    {"$set": {
+        "discoverable": {"$and": [
+            {"$gte": ["$ocr_length", DISCOVER_MIN_OCR_CHARS]},
+            {"$gte": ["$translation_length", DISCOVER_MIN_TRANSLATION_CHARS]},
+        ]},
+    }},
+]
+
+
+def text_stats(page_doc: Mapping[str, Any]) -> Dict[str, Any]:
+    """ Text lengths and the `discoverable` flag for a page document.
+    Stored on every page so /discover can sample from the `(tenant_id, discoverable)` index
+    instead of measuring every page's text.
+    """
+    ocr_length = len(((page_doc.get("ocr") or {}).get("data")) or "")
+    translation_length = len(((page_doc.get("translation") or {}).get("data")) or "")
+    return {
+        "ocr_length": ocr_length,
+        "translation_length": translation_length,
+        "discoverable": ocr_length >= DISCOVER_MIN_OCR_CHARS and translation_length >= DISCOVER_MIN_TRANSLATION_CHARS,
+    }
+
+
 class PageRepo(BaseRepo):
+    """ Pages repository. Keeps `ocr_length`, `translation_length` and `discoverable`
+    in sync with the page text, and bumps `updated_at`, on every write.
+    """
+    touch_updated_at = True
+
     def __init__(self, ctx: RequestContext):
-        super().__init__("pages", ctx)    
-    # Add page-specific repository methods here if needed
+        super().__init__("pages", ctx)
+
+    @staticmethod
+    def _with_text_stats(update: Union[Mapping[str, Any], List[Mapping[str, Any]]]):
+        """ Turns a `{"$set": ...}` update touching page text into an update pipeline that also
+        recomputes the text stats atomically. Values are wrapped in `$literal` so text starting
+        with `$` is not read as a field path. Other updates are returned unchanged.
+        """
+        if not isinstance(update, Mapping) or set(update) != {"$set"}:
+            return update
+        set_fields = update["$set"]
+        if not _TEXT_FIELDS & set(set_fields):
+            return update
+        return [{"$set": {key: {"$literal": value} for key, value in set_fields.items()}}, *TEXT_STATS_STAGES]
+
+    async def insert_one(self, doc: MutableMapping[str, Any]):
+        doc.update(text_stats(doc))
+        return await super().insert_one(doc)
+
+    async def insert_many(self, docs: list[MutableMapping[str, Any]]):
+        for doc in docs:
+            doc.update(text_stats(doc))
+        return await super().insert_many(docs)
+
+    async def update_one(self, filter: Mapping[str, Any], update: Mapping[str, Any], *args, **kwargs):
+        return await super().update_one(filter, self._with_text_stats(update), *args, **kwargs)
+
+    async def update_many(self, filter: Mapping[str, Any], update: Mapping[str, Any], *args, **kwargs):
+        return await super().update_many(filter, self._with_text_stats(update), *args, **kwargs)
+
+    async def bulk_update(self,
+                          updates: list[tuple[Mapping[str, Any], Mapping[str, Any]]],
+                          ordered: bool = False,
+                          upsert: bool = False):
+        return await super().bulk_update([(filter, self._with_text_stats(update)) for filter, update in updates],
+                                         ordered, upsert)
+
+    async def sample_discoverable_ids(self, size: int) -> List[str]:
+        """ Random ids of discoverable pages. The pipeline is covered by the
+        `(tenant_id, discoverable, id)` index, so only index entries are sampled.
+        """
+        cursor = await self.aggregate([
+            {"$match": {"discoverable": True}},
+            {"$project": {"_id": 0, "id": 1}},
+            {"$sample": {"size": size}},
+        ])
+        return [doc["id"] for doc in await cursor.to_list(size)]
+
 
 def get_pages_repo(request_ctx: request_context_dependency) -> PageRepo:
-    return PageRepo(ctx=request_ctx)
\ No newline at end of file
+    return PageRepo(ctx=request_ctx)
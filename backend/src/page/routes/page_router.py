@@ -1,4 +1,4 @@
-from fastapi import APIRouter, File, UploadFile, Form, Depends
+from fastapi import APIRouter, File, UploadFile, Form, Depends, Request, Response
 from typing import Optional, Annotated
 
 from page.models.page_model import Page
@@ -7,6 +7,7 @@ from book.book_repo import get_books_repo
 from page.page_repo import PageRepo, get_pages_repo
 
 from core.dependency import s3_service_dependency
+from core.http_cache import CACHE_REVALIDATE, not_modified_response, set_cache_headers
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
 from page.services.page_service import (
     create_page_service,
@@ -14,6 +15,7 @@ from page.services.page_service import (
     update_page_service,
     delete_page_service,
     update_page_by_request_service,
+    get_page_cache_validators,
     PageRequestUpdate
 )
 
@@ -60,7 +62,18 @@ async def create_page(
 
 
 @router.get("/{page_id}", response_model=Page)
-async def get_page(page_id: str, pages_repo: page_repo_dep, s3: s3_service_dependency) -> Page:    
+async def get_page(page_id: str,
+                   request: Request,
+                   response: Response,
+                   pages_repo: page_repo_dep,
+                   s3: s3_service_dependency
+) -> Page:
+    validators = await get_page_cache_validators(page_id=page_id, pages_repo=pages_repo)
+    not_modified = not_modified_response(request, validators, CACHE_REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    set_cache_headers(response, validators, CACHE_REVALIDATE)
     return await get_page_service(page_id=page_id, pages_repo=pages_repo, s3=s3)
 
 
@@ -12,6 +12,8 @@ from book.book_repo import BookRepo
 from page.page_repo import PageRepo
 
 from cell.services.s3_service import S3Service
+from core.http_cache import CacheValidators, make_etag
+from discover.services.discover_pool import invalidate_discover_pool
 
 from utils.helpers import (
     compress_image,
@@ -116,6 +118,14 @@ async def create_page_service(
         raise HTTPException(status_code=500, detail=f"Failed to create page: {str(e)}")
 
 
+async def get_page_cache_validators(page_id: str, pages_repo: PageRepo) -> CacheValidators:
+    page_data = await pages_repo.find_one({"id": page_id}, {"_id": 0, "updated_at": 1})
+    if not page_data:
+        raise HTTPException(status_code=404, detail="Page not found")
+    updated_at = page_data.get("updated_at")
+    return CacheValidators(etag=make_etag("page", page_id, updated_at), last_modified=updated_at)
+
+
 async def get_page_service(page_id: str, pages_repo: PageRepo, s3: S3Service) -> Page:
     page_data = await pages_repo.find_one({"id": page_id})
     if not page_data:
@@ -291,6 +301,7 @@ async def delete_page_service(page_id: str, pages_repo: PageRepo, s3: S3Service)
     await s3.delete_page_files(book_id=page.book_id, page_id=page.id)
     
     await pages_repo.delete_one({"id": page_id})
+    invalidate_discover_pool(pages_repo.tenant_id)
     
     return {"message": "Page deleted!"}
 
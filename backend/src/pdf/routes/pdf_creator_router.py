@@ -1,36 +1,18 @@
-from fastapi import APIRouter, Query, Response, HTTPException
-import httpx
+from typing import Optional
+from fastapi import APIRouter, Query, Response
+
+from core.dependency import s3_service_dependency
+from pdf.services.image_proxy_service import proxy_image, head_image
 
 router = APIRouter()
 
 @router.get("/")
-async def image_proxy(url: str = Query(...)):
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            if resp.status_code != 200:
-                raise HTTPException(status_code=404, detail="Image not found")
-            content_type = resp.headers.get("content-type", "image/jpeg")
-            return Response(
-                content=resp.content,
-                media_type=content_type,
-                headers={"Access-Control-Allow-Origin": "*"}
-            )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching image: {e}")
+async def image_proxy(s3: s3_service_dependency,
+                      url: str = Query(...),
+                      width: Optional[int] = Query(None, ge=16, le=4096)) -> Response:
+    """Proxies a tenant image for client-side PDF generation, optionally downscaled to `width` pixels."""
+    return await proxy_image(url, s3, width)
 
 @router.head("/")
-async def image_proxy_head(url: str = Query(...)):
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.head(url)
-            if resp.status_code != 200:
-                raise HTTPException(status_code=404, detail="Image not found")
-            content_type = resp.headers.get("content-type", "image/jpeg")
-            return Response(
-                status_code=200,
-                media_type=content_type,
-                headers={"Access-Control-Allow-Origin": "*"}
-            )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching image: {e}")
\ No newline at end of file
+async def image_proxy_head(s3: s3_service_dependency, url: str = Query(...)) -> Response:
+    return await head_image(url, s3)
@@ -0,0 +1,263 @@
+import os
+import re
+import asyncio
+import tempfile
+from io import BytesIO
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from PIL import Image
+
+from book.models.book_model import Book
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from cell.services.s3_service import S3Service
+from core.http_cache import CacheValidators, make_etag
+from book.services.book_service import get_book_cache_validators
+from utils.helpers import downscale_image_bytes
+from telemetry.services.tracing import create_untraced_task
+from pdf.services.pdf_writer import (
+    StreamingPdfWriter,
+    PAGE_WIDTH,
+    PAGE_HEIGHT,
+    MARGIN,
+    image_content,
+    markdown_to_plain,
+    text_content,
+    wrap_text,
+)
+
+# Page images downloaded ahead of the page being written
+BOOK_PDF_IMAGE_WINDOW: int = int(os.getenv("BOOK_PDF_IMAGE_WINDOW", 8))
+# Pages read from Mongo (and rendered) per batch
+BOOK_PDF_PAGE_BATCH: int = int(os.getenv("BOOK_PDF_PAGE_BATCH", 32))
+
+# Stored exports per image variant; each variant only replaces its own older versions
+_EXPORT_KINDS = {False: "pdf", True: "pdf-original"}
+_PAGE_PROJECTION = {"_id": 0, "id": 1, "page_number": 1, "photo": 1, "compressed_photo": 1,
+                    "ocr.data": 1, "translation.data": 1}
+
+_BODY_FONT_SIZE = 11
+_BODY_LEADING = 15
+_FOOTER_HEIGHT = 24
+
+# Uploads of finished exports, referenced until done so they are not garbage collected
+_upload_tasks: Set[asyncio.Task] = set()
+
+
+async def get_book_pdf_cache_validators(book_id: str,
+                                        books_repo: BookRepo,
+                                        pages_repo: PageRepo,
+                                        original_images: bool = False
+) -> CacheValidators:
+    """Version of a book's PDF: the book and all its pages, plus the image variant."""
+    details = await get_book_cache_validators(book_id=book_id,
+                                              books_repo=books_repo,
+                                              pages_repo=pages_repo,
+                                              with_pages=True)
+    return CacheValidators(etag=make_etag("book_pdf", details.etag, original_images))
+
+
+def _export_filename(validators: CacheValidators) -> str:
+    version = validators.etag.strip('"')
+    return f"{version}.pdf"
+
+
+def _download_filename(book: Book) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", book.display_title or book.title).strip("_")[:80]
+    return f"{name or book.id}.pdf"
+
+
+def _prepare_jpeg(data: bytes) -> Optional[Tuple[bytes, int, int, int]]:
+    """ JPEG bytes, size and colour components for embedding. Baseline RGB/grey JPEGs are used
+    as-is; anything else (PNG, CMYK, EXIF-rotated) is re-encoded. Runs in a worker thread.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        if image.format == "JPEG" and image.mode in ("RGB", "L") and image.getexif().get(274, 1) == 1:
+            return data, image.width, image.height, 1 if image.mode == "L" else 3
+        data = downscale_image_bytes(data, image.width).getvalue()
+        image = Image.open(BytesIO(data))
+        return data, image.width, image.height, 1 if image.mode == "L" else 3
+    except Exception as e:
+        print(f"Skipping unreadable page image in PDF export: {e}")
+        return None
+
+
+def _title_page(book: Book) -> bytes:
+    top = PAGE_HEIGHT - MARGIN - 120
+    width = PAGE_WIDTH - 2 * MARGIN
+    content = text_content(wrap_text(book.display_title or book.title, 22, width), MARGIN, top, 22, 28)
+    details = [book.author, "", f"Published: {book.published}", f"Language: {book.language}"]
+    return content + text_content(details, MARGIN, top - 140, 13, 18)
+
+
+def _footer(label: str) -> bytes:
+    return text_content([label], MARGIN, MARGIN - 10 + _BODY_LEADING, 9, _BODY_LEADING)
+
+
+def _image_page(page: Dict[str, Any], jpeg: Tuple[bytes, int, int, int], ocr_text: str) -> bytes:
+    """ The scan fitted into the margins, with the OCR text as an invisible layer over it
+    so the PDF is searchable and the text can be selected.
+    """
+    _, width, height, _ = jpeg
+    box_width = PAGE_WIDTH - 2 * MARGIN
+    box_height = PAGE_HEIGHT - 2 * MARGIN - _FOOTER_HEIGHT
+    scale = min(box_width / width, box_height / height)
+    draw_width, draw_height = width * scale, height * scale
+    x = (PAGE_WIDTH - draw_width) / 2
+    y = MARGIN + _FOOTER_HEIGHT + (box_height - draw_height)
+
+    content = image_content(0, x, y, draw_width, draw_height)
+    lines = [line for line in wrap_text(ocr_text, 8, draw_width) if line]
+    if lines:
+        leading = min(10.0, draw_height / len(lines))
+        content += text_content(lines, x, y + draw_height, 8, leading, invisible=True)
+    return content + _footer(f"Page {page['page_number']}")
+
+
+def _text_pages(heading: str, text: str) -> List[bytes]:
+    """Visible text, split across as many PDF pages as it needs."""
+    width = PAGE_WIDTH - 2 * MARGIN
+    lines = wrap_text(text, _BODY_FONT_SIZE, width)
+    per_page = int((PAGE_HEIGHT - 2 * MARGIN - _FOOTER_HEIGHT - 30) // _BODY_LEADING)
+    top = PAGE_HEIGHT - MARGIN
+
+    pages = []
+    for start in range(0, max(len(lines), 1), per_page):
+        content = text_content([heading], MARGIN, top, 13, 0)
+        content += text_content(lines[start:start + per_page], MARGIN, top - 16, _BODY_FONT_SIZE, _BODY_LEADING)
+        pages.append(content + _footer(heading))
+    return pages
+
+
+async def _render_pages(writer: StreamingPdfWriter,
+                        pages: List[Dict[str, Any]],
+                        s3: S3Service,
+                        original_images: bool
+) -> AsyncIterator[bytes]:
+    image_urls = [page.get("photo") if original_images else (page.get("compressed_photo") or page.get("photo"))
+                  for page in pages]
+    page_iter = iter(pages)
+    async for image in s3.iter_files(image_urls, window=BOOK_PDF_IMAGE_WINDOW):
+        page = next(page_iter)
+        ocr_text = markdown_to_plain((page.get("ocr") or {}).get("data") or "")
+        translation = markdown_to_plain((page.get("translation") or {}).get("data") or "")
+
+        jpeg = await asyncio.to_thread(_prepare_jpeg, image) if image else None
+        if jpeg:
+            yield writer.add_page(_image_page(page, jpeg, ocr_text), images=[jpeg])
+        elif ocr_text.strip():
+            for content in _text_pages(f"Page {page['page_number']} - Original", ocr_text):
+                yield writer.add_page(content)
+
+        if translation.strip():
+            for content in _text_pages(f"Page {page['page_number']} - Translation", translation):
+                yield writer.add_page(content)
+
+
+async def _render_book_pdf(book: Book, pages_repo: PageRepo, s3: S3Service, original_images: bool) -> AsyncIterator[bytes]:
+    writer = StreamingPdfWriter(title=book.display_title or book.title, author=book.author)
+    yield writer.begin()
+    yield writer.add_page(_title_page(book))
+
+    cursor = pages_repo.find({"book_id": book.id}, _PAGE_PROJECTION).sort("page_number", 1)
+    batch: List[Dict[str, Any]] = []
+    async for page in cursor:
+        batch.append(page)
+        if len(batch) >= BOOK_PDF_PAGE_BATCH:
+            async for chunk in _render_pages(writer, batch, s3, original_images):
+                yield chunk
+            batch = []
+    if batch:
+        async for chunk in _render_pages(writer, batch, s3, original_images):
+            yield chunk
+
+    yield writer.finish()
+
+
+def _scan_page(jpeg: Tuple[bytes, int, int, int]) -> bytes:
+    """The scan alone, as large as the page allows."""
+    _, width, height, _ = jpeg
+    scale = min(PAGE_WIDTH / width, PAGE_HEIGHT / height)
+    draw_width, draw_height = width * scale, height * scale
+    return image_content(0, (PAGE_WIDTH - draw_width) / 2, (PAGE_HEIGHT - draw_height) / 2, draw_width, draw_height)
+
+
+async def render_scans_pdf(pages: List[Dict[str, Any]], s3: S3Service, original_images: bool = False) -> bytes:
+    """ A PDF with one page per entry of `pages` (page documents with `photo`/`compressed_photo`)
+    holding only its scan, e.g. to OCR a page range in one request. Pages without a readable
+    image are left blank so PDF pages keep matching `pages` by position.
+    """
+    writer = StreamingPdfWriter()
+    chunks = [writer.begin()]
+    image_urls = [page.get("photo") if original_images else (page.get("compressed_photo") or page.get("photo"))
+                  for page in pages]
+    async for image in s3.iter_files(image_urls, window=BOOK_PDF_IMAGE_WINDOW):
+        jpeg = await asyncio.to_thread(_prepare_jpeg, image) if image else None
+        chunks.append(writer.add_page(_scan_page(jpeg), images=[jpeg]) if jpeg else writer.add_page(b""))
+    chunks.append(writer.finish())
+    return b"".join(chunks)
+
+
+async def _upload_export(s3: S3Service, book_id: str, kind: str, filename: str, path: str) -> None:
+    try:
+        await s3.upload_book_export(book_id, kind, filename, path, "application/pdf")
+    except Exception as e:
+        print(f"Failed to store PDF export of book '{book_id}': {e}")
+    finally:
+        os.remove(path)
+
+
+async def _generate_and_store(book: Book, pages_repo: PageRepo, s3: S3Service, filename: str, original_images: bool) -> AsyncIterator[bytes]:
+    """ Streams the PDF to the client while spooling it to disk; a completed export
+    is uploaded to S3 afterwards so the next request for this book version is served from there.
+    Disk writes run in a thread, off the event loop.
+    """
+    spool = await asyncio.to_thread(tempfile.NamedTemporaryFile, prefix="book-export-", suffix=".pdf", delete=False)
+    completed = False
+    try:
+        async for chunk in _render_book_pdf(book, pages_repo, s3, original_images):
+            await asyncio.to_thread(spool.write, chunk)
+            yield chunk
+        completed = True
+    finally:
+        await asyncio.to_thread(spool.close)
+        if completed:
+            kind = _EXPORT_KINDS[original_images]
+            task = create_untraced_task(s3.cell.holding(_upload_export(s3, book.id, kind, filename, spool.name)))
+            _upload_tasks.add(task)
+            task.add_done_callback(_upload_tasks.discard)
+        else:
+            os.remove(spool.name)
+
+
+async def export_book_pdf_service(book_id: str,
+                                  validators: CacheValidators,
+                                  books_repo: BookRepo,
+                                  pages_repo: PageRepo,
+                                  s3: S3Service,
+                                  original_images: bool = False
+) -> StreamingResponse:
+    """ The book as a PDF: a title page, then per page the scan (with a searchable OCR layer)
+    followed by its translation. Served from S3 when this book version was exported before.
+    """
+    book_data = await books_repo.find_one({"id": book_id})
+    if not book_data:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book = Book(**book_data)
+
+    filename = _export_filename(validators)
+    headers = {"Content-Disposition": f'attachment; filename="{_download_filename(book)}"'}
+
+    kind = _EXPORT_KINDS[original_images]
+    size = await s3.get_book_export_size(book_id, kind, filename)
+    if size is not None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(s3.stream_book_export(book_id, kind, filename),
+                                 media_type="application/pdf",
+                                 headers=headers)
+
+    return StreamingResponse(_generate_and_store(book, pages_repo, s3, filename, original_images),
+                             media_type="application/pdf",
+                             headers=headers)
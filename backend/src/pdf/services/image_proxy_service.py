@@ -0,0 +1,235 @@
+import os
+import uuid
+import shutil
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from cell.services.s3_service import S3Service
+from utils.helpers import downscale_image_bytes
+
+IMAGE_PROXY_CACHE_DIR: str = os.getenv("IMAGE_PROXY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "image-proxy-cache"))
+IMAGE_PROXY_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_PROXY_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Largest single object kept in the cache; bigger ones are streamed through uncached
+IMAGE_PROXY_CACHE_MAX_OBJECT_BYTES: int = int(os.getenv("IMAGE_PROXY_CACHE_MAX_OBJECT_BYTES", 32 * 1024 * 1024))
+# Largest upstream image that is buffered for downscaling
+IMAGE_PROXY_MAX_SOURCE_BYTES: int = int(os.getenv("IMAGE_PROXY_MAX_SOURCE_BYTES", 64 * 1024 * 1024))
+IMAGE_PROXY_CHUNK_SIZE: int = 64 * 1024
+
+# Proxied S3 objects have unique (uuid) names, so browsers may keep them for a day
+_PROXY_HEADERS = {"Access-Control-Allow-Origin": "*", "Cache-Control": "private, max-age=86400"}
+
+
+@dataclass
+class _CacheEntry:
+    path: str
+    size: int
+    content_type: str
+
+
+class DiskLruCache:
+    """ Recently proxied images on local disk, evicted least-recently-used beyond `max_bytes`.
+    The index lives in memory, so every worker process uses its own directory.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = os.path.join(directory, str(os.getpid()))
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        shutil.rmtree(self.directory, ignore_errors=True)  # Leftovers of a previous process with this pid
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(url: str, width: Optional[int]) -> str:
+        return hashlib.sha256(f"{url}|{width or ''}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[_CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not os.path.exists(entry.path):
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def temp_path(self) -> str:
+        return os.path.join(self.directory, f"tmp-{uuid.uuid4().hex}")
+
+    def commit(self, key: str, temp_path: str, content_type: str) -> None:
+        """Moves a fully written temp file into the cache and evicts old entries."""
+        path = os.path.join(self.directory, key)
+        os.replace(temp_path, path)
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key).size
+        entry = _CacheEntry(path=path, size=os.path.getsize(path), content_type=content_type)
+        self._entries[key] = entry
+        self._total_bytes += entry.size
+
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+_client: Optional[httpx.AsyncClient] = None
+_cache: Optional[DiskLruCache] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Pooled client shared by all proxy requests (keep-alive connections to S3 are reused)."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=5.0),
+                                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                                    follow_redirects=False)
+    return _client
+
+
+def _get_cache() -> DiskLruCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskLruCache(IMAGE_PROXY_CACHE_DIR, IMAGE_PROXY_CACHE_MAX_BYTES)
+    return _cache
+
+
+async def close_image_proxy_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _check_allowed(url: str, s3: S3Service) -> None:
+    if not s3.owns_url(url):
+        raise HTTPException(status_code=400, detail="Only images stored for this tenant can be proxied")
+
+
+def _raise_for_upstream(resp: httpx.Response) -> None:
+    if resp.status_code in (403, 404):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if resp.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"Upstream returned {resp.status_code}")
+
+
+def _cached_response(entry: _CacheEntry) -> Response:
+    return FileResponse(entry.path, media_type=entry.content_type, headers=_PROXY_HEADERS)
+
+
+async def proxy_image(url: str, s3: S3Service, width: Optional[int] = None) -> Response:
+    """ Streams a tenant image from S3, optionally downscaled to `width`, through the disk cache. """
+    _check_allowed(url, s3)
+    cache = _get_cache()
+    key = cache.key(url, width)
+
+    entry = cache.get(key)
+    if entry is not None:
+        return _cached_response(entry)
+
+    if width:
+        return await _proxy_downscaled(url, width, key, cache)
+    return await _proxy_passthrough(url, key, cache)
+
+
+async def _proxy_passthrough(url: str, key: str, cache: DiskLruCache) -> Response:
+    client = _get_client()
+    try:
+        upstream = await client.send(client.build_request("GET", url), stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching image: {e}")
+
+    try:
+        _raise_for_upstream(upstream)
+    except HTTPException:
+        await upstream.aclose()
+        raise
+
+    content_type = upstream.headers.get("content-type", "image/jpeg")
+    content_length = int(upstream.headers.get("content-length", 0)) or None
+    cacheable = content_length is not None and content_length <= IMAGE_PROXY_CACHE_MAX_OBJECT_BYTES
+
+    async def body() -> AsyncIterator[bytes]:
+        temp_path = cache.temp_path() if cacheable else None
+        temp_file = open(temp_path, "wb") if temp_path else None
+        written = 0
+        try:
+            async for chunk in upstream.aiter_raw(IMAGE_PROXY_CHUNK_SIZE):
+                if temp_file:
+                    temp_file.write(chunk)
+                written += len(chunk)
+                yield chunk
+            if temp_file:
+                temp_file.close()
+                temp_file = None
+                if written == content_length:
+                    cache.commit(key, temp_path, content_type)
+                    temp_path = None
+        finally:
+            await upstream.aclose()
+            if temp_file:
+                temp_file.close()
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    headers = dict(_PROXY_HEADERS)
+    if content_length is not None and "content-encoding" not in upstream.headers:
+        headers["Content-Length"] = str(content_length)
+    return StreamingResponse(body(), media_type=content_type, headers=headers)
+
+
+async def _proxy_downscaled(url: str, width: int, key: str, cache: DiskLruCache) -> Response:
+    client = _get_client()
+    try:
+        async with client.stream("GET", url) as upstream:
+            _raise_for_upstream(upstream)
+            buffer = bytearray()
+            async for chunk in upstream.aiter_bytes(IMAGE_PROXY_CHUNK_SIZE):
+                buffer.extend(chunk)
+                if len(buffer) > IMAGE_PROXY_MAX_SOURCE_BYTES:
+                    raise HTTPException(status_code=413, detail="Image too large to resize")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching image: {e}")
+
+    try:
+        resized = await asyncio.to_thread(downscale_image_bytes, bytes(buffer), width)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not resize image: {e}")
+
+    data = resized.getvalue()
+    temp_path = cache.temp_path()
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    cache.commit(key, temp_path, "image/jpeg")
+    return Response(content=data, media_type="image/jpeg", headers=_PROXY_HEADERS)
+
+
+async def head_image(url: str, s3: S3Service) -> Response:
+    _check_allowed(url, s3)
+    entry = _get_cache().get(DiskLruCache.key(url, None))
+    if entry is not None:
+        return Response(status_code=200, media_type=entry.content_type,
+                        headers={**_PROXY_HEADERS, "Content-Length": str(entry.size)})
+
+    try:
+        resp = await _get_client().head(url)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching image: {e}")
+    _raise_for_upstream(resp)
+    return Response(status_code=200,
+                    media_type=resp.headers.get("content-type", "image/jpeg"),
+                    headers=_PROXY_HEADERS)
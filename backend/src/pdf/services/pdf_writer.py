@@ -0,0 +1,178 @@
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# A4 in points
+PAGE_WIDTH: float = 595.0
+PAGE_HEIGHT: float = 842.0
+MARGIN: float = 50.0
+
+# Helvetica glyph widths (1/1000 em) for ASCII 32..126, from the standard 14 font metrics
+_HELVETICA_WIDTHS: List[int] = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_DEFAULT_WIDTH: int = 556
+
+_MARKDOWN_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_MARKDOWN_EMPHASIS = re.compile(r"(\*\*|__|\*|`)")
+_MARKDOWN_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+")
+
+
+def text_width(text: str, font_size: float) -> float:
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += _HELVETICA_WIDTHS[code - 32] if 32 <= code <= 126 else _DEFAULT_WIDTH
+    return total * font_size / 1000
+
+
+def wrap_text(text: str, font_size: float, max_width: float) -> List[str]:
+    """Greedy word wrap; blank lines are kept as paragraph breaks."""
+    lines: List[str] = []
+    for paragraph in text.splitlines():
+        words = paragraph.split()
+        if not words:
+            lines.append("")
+            continue
+        line = ""
+        for word in words:
+            candidate = f"{line} {word}" if line else word
+            if text_width(candidate, font_size) <= max_width or not line:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+
+def markdown_to_plain(text: str) -> str:
+    """Drops the markdown the OCR/translation prompts produce (headings, emphasis, inline images)."""
+    lines = []
+    for line in text.splitlines():
+        line = _MARKDOWN_IMAGE.sub("", line)
+        line = _MARKDOWN_HEADING.sub("", line)
+        lines.append(_MARKDOWN_EMPHASIS.sub("", line))
+    return "\n".join(lines)
+
+
+def _pdf_string(text: str) -> bytes:
+    """PDF literal string in WinAnsiEncoding; characters outside it become '?'."""
+    encoded = text.encode("cp1252", errors="replace")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class StreamingPdfWriter:
+    """ Writes a PDF incrementally: every method returns the bytes to send next, so a document
+    of any length is produced with only the current page in memory. Object offsets are tracked
+    as bytes are handed out, and the page tree, catalog and xref table are written by `finish`.
+
+    Text uses the standard Helvetica font (no embedding), so only WinAnsi characters render.
+    """
+    _CATALOG = 1
+    _PAGES = 2
+    _FONT = 3
+    _INFO = 4
+
+    def __init__(self, title: str = "", author: str = ""):
+        self._offset = 0
+        self._offsets: Dict[int, int] = {}
+        self._next_object = 5
+        self._page_objects: List[int] = []
+        self._title = title
+        self._author = author
+
+    def _emit(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return data
+
+    def _object(self, number: int, body: bytes, stream: Optional[bytes] = None) -> bytes:
+        self._offsets[number] = self._offset
+        parts = [f"{number} 0 obj\n".encode(), body]
+        if stream is not None:
+            parts += [b"\nstream\n", stream, b"\nendstream"]
+        parts.append(b"\nendobj\n")
+        return self._emit(b"".join(parts))
+
+    def _allocate(self) -> int:
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def begin(self) -> bytes:
+        header = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        font = self._object(self._FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        info = self._object(self._INFO, b"<< /Producer (Source Library) /Title " + _pdf_string(self._title)
+                            + b" /Author " + _pdf_string(self._author) + b" >>")
+        return header + font + info
+
+    def add_page(self, content: bytes, images: Optional[List[Tuple[bytes, int, int, int]]] = None) -> bytes:
+        """ Adds a page drawing `content` (a content stream). `images` are JPEGs as
+        `(data, width, height, components)`, available to the content stream as /Im0, /Im1...
+        """
+        chunks: List[bytes] = []
+        xobjects = []
+        for index, (data, width, height, components) in enumerate(images or []):
+            number = self._allocate()
+            colorspace = b"/DeviceGray" if components == 1 else b"/DeviceRGB"
+            chunks.append(self._object(number,
+                                       b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+                                       b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+                                       % (width, height, colorspace, len(data)),
+                                       data))
+            xobjects.append(b"/Im%d %d 0 R" % (index, number))
+
+        compressed = zlib.compress(content)
+        content_number = self._allocate()
+        chunks.append(self._object(content_number,
+                                   b"<< /Filter /FlateDecode /Length %d >>" % len(compressed),
+                                   compressed))
+
+        page_number = self._allocate()
+        resources = b"<< /Font << /F1 %d 0 R >>" % self._FONT
+        if xobjects:
+            resources += b" /XObject << " + b" ".join(xobjects) + b" >>"
+        resources += b" >>"
+        chunks.append(self._object(page_number,
+                                   b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %g %g] /Resources %s /Contents %d 0 R >>"
+                                   % (self._PAGES, PAGE_WIDTH, PAGE_HEIGHT, resources, content_number)))
+        self._page_objects.append(page_number)
+        return b"".join(chunks)
+
+    def finish(self) -> bytes:
+        kids = b" ".join(b"%d 0 R" % number for number in self._page_objects)
+        chunks = [
+            self._object(self._PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_objects))),
+            self._object(self._CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % self._PAGES),
+        ]
+
+        xref_offset = self._offset
+        xref = [b"xref\n0 %d\n" % self._next_object, b"0000000000 65535 f \n"]
+        for number in range(1, self._next_object):
+            xref.append(b"%010d 00000 n \n" % self._offsets[number])
+        xref.append(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (self._next_object, self._CATALOG, self._INFO, xref_offset))
+        chunks.append(self._emit(b"".join(xref)))
+        return b"".join(chunks)
+
+
+def text_content(lines: List[str], x: float, y: float, font_size: float, leading: float, invisible: bool = False) -> bytes:
+    """Content stream drawing `lines` top-down from (x, y); invisible text is selectable and searchable only."""
+    if not lines:
+        return b""
+    ops = [b"BT", b"/F1 %g Tf" % font_size, b"%g TL" % leading, b"%g %g Td" % (x, y)]
+    if invisible:
+        ops.append(b"3 Tr")
+    for line in lines:
+        ops.append(_pdf_string(line) + b" '")
+    ops.append(b"ET")
+    return b"\n".join(ops) + b"\n"
+
+
+def image_content(index: int, x: float, y: float, width: float, height: float) -> bytes:
+    return b"q %g 0 0 %g %g %g cm /Im%d Do Q\n" % (width, height, x, y, index)
@@ -0,0 +1,20 @@
+import os
+import hmac
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from telemetry.services.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+
+router = APIRouter()
+
+# Optional shared secret for scrapers; when unset the endpoint is open (restrict it at the network level)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint for this worker's metrics."""
+    if METRICS_TOKEN:
+        auth_header = request.headers.get("authorization", "")
+        if not hmac.compare_digest(auth_header, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+    return Response(content=REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
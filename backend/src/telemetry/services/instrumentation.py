@@ -0,0 +1,124 @@
+import time
+import functools
+from typing import Any, Optional
+
+from telemetry.services.metrics import Histogram, AI_REQUEST_LATENCY, AI_TOKENS
+from telemetry.services.tracing import Span, get_current_span, span
+
+
+class _Instrumented:
+    __slots__ = ("_histogram", "_labels", "_span_scope", "_start", "span")
+
+    def __init__(self, span_name: str, histogram: Histogram, **labels):
+        self._histogram = histogram
+        self._labels = labels
+        self._span_scope = span(span_name, **labels)
+        self._start = 0.0
+        self.span: Optional[Span] = None
+
+    def __enter__(self) -> "_Instrumented":
+        self.span = self._span_scope.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+        return self._span_scope.__exit__(exc_type, exc, tb)
+
+
+class _InstrumentedAiCall:
+    __slots__ = ("_labels", "_span_scope", "_start")
+
+    def __init__(self, provider: str, model: str, operation: str):
+        self._labels = {"provider": provider, "model": model, "operation": operation}
+        self._span_scope = span(f"ai.{provider}.{operation}", **self._labels)
+        self._start = 0.0
+
+    def __enter__(self) -> "_InstrumentedAiCall":
+        self._span_scope.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        outcome = "ok" if exc_type is None else "error"
+        AI_REQUEST_LATENCY.observe(time.perf_counter() - self._start, outcome=outcome, **self._labels)
+        return self._span_scope.__exit__(exc_type, exc, tb)
+
+
+def instrument(span_name: str, histogram: Histogram, **labels) -> _Instrumented:
+    """ Times a block into `histogram` and, inside a traced request, records it as a child span.
+
+    >Example: `with instrument("s3.upload", S3_OPERATION_LATENCY, operation="upload"): ...`
+    """
+    return _Instrumented(span_name, histogram, **labels)
+
+
+def instrument_ai_call(provider: str, model: str, operation: str) -> _InstrumentedAiCall:
+    """Times an AI provider call by provider/model/operation, labelling it with the outcome (ok/error)."""
+    return _InstrumentedAiCall(provider, model, operation)
+
+
+def record_ai_tokens(provider: str,
+                     model: str,
+                     prompt_tokens: Optional[int],
+                     completion_tokens: Optional[int],
+                     cached_tokens: Optional[int] = None) -> None:
+    """ Counts provider-reported tokens and attaches them to the current span.
+    `cached_tokens` is the part of the prompt served from the provider's context cache (billed at a discount).
+    """
+    if prompt_tokens:
+        AI_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind="prompt")
+    if completion_tokens:
+        AI_TOKENS.inc(completion_tokens, provider=provider, model=model, kind="completion")
+    if cached_tokens:
+        AI_TOKENS.inc(cached_tokens, provider=provider, model=model, kind="cached")
+
+    current = get_current_span()
+    if current is not None:
+        current.set_attribute("prompt_tokens", prompt_tokens or 0)
+        current.set_attribute("completion_tokens", completion_tokens or 0)
+        if cached_tokens:
+            current.set_attribute("cached_tokens", cached_tokens)
+
+
+class TimedCursor:
+    """ Wraps a Motor cursor so the time spent awaiting results is recorded in a histogram
+    (and as a span when traced). Chained calls (`sort`, `limit`, `skip`, ...) keep returning the wrapper.
+    """
+    def __init__(self, cursor: Any, span_name: str, histogram: Histogram, **labels):
+        self._cursor = cursor
+        self._span_name = span_name
+        self._histogram = histogram
+        self._labels = labels
+        self._elapsed = 0.0
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return call
+
+    async def to_list(self, *args, **kwargs) -> list:
+        with instrument(self._span_name, self._histogram, **self._labels) as timer:
+            documents = await self._cursor.to_list(*args, **kwargs)
+            if timer.span is not None:
+                timer.span.set_attribute("documents", len(documents))
+            return documents
+
+    def __aiter__(self) -> "TimedCursor":
+        return self
+
+    async def __anext__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return await self._cursor.__anext__()
+        except StopAsyncIteration:
+            self._histogram.observe(self._elapsed + time.perf_counter() - start, **self._labels)
+            raise
+        finally:
+            self._elapsed += time.perf_counter() - start
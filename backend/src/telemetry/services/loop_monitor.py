@@ -0,0 +1,43 @@
+import os
+import time
+import asyncio
+from typing import Optional
+
+from telemetry.services.metrics import EVENT_LOOP_LAG
+from telemetry.services.loop_watchdog import watchdog
+
+# Also the watchdog heartbeat, so keep it well below LOOP_BLOCK_THRESHOLD_SECONDS for timely detection
+LOOP_MONITOR_INTERVAL_SECONDS: float = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", 0.05))
+LOOP_WATCHDOG_ENABLED: bool = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+
+_monitor_task: Optional[asyncio.Task] = None
+
+
+async def _measure_loop_lag(interval: float) -> None:
+    while True:
+        scheduled = time.perf_counter()
+        watchdog.beat(interval)
+        await asyncio.sleep(interval)
+        lag = time.perf_counter() - scheduled - interval
+        EVENT_LOOP_LAG.set(max(0.0, lag))
+
+
+def start_loop_monitor(interval: float = LOOP_MONITOR_INTERVAL_SECONDS) -> None:
+    """Starts a background task that keeps the event loop lag gauge up to date, plus the blocking watchdog."""
+    global _monitor_task
+    if _monitor_task is None or _monitor_task.done():
+        _monitor_task = asyncio.create_task(_measure_loop_lag(interval))
+        if LOOP_WATCHDOG_ENABLED:
+            watchdog.start()
+
+
+async def stop_loop_monitor() -> None:
+    global _monitor_task
+    watchdog.stop()
+    if _monitor_task:
+        _monitor_task.cancel()
+        try:
+            await _monitor_task
+        except asyncio.CancelledError:
+            pass
+        _monitor_task = None
@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+import threading
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from telemetry.services.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_BLOCK_DURATION
+
+# The loop counts as blocked when a heartbeat is this much later than scheduled
+LOOP_BLOCK_THRESHOLD_SECONDS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", 0.1))
+# How often the watchdog thread checks the heartbeat and, while blocked, samples the loop thread's stack
+LOOP_WATCHDOG_SAMPLE_SECONDS: float = float(os.getenv("LOOP_WATCHDOG_SAMPLE_SECONDS", 0.02))
+LOOP_WATCHDOG_MAX_LOCATIONS: int = int(os.getenv("LOOP_WATCHDOG_MAX_LOCATIONS", 500))
+
+_MAX_STACK_DEPTH: int = 20
+# Frames from these directories are skipped when attributing a block to application code
+_LIBRARY_PATH_MARKERS = ("site-packages", "dist-packages", os.path.dirname(os.__file__))
+
+
+@dataclass
+class BlockingLocation:
+    """Aggregated stack samples taken while the event loop was blocked, keyed by the innermost app frame."""
+    location: str
+    samples: int = 0
+    blocks: int = 0
+    max_block_seconds: float = 0.0
+    last_seen: float = 0.0
+    example_stack: List[str] = field(default_factory=list)
+
+    def to_dict(self, sample_interval: float) -> Dict:
+        return {
+            "location": self.location,
+            "samples": self.samples,
+            "blocks": self.blocks,
+            "estimated_blocked_seconds": round(self.samples * sample_interval, 3),
+            "max_block_seconds": round(self.max_block_seconds, 3),
+            "last_seen": self.last_seen,
+            "example_stack": self.example_stack,
+        }
+
+
+class LoopWatchdog:
+    """ Detects callbacks that block the event loop.
+
+    The loop side calls `beat(expected_interval)` from the loop monitor task. A daemon thread checks how
+    overdue the next beat is; past `threshold` it samples the loop thread's stack with `sys._current_frames()`
+    until the loop recovers, then attributes the block to the code locations seen in the samples.
+    """
+    def __init__(self,
+                 threshold: float = LOOP_BLOCK_THRESHOLD_SECONDS,
+                 sample_interval: float = LOOP_WATCHDOG_SAMPLE_SECONDS,
+                 max_locations: int = LOOP_WATCHDOG_MAX_LOCATIONS):
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.max_locations = max_locations
+
+        self._loop_thread_id: Optional[int] = None
+        self._next_beat_due: float = 0.0
+        self._lock = threading.Lock()
+        self._locations: Dict[str, BlockingLocation] = {}
+        self._total_blocks = 0
+        self._total_blocked_seconds = 0.0
+        self._started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ----- loop side -----
+
+    def start(self) -> None:
+        """Must be called from the event loop thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._next_beat_due = time.monotonic() + 1.0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def beat(self, expected_interval: float) -> None:
+        """Records that the loop is responsive and when the next heartbeat should arrive."""
+        self._next_beat_due = time.monotonic() + expected_interval
+
+    # ----- watchdog thread -----
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            overdue = time.monotonic() - self._next_beat_due
+            if overdue > self.threshold:
+                self._record_block(overdue)
+
+    def _record_block(self, overdue: float) -> None:
+        block_start = time.monotonic() - overdue
+        samples: Dict[str, int] = {}
+        stacks: Dict[str, List[str]] = {}
+        due = self._next_beat_due
+
+        # Keep sampling until the loop beats again (or we are asked to stop)
+        while self._next_beat_due == due and not self._stop.is_set():
+            stack = self._sample_loop_stack()
+            if stack:
+                location = self._attribute(stack)
+                samples[location] = samples.get(location, 0) + 1
+                stacks[location] = [f"{f.filename}:{f.lineno} in {f.name}" for f in stack[-_MAX_STACK_DEPTH:]]
+            self._stop.wait(self.sample_interval)
+
+        duration = time.monotonic() - block_start
+        EVENT_LOOP_BLOCKS.inc()
+        EVENT_LOOP_BLOCK_DURATION.observe(duration)
+
+        culprit = max(samples, key=samples.get) if samples else "unknown"
+        print(f"Event loop blocked for {duration:.3f}s, mostly in {culprit}")
+
+        now = time.time()
+        with self._lock:
+            self._total_blocks += 1
+            self._total_blocked_seconds += duration
+            for location, count in samples.items():
+                entry = self._locations.get(location)
+                if entry is None:
+                    if len(self._locations) >= self.max_locations:
+                        self._evict_smallest()
+                    entry = self._locations[location] = BlockingLocation(location=location)
+                entry.samples += count
+                entry.blocks += 1
+                entry.max_block_seconds = max(entry.max_block_seconds, duration)
+                entry.last_seen = now
+                entry.example_stack = stacks[location]
+
+    def _sample_loop_stack(self) -> Optional[List[traceback.FrameSummary]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        return traceback.extract_stack(frame)
+
+    @staticmethod
+    def _attribute(stack: List[traceback.FrameSummary]) -> str:
+        """Innermost frame in application code, falling back to the innermost frame."""
+        for frame in reversed(stack):
+            if not any(marker in frame.filename for marker in _LIBRARY_PATH_MARKERS):
+                return f"{frame.filename}:{frame.lineno} in {frame.name}"
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} in {frame.name}"
+
+    def _evict_smallest(self) -> None:
+        smallest = min(self._locations.values(), key=lambda entry: entry.samples)
+        del self._locations[smallest.location]
+
+    # ----- report -----
+
+    def report(self, limit: int = 50) -> Dict:
+        with self._lock:
+            locations = sorted(self._locations.values(), key=lambda entry: entry.samples, reverse=True)[:limit]
+            return {
+                "pid": os.getpid(),
+                "since": self._started_at,
+                "threshold_seconds": self.threshold,
+                "sample_interval_seconds": self.sample_interval,
+                "total_blocks": self._total_blocks,
+                "total_blocked_seconds": round(self._total_blocked_seconds, 3),
+                "locations": [entry.to_dict(self.sample_interval) for entry in locations],
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._locations.clear()
+            self._total_blocks = 0
+            self._total_blocked_seconds = 0.0
+            self._started_at = time.time()
+
+
+watchdog = LoopWatchdog()
@@ -0,0 +1,320 @@
+import time
+import bisect
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+_LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SLOW_LATENCY_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """ Holds the metrics of this worker process and renders them in the Prometheus text format.
+    Every uvicorn worker has its own registry, so each worker is scraped separately.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric") -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional["_Metric"]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type_name: str = "untyped"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 registry: Optional[MetricsRegistry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()  # Observations may come from worker threads (asyncio.to_thread)
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = _LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the wall-clock duration of the block, including when it raises."""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        lines: List[str] = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self._histogram = histogram
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self._histogram.observe(time.perf_counter() - self._start, **self._labels)
+        return False
+
+
+# ---------- Application metrics ----------
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+
+DB_OPERATION_LATENCY = Histogram(
+    "db_operation_duration_seconds",
+    "MongoDB operation latency by collection and operation.",
+    ("collection", "operation"),
+)
+
+S3_OPERATION_LATENCY = Histogram(
+    "s3_operation_duration_seconds",
+    "S3 operation latency by operation.",
+    ("operation",),
+    buckets=_SLOW_LATENCY_BUCKETS,
+)
+
+S3_GC_RECLAIMED_BYTES = Counter(
+    "s3_gc_reclaimed_bytes_total",
+    "Bytes of orphaned S3 objects deleted by storage garbage collection, by tenant.",
+    ("tenant",),
+)
+
+AI_REQUEST_LATENCY = Histogram(
+    "ai_request_duration_seconds",
+    "AI provider call latency by provider, model, operation and outcome.",
+    ("provider", "model", "operation", "outcome"),
+    buckets=_SLOW_LATENCY_BUCKETS,
+)
+
+AI_TOKENS = Counter(
+    "ai_tokens_total",
+    "Tokens reported by AI providers, by provider, model and kind (prompt/completion/cached, cached being part of prompt).",
+    ("provider", "model", "kind"),
+)
+
+AI_CIRCUIT_STATE = Gauge(
+    "ai_circuit_state",
+    "Circuit breaker state of an AI provider: 0 closed, 1 half-open, 2 open.",
+    ("provider",),
+)
+
+AI_CIRCUIT_TRANSITIONS = Counter(
+    "ai_circuit_transitions_total",
+    "AI provider circuit breaker transitions, by the state entered.",
+    ("provider", "state"),
+)
+
+AI_FAILOVERS = Counter(
+    "ai_failovers_total",
+    "Requests served by another AI provider because the requested one's circuit was open.",
+    ("requested", "served"),
+)
+
+AI_KEY_REQUESTS = Counter(
+    "ai_key_requests_total",
+    "AI provider calls per API key of a pool, by outcome (ok or the error kind).",
+    ("provider", "key", "outcome"),
+)
+
+AI_KEY_IN_FLIGHT = Gauge(
+    "ai_key_in_flight",
+    "AI provider calls in flight per API key.",
+    ("provider", "key"),
+)
+
+AI_KEY_QUARANTINES = Counter(
+    "ai_key_quarantines_total",
+    "Times an API key was taken out of its pool for a while, by reason (rate_limited/auth).",
+    ("provider", "key", "reason"),
+)
+
+AI_HEDGES = Counter(
+    "ai_hedges_total",
+    "Hedged AI calls by provider of the duplicate, operation and outcome (sent/won/lost/skipped).",
+    ("provider", "operation", "outcome"),
+)
+
+SINGLE_FLIGHT_COALESCED = Counter(
+    "single_flight_coalesced_total",
+    "Duplicate OCR/translation requests answered by a call already in flight, on this worker (local) or another (remote).",
+    ("operation", "scope"),
+)
+
+TM_SEGMENTS = Counter(
+    "translation_memory_segments_total",
+    "Sentences looked up in the translation memory, by result (exact/fuzzy/miss).",
+    ("result",),
+)
+
+TM_TOKENS_SAVED = Counter(
+    "translation_memory_tokens_saved_total",
+    "Estimated AI tokens not spent thanks to translations served from the translation memory.",
+)
+
+IMAGE_PROCESSING_LATENCY = Histogram(
+    "image_processing_duration_seconds",
+    "Image decode/resize/encode latency by operation.",
+    ("operation",),
+)
+
+EVENT_LOOP_LAG = Gauge(
+    "event_loop_lag_seconds",
+    "Delay between when the loop monitor was scheduled to wake and when it actually ran.",
+)
+
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total",
+    "Times the event loop was blocked for longer than LOOP_BLOCK_THRESHOLD_SECONDS.",
+)
+
+EVENT_LOOP_BLOCK_DURATION = Histogram(
+    "event_loop_block_duration_seconds",
+    "Duration of detected event loop blocks.",
+    buckets=_SLOW_LATENCY_BUCKETS,
+)
+
+CELL_HEALTHY = Gauge(
+    "cell_healthy",
+    "1 if the cell's MongoDB answered the last health check, 0 otherwise.",
+    ("cell",),
+)
+
+CELLS_OPEN = Gauge(
+    "cells_open",
+    "Cells with open MongoDB/S3 connections in this worker.",
+)
@@ -0,0 +1,309 @@
+import os
+import time
+import random
+import asyncio
+import secrets
+from abc import ABC, abstractmethod
+from collections import deque
+from contextvars import ContextVar, Token, copy_context
+from dataclasses import dataclass, field
+from typing import Any, Coroutine, Deque, Dict, List, Optional, Tuple, TypeVar
+import httpx
+
+TRACE_ID_HEADER: str = "X-Trace-Id"
+TRACEPARENT_HEADER: str = "traceparent"
+
+# Fraction of requests traced when the caller did not ask for timing explicitly; none unless traces are exported
+TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", 1.0 if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else 0.0))
+SERVICE_NAME: str = os.getenv("OTEL_SERVICE_NAME", "book-translation-api")
+
+
+@dataclass
+class Span:
+    """ A timed operation within a trace. Root spans are created per request by the
+    context middleware; children are opened by repositories, S3, AI clients and image helpers.
+    """
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    parent_id: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    error: Optional[str] = None
+    children: List["Span"] = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def iter_spans(self):
+        yield self
+        for child in self.children:
+            yield from child.iter_spans()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span tree as plain data, e.g. for `?debug_timing=1` responses.
+        `offset_ms` is relative to the start of this span."""
+        return self._to_dict(self.start_ns)
+
+    def _to_dict(self, root_start_ns: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "offset_ms": round((self.start_ns - root_start_ns) / 1_000_000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+        if self.error:
+            data["error"] = self.error
+        data["children"] = [child._to_dict(root_start_ns) for child in self.children]
+        return data
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def get_current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+class _SpanScope:
+    """Context manager that opens a child of the current span, or does nothing outside a trace."""
+    __slots__ = ("_name", "_attributes", "_span", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self._name = name
+        self._attributes = attributes
+        self._span: Optional[Span] = None
+        self._token = None
+
+    def __enter__(self) -> Optional[Span]:
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        self._span = Span(name=self._name,
+                          trace_id=parent.trace_id,
+                          parent_id=parent.span_id,
+                          attributes=self._attributes)
+        parent.children.append(self._span)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if self._span is not None:
+            if exc is not None:
+                self._span.error = f"{exc_type.__name__}: {exc}"
+            self._span.end()
+            _current_span.reset(self._token)
+        return False
+
+
+def span(name: str, **attributes) -> _SpanScope:
+    """Opens a child span of the current request's span: `with span("s3.upload", key=key): ...`"""
+    return _SpanScope(name, attributes)
+
+
+def _parse_traceparent(header: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """Extracts (trace_id, parent_span_id) from a W3C `traceparent` header."""
+    if not header:
+        return None, None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+def start_trace(name: str,
+                traceparent: Optional[str] = None,
+                force: bool = False,
+                **attributes
+) -> Tuple[Optional[Span], Optional[Token]]:
+    """ Creates a root span and makes it current. Returns it with the token to pass to `detach_trace`
+    once the request is done, or (None, None) when the request is not sampled.
+    """
+    trace_id, parent_id = _parse_traceparent(traceparent)
+    if not force and trace_id is None and random.random() >= TRACE_SAMPLE_RATE:
+        return None, None
+
+    root = Span(name=name,
+                trace_id=trace_id or secrets.token_hex(16),
+                parent_id=parent_id,
+                attributes=attributes)
+    return root, _current_span.set(root)
+
+
+def detach_trace(token: Optional[Token]) -> None:
+    """Makes the span that was current before `start_trace` current again."""
+    if token is not None:
+        _current_span.reset(token)
+
+
+T = TypeVar("T")
+
+def create_untraced_task(coro: Coroutine[Any, Any, T]) -> "asyncio.Task[T]":
+    """ Starts a task outside of the current trace, for work that may outlive the request starting it
+    (jobs, uploads, cache refreshes): its spans would otherwise be added to a root already exported.
+    Other context variables are inherited as usual.
+    """
+    context = copy_context()
+    context.run(_current_span.set, None)
+    return asyncio.get_running_loop().create_task(coro, context=context)
+
+
+def finish_trace(root: Span) -> None:
+    """Ends the root span and hands the finished tree to the exporters."""
+    root.end()
+    for exporter in _exporters:
+        try:
+            exporter.export(root)
+        except Exception as e:
+            print(f"Failed to export trace {root.trace_id}: {e}")
+
+
+# ---------- Exporters ----------
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, root: Span) -> None:
+        """Receives a finished trace. Must not block the event loop."""
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps the most recent traces in memory; used in tests and for local debugging."""
+    def __init__(self, max_traces: int = 1000):
+        self._traces: Deque[Span] = deque(maxlen=max_traces)
+
+    def export(self, root: Span) -> None:
+        self._traces.append(root)
+
+    def get_traces(self) -> List[Span]:
+        return list(self._traces)
+
+    def get_trace(self, trace_id: str) -> Optional[Span]:
+        return next((root for root in reversed(self._traces) if root.trace_id == trace_id), None)
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """ Sends spans to an OpenTelemetry collector using OTLP/HTTP with the JSON encoding.
+    Spans are buffered and posted from a background task every `flush_interval` seconds.
+    """
+    def __init__(self,
+                 endpoint: str,
+                 headers: Optional[Dict[str, str]] = None,
+                 flush_interval: float = 5.0,
+                 max_buffered_spans: int = 10_000):
+        self._url = endpoint.rstrip("/") + "/v1/traces"
+        self._headers = headers or {}
+        self._flush_interval = flush_interval
+        self._buffer: Deque[Span] = deque(maxlen=max_buffered_spans)  # Oldest spans are dropped when the collector is down
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def export(self, root: Span) -> None:
+        self._buffer.extend(root.iter_spans())
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+            except RuntimeError:
+                pass  # No running loop; spans are flushed on shutdown
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        spans = list(self._buffer)
+        self._buffer.clear()
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10.0)
+        try:
+            response = await self._client.post(self._url, json=self._to_otlp(spans), headers=self._headers)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Failed to export {len(spans)} spans to {self._url}: {e}")
+
+    async def shutdown(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._client:
+            await self._client.aclose()
+
+    @staticmethod
+    def _to_otlp(spans: List[Span]) -> Dict[str, Any]:
+        def attribute(key: str, value: Any) -> Dict[str, Any]:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        otlp_spans = []
+        for s in spans:
+            otlp_span: Dict[str, Any] = {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,  # SERVER for roots, INTERNAL otherwise
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [attribute(k, v) for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            otlp_spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "sourcelibrary"}, "spans": otlp_spans}],
+            }]
+        }
+
+
+_exporters: List[SpanExporter] = []
+
+def add_span_exporter(exporter: SpanExporter) -> None:
+    _exporters.append(exporter)
+
+def remove_span_exporter(exporter: SpanExporter) -> None:
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+def configure_exporters_from_env() -> None:
+    """Registers the OTLP exporter when `OTEL_EXPORTER_OTLP_ENDPOINT` is set."""
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+    if endpoint:
+        add_span_exporter(OtlpHttpSpanExporter(endpoint))
+
+async def shutdown_exporters() -> None:
+    for exporter in list(_exporters):
+        await exporter.shutdown()
+        remove_span_exporter(exporter)
@@ -1,10 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional
 
-from cell.models.cell_registry import CellID
+from cell.models.cell_registry import CELL_REGISTRY
 from core.models.primitives_model import EntityStatus
 from tenant.models.tenant_model import TenantBranding, PlanName, TenantRolePermissions
 
+def _registered_cell(cell_id: str) -> str:
+    if cell_id not in CELL_REGISTRY:
+        raise ValueError(f"Unknown cell '{cell_id}'")
+    return cell_id
+
 class TenantSummary(BaseModel):
     """ Summary model for tenant listing.
     
@@ -34,10 +39,15 @@ class TenantCreate(BaseModel):
     """
     name: str
     slug: str
-    cell_id: CellID
+    cell_id: str
     plan: PlanName
     branding_config: Optional[TenantBranding] = None
 
+    @field_validator("cell_id")
+    @classmethod
+    def validate_cell(cls, value):
+        return _registered_cell(value)
+
 class TenantUpdate(BaseModel):
     """ Model for updating an existing tenant by SUPERADMIN users.
     
@@ -51,10 +61,15 @@ class TenantUpdate(BaseModel):
     tenant_id: str
     name: Optional[str] = None
     slug: Optional[str] = None
-    cell_id: Optional[CellID] = None
+    cell_id: Optional[str] = None
     status: Optional[EntityStatus] = None
     plan: Optional[PlanName] = None
 
+    @field_validator("cell_id")
+    @classmethod
+    def validate_cell(cls, value):
+        return _registered_cell(value) if value is not None else value
+
 class TenantSettings(BaseModel):
     """ Model for updating an existing tenant with admin rights.
     
@@ -58,7 +58,7 @@ class Tenant(BaseModel):
     external_sys_id: Optional[str] = None # Eg, Memorix identifier
     name: str # Eg, "Ritman Library"
     slug: str # Eg, "rit"    
-    cell_id: CellID = CellID.CELL_DEFAULT
+    cell_id: str = CellID.CELL_DEFAULT
     status: EntityStatus = EntityStatus.ACTIVE
     plan: PlanName = PlanName.BASIC
     branding_config: TenantBranding = Field(default_factory=TenantBranding)
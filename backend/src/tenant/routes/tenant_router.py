@@ -5,6 +5,15 @@ from motor.motor_asyncio import AsyncIOMotorCollection
 from tenant.tenant_repo import get_tenant_repo
 from book.book_repo import BookRepo, get_books_repo
 from page.page_repo import PageRepo, get_pages_repo
+from jobs.job_repo import JobRepo, get_jobs_repo
+from jobs.flight_repo import FlightRepo, get_flights_repo
+from translation_memory.translation_memory_repo import (
+    TranslationMemoryRepo,
+    TranslationMemoryStatsRepo,
+    get_translation_memory_repo,
+    get_translation_memory_stats_repo
+)
+from jobs.models.job_model import Job
 from core.dependency import s3_service_dependency, request_context_dependency
 
 from tenant.models.tenant_model import Tenant, TenantBranding
@@ -85,21 +94,35 @@ async def update_tenant(data: TenantUpdate,
     return await update_tenant_service(data, tenant_repo)
 
 
-@router.delete("/{tenant_id}", dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.DELETE))])
+@router.delete("/{tenant_id}",
+               status_code=202,
+               response_model=Job,
+               dependencies=[Depends(need_permission(ResourceType.TENANT, ActionType.DELETE))])
 async def delete_tenant(tenant_id: str,
                         expected_tenant_name: str,
                         tenant_repo: tenant_repo_dep,
                         s3: s3_service_dependency,
+                        req_ctx: request_context_dependency,
                         book_repo: BookRepo = Depends(get_books_repo),
                         page_repo: PageRepo = Depends(get_pages_repo),
-                       ) -> str:
-    await delete_tenant_and_collection_service(
+                        tm_repo: TranslationMemoryRepo = Depends(get_translation_memory_repo),
+                        tm_stats_repo: TranslationMemoryStatsRepo = Depends(get_translation_memory_stats_repo),
+                        flights_repo: FlightRepo = Depends(get_flights_repo),
+                        jobs_repo: JobRepo = Depends(get_jobs_repo),
+                        concurrent: bool = True
+                       ) -> Job:
+    """Starts deleting the tenant and its data; poll `/jobs/{id}` for progress."""
+    return await delete_tenant_and_collection_service(
         tenant_id=tenant_id,
         expected_tenant_name=expected_tenant_name,
         tenant_repo=tenant_repo,
         book_repo=book_repo,
         page_repo=page_repo,
-        s3=s3
+        tm_repo=tm_repo,
+        tm_stats_repo=tm_stats_repo,
+        flights_repo=flights_repo,
+        s3=s3,
+        jobs_repo=jobs_repo,
+        created_by=req_ctx.user_id,
+        concurrent=concurrent
     )
-
-    return f"Tenant {tenant_id} and its collections have been deleted successfully."
\ No newline at end of file
@@ -0,0 +1,170 @@
+import os
+import re
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from content.content_request_repo import EditRequestRepo
+from cell.services.s3_service import S3Service, ObjectDeletion
+from jobs.services.job_runner import JobProgress
+from telemetry.services.metrics import S3_GC_RECLAIMED_BYTES
+
+# Objects younger than this are never collected: their document may not be saved yet
+S3_GC_GRACE_HOURS: float = float(os.getenv("S3_GC_GRACE_HOURS", 24))
+
+_URL = re.compile(r"https://[^\s()<>\"'\[\]]+")
+_BOOK_KEY = re.compile(r"^tenants/[^/]+/books/(?P<book_id>[^/]+)/(?P<rest>.*)$")
+_DELETE_BATCH = 1000
+# Margin for the clocks of the workers stamping `updated_at`, when re-checking documents changed since a scan
+_RECHECK_MARGIN = timedelta(minutes=1)
+
+
+def _key_hash(key: str) -> int:
+    """64-bit digest of a key. The referenced set holds these instead of the keys to stay compact;
+    a collision can only make an orphan look referenced, never the reverse."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def _collect_keys(value: Any, s3: S3Service, referenced: Set[int]) -> None:
+    """Adds the keys of all tenant file URLs found in `value`: fields holding a URL as well as
+    markdown text embedding them (OCR clippings)."""
+    if isinstance(value, str):
+        if "https://" in value:
+            for url in _URL.findall(value):
+                key = s3.object_key(url)
+                if key:
+                    referenced.add(_key_hash(key))
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_keys(item, s3, referenced)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_keys(item, s3, referenced)
+
+
+class StorageGc:
+    """ Deletes this tenant's S3 objects under `../books/` that no document references any more:
+    files of deleted books, replaced page images, uploads whose page was never saved. Exports of
+    existing books are private and unreferenced by design, so they are kept.
+    Right before each batch is deleted, the documents changed since the last scan are scanned again,
+    so a file that became referenced meanwhile (e.g. an older image restored on a page) is kept.
+    """
+    def __init__(self,
+                 books_repo: BookRepo,
+                 pages_repo: PageRepo,
+                 requests_repo: EditRequestRepo,
+                 s3: S3Service,
+                 progress: JobProgress,
+                 grace: timedelta,
+                 dry_run: bool = False):
+        self.books_repo = books_repo
+        self.pages_repo = pages_repo
+        self.requests_repo = requests_repo
+        self.s3 = s3
+        self.progress = progress
+        self.cutoff = datetime.now(timezone.utc) - grace
+        self.dry_run = dry_run
+        self.referenced: Set[int] = set()
+        self.book_ids: Set[str] = set()
+        self.orphaned_bytes = 0
+        self.kept_files = 0
+        self.scanned_at: Optional[datetime] = None
+        self._recheck_lock = asyncio.Lock()
+
+    async def _collect_references(self, since: Optional[datetime] = None) -> int:
+        """ Adds the files referenced by the books, pages and edit requests, or only by those changed
+        since `since` (they all get `updated_at` bumped on every write). Returns the number of pages scanned.
+        """
+        scanned_at = datetime.now(timezone.utc)
+        changed = {"updated_at": {"$gte": since - _RECHECK_MARGIN}} if since else {}
+        async for book in self.books_repo.find(changed, {"_id": 0, "id": 1, "thumbnail": 1}):
+            self.book_ids.add(book["id"])
+            _collect_keys(book, self.s3, self.referenced)
+
+        count = 0
+        async for page in self.pages_repo.find(changed, {"_id": 0, "photo": 1, "compressed_photo": 1, "thumbnail": 1,
+                                                         "ocr": 1, "translation.data": 1}):
+            _collect_keys(page, self.s3, self.referenced)
+            count += 1
+            if not since and count % 10_000 == 0:
+                await self.progress.set(pages_scanned=count)
+
+        # Pending edits may carry clippings that only become referenced once accepted
+        async for request in self.requests_repo.find(changed, {"_id": 0, "oldText": 1, "newText": 1}):
+            _collect_keys(request, self.s3, self.referenced)
+
+        self.scanned_at = scanned_at
+        return count
+
+    async def _recheck(self, batch: Dict[str, int]) -> Dict[str, int]:
+        """The keys of `batch` still orphaned once the documents changed since the last scan are scanned."""
+        async with self._recheck_lock:
+            await self._collect_references(since=self.scanned_at)
+        orphans = {key: size for key, size in batch.items() if self._is_orphan_key(key)}
+        for key, size in batch.items():
+            if key not in orphans:
+                self.kept_files += 1
+                self.orphaned_bytes -= size
+        return orphans
+
+    def _is_orphan(self, obj: Dict[str, Any]) -> bool:
+        return obj["LastModified"] <= self.cutoff and self._is_orphan_key(obj["Key"])
+
+    def _is_orphan_key(self, key: str) -> bool:
+        if _key_hash(key) in self.referenced:
+            return False
+        match = _BOOK_KEY.match(key)
+        if match and match["book_id"] in self.book_ids and match["rest"].startswith("exports/"):
+            return False
+        return True
+
+    async def _orphans(self) -> AsyncIterator[Dict[str, int]]:
+        """Batches of orphaned `key -> size`, produced while the listing streams in."""
+        batch: Dict[str, int] = {}
+        async for page in self.s3.list_book_objects():
+            for obj in page:
+                if self._is_orphan(obj):
+                    batch[obj["Key"]] = obj.get("Size", 0)
+                    self.orphaned_bytes += obj.get("Size", 0)
+            await self.progress.add(files_scanned=len(page))
+            if len(batch) >= _DELETE_BATCH:
+                yield batch
+                batch = {}
+        if batch:
+            yield batch
+
+    async def _report(self, deletion: ObjectDeletion) -> None:
+        await self.progress.set(orphans_found=deletion.listed,
+                                orphaned_bytes=self.orphaned_bytes,
+                                files_kept=self.kept_files,
+                                files_deleted=deletion.deleted,
+                                bytes_reclaimed=deletion.deleted_bytes)
+
+    async def run(self) -> None:
+        await self.progress.set(dry_run=self.dry_run, cutoff=self.cutoff.isoformat())
+        pages = await self._collect_references()
+        await self.progress.set(pages_scanned=pages, books_scanned=len(self.book_ids),
+                                referenced_files=len(self.referenced))
+
+        if self.dry_run:
+            found = 0
+            async for batch in self._orphans():
+                found += len(batch)
+                await self.progress.set(orphans_found=found, orphaned_bytes=self.orphaned_bytes)
+            return
+
+        reclaimed = 0
+
+        async def report(deletion: ObjectDeletion) -> None:
+            nonlocal reclaimed
+            S3_GC_RECLAIMED_BYTES.inc(deletion.deleted_bytes - reclaimed, tenant=self.s3.tenant_id)
+            reclaimed = deletion.deleted_bytes
+            await self._report(deletion)
+
+        deletion = await self.s3.delete_object_batches(self._orphans(), report, before_delete=self._recheck)
+        await self._report(deletion)
+        print(f"Storage GC of tenant '{self.s3.tenant_id}' reclaimed {deletion.deleted_bytes} bytes "
+              f"in {deletion.deleted} objects")
@@ -0,0 +1,334 @@
+import os
+import time
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+import aioboto3
+import bson
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from pymongo import ReplaceOne, DeleteMany
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from cell.models.cell_registry import CellConfig, CELL_REGISTRY
+from cell.services.cell_manager import get_cell
+from core.models.primitives_model import EntityStatus
+from tenant.models.tenant_model import Tenant
+from tenant.services.tenant_resolver import get_tenants_collection, invalidate_tenant_cache, TENANT_CACHE_TTL_SECONDS
+
+# Collections holding tenant data (documents carry `tenant_id`)
+TENANT_COLLECTIONS: List[str] = ["books", "pages", "users", "requests", "categories", "revoked_tokens",
+                                  "translation_memory", "translation_memory_stats", "jobs", "flights"]
+
+# Collections whose documents get `updated_at` bumped on every write, so the cut-over only re-copies changes
+_TIMESTAMPED_COLLECTIONS = {"books", "pages", "translation_memory", "jobs"}
+
+# Checkpoints live in the target cell, so a migration resumes wherever it is restarted
+MIGRATIONS_COLLECTION: str = "tenant_migrations"
+
+TENANT_MIGRATION_BATCH_SIZE: int = int(os.getenv("TENANT_MIGRATION_BATCH_SIZE", 500))
+TENANT_MIGRATION_S3_CONCURRENCY: int = int(os.getenv("TENANT_MIGRATION_S3_CONCURRENCY", 16))
+
+# Largest object S3 copies server-side in one request; bigger ones are streamed
+_MAX_COPY_OBJECT_BYTES: int = 5 * 1024 ** 3
+# Streamed copies hold at most a few multipart chunks of an object in memory
+_STREAM_TRANSFER_CONFIG = TransferConfig(multipart_chunksize=8 * 1024 * 1024, max_concurrency=2, max_io_queue=2)
+
+# Objects under these path segments are private; everything else is uploaded public-read (as S3Service does)
+_PRIVATE_PATH_SEGMENTS = ("/exports/",)
+
+
+@dataclass
+class Throughput:
+    objects: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def add(self, objects: int, size: int, seconds: float) -> None:
+        self.objects += objects
+        self.bytes += size
+        self.seconds += seconds
+
+    def __str__(self) -> str:
+        seconds = max(self.seconds, 1e-9)
+        return (f"{self.objects} objects, {self.bytes / 1e6:.1f} MB in {self.seconds:.1f}s "
+                f"({self.objects / seconds:.0f} objects/s, {self.bytes / 1e6 / seconds:.2f} MB/s)")
+
+
+@dataclass
+class MigrationReport:
+    collections: Dict[str, Throughput] = field(default_factory=dict)
+    s3: Throughput = field(default_factory=Throughput)
+
+    def print(self) -> None:
+        for name, throughput in self.collections.items():
+            print(f"  mongo {name}: {throughput}")
+        print(f"  s3: {self.s3}")
+
+
+def _public_base(config: CellConfig) -> str:
+    return f"https://{config.s3_bucket}.s3.{config.s3_region}.amazonaws.com"
+
+
+def _rewrite_urls(value: Any, old: str, new: str) -> Any:
+    """Replaces the source bucket's base URL in every string of a document (fields and markdown text)."""
+    if isinstance(value, str):
+        return value.replace(old, new) if old in value else value
+    if isinstance(value, dict):
+        return {key: _rewrite_urls(item, old, new) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rewrite_urls(item, old, new) for item in value]
+    return value
+
+
+class _HashingReader:
+    """Reads an object's body for `upload_fileobj` while computing the MD5 of what went through."""
+    def __init__(self, body):
+        self._body = body
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        data = await self._body.read(size)
+        self.md5.update(data)
+        self.size += len(data)
+        return data
+
+
+class TenantMigration:
+    """ Moves one tenant from its current cell to `target_cell_id`:
+
+    1. `copy`: Mongo collections (in parallel, by `_id` order) and S3 objects under `tenants/<id>/`
+       (a bounded pool of concurrent copies, server-side where the credentials allow, each verified
+       against the source ETag), checkpointing after every batch.
+    2. `cutover`: suspends the tenant, waits until every worker's tenant cache has expired, re-syncs
+       what changed since the copy started, verifies counts and flips `cell_id`.
+
+    Source data is left in place; remove it once the tenant runs fine in the new cell.
+    """
+    def __init__(self, tenant: Tenant, target_cell_id: str):
+        if tenant.cell_id == target_cell_id:
+            raise ValueError(f"Tenant '{tenant.slug}' is already in cell '{target_cell_id}'")
+        if target_cell_id not in CELL_REGISTRY:
+            raise ValueError(f"Cell '{target_cell_id}' is not configured")
+
+        self.tenant = tenant
+        self.source = get_cell(tenant.cell_id)
+        self.target = get_cell(target_cell_id)
+        self.source_db: AsyncIOMotorDatabase = self.source.mongo_service.get_db()
+        self.target_db: AsyncIOMotorDatabase = self.target.mongo_service.get_db()
+        self.source_base = f"{_public_base(self.source.config)}/tenants/{tenant.id}/"
+        self.target_base = f"{_public_base(self.target.config)}/tenants/{tenant.id}/"
+        self.same_bucket = self.source_base == self.target_base
+        # With the same credentials the target's client can read the source bucket: objects are copied by S3 itself
+        self.server_side_copy = self.source.config.s3_access_key == self.target.config.s3_access_key
+        self.report = MigrationReport()
+        self._checkpoint_id = f"{tenant.id}:{target_cell_id}"
+        self._checkpoints: AsyncIOMotorCollection = self.target_db[MIGRATIONS_COLLECTION]
+        self._botoconfig = BotoConfig(retries={'max_attempts': 5, 'mode': 'standard'},
+                                      max_pool_connections=TENANT_MIGRATION_S3_CONCURRENCY * 2)
+
+    # ---------- Checkpoints ----------
+
+    async def _load_checkpoint(self) -> Dict[str, Any]:
+        checkpoint = await self._checkpoints.find_one({"_id": self._checkpoint_id})
+        if checkpoint is None:
+            checkpoint = {"_id": self._checkpoint_id,
+                          "tenant_id": self.tenant.id,
+                          "source_cell_id": self.tenant.cell_id,
+                          "started_at": datetime.now(timezone.utc),
+                          "collections": {},
+                          "s3": {}}
+            await self._checkpoints.insert_one(checkpoint)
+        return checkpoint
+
+    async def _save_checkpoint(self, key: str, value: Any) -> None:
+        await self._checkpoints.update_one({"_id": self._checkpoint_id}, {"$set": {key: value}})
+
+    # ---------- Mongo ----------
+
+    async def _copy_documents(self, name: str, filter: Dict[str, Any], resume_after: Optional[Any]) -> Optional[Any]:
+        """Upserts matching documents batch by batch in `_id` order; returns the last copied `_id`."""
+        source, target = self.source_db[name], self.target_db[name]
+        throughput = self.report.collections.setdefault(name, Throughput())
+        last_id = resume_after
+
+        while True:
+            query = {**filter, "tenant_id": self.tenant.id}
+            if last_id is not None:
+                query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+            start = time.perf_counter()
+            docs = await source.find(query).sort("_id", 1).limit(TENANT_MIGRATION_BATCH_SIZE).to_list(None)
+            if not docs:
+                return last_id
+
+            if not self.same_bucket:
+                docs = [_rewrite_urls(doc, self.source_base, self.target_base) for doc in docs]
+            await target.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+            throughput.add(len(docs), sum(len(bson.encode(doc)) for doc in docs), time.perf_counter() - start)
+
+            last_id = docs[-1]["_id"]
+            if not filter:
+                await self._save_checkpoint(f"collections.{name}.last_id", last_id)
+
+    async def _copy_collection(self, name: str, checkpoint: Dict[str, Any]) -> None:
+        state = checkpoint["collections"].get(name, {})
+        if state.get("done"):
+            return
+        await self._copy_documents(name, {}, state.get("last_id"))
+        await self._save_checkpoint(f"collections.{name}.done", True)
+        print(f"Copied {name}: {self.report.collections.get(name, Throughput())}")
+
+    async def _resync_collection(self, name: str, since: datetime) -> None:
+        """ Copies documents changed since `since` (whole collection when it has no `updated_at`)
+        and removes the ones deleted in the source meanwhile.
+        """
+        source_ids = {doc["_id"] async for doc in self.source_db[name].find({"tenant_id": self.tenant.id}, {"_id": 1})}
+        target_ids = {doc["_id"] async for doc in self.target_db[name].find({"tenant_id": self.tenant.id}, {"_id": 1})}
+        # Deletions first: a document re-created in the source under a new `_id` (e.g. a flight lease)
+        # would otherwise collide with its old copy on the collection's unique keys
+        deleted = list(target_ids - source_ids)
+        if deleted:
+            await self.target_db[name].bulk_write([DeleteMany({"_id": {"$in": deleted}})])
+
+        timestamped = name in _TIMESTAMPED_COLLECTIONS
+        await self._copy_documents(name, {"updated_at": {"$gte": since}} if timestamped else {}, None)
+        missing = source_ids - target_ids
+        if missing:
+            await self._copy_documents(name, {"_id": {"$in": list(missing)}}, None)
+
+    async def _verify_collection(self, name: str) -> None:
+        source_count, target_count = await asyncio.gather(
+            self.source_db[name].count_documents({"tenant_id": self.tenant.id}),
+            self.target_db[name].count_documents({"tenant_id": self.tenant.id}),
+        )
+        if source_count != target_count:
+            raise RuntimeError(f"Collection '{name}': {source_count} documents in source, {target_count} in target")
+
+    # ---------- S3 ----------
+
+    def _s3_client(self, config: CellConfig):
+        session = aioboto3.Session(aws_access_key_id=config.s3_access_key,
+                                   aws_secret_access_key=config.s3_secret_key,
+                                   region_name=config.s3_region)
+        return session.client('s3', config=self._botoconfig)
+
+    async def _copy_object(self, source_s3, target_s3, obj: Dict[str, Any], semaphore: asyncio.Semaphore) -> int:
+        """ Copies one object: server-side when the target can read the source bucket, otherwise streamed
+        through in multipart chunks. Either way the copy is checked against the source's ETag (an MD5
+        unless the source was a multipart upload)."""
+        key, size = obj['Key'], obj.get('Size', 0)
+        extra = {} if any(segment in key for segment in _PRIVATE_PATH_SEGMENTS) else {'ACL': 'public-read'}
+        source_etag = obj.get('ETag', '').strip('"')
+        async with semaphore:
+            if self.server_side_copy and size <= _MAX_COPY_OBJECT_BYTES:
+                response = await target_s3.copy_object(Bucket=self.target.config.s3_bucket,
+                                                       Key=key,
+                                                       CopySource={'Bucket': self.source.config.s3_bucket, 'Key': key},
+                                                       **extra)
+                copied_etag = response.get('CopyObjectResult', {}).get('ETag', '').strip('"')
+                if source_etag and "-" not in source_etag and copied_etag != source_etag:
+                    raise RuntimeError(f"Checksum mismatch copying '{key}'")
+                return size
+
+            response = await source_s3.get_object(Bucket=self.source.config.s3_bucket, Key=key)
+            reader = _HashingReader(response['Body'])
+            extra['ContentType'] = response.get('ContentType', 'application/octet-stream')
+            await target_s3.upload_fileobj(reader, self.target.config.s3_bucket, key,
+                                           ExtraArgs=extra, Config=_STREAM_TRANSFER_CONFIG)
+            source_etag = response.get('ETag', '').strip('"')
+            if source_etag and "-" not in source_etag and source_etag != reader.md5.hexdigest():
+                await target_s3.delete_object(Bucket=self.target.config.s3_bucket, Key=key)
+                raise RuntimeError(f"Checksum mismatch reading '{key}'")
+            return reader.size
+
+    async def _list_objects(self, s3, bucket: str, start_after: str = "") -> AsyncIterator[List[Dict[str, Any]]]:
+        paginator = s3.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=bucket, Prefix=f"tenants/{self.tenant.id}/", StartAfter=start_after):
+            contents = page.get('Contents', [])
+            if contents:
+                yield contents
+
+    async def _copy_keys(self, source_s3, target_s3, objects: List[Dict[str, Any]], semaphore: asyncio.Semaphore) -> None:
+        start = time.perf_counter()
+        sizes = await asyncio.gather(*(self._copy_object(source_s3, target_s3, obj, semaphore) for obj in objects))
+        self.report.s3.add(len(objects), sum(sizes), time.perf_counter() - start)
+
+    async def _copy_objects(self, checkpoint: Dict[str, Any]) -> None:
+        """Copies objects listing page by page; the checkpoint advances once a whole page is copied."""
+        if self.same_bucket or checkpoint["s3"].get("done"):
+            return
+        semaphore = asyncio.Semaphore(TENANT_MIGRATION_S3_CONCURRENCY)
+
+        async with self._s3_client(self.source.config) as source_s3, self._s3_client(self.target.config) as target_s3:
+            async for contents in self._list_objects(source_s3, self.source.config.s3_bucket, checkpoint["s3"].get("last_key", "")):
+                await self._copy_keys(source_s3, target_s3, contents, semaphore)
+                last_key = contents[-1]['Key']
+                await self._save_checkpoint("s3.last_key", last_key)
+                print(f"Copied S3 objects up to '{last_key}': {self.report.s3}")
+        await self._save_checkpoint("s3.done", True)
+
+    async def _sync_objects(self) -> None:
+        """Copies objects added or changed since the copy (by ETag) and deletes the ones removed from the source."""
+        if self.same_bucket:
+            return
+        semaphore = asyncio.Semaphore(TENANT_MIGRATION_S3_CONCURRENCY)
+
+        async with self._s3_client(self.source.config) as source_s3, self._s3_client(self.target.config) as target_s3:
+            source_objects = {obj['Key']: obj async for contents in self._list_objects(source_s3, self.source.config.s3_bucket) for obj in contents}
+            target_etags = {obj['Key']: obj['ETag'] async for contents in self._list_objects(target_s3, self.target.config.s3_bucket) for obj in contents}
+
+            changed = [obj for key, obj in source_objects.items() if target_etags.get(key) != obj['ETag']]
+            for start in range(0, len(changed), 1000):
+                await self._copy_keys(source_s3, target_s3, changed[start:start + 1000], semaphore)
+
+            deleted = [key for key in target_etags if key not in source_objects]
+            for start in range(0, len(deleted), 1000):
+                await target_s3.delete_objects(Bucket=self.target.config.s3_bucket,
+                                               Delete={'Objects': [{'Key': key} for key in deleted[start:start + 1000]]})
+
+    # ---------- Phases ----------
+
+    async def copy(self) -> None:
+        """Bulk copy while the tenant stays online. Safe to re-run; continues from the checkpoint."""
+        checkpoint = await self._load_checkpoint()
+        await asyncio.gather(*(self._copy_collection(name, checkpoint) for name in TENANT_COLLECTIONS),
+                             self._copy_objects(checkpoint))
+
+    async def cutover(self, suspend: bool = True) -> None:
+        """ Final sync and switch to the target cell. With `suspend`, the tenant is unavailable
+        for one tenant cache TTL plus the sync, so no worker writes to the source cell afterwards.
+        """
+        checkpoint = await self._load_checkpoint()
+        tenants = get_tenants_collection()
+        tenant = await tenants.find_one({"id": self.tenant.id}, {"status": 1})
+        status = tenant.get("status", EntityStatus.ACTIVE) if tenant else EntityStatus.ACTIVE
+
+        if suspend:
+            await tenants.update_one({"id": self.tenant.id}, {"$set": {"status": EntityStatus.SUSPENDED}})
+            print(f"Tenant suspended; waiting {TENANT_CACHE_TTL_SECONDS:.0f}s for worker caches to expire...")
+            await asyncio.sleep(TENANT_CACHE_TTL_SECONDS + 1)
+
+        try:
+            await self._copy_objects(checkpoint)  # In case the copy phase did not finish
+            await self._sync_objects()
+            await asyncio.gather(*(self._resync_collection(name, checkpoint["started_at"]) for name in TENANT_COLLECTIONS))
+            await asyncio.gather(*(self._verify_collection(name) for name in TENANT_COLLECTIONS))
+
+            await tenants.update_one({"id": self.tenant.id},
+                                     {"$set": {"cell_id": str(self.target.config.cell_id),
+                                               "updated_at": datetime.now(timezone.utc)}})
+            await self._save_checkpoint("completed_at", datetime.now(timezone.utc))
+        finally:
+            if suspend:  # Back to the status from before, which need not be active
+                await tenants.update_one({"id": self.tenant.id}, {"$set": {"status": status}})
+            invalidate_tenant_cache(self.tenant.slug)
+
+
+async def get_tenant_by_slug(slug: str) -> Tenant:
+    doc = await get_tenants_collection().find_one({"slug": slug})
+    if not doc:
+        raise ValueError(f"Tenant '{slug}' not found")
+    return Tenant(**doc)
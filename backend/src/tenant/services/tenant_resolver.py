@@ -1,13 +1,23 @@
+import os
 from fastapi import Request, HTTPException
 from async_lru import alru_cache
 from datetime import timezone
+from typing import Optional
 
 from tenant.models.tenant_model import Tenant
 from core.models.primitives_model import EntityStatus
+from core.models.req_context_model import RequestContext
 from cell.services.mongo_service import MongoService
+from cell.services.cell_manager import get_cell
 
 _tenant_not_found_exception = HTTPException(status_code=404, detail={"error": "TENANT_NOT_FOUND"})
 
+# Tenants are cached per worker; changes made elsewhere (status, `cell_id` after a migration)
+# are picked up by every worker within this time
+TENANT_CACHE_TTL_SECONDS: float = float(os.getenv("TENANT_CACHE_TTL_SECONDS", 60))
+
+_tenants_mongo: Optional[MongoService] = None
+
 async def resolve_tenant(request: Request, tenant_id_from_token: str | None) -> Tenant:
     """Resolve tenant based on request information and verify with token if present."""
         
@@ -21,11 +31,11 @@ async def resolve_tenant(request: Request, tenant_id_from_token: str | None) ->
     
     return tenant
 
-@alru_cache()
+@alru_cache(ttl=TENANT_CACHE_TTL_SECONDS)
 async def _get_tenant_from_db(slug: str) -> Tenant:    
     try:
         query = {"slug": slug}
-        doc = await _get_tenants_collection().find_one(query)
+        doc = await get_tenants_collection().find_one(query)
         if not doc:
             raise _tenant_not_found_exception        
         
@@ -37,12 +47,34 @@ async def _get_tenant_from_db(slug: str) -> Tenant:
     except Exception as e:        
         raise e        
 
-# Tenants DB connection should be separate from platform/cell DB
-def _get_tenants_collection():
-    import os
-    
-    MONGODB_URL = os.getenv('MONGO_URI_CELL_DEFAULT')
-    MONGODB_DB_NAME = os.getenv('MONGO_DB_CELL_DEFAULT')
+async def get_system_context(tenant_id: str) -> Optional[RequestContext]:
+    """ A context for work done on a tenant's data outside of a request (background refreshes): no user,
+    and the tenant's current cell, read from the tenants collection rather than the cache so a migrated
+    tenant is not served from its old cell. None if the tenant is gone or inactive.
+    Callers running past the current step should hold the cell (`ctx.cell.hold()`).
+    """
+    doc = await get_tenants_collection().find_one({"id": tenant_id})
+    if not doc:
+        return None
+    tenant = Tenant(**doc)
+    if tenant.status != EntityStatus.ACTIVE:
+        return None
+    return RequestContext(tenant_id=tenant.id,
+                          tenant_slug=tenant.slug,
+                          tenant_name=tenant.name,
+                          tenant_permissions={},
+                          cell=get_cell(tenant.cell_id),
+                          user_id=None,
+                          user_roles=[])
+
+def invalidate_tenant_cache(slug: str) -> None:
+    """Drops this worker's cached tenant; other workers refresh within `TENANT_CACHE_TTL_SECONDS`."""
+    _get_tenant_from_db.cache_invalidate(slug)
 
-    mongoService = MongoService(mongo_uri=MONGODB_URL, mongo_db_name=MONGODB_DB_NAME)    
-    return mongoService.get_db()["tenants"]
\ No newline at end of file
+# Tenants DB connection should be separate from platform/cell DB
+def get_tenants_collection():
+    global _tenants_mongo
+    if _tenants_mongo is None:
+        _tenants_mongo = MongoService(mongo_uri=os.getenv('MONGO_URI_CELL_DEFAULT'),
+                                      mongo_db_name=os.getenv('MONGO_DB_CELL_DEFAULT'))
+    return _tenants_mongo.get_db()["tenants"]
@@ -1,11 +1,18 @@
+import asyncio
 from fastapi import HTTPException, status
-from typing import List
+from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorCollection
 from datetime import datetime, timezone
 
 from page.page_repo import PageRepo
 from book.book_repo import BookRepo
-from cell.services.s3_service import S3Service
+from cell.services.s3_service import S3Service, ObjectDeletion
+from jobs.job_repo import JobRepo
+from jobs.flight_repo import FlightRepo
+from translation_memory.translation_memory_repo import TranslationMemoryRepo, TranslationMemoryStatsRepo
+from jobs.models.job_model import Job
+from jobs.services.job_runner import JobProgress, start_job
+from discover.services.discover_pool import invalidate_discover_pool
 
 from tenant.models.tenant_model import Tenant, PlanName
 from tenant.models.tenant_crud_models import (
@@ -49,15 +56,61 @@ async def create_tenant_service(creation_data: TenantCreate, tenant_repo: AsyncI
     await tenant_repo.insert_one(tenant_model.model_dump())
     return tenant_model
 
+async def purge_tenant_data(tenant_id: str,
+                            book_repo: BookRepo,
+                            page_repo: PageRepo,
+                            tm_repo: TranslationMemoryRepo,
+                            tm_stats_repo: TranslationMemoryStatsRepo,
+                            jobs_repo: JobRepo,
+                            flights_repo: FlightRepo,
+                            s3: S3Service,
+                            progress: JobProgress,
+                            concurrent: bool = True
+                        ) -> None:
+    """Deletes a tenant's books, pages, translation memory, jobs and S3 files, reporting counts to the job's progress.
+    The purge's own job is kept, so its outcome can still be read. With `concurrent` the S3 purge runs
+    alongside the Mongo deletes instead of after them."""
+    async def delete_documents():
+        books = await book_repo.delete_many({"tenant_id": tenant_id})
+        await progress.add(books_deleted=books.deleted_count)
+        pages = await page_repo.delete_many({"tenant_id": tenant_id})
+        invalidate_discover_pool(tenant_id)
+        await progress.add(pages_deleted=pages.deleted_count)
+        memory = await tm_repo.delete_many({"tenant_id": tenant_id})
+        await tm_stats_repo.delete_many({"tenant_id": tenant_id})
+        await progress.add(translation_memory_deleted=memory.deleted_count)
+        jobs = await jobs_repo.delete_many({"tenant_id": tenant_id, "id": {"$ne": progress.job_id}})
+        await flights_repo.delete_many({"tenant_id": tenant_id})
+        await progress.add(jobs_deleted=jobs.deleted_count)
+
+    async def report_files(deletion: ObjectDeletion):
+        await progress.set(files_listed=deletion.listed,
+                           files_deleted=deletion.deleted,
+                           bytes_deleted=deletion.deleted_bytes,
+                           files_failed=len(deletion.failed_keys))
+
+    if concurrent:
+        await asyncio.gather(delete_documents(), s3.delete_tenant_files(tenant_id, report_files))
+    else:
+        await delete_documents()
+        await s3.delete_tenant_files(tenant_id, report_files)
+
 async def delete_tenant_and_collection_service(tenant_id: str,
                                                expected_tenant_name: str,
                                                tenant_repo: AsyncIOMotorCollection,
                                                book_repo: BookRepo,
                                                page_repo: PageRepo,
-                                               s3: S3Service
-                                            ) -> None:
+                                               tm_repo: TranslationMemoryRepo,
+                                               tm_stats_repo: TranslationMemoryStatsRepo,
+                                               flights_repo: FlightRepo,
+                                               s3: S3Service,
+                                               jobs_repo: JobRepo,
+                                               created_by: Optional[str] = None,
+                                               concurrent: bool = True
+                                            ) -> Job:
     """Deletes a tenant by its ID after verifying the expected tenant name.
     Also deletes all associated collections of books within the tenant's scope.
+    The purge runs as a background job, returned right away; the tenant record goes last.
     """
     doc = await tenant_repo.find_one({"id": tenant_id}, projection={"name": 1, "plan": 1})
     if not doc:
@@ -73,10 +126,13 @@ async def delete_tenant_and_collection_service(tenant_id: str,
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Can't delete the root tenant using API.")
     
-    await book_repo.delete_many({"tenant_id": tenant_id})
-    await page_repo.delete_many({"tenant_id": tenant_id})
-    await s3.delete_tenant_files(tenant_id=tenant_id)
-    await tenant_repo.delete_one({"id": tenant_id})
+    async def run(progress: JobProgress):
+        await progress.set(tenant_id=tenant_id)
+        await purge_tenant_data(tenant_id, book_repo, page_repo, tm_repo, tm_stats_repo, jobs_repo, flights_repo,
+                                s3, progress, concurrent)
+        await tenant_repo.delete_one({"id": tenant_id})
+
+    return await start_job("tenant_delete", jobs_repo, run, created_by)
 
 async def update_tenant_service(data: TenantUpdate, 
                                 tenant_repo: AsyncIOMotorCollection
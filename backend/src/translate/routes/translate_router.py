@@ -1,27 +1,50 @@
 from fastapi import APIRouter, Form, HTTPException, Request, Depends
 from datetime import datetime, timezone
-from typing import Optional
-import asyncio
+from typing import Optional, Tuple
 
 
 from page.page_repo import get_pages_repo
+from book.book_repo import get_books_repo
+from jobs.flight_repo import get_flights_repo
+from jobs.services.single_flight import flight_key, single_flight
+from translation_memory.translation_memory_repo import get_translation_memory_repo, get_translation_memory_stats_repo
 
 from ai.services.ai_registry import get_ai_client
+from ai.services.hedging import hedged_call
+from telemetry.services.tracing import create_untraced_task
+from core.dependency import request_context_dependency
 from auth.services.rbac_service import need_permission, ResourceType, ActionType
+from translate.services.translation_prompt import (
+    build_translation_instructions,
+    get_book_translation_context,
+    wrap_translation_text
+)
+from translation_memory.services.translation_memory_service import (
+    estimate_tokens,
+    format_hints,
+    lookup_translation,
+    record_memory_use
+)
 
 router = APIRouter()
 
 @router.post("/", dependencies=[Depends(need_permission(ResourceType.PAGE, ActionType.UPDATE))])
 async def translate_text(
     request: Request,
+    req_ctx: request_context_dependency,
     text: Optional[str] = Form(None),
     source_lang: Optional[str] = Form(None),
     target_lang: Optional[str] = Form(None),
     custom_prompt: Optional[str] = Form(None),
     auto_save: Optional[bool] = Form(False),
     page_id: Optional[str] = Form(None),
+    book_id: Optional[str] = Form(None),
     ai_model: Optional[str] = Form(None),
     pages_repo = Depends(get_pages_repo),
+    books_repo = Depends(get_books_repo),
+    tm_repo = Depends(get_translation_memory_repo),
+    tm_stats_repo = Depends(get_translation_memory_stats_repo),
+    flights_repo = Depends(get_flights_repo),
 ):
     # Parse request data
     content_type = request.headers.get("content-type", "") if request else ""    
@@ -35,6 +58,7 @@ async def translate_text(
             custom_prompt_final = body.get("custom_prompt")
             auto_save_final = body.get("auto_save", False)
             page_id_final = body.get("page_id")
+            book_id_final = body.get("book_id")
             model_final = body.get("ai_model")
         except Exception as e:
             raise HTTPException(status_code=400, detail="Invalid JSON body")
@@ -45,6 +69,7 @@ async def translate_text(
         custom_prompt_final = custom_prompt
         auto_save_final = auto_save
         page_id_final = page_id
+        book_id_final = book_id
         model_final = ai_model
     
     if not text_final or not source_lang_final or not target_lang_final:        
@@ -61,27 +86,44 @@ async def translate_text(
         if not client:
             raise HTTPException(status_code=500, detail="AI service not available")
             
-        prompt = ""
-        if custom_prompt_final:
-            prompt = custom_prompt_final
-        else:
-            prompt = f"""
-                    You are a professional translator. Translate the following text from {source_lang_final} to {target_lang_final}.
-                    **Strictly follow these rules:**
-                    1. Preserve ALL markdown formatting (headers, lists, bold, italics, etc.).
-                    2. Do NOT modify or remove any image tags (e.g., `![alt text](image_url)`). Leave them exactly as they are.
-                    3. Do NOT add new formatting, comments, quoting original text, or explanations.
-                    4. Translate ONLY the text content. Ignore code blocks, links, or any non-text elements.
-                    5. Maintain the original structure and line breaks.
-
-                    ---
-                    {text_final}
-                    ---
-                """
-        
         # Process translation using the async client
         try:
-            translation_text = await client.process_translation_async(prompt)                 
+            # Identical requests in flight (double clicks, two editors) share one provider call
+            async def translate(key: str, call) -> Tuple[str, str]:
+                async def run() -> dict:
+                    text, ai = await hedged_call(req_ctx.tenant_id, "translation", client, call)
+                    return {"translation": text, "model": ai.name}
+                result = await single_flight(flights_repo, "translation", key, run)
+                return result["translation"], result["model"]
+
+            if custom_prompt_final:
+                translation_text, model_name = await translate(
+                    flight_key(req_ctx.tenant_id, page_id_final, "translation", chosen_model, custom_prompt_final),
+                    lambda ai: ai.process_translation_async(custom_prompt_final))
+            else:
+                # The instructions (with the book's notes and glossary) are the same for every page of the book,
+                # so they are sent apart from the text for the provider to cache
+                context_book_id, context = await get_book_translation_context(book_id_final, page_id_final,
+                                                                              books_repo, pages_repo)
+                instructions = build_translation_instructions(source_lang_final, target_lang_final, context)
+                # Approved translations of the same sentences answer without the model; similar ones go along as hints
+                memory = await lookup_translation(text_final, source_lang_final, target_lang_final, tm_repo)
+                if memory.translation is not None:
+                    translation_text, model_name = memory.translation, "translation-memory"
+                    tokens_saved = estimate_tokens(instructions) + estimate_tokens(text_final) + estimate_tokens(translation_text)
+                else:
+                    text_wrapped = wrap_translation_text(text_final)
+                    if memory.hints:
+                        text_wrapped = f"{format_hints(memory.hints)}\n\n{text_wrapped}"
+                    cache_key = f"{req_ctx.tenant_id}:{context_book_id or '-'}:{source_lang_final}:{target_lang_final}"
+                    translation_text, model_name = await translate(
+                        flight_key(req_ctx.tenant_id, page_id_final, "translation", chosen_model, instructions, text_wrapped),
+                        lambda ai: ai.process_translation_with_context_async(instructions, text_wrapped, cache_key))
+                    tokens_saved = 0
+                try:
+                    await record_memory_use(context_book_id, memory, tokens_saved, tm_stats_repo)
+                except Exception as e:
+                    print(f"Failed to record translation memory use: {e}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Translation processing failed: {str(e)}")
         
@@ -94,7 +136,7 @@ async def translate_text(
                         {"id": page_id_final},
                         {"$set": {
                             "translation.language": target_lang_final,
-                            "translation.model": chosen_model, 
+                            "translation.model": model_name,
                             "translation.data": translation_text,
                             "updated_at": datetime.now(timezone.utc)
                         }}
@@ -104,7 +146,7 @@ async def translate_text(
                     raise Exception(f"Failed to update translation data in database.\n{db_error}")                    
             
             # Schedule the database update as a background task
-            asyncio.create_task(update_database())
+            create_untraced_task(req_ctx.cell.holding(update_database()))
                 
         return {"translation": translation_text}
         
@@ -0,0 +1,46 @@
+from typing import Optional, Tuple
+
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from book.models.book_model import TranslationContext
+
+_RULES = """You are a professional translator. Translate the text between the --- lines from {source} to {target}.
+**Strictly follow these rules:**
+1. Preserve ALL markdown formatting (headers, lists, bold, italics, etc.).
+2. Do NOT modify or remove any image tags (e.g., `![alt text](image_url)`). Leave them exactly as they are.
+3. Do NOT add new formatting, comments, quoting original text, or explanations.
+4. Translate ONLY the text content. Ignore code blocks, links, or any non-text elements.
+5. Maintain the original structure and line breaks."""
+
+
+def build_translation_instructions(source_lang: str, target_lang: str, context: Optional[TranslationContext]) -> str:
+    """ The part of a translation prompt shared by all pages of a book: rules, then the book's notes and glossary.
+    Built deterministically, so providers can cache it as a prefix.
+    """
+    instructions = _RULES.format(source=source_lang, target=target_lang)
+    if context and context.notes.strip():
+        instructions += f"\n\nAbout the source text:\n{context.notes.strip()}"
+    if context and context.glossary:
+        terms = "\n".join(f"- {term}: {translation}" for term, translation in sorted(context.glossary.items()))
+        instructions += f"\n\nGlossary, translate these terms exactly as given:\n{terms}"
+    return instructions
+
+
+def wrap_translation_text(text: str) -> str:
+    return f"---\n{text}\n---"
+
+
+async def get_book_translation_context(book_id: Optional[str],
+                                       page_id: Optional[str],
+                                       books_repo: BookRepo,
+                                       pages_repo: PageRepo
+) -> Tuple[Optional[str], Optional[TranslationContext]]:
+    """The book being translated (given, or the page's) and its translation context, if any."""
+    if not book_id and page_id:
+        page = await pages_repo.find_one({"id": page_id}, {"_id": 0, "book_id": 1})
+        book_id = page.get("book_id") if page else None
+    if not book_id:
+        return None, None
+    book = await books_repo.find_one({"id": book_id}, {"_id": 0, "translation_context": 1})
+    context = (book or {}).get("translation_context")
+    return book_id, TranslationContext(**context) if context else None
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from bson import ObjectId
+from pydantic import BaseModel, Field, computed_field
+
+class MemorySegment(BaseModel):
+    """An approved translation of a source segment (sentence, paragraph or page) for one language pair."""
+    id: str = Field(default_factory=lambda: str(ObjectId()))
+    source_lang: str
+    target_lang: str
+    source_hash: str
+    source: str
+    target: str
+    fuzzy_keys: List[int] = []  # MinHash bands of the source's character trigrams, for similarity lookups
+    book_id: Optional[str] = None
+    page_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class BookMemoryStats(BaseModel):
+    """Translation memory use by the page translations of a book."""
+    book_id: str
+    segments: int = 0        # Sentences looked up
+    exact_hits: int = 0      # ... found in the memory
+    fuzzy_hits: int = 0      # ... with a similar enough sentence passed to the model as a hint
+    pages_served: int = 0    # Translations answered from the memory alone
+    tokens_saved: int = 0    # Estimated AI tokens those translations did not use
+
+    @computed_field
+    @property
+    def hit_rate(self) -> float:
+        return round(self.exact_hits / self.segments, 4) if self.segments else 0.0
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from typing import Annotated
+
+from auth.services.rbac_service import need_permission, ResourceType, ActionType
+from translation_memory.translation_memory_repo import TranslationMemoryStatsRepo, get_translation_memory_stats_repo
+from translation_memory.models.translation_memory_model import BookMemoryStats
+from translation_memory.services.translation_memory_service import get_book_memory_stats_service
+
+router = APIRouter()
+
+tm_stats_repo_dep = Annotated[TranslationMemoryStatsRepo, Depends(get_translation_memory_stats_repo)]
+
+@router.get("/books/{book_id}/stats",
+            response_model=BookMemoryStats,
+            dependencies=[Depends(need_permission(ResourceType.BOOK, ActionType.READ))]
+)
+async def get_book_memory_stats(book_id: str, tm_stats_repo: tm_stats_repo_dep) -> BookMemoryStats:
+    """Translation memory hit rate and AI tokens saved for a book's page translations."""
+    return await get_book_memory_stats_service(book_id=book_id, stats_repo=tm_stats_repo)
@@ -0,0 +1,76 @@
+import re
+import hashlib
+from dataclasses import dataclass, field
+from typing import List, Set, Tuple
+
+# Fuzzy keys: MinHash of the character trigrams, in bands. Two texts share a band with
+# probability ~ 1 - (1 - J^ROWS)^BANDS for trigram Jaccard similarity J (J=0.7: 0.96, J=0.3: 0.42)
+_BANDS = 6
+_ROWS = 2
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [(int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _PRIME | 1,
+                  int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME)
+                 for i in range(_BANDS * _ROWS)]
+
+_PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+# After sentence punctuation, or at a line break (running titles, headers and verse are lines of their own)
+_SENTENCE_BREAK = re.compile(r"((?<=[.!?;])[ \t]+|[ \t]*\n[ \t]*)")
+
+
+@dataclass
+class Paragraph:
+    text: str
+    separator: str  # Whitespace that followed it
+    sentences: List[Tuple[str, str]] = field(default_factory=list)  # (sentence, whitespace that followed it)
+
+
+def _pairs(parts: List[str]) -> List[Tuple[str, str]]:
+    # re.split with a capturing group alternates text and separator
+    return [(parts[i], parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+
+
+def split_paragraphs(text: str) -> List[Paragraph]:
+    """Text as paragraphs of sentences, keeping the separators so it can be put back together."""
+    paragraphs = []
+    for paragraph, separator in _pairs(_PARAGRAPH_BREAK.split(text)):
+        if paragraph:
+            sentences = [(sentence, gap) for sentence, gap in _pairs(_SENTENCE_BREAK.split(paragraph)) if sentence]
+            paragraphs.append(Paragraph(paragraph, separator, sentences))
+    return paragraphs
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def is_trivial(text: str) -> bool:
+    """Page numbers, rules, signature marks...: nothing to translate, kept as they are."""
+    return not any(char.isalpha() for char in text)
+
+
+def segment_hash(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    text = normalized.casefold()
+    if len(text) < 3:
+        return {text}
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def fuzzy_keys(normalized: str) -> List[int]:
+    """One key per MinHash band; texts sharing a key are candidates for `similarity`."""
+    hashes = [int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "big")
+              for gram in trigrams(normalized)]
+    minimums = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    keys = []
+    for band in range(_BANDS):
+        rows = minimums[band * _ROWS:(band + 1) * _ROWS]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big") >> 1)  # Fits a signed 64-bit Mongo integer
+    return keys
@@ -0,0 +1,249 @@
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+
+from page.page_repo import PageRepo
+from translation_memory.translation_memory_repo import TranslationMemoryRepo, TranslationMemoryStatsRepo
+from translation_memory.models.translation_memory_model import BookMemoryStats
+from translation_memory.services.segmenter import (
+    Paragraph,
+    fuzzy_keys,
+    is_trivial,
+    normalize,
+    segment_hash,
+    similarity,
+    split_paragraphs,
+    trigrams
+)
+from telemetry.services.metrics import TM_SEGMENTS, TM_TOKENS_SAVED
+
+# Trigram similarity from which a remembered sentence is passed to the model as a hint
+TM_FUZZY_MIN_SIMILARITY: float = float(os.getenv("TM_FUZZY_MIN_SIMILARITY", 0.6))
+# Most remembered sentences passed as hints with one translation
+TM_MAX_HINTS: int = int(os.getenv("TM_MAX_HINTS", 20))
+# Most candidates compared for the fuzzy lookup of one page
+TM_FUZZY_MAX_CANDIDATES: int = int(os.getenv("TM_FUZZY_MAX_CANDIDATES", 200))
+# Segments longer than this get no fuzzy keys (whole pages, long paragraphs): only exact matches
+TM_FUZZY_MAX_CHARS: int = int(os.getenv("TM_FUZZY_MAX_CHARS", 1000))
+# Sentence pairs are remembered only when each one's length ratio is within this factor of its paragraph's
+TM_ALIGN_MAX_RATIO_DEVIATION: float = float(os.getenv("TM_ALIGN_MAX_RATIO_DEVIATION", 1.8))
+
+_PROJECTION = {"_id": 0, "source_hash": 1, "source": 1, "target": 1}
+
+
+@dataclass
+class MemoryLookup:
+    translation: Optional[str] = None  # The whole text, when the page or each of its paragraphs is in the memory
+    segments: int = 0
+    exact_hits: int = 0
+    fuzzy_hits: int = 0
+    hints: List[Tuple[str, str]] = field(default_factory=list)  # (source, translation) for the model
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _units(paragraphs: List[Paragraph]) -> List[str]:
+    return [normalize(text) for paragraph in paragraphs
+            for text in [paragraph.text, *(sentence for sentence, _ in paragraph.sentences)]
+            if not is_trivial(text)]
+
+
+async def lookup_translation(text: str,
+                             source_lang: str,
+                             target_lang: str,
+                             tm_repo: TranslationMemoryRepo
+) -> MemoryLookup:
+    """ Looks the text up in the memory: as a whole, by paragraph, then by sentence. When the whole text
+    or every paragraph is found, `translation` is the text put together from the memory. Otherwise the
+    remembered paragraphs and sentences, exact and similar ones, come back as `hints`: sentence pairs
+    come from an automatic alignment, so they are never served without the model.
+    """
+    paragraphs = split_paragraphs(text)
+    page = normalize(text)
+    hashes = {segment_hash(unit) for unit in [page, *_units(paragraphs)]}
+    docs = await tm_repo.find({"source_lang": source_lang, "target_lang": target_lang,
+                               "source_hash": {"$in": list(hashes)}}, _PROJECTION).to_list(None)
+    found: Dict[str, dict] = {doc["source_hash"]: doc for doc in docs}
+
+    lookup = MemoryLookup()
+    sentences = [sentence for paragraph in paragraphs for sentence, _ in paragraph.sentences if not is_trivial(sentence)]
+    lookup.segments = len(sentences)
+    if segment_hash(page) in found:
+        lookup.exact_hits = lookup.segments
+        lookup.translation = found[segment_hash(page)]["target"]
+        return lookup
+
+    parts: List[str] = []
+    misses: List[str] = []
+    complete = True
+    for paragraph in paragraphs:
+        remembered = found.get(segment_hash(normalize(paragraph.text)))
+        if remembered:
+            lookup.exact_hits += sum(1 for sentence, _ in paragraph.sentences if not is_trivial(sentence))
+            lookup.hints.append((remembered["source"], remembered["target"]))
+            parts.append(remembered["target"] + paragraph.separator)
+            continue
+        if is_trivial(paragraph.text):
+            parts.append(paragraph.text + paragraph.separator)
+            continue
+        complete = False
+        for sentence, _ in paragraph.sentences:
+            if is_trivial(sentence):
+                continue
+            remembered = found.get(segment_hash(normalize(sentence)))
+            if remembered:
+                lookup.exact_hits += 1
+                lookup.hints.append((remembered["source"], remembered["target"]))
+            else:
+                misses.append(normalize(sentence))
+
+    if complete:
+        lookup.translation = "".join(parts)
+        lookup.hints = []
+        return lookup
+
+    await _add_fuzzy_hints(lookup, misses, source_lang, target_lang, tm_repo)
+    del lookup.hints[TM_MAX_HINTS:]
+    return lookup
+
+
+async def _add_fuzzy_hints(lookup: MemoryLookup,
+                           misses: List[str],
+                           source_lang: str,
+                           target_lang: str,
+                           tm_repo: TranslationMemoryRepo
+) -> None:
+    keys = {key for miss in misses if len(miss) <= TM_FUZZY_MAX_CHARS for key in fuzzy_keys(miss)}
+    if not keys:
+        return
+    candidates = await tm_repo.find({"source_lang": source_lang, "target_lang": target_lang,
+                                     "fuzzy_keys": {"$in": list(keys)}}, _PROJECTION).to_list(TM_FUZZY_MAX_CANDIDATES)
+    grams = [(candidate, trigrams(candidate["source"])) for candidate in candidates]
+    hinted = {source for source, _ in lookup.hints}
+    for miss in misses:
+        miss_grams = trigrams(miss)
+        best, score = None, TM_FUZZY_MIN_SIMILARITY
+        for candidate, candidate_grams in grams:
+            candidate_score = similarity(miss_grams, candidate_grams)
+            if candidate_score >= score:
+                best, score = candidate, candidate_score
+        if best is not None:
+            lookup.fuzzy_hits += 1
+            if best["source"] not in hinted:
+                hinted.add(best["source"])
+                lookup.hints.append((best["source"], best["target"]))
+
+
+def format_hints(hints: List[Tuple[str, str]]) -> str:
+    """Remembered translations, to send with the text (not the cacheable instructions: they vary by page)."""
+    lines = "\n".join(f"- {source} => {target}" for source, target in hints)
+    return f"Approved translations of similar passages, reuse them where they apply:\n{lines}"
+
+
+def _lengths_agree(sources: List[str], targets: List[str], paragraph_ratio: float) -> bool:
+    """Whether every sentence's translation is about as long, relative to its source, as the paragraph's is:
+    a sentence split differently on one side shifts the pairs after it, which skews their ratios."""
+    for source, target in zip(sources, targets):
+        deviation = (len(target) / max(len(source), 1)) / paragraph_ratio
+        if not 1 / TM_ALIGN_MAX_RATIO_DEVIATION <= deviation <= TM_ALIGN_MAX_RATIO_DEVIATION:
+            return False
+    return True
+
+
+def _align(source_text: str, target_text: str) -> List[Tuple[str, str]]:
+    """ (source, translation) pairs from an approved translation: the whole text, then the paragraphs
+    wherever both sides split into the same number of them, and the sentences of a paragraph when they
+    also do and their lengths agree (see `_lengths_agree`).
+    Sources are normalized for lookups; whole texts and paragraphs keep their translation's line breaks.
+    """
+    pairs = [(normalize(source_text), target_text.strip())]
+    source_paragraphs = [p for p in split_paragraphs(source_text) if not is_trivial(p.text)]
+    target_paragraphs = [p for p in split_paragraphs(target_text) if not is_trivial(p.text)]
+    if len(source_paragraphs) != len(target_paragraphs):
+        return pairs
+    for source, target in zip(source_paragraphs, target_paragraphs):
+        pairs.append((normalize(source.text), target.text.strip()))
+        source_sentences = [normalize(s) for s, _ in source.sentences if not is_trivial(s)]
+        target_sentences = [normalize(s) for s, _ in target.sentences if not is_trivial(s)]
+        if len(source_sentences) != len(target_sentences):
+            continue
+        ratio = sum(map(len, target_sentences)) / max(sum(map(len, source_sentences)), 1)
+        if _lengths_agree(source_sentences, target_sentences, ratio):
+            pairs.extend(zip(source_sentences, target_sentences))
+    return pairs
+
+
+async def learn_translation(source_text: str,
+                            target_text: str,
+                            source_lang: str,
+                            target_lang: str,
+                            tm_repo: TranslationMemoryRepo,
+                            book_id: Optional[str] = None,
+                            page_id: Optional[str] = None
+) -> int:
+    """Stores an approved translation in the memory, replacing earlier translations of the same segments."""
+    if not source_text.strip() or not target_text.strip():
+        return 0
+    now = datetime.now(timezone.utc)
+    segments = {segment_hash(source): (source, target) for source, target in _align(source_text, target_text) if source}
+    updates = []
+    for digest, (source, target) in segments.items():
+        updates.append(({"source_lang": source_lang, "target_lang": target_lang, "source_hash": digest}, {
+            "$set": {"source": source,
+                     "target": target,
+                     "fuzzy_keys": fuzzy_keys(source) if len(source) <= TM_FUZZY_MAX_CHARS else [],
+                     "book_id": book_id,
+                     "page_id": page_id,
+                     "updated_at": now},
+            "$setOnInsert": {"id": str(ObjectId()), "created_at": now},
+        }))
+    await tm_repo.bulk_update(updates, upsert=True)
+    return len(updates)
+
+
+async def record_memory_use(book_id: Optional[str],
+                            lookup: MemoryLookup,
+                            tokens_saved: int,
+                            stats_repo: TranslationMemoryStatsRepo
+) -> None:
+    misses = lookup.segments - lookup.exact_hits - lookup.fuzzy_hits
+    TM_SEGMENTS.inc(lookup.exact_hits, result="exact")
+    TM_SEGMENTS.inc(lookup.fuzzy_hits, result="fuzzy")
+    TM_SEGMENTS.inc(max(misses, 0), result="miss")
+    if tokens_saved:
+        TM_TOKENS_SAVED.inc(tokens_saved)
+    if not book_id:
+        return
+    await stats_repo.update_one({"book_id": book_id}, {"$inc": {
+        "segments": lookup.segments,
+        "exact_hits": lookup.exact_hits,
+        "fuzzy_hits": lookup.fuzzy_hits,
+        "pages_served": 1 if lookup.translation is not None else 0,
+        "tokens_saved": tokens_saved,
+    }}, upsert=True)
+
+
+async def get_book_memory_stats_service(book_id: str, stats_repo: TranslationMemoryStatsRepo) -> BookMemoryStats:
+    doc = await stats_repo.find_one({"book_id": book_id}, {"_id": 0, "tenant_id": 0})
+    return BookMemoryStats(**doc) if doc else BookMemoryStats(book_id=book_id)
+
+
+async def learn_page_translation(page_id: str,
+                                 translation: str,
+                                 pages_repo: PageRepo,
+                                 tm_repo: TranslationMemoryRepo
+) -> int:
+    """Stores the approved translation of a page against its OCR text."""
+    page = await pages_repo.find_one({"id": page_id}, {"_id": 0, "book_id": 1, "ocr": 1, "translation.language": 1})
+    if not page:
+        return 0
+    ocr = page.get("ocr") or {}
+    source_lang, target_lang = ocr.get("language"), (page.get("translation") or {}).get("language")
+    if not ocr.get("data") or not source_lang or not target_lang:
+        return 0
+    return await learn_translation(ocr["data"], translation, source_lang, target_lang, tm_repo,
+                                   book_id=page.get("book_id"), page_id=page_id)
@@ -0,0 +1,17 @@
+from core.base_repo import BaseRepo
+from core.dependency import request_context_dependency
+from core.models.req_context_model import RequestContext
+
+class TranslationMemoryRepo(BaseRepo):
+    def __init__(self, ctx: RequestContext):
+        super().__init__("translation_memory", ctx)
+
+class TranslationMemoryStatsRepo(BaseRepo):
+    def __init__(self, ctx: RequestContext):
+        super().__init__("translation_memory_stats", ctx)
+
+def get_translation_memory_repo(ctx: request_context_dependency) -> TranslationMemoryRepo:
+    return TranslationMemoryRepo(ctx)
+
+def get_translation_memory_stats_repo(ctx: request_context_dependency) -> TranslationMemoryStatsRepo:
+    return TranslationMemoryStatsRepo(ctx)
@@ -2,6 +2,9 @@ from io import BytesIO
 from PIL import Image
 import aiohttp
 
+from telemetry.services.metrics import IMAGE_PROCESSING_LATENCY
+from telemetry.services.instrumentation import instrument
+
 # Disable DecompressionBombError for large images
 # Image.MAX_IMAGE_PIXELS = None
 
@@ -12,18 +15,19 @@ class MockUploadFile:
         self.content_type = content_type
 
 async def compress_image(file, max_width: int) -> BytesIO:
-    # Handle both UploadFile and BytesIO objects
-    if hasattr(file, 'file'):
-        # It's an UploadFile or similar object
-        # Ensure we can read from it
-        file.file.seek(0)  # Reset to beginning
-        image = Image.open(file.file)
-    else:
-        # It's already a BytesIO object
-        file.seek(0)  # Reset to beginning
-        image = Image.open(file)
-    
-    return await _get_compressed_jpeg(image, max_width)    
+    with instrument("image.compress", IMAGE_PROCESSING_LATENCY, operation="compress"):
+        # Handle both UploadFile and BytesIO objects
+        if hasattr(file, 'file'):
+            # It's an UploadFile or similar object
+            # Ensure we can read from it
+            file.file.seek(0)  # Reset to beginning
+            image = Image.open(file.file)
+        else:
+            # It's already a BytesIO object
+            file.seek(0)  # Reset to beginning
+            image = Image.open(file)
+        
+        return await _get_compressed_jpeg(image, max_width)    
 
 async def get_compressed_image_from_url(image_url: str, max_width: int) -> BytesIO:
     """Generate a compressed thumbnail from an existing image URL"""
@@ -33,14 +37,30 @@ async def get_compressed_image_from_url(image_url: str, max_width: int) -> Bytes
                 response.raise_for_status()
                 content = await response.read()
         
-        image = Image.open(BytesIO(content))
-        return await _get_compressed_jpeg(image, max_width)                
+        with instrument("image.compress_from_url", IMAGE_PROCESSING_LATENCY, operation="compress_from_url"):
+            image = Image.open(BytesIO(content))
+            return await _get_compressed_jpeg(image, max_width)                
         
     except Exception as e:
         raise Exception(f"Failed to generate thumbnail: {str(e)}")
     
 async def _get_compressed_jpeg(image: Image.Image, max_width: int, quality: int = 85) -> BytesIO:
     """Helper function to process and compress a PIL Image object."""
+    return _compress_to_jpeg(image, max_width, quality)
+
+def downscale_image_bytes(content: bytes, max_width: int, quality: int = 85) -> BytesIO:
+    """ Re-encodes an image as JPEG no wider than `max_width` (never upscales).
+    Synchronous and CPU-bound: call it through `asyncio.to_thread` from request handlers.
+    """
+    with instrument("image.downscale", IMAGE_PROCESSING_LATENCY, operation="downscale"):
+        image = Image.open(BytesIO(content))
+        if image.mode in ("P", "LA"):
+            image = image.convert("RGBA")
+        elif image.mode not in ("RGB", "L", "RGBA"):
+            image = image.convert("RGB")
+        return _compress_to_jpeg(image, min(max_width, image.width), quality)
+
+def _compress_to_jpeg(image: Image.Image, max_width: int, quality: int = 85) -> BytesIO:
     # Check for EXIF orientation and rotate if needed
     try:
         exif = image.getexif()
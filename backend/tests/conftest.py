@@ -0,0 +1,78 @@
+""" Runs `main:app` in-process against mongomock-motor, with `backend/src` on the path.
+
+    pip install -r backend/requirements.txt -r backend/tests/requirements.txt
+    python -m pytest backend/tests
+"""
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+os.environ.setdefault("MONGO_URI_CELL_DEFAULT", "mongodb://tests.invalid")
+os.environ.setdefault("MONGO_DB_CELL_DEFAULT", "tests")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")  # S3 is not reached by the tested routes
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("S3_BUCKET_CELL_DEFAULT", "tests")
+os.environ.setdefault("S3_REGION_CELL_DEFAULT", "us-east-1")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("MISTRAL_API_KEY", "test-key")
+
+_mock_clients = {}
+
+def _shared_mock_client(mongo_uri: str, **kwargs):
+    """mongomock keeps data per client instance, so every MongoService for a URI must share one."""
+    from mongomock_motor import AsyncMongoMockClient
+    if mongo_uri not in _mock_clients:
+        _mock_clients[mongo_uri] = AsyncMongoMockClient(tz_aware=True)
+    return _mock_clients[mongo_uri]
+
+import cell.services.mongo_service as mongo_service  # noqa: E402
+mongo_service.AsyncIOMotorClient = _shared_mock_client
+
+from main import app  # noqa: E402  (must come after the Mongo stand-in is installed)
+from cell.models.cell_registry import CellID  # noqa: E402
+from cell.services.cell_manager import get_cell  # noqa: E402
+from core.models.req_context_model import RequestContext  # noqa: E402
+from core.indexes import ensure_indexes  # noqa: E402
+from tenant.models.tenant_model import Tenant  # noqa: E402
+from tenant.services.tenant_resolver import get_tenants_collection  # noqa: E402
+
+
+def run(coro):
+    """Runs a coroutine to completion; tests are synchronous, like FastAPI's TestClient."""
+    return asyncio.run(coro)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def indexes():
+    """The cell's indexes as startup creates them; unique ones are what some writes rely on to collide."""
+    run(ensure_indexes(get_cell(CellID.CELL_DEFAULT).mongo_service.get_db()))
+
+
+@pytest.fixture
+def tenant():
+    tenant = Tenant(name="Test Library", slug=f"test-{os.urandom(4).hex()}")
+    run(get_tenants_collection().insert_one(tenant.model_dump()))
+    return tenant
+
+
+@pytest.fixture
+def ctx(tenant) -> RequestContext:
+    """A context of the tenant for seeding and updating data through the repositories."""
+    return RequestContext(tenant_id=tenant.id,
+                          tenant_slug=tenant.slug,
+                          tenant_name=tenant.name,
+                          tenant_permissions={},
+                          cell=get_cell(CellID.CELL_DEFAULT),
+                          user_id=None,
+                          user_roles=[])
+
+
+@pytest.fixture
+def client(tenant):
+    from fastapi.testclient import TestClient
+    with TestClient(app, headers={"X-Tenant-Slug": tenant.slug}) as client:
+        yield client
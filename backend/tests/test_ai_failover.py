@@ -0,0 +1,191 @@
+""" Circuit breakers of the AI providers, and failover: which client `get_ai_client` picks while
+a provider's circuit is open.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ai.services import ai_registry, circuit_breaker
+from ai.services.ai_client_interface import Priority
+
+
+class FakeClient:
+    def __init__(self, name: str, supports_batch: bool = False, supports_document_ocr: bool = False):
+        self.name = name
+        self.supports_batch = supports_batch
+        self.supports_document_ocr = supports_document_ocr
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Three providers with fresh circuits: only `mistral` takes whole documents and batches."""
+    registry = {"mistral": FakeClient("mistral", supports_batch=True, supports_document_ocr=True),
+                "gemini": FakeClient("gemini"),
+                "openai": FakeClient("openai")}
+    monkeypatch.setattr(ai_registry, "_registry", registry)
+    monkeypatch.setattr(ai_registry, "AI_FAILOVER_ORDER", ["gemini", "mistral", "openai"])
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    return registry
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """The breakers' monotonic clock, moved forward by hand."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+class StatusError(Exception):
+    """An SDK error carrying the HTTP status, like mistralai's `SDKError`."""
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _open(provider: str) -> None:
+    breaker = circuit_breaker.get_breaker(provider)
+    for _ in range(circuit_breaker.AI_CIRCUIT_FAILURE_THRESHOLD):
+        breaker.record(TimeoutError())
+    assert not breaker.available
+
+
+def test_document_ocr_fails_over_only_to_providers_taking_documents(providers):
+    providers["openai"].supports_document_ocr = True
+    _open("mistral")
+
+    assert ai_registry.get_ai_client("mistral").name == "gemini"
+    assert ai_registry.get_ai_client("mistral", document_ocr=True).name == "openai"
+
+
+def test_document_ocr_without_a_capable_fallback_stays_on_the_open_circuit(providers):
+    _open("mistral")
+
+    assert ai_registry.get_ai_client("mistral", document_ocr=True).name == "mistral"
+
+
+def test_document_ocr_on_a_provider_without_it_is_rejected(providers):
+    with pytest.raises(Exception, match="no document OCR"):
+        ai_registry.get_ai_client("gemini", document_ocr=True)
+
+
+def test_errors_are_classified_by_status_and_type():
+    kinds = {status: circuit_breaker.classify_error(StatusError(status)) for status in (429, 401, 503, 408, 404)}
+    assert kinds == {429: circuit_breaker.ErrorKind.RATE_LIMITED,
+                     401: circuit_breaker.ErrorKind.AUTH,
+                     503: circuit_breaker.ErrorKind.TRANSIENT,
+                     408: circuit_breaker.ErrorKind.TRANSIENT,
+                     404: circuit_breaker.ErrorKind.INVALID_REQUEST}
+    assert circuit_breaker.classify_error(TimeoutError()) == circuit_breaker.ErrorKind.TRANSIENT
+    assert circuit_breaker.classify_error(ValueError("bad JSON")) == circuit_breaker.ErrorKind.UNKNOWN
+
+    try:
+        try:
+            raise StatusError(429)
+        except StatusError as e:
+            raise RuntimeError("OCR failed") from e
+    except RuntimeError as wrapped:
+        assert circuit_breaker.classify_error(wrapped) == circuit_breaker.ErrorKind.RATE_LIMITED
+
+
+def test_circuit_opens_after_consecutive_failures_only(providers, clock):
+    breaker = circuit_breaker.get_breaker("gemini")
+    for _ in range(circuit_breaker.AI_CIRCUIT_FAILURE_THRESHOLD - 1):
+        breaker.record(StatusError(503))
+    breaker.record(None)
+    for _ in range(circuit_breaker.AI_CIRCUIT_FAILURE_THRESHOLD - 1):
+        breaker.record(StatusError(503))
+    assert breaker.state == circuit_breaker.CircuitState.CLOSED
+
+    breaker.record(StatusError(503))
+    assert breaker.state == circuit_breaker.CircuitState.OPEN
+    with pytest.raises(circuit_breaker.ProviderUnavailableError):
+        breaker.before_call()
+
+
+def test_invalid_requests_do_not_count_against_the_provider(providers, clock):
+    breaker = circuit_breaker.get_breaker("gemini")
+    for _ in range(circuit_breaker.AI_CIRCUIT_FAILURE_THRESHOLD * 2):
+        breaker.record(StatusError(400))
+    assert breaker.state == circuit_breaker.CircuitState.CLOSED
+
+
+def test_open_circuit_lets_one_probe_through_after_the_reset_time(providers, clock):
+    _open("gemini")
+    breaker = circuit_breaker.get_breaker("gemini")
+    clock.now += circuit_breaker.AI_CIRCUIT_RESET_SECONDS
+    assert breaker.available
+
+    breaker.before_call()
+    assert breaker.state == circuit_breaker.CircuitState.HALF_OPEN
+    assert not breaker.available
+    with pytest.raises(circuit_breaker.ProviderUnavailableError):
+        breaker.before_call()
+
+    breaker.record(None)
+    assert breaker.state == circuit_breaker.CircuitState.CLOSED
+    assert breaker.available
+
+
+def test_failed_probe_reopens_the_circuit(providers, clock):
+    _open("gemini")
+    breaker = circuit_breaker.get_breaker("gemini")
+    clock.now += circuit_breaker.AI_CIRCUIT_RESET_SECONDS
+
+    with pytest.raises(TimeoutError):
+        with breaker:
+            raise TimeoutError()
+    assert breaker.state == circuit_breaker.CircuitState.OPEN
+    assert not breaker.available
+
+
+def test_cancelled_probe_frees_the_probe_slot(providers, clock):
+    _open("gemini")
+    breaker = circuit_breaker.get_breaker("gemini")
+    clock.now += circuit_breaker.AI_CIRCUIT_RESET_SECONDS
+
+    with pytest.raises(asyncio.CancelledError):
+        with breaker:
+            raise asyncio.CancelledError()
+    assert breaker.state == circuit_breaker.CircuitState.HALF_OPEN
+    assert breaker.available
+
+
+def test_open_circuit_fails_over_in_order_until_the_provider_recovers(providers, clock):
+    _open("mistral")
+    assert ai_registry.get_ai_client("mistral").name == "gemini"
+
+    _open("gemini")
+    assert ai_registry.get_ai_client("mistral").name == "openai"
+
+    clock.now += circuit_breaker.AI_CIRCUIT_RESET_SECONDS
+    assert ai_registry.get_ai_client("mistral").name == "mistral"
+
+
+def test_nothing_healthy_to_fail_over_to_stays_on_the_requested_provider(providers, clock):
+    for name in providers:
+        _open(name)
+
+    assert ai_registry.get_ai_client("gemini").name == "gemini"
+    with pytest.raises(circuit_breaker.ProviderUnavailableError):
+        circuit_breaker.get_breaker("gemini").before_call()
+
+
+def test_batch_priority_fails_over_only_to_providers_with_batches(providers, clock):
+    providers["openai"].supports_batch = True
+    _open("mistral")
+
+    assert ai_registry.get_ai_client("mistral", Priority.BATCH).name == "openai"
+    with pytest.raises(Exception, match="no batch mode"):
+        ai_registry.get_ai_client("gemini", Priority.BATCH)
+
+
+def test_hedges_go_to_a_healthy_provider(providers, clock):
+    assert ai_registry.get_hedge_client(providers["gemini"]).name == "mistral"
+    assert ai_registry.get_hedge_client(providers["gemini"], same=True).name == "gemini"
+
+    _open("mistral")
+    assert ai_registry.get_hedge_client(providers["gemini"]).name == "openai"
+    _open("gemini")
+    assert ai_registry.get_hedge_client(providers["gemini"], same=True) is None
@@ -0,0 +1,70 @@
+""" Book archive imports: the limits that keep a crafted zip from exhausting memory or disk. """
+import io
+import json
+import os
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from conftest import run
+from book.book_repo import BookRepo
+from book.services import book_archive_service as archives
+from page.page_repo import PageRepo
+
+
+def _archive(entries: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps({"format": archives.ARCHIVE_FORMAT, "version": archives.ARCHIVE_VERSION}))
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _import(ctx, data: bytes, size=None):
+    file = UploadFile(io.BytesIO(data), size=size, filename="book.zip")
+    # S3 is never reached: every rejection happens before the first upload
+    return run(archives.import_book_archive_service(file, BookRepo(ctx), PageRepo(ctx), s3=None))
+
+
+def test_upload_above_the_limit_is_rejected(ctx, monkeypatch):
+    monkeypatch.setattr(archives, "BOOK_ARCHIVE_MAX_BYTES", 1000)
+    data = _archive({"files/scan.jpg": os.urandom(2000)})
+
+    with pytest.raises(HTTPException) as error:
+        _import(ctx, data, size=len(data))
+    assert error.value.status_code == 413
+
+
+def test_upload_size_is_measured_without_a_declared_size(ctx, monkeypatch):
+    monkeypatch.setattr(archives, "BOOK_ARCHIVE_MAX_BYTES", 1000)
+
+    with pytest.raises(HTTPException) as error:
+        _import(ctx, _archive({"files/scan.jpg": os.urandom(2000)}))
+    assert error.value.status_code == 413
+
+
+def test_archive_expanding_beyond_the_limit_is_rejected(ctx, monkeypatch):
+    """A few KB of zeros deflate to almost nothing: only the declared sizes reveal the bomb."""
+    monkeypatch.setattr(archives, "BOOK_ARCHIVE_MAX_UNCOMPRESSED_BYTES", 1024 * 1024)
+    data = _archive({"pages/00001.ndjson": b"\x00" * (2 * 1024 * 1024)})
+    assert len(data) < 1024 * 1024
+
+    with pytest.raises(HTTPException) as error:
+        _import(ctx, data)
+    assert error.value.status_code == 413
+
+
+def test_archive_with_too_many_entries_is_rejected(ctx, monkeypatch):
+    monkeypatch.setattr(archives, "BOOK_ARCHIVE_MAX_ENTRIES", 10)
+
+    with pytest.raises(HTTPException) as error:
+        _import(ctx, _archive({f"files/{number}.jpg": b"" for number in range(20)}))
+    assert error.value.status_code == 413
+
+
+def test_archive_within_the_limits_is_read(ctx):
+    """An archive passing the limits gets as far as its (here missing) book entry."""
+    with pytest.raises(KeyError):
+        _import(ctx, _archive({"files/scan.jpg": b"\x00" * 100}))
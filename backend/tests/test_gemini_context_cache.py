@@ -0,0 +1,95 @@
+""" Gemini context caches of translation instructions: reuse, replacement, failures and eviction. """
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import run
+from ai.services import circuit_breaker, gemini_ai
+from ai.services.gemini_ai import GeminiClient
+
+INSTRUCTIONS = "Translate from Latin into English. " * 500  # Long enough to be cached
+
+
+class FakeCaches:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.attempts = 0
+        self.created = []
+        self.deleted = []
+
+    async def create(self, model, config):
+        self.attempts += 1
+        if self.fail:
+            raise RuntimeError("cache creation failed")
+        name = f"cachedContents/{len(self.created)}"
+        self.created.append(name)
+        return SimpleNamespace(name=name)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def _key(caches: FakeCaches, label: str = "key0"):
+    return SimpleNamespace(label=label, client=SimpleNamespace(aio=SimpleNamespace(caches=caches)))
+
+
+@pytest.fixture
+def gemini(monkeypatch) -> GeminiClient:
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    return GeminiClient()
+
+
+def test_cache_is_created_once_and_reused(gemini):
+    caches = FakeCaches()
+
+    async def scenario():
+        return await asyncio.gather(*(gemini._context_cache(_key(caches), "book", INSTRUCTIONS) for _ in range(3)))
+
+    assert run(scenario()) == ["cachedContents/0"] * 3
+    assert caches.created == ["cachedContents/0"]
+
+
+def test_edited_instructions_supersede_the_cache(gemini):
+    caches = FakeCaches()
+
+    async def scenario():
+        first = await gemini._context_cache(_key(caches), "book", INSTRUCTIONS)
+        second = await gemini._context_cache(_key(caches), "book", INSTRUCTIONS + "Keep the glossary.")
+        return first, second
+
+    assert run(scenario()) == ("cachedContents/0", "cachedContents/1")
+    assert caches.deleted == ["cachedContents/0"]
+    assert len(gemini._context_caches) == 1
+
+
+def test_failed_creation_is_not_retried_until_the_retry_delay(gemini, monkeypatch):
+    monkeypatch.setattr(gemini_ai, "GEMINI_CONTEXT_CACHE_RETRY_SECONDS", 0.2)
+    caches = FakeCaches(fail=True)
+
+    async def scenario():
+        results = [await gemini._context_cache(_key(caches), "book", INSTRUCTIONS) for _ in range(3)]
+        caches.fail = False
+        during = await gemini._context_cache(_key(caches), "book", INSTRUCTIONS)
+        await asyncio.sleep(0.25)
+        after = await gemini._context_cache(_key(caches), "book", INSTRUCTIONS)
+        return results, during, after
+
+    results, during, after = run(scenario())
+    assert results == [None, None, None]
+    assert during is None  # Still within the retry delay: not even tried
+    assert after == "cachedContents/0"
+    assert caches.attempts == 2
+
+
+def test_expired_caches_are_forgotten(gemini, monkeypatch):
+    monkeypatch.setattr(gemini_ai, "GEMINI_CONTEXT_CACHE_TTL_SECONDS", 0)
+    caches = FakeCaches()
+
+    async def scenario():
+        for book in range(5):
+            await gemini._context_cache(_key(caches), f"book-{book}", INSTRUCTIONS)
+            gemini._context_caches_swept_at = 0.0  # Sweep on every call
+        return set(gemini._context_caches)
+
+    assert run(scenario()) == {("key0", "book-4")}
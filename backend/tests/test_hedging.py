@@ -0,0 +1,129 @@
+""" Hedged AI calls: when a duplicate is sent, what the latency window learns, and figures stored once. """
+import asyncio
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from conftest import run
+from ai.services import hedging
+from ai.services.ocr_figures import OcrFigureUploader
+
+
+class FakeProvider:
+    """Answers after `seconds`; with `s3`, stores one figure of the answer, like Mistral OCR does."""
+    def __init__(self, name: str, seconds: float, s3=None):
+        self.name = name
+        self.seconds = seconds
+        self.s3 = s3
+        self.calls = 0
+
+    async def ocr(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        if self.s3 is not None:
+            figures = OcrFigureUploader(self.s3, book_id="book", page_id="page")
+            await figures.add("img-0", _figure_data_url(self.name))
+            await figures.finish()
+        return self.name
+
+
+def _figure_data_url(text: str) -> str:
+    output = BytesIO()
+    Image.new("RGB", (8, 8), (len(text) * 20 % 256, 0, 0)).save(output, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(output.getvalue()).decode()}"
+
+
+class StubS3:
+    def __init__(self):
+        self.uploads = []
+
+    async def upload_ocr_figure(self, book_id, page_id, filename, file, content_type):
+        self.uploads.append(filename)
+        return f"https://files.invalid/{filename}"
+
+
+@pytest.fixture(autouse=True)
+def hedging_on(monkeypatch):
+    """Hedging enabled after 0.1s, with a fresh latency window and budget."""
+    monkeypatch.setattr(hedging, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "_MIN_DELAY", 0.01)
+    monkeypatch.setattr(hedging, "_latencies", {})
+    monkeypatch.setattr(hedging, "_budgets", hedging.OrderedDict({"tenant": hedging.AI_HEDGE_BUDGET_BURST}))
+    for _ in range(hedging._MIN_SAMPLES):
+        hedging._observe("primary", "ocr", 0.1)
+
+
+def _hedge_to(monkeypatch, provider: FakeProvider) -> None:
+    monkeypatch.setattr(hedging, "get_hedge_client", lambda client, same=False: provider)
+
+
+def test_fast_call_is_not_hedged(monkeypatch):
+    primary, hedge = FakeProvider("primary", 0.01), FakeProvider("hedge", 0.01)
+    _hedge_to(monkeypatch, hedge)
+
+    result, client = run(hedging.hedged_call("tenant", "ocr", primary, lambda ai: ai.ocr()))
+
+    assert (result, client) == ("primary", primary)
+    assert hedge.calls == 0
+
+
+def test_late_call_is_hedged_and_the_first_answer_wins(monkeypatch):
+    primary, hedge = FakeProvider("primary", 1.0), FakeProvider("hedge", 0.05)
+    _hedge_to(monkeypatch, hedge)
+
+    result, client = run(hedging.hedged_call("tenant", "ocr", primary, lambda ai: ai.ocr()))
+
+    assert (result, client) == ("hedge", hedge)
+    assert (primary.calls, hedge.calls) == (1, 1)
+
+
+def test_cancelled_loser_counts_as_a_slow_call(monkeypatch):
+    """The primary lost after running past the hedge delay: its elapsed time enters the window as a lower bound."""
+    primary, hedge = FakeProvider("primary", 1.0), FakeProvider("hedge", 0.05)
+    _hedge_to(monkeypatch, hedge)
+
+    run(hedging.hedged_call("tenant", "ocr", primary, lambda ai: ai.ocr()))
+
+    samples = hedging._latencies[("primary", "ocr")]
+    assert len(samples) == hedging._MIN_SAMPLES + 1
+    assert samples[-1] >= 0.1
+
+
+def test_hedge_needs_budget(monkeypatch):
+    primary, hedge = FakeProvider("primary", 0.3), FakeProvider("hedge", 0.01)
+    _hedge_to(monkeypatch, hedge)
+    hedging._budgets["tenant"] = 0.0
+
+    result, _ = run(hedging.hedged_call("tenant", "ocr", primary, lambda ai: ai.ocr()))
+
+    assert result == "primary"
+    assert hedge.calls == 0
+
+
+def test_budgets_of_many_tenants_are_bounded(monkeypatch):
+    monkeypatch.setattr(hedging, "_MAX_BUDGETS", 3)
+    for number in range(10):
+        hedging._earn(f"tenant-{number}")
+    hedging._earn("tenant-7")
+
+    assert list(hedging._budgets) == ["tenant-8", "tenant-9", "tenant-7"]
+
+
+@pytest.mark.parametrize("primary_seconds, hedge_seconds, winner", [(1.0, 0.05, "hedge"), (0.2, 1.0, "primary")])
+def test_figures_are_uploaded_by_the_winner_only(monkeypatch, primary_seconds, hedge_seconds, winner):
+    s3 = StubS3()
+    primary, hedge = FakeProvider("primary", primary_seconds, s3), FakeProvider("hedge", hedge_seconds, s3)
+    _hedge_to(monkeypatch, hedge)
+
+    async def scenario():
+        result = await hedging.hedged_call("tenant", "ocr", primary, lambda ai: ai.ocr())
+        await asyncio.sleep(0.1)  # Time for a loser's upload, had it not been held back
+        return result
+
+    result, client = run(scenario())
+
+    assert result == winner
+    assert (primary.calls, hedge.calls) == (1, 1)
+    assert len(s3.uploads) == 1
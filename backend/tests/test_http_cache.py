@@ -0,0 +1,150 @@
+""" Conditional GETs of books and pages: validators, 304 responses and the headers caches key on. """
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from conftest import run
+from book.book_repo import BookRepo
+from book.models.book_model import Book
+from page.page_repo import PageRepo
+from page.models.page_model import OcrData, Page
+from core.http_cache import CACHE_REVALIDATE
+from tenant.models.tenant_model import Tenant
+from tenant.services.tenant_resolver import get_tenants_collection
+
+
+@pytest.fixture
+def book(ctx) -> Book:
+    book = Book(title="De revolutionibus", author="Copernicus", published="1543", language="Latin",
+                thumbnail="https://files.invalid/thumbnail.jpg")
+    run(BookRepo(ctx).insert_one(book.model_dump(exclude={"tenant"})))
+    return book
+
+
+@pytest.fixture
+def page(ctx, book) -> Page:
+    page = Page(book_id=book.id,
+                page_number=1,
+                ocr=OcrData(language="Latin", data="Liber primus."),
+                translation={"language": "English", "data": "Book one."},
+                photo="https://files.invalid/1.jpg",
+                thumbnail="https://files.invalid/1_thumb.jpg",
+                compressed_photo="https://files.invalid/1_compressed.jpg")
+    run(PageRepo(ctx).insert_one(page.model_dump(exclude={"tenant"})))
+    return page
+
+
+def _assert_cache_headers(response) -> None:
+    assert response.headers["Cache-Control"] == CACHE_REVALIDATE
+    vary = {header.strip().lower() for header in response.headers["Vary"].split(",")}
+    assert {"x-tenant-slug", "authorization"} <= vary
+
+
+@pytest.mark.parametrize("path", ["/book/{book_id}", "/book/details/{book_id}", "/book/", "/page/{page_id}"])
+def test_response_carries_validators(client, book, page, path):
+    response = client.get(path.format(book_id=book.id, page_id=page.id))
+
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"')
+    _assert_cache_headers(response)
+
+
+@pytest.mark.parametrize("path", ["/book/{book_id}", "/book/details/{book_id}", "/book/", "/page/{page_id}"])
+def test_matching_if_none_match_is_not_modified(client, book, page, path):
+    path = path.format(book_id=book.id, page_id=page.id)
+    etag = client.get(path).headers["ETag"]
+
+    response = client.get(path, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    _assert_cache_headers(response)
+
+
+def test_if_none_match_uses_weak_comparison_over_a_list(client, book):
+    etag = client.get(f"/book/{book.id}").headers["ETag"]
+
+    response = client.get(f"/book/{book.id}", headers={"If-None-Match": f'"stale", W/{etag}'})
+
+    assert response.status_code == 304
+
+
+def test_stale_if_none_match_gets_the_resource(client, book):
+    response = client.get(f"/book/{book.id}", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json()["id"] == book.id
+
+
+def test_book_etag_changes_after_update(client, ctx, book):
+    etag = client.get(f"/book/{book.id}").headers["ETag"]
+    time.sleep(0.001)  # `updated_at` has millisecond precision in Mongo
+    run(BookRepo(ctx).update_one({"id": book.id}, {"$set": {"title": "De revolutionibus orbium coelestium"}}))
+
+    response = client.get(f"/book/{book.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["title"] == "De revolutionibus orbium coelestium"
+
+
+def test_book_details_etag_changes_after_page_update(client, ctx, book, page):
+    book_etag = client.get(f"/book/{book.id}").headers["ETag"]
+    details_etag = client.get(f"/book/details/{book.id}").headers["ETag"]
+    time.sleep(0.001)
+    run(PageRepo(ctx).update_one({"id": page.id}, {"$set": {"thumbnail": "https://files.invalid/1_thumb_v2.jpg"}}))
+
+    assert client.get(f"/book/details/{book.id}", headers={"If-None-Match": details_etag}).status_code == 200
+    # The book alone does not embed its pages
+    assert client.get(f"/book/{book.id}", headers={"If-None-Match": book_etag}).status_code == 304
+
+
+def test_page_etag_changes_after_update(client, ctx, page):
+    etag = client.get(f"/page/{page.id}").headers["ETag"]
+    time.sleep(0.001)
+    run(PageRepo(ctx).update_one({"id": page.id}, {"$set": {"thumbnail": "https://files.invalid/1_thumb_v2.jpg"}}))
+
+    response = client.get(f"/page/{page.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_library_etag_changes_after_delete(client, ctx, book, page):
+    etag = client.get("/book/").headers["ETag"]
+    run(PageRepo(ctx).delete_one({"id": page.id}))
+
+    response = client.get("/book/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_if_modified_since(client, page):
+    last_modified = client.get(f"/page/{page.id}").headers["Last-Modified"]
+    earlier = format_datetime(datetime.now(timezone.utc) - timedelta(days=1), usegmt=True)
+
+    assert client.get(f"/page/{page.id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(f"/page/{page.id}", headers={"If-Modified-Since": earlier}).status_code == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since(client, page):
+    last_modified = client.get(f"/page/{page.id}").headers["Last-Modified"]
+
+    response = client.get(f"/page/{page.id}", headers={"If-None-Match": '"stale"', "If-Modified-Since": last_modified})
+
+    assert response.status_code == 200
+
+
+def test_validators_are_per_tenant(client, book):
+    """Another tenant asking for the book with its ETag gets no 304: validators are read in the tenant's scope."""
+    etag = client.get(f"/book/{book.id}").headers["ETag"]
+    other = Tenant(name="Other Library", slug=f"other-{book.id}")
+    run(get_tenants_collection().insert_one(other.model_dump()))
+
+    response = client.get(f"/book/{book.id}", headers={"X-Tenant-Slug": other.slug, "If-None-Match": etag})
+
+    assert response.status_code == 404
@@ -0,0 +1,75 @@
+""" API key pools: quarantine steers calls to other keys, and never holds calls up. """
+import asyncio
+
+import pytest
+
+from conftest import run
+from ai.services import key_pool
+from ai.services.key_pool import KeyPool
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+async def _call(pool: KeyPool, error=None) -> str:
+    """One provider call through the pool; returns the label of the key it went to."""
+    async with pool.acquire() as key:
+        if error is not None:
+            raise error
+        return key.label
+
+
+async def _refused(pool: KeyPool, status_code: int) -> None:
+    with pytest.raises(ProviderError):
+        await _call(pool, ProviderError(status_code))
+
+
+@pytest.fixture(autouse=True)
+def least_loaded(monkeypatch):
+    monkeypatch.setattr(key_pool, "AI_KEY_SELECTION", "least_loaded")
+
+
+@pytest.mark.parametrize("status_code", [429, 401])
+def test_single_key_keeps_serving_while_quarantined(status_code):
+    """With nowhere to reroute to, the next call goes straight to the provider instead of sitting out the quarantine."""
+    async def scenario():
+        pool = KeyPool("test", [("only", object())], max_concurrency=4)
+        await _refused(pool, status_code)
+        assert pool.keys[0].quarantined(asyncio.get_running_loop().time())
+        assert not pool.healthy()
+        return await asyncio.wait_for(_call(pool), timeout=1)
+
+    assert run(scenario()) == "only"
+
+
+def test_quarantined_key_is_skipped_while_another_is_healthy():
+    async def scenario():
+        pool = KeyPool("test", [("first", object()), ("second", object())], max_concurrency=4)
+        await _refused(pool, 429)  # Both idle: the first key takes the call
+        assert pool.healthy()
+        return [await _call(pool) for _ in range(3)]
+
+    assert run(scenario()) == ["second"] * 3
+
+
+def test_all_keys_quarantined_goes_to_the_key_back_first():
+    async def scenario():
+        pool = KeyPool("test", [("first", object()), ("second", object())], max_concurrency=4)
+        await _refused(pool, 401)  # Long quarantine
+        await _refused(pool, 429)  # Short quarantine
+        assert not pool.healthy()
+        return await asyncio.wait_for(_call(pool), timeout=1)
+
+    assert run(scenario()) == "second"
+
+
+def test_invalid_requests_do_not_quarantine():
+    async def scenario():
+        pool = KeyPool("test", [("first", object()), ("second", object())], max_concurrency=4)
+        await _refused(pool, 400)
+        return pool.healthy(), [key.quarantined_until for key in pool.keys]
+
+    assert run(scenario()) == (True, [0.0, 0.0])
@@ -0,0 +1,76 @@
+""" Figures of OCR responses: re-encoding, and how many are decoded and uploaded at once. """
+import asyncio
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+from conftest import run
+from ai.services import ocr_figures
+from ai.services.ocr_figures import OcrFigureUploader
+
+
+def _data_url(image: Image.Image, format: str = "PNG") -> str:
+    output = BytesIO()
+    image.save(output, format=format)
+    return f"data:image/{format.lower()};base64,{base64.b64encode(output.getvalue()).decode()}"
+
+
+class StubS3:
+    """Records uploads, and how many were in flight at most."""
+    def __init__(self, seconds: float = 0.02):
+        self.seconds = seconds
+        self.uploads = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def upload_ocr_figure(self, book_id, page_id, filename, file, content_type):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.seconds)
+        self.in_flight -= 1
+        self.uploads.append((filename, file.getvalue()))
+        return f"https://files.invalid/{filename}"
+
+
+def test_transparency_becomes_white_in_jpeg(monkeypatch):
+    monkeypatch.setattr(ocr_figures, "OCR_FIGURE_FORMAT", "jpeg")
+    figure = Image.new("RGBA", (256, 256), (0, 0, 0, 0))
+    figure.paste(Image.effect_noise((128, 128), 64).convert("RGBA"), (64, 64))  # Noise: JPEG beats PNG
+
+    data, ext = ocr_figures._decode(_data_url(figure))
+
+    decoded = Image.open(BytesIO(data))
+    assert ext == "jpg"
+    assert min(decoded.getpixel((8, 8))) > 245
+
+
+def test_figures_in_flight_are_bounded_by_the_window():
+    s3 = StubS3()
+    window = asyncio.Semaphore(2)
+
+    async def scenario():
+        figures = OcrFigureUploader(s3, book_id="book", page_id="page", window=window)
+        for number in range(8):
+            await figures.add(f"img-{number}", _data_url(Image.new("RGB", (8, 8), (number * 30, 0, 0))))
+            assert len([task for task in figures._tasks if not task.done()]) <= 2
+        return await figures.finish()
+
+    urls = run(scenario())
+    assert len(urls) == 8
+    assert s3.max_in_flight <= 2
+
+
+def test_identical_figures_are_uploaded_once():
+    s3 = StubS3()
+    data_url = _data_url(Image.new("RGB", (8, 8), "blue"))
+
+    async def scenario():
+        figures = OcrFigureUploader(s3, book_id="book", page_id="page")
+        for number in range(3):
+            await figures.add(f"img-{number}", data_url)
+        return await figures.finish(), figures.urls
+
+    urls, uploaded = run(scenario())
+    assert len(s3.uploads) == 1
+    assert set(urls.values()) == set(uploaded)
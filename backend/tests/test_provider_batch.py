@@ -0,0 +1,185 @@
+""" Batch priority book OCR: submitting a provider batch, polling it, collecting it, and resuming it
+after the job was cancelled by a shutdown.
+"""
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import run
+from ai.services import ai_registry
+from ai.services.ai_client_interface import AiClientInterface, BatchResult, BatchState, BatchStatus, Priority
+from book.book_repo import BookRepo
+from page.page_repo import PageRepo
+from jobs.job_repo import JobRepo
+from jobs.models.job_model import JobStatus
+from jobs.services.job_runner import stop_jobs
+from ocr.services import document_ocr_service as service
+
+
+class FakeBatchClient(AiClientInterface):
+    """A provider batch API in memory: a batch runs until `finish()`, or fails with `fail()`."""
+    name = "fake"
+    supports_batch = True
+
+    def __init__(self):
+        self.submitted: List[List[Tuple[str, str]]] = []
+        self.polls = 0
+        self.state = BatchState.RUNNING
+        self.failed_pages: List[str] = []
+
+    def finish(self, *failed_pages: str) -> None:
+        self.state = BatchState.SUCCEEDED
+        self.failed_pages = list(failed_pages)
+
+    def fail(self) -> None:
+        self.state = BatchState.FAILED
+
+    async def process_ocr_async(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def process_translation_async(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def cleanup(self):
+        pass
+
+    async def submit_ocr_batch(self, pages, language, custom_prompt=None) -> str:
+        self.submitted.append(list(pages))
+        return f"batch-{len(self.submitted)}"
+
+    async def get_batch_status(self, batch_id: str) -> BatchStatus:
+        self.polls += 1
+        pages = len(self.submitted[-1])
+        return BatchStatus(self.state, pages if self.state == BatchState.SUCCEEDED else 0, pages,
+                           "provider gave up" if self.state == BatchState.FAILED else None)
+
+    async def iter_ocr_batch_results(self, batch_id: str, book_id: str, s3_service) -> AsyncIterator[BatchResult]:
+        for page_id, _ in self.submitted[-1]:
+            if page_id in self.failed_pages:
+                yield BatchResult(page_id, error="unreadable")
+            else:
+                yield BatchResult(page_id, text=f"# {page_id}", image_urls=[])
+
+
+@pytest.fixture
+def provider(monkeypatch) -> FakeBatchClient:
+    client = FakeBatchClient()
+    monkeypatch.setattr(ai_registry, "_registry", {"fake": client})
+    monkeypatch.setattr(service, "AI_BATCH_POLL_SECONDS", 0.01)
+    return client
+
+
+@pytest.fixture
+def saved(monkeypatch) -> Dict[str, str]:
+    """OCR text saved per page id (page updates need `$strLenCP`, which mongomock lacks)."""
+    saved: Dict[str, str] = {}
+
+    async def save_results(pages, results, language, model, pages_repo, s3):
+        for page, (text, _) in zip(pages, results):
+            saved[page["id"]] = text
+
+    monkeypatch.setattr(service, "_save_results", save_results)
+    return saved
+
+
+@pytest.fixture
+def repos(ctx) -> Dict[str, Any]:
+    return {"books_repo": BookRepo(ctx), "pages_repo": PageRepo(ctx), "jobs_repo": JobRepo(ctx)}
+
+
+@pytest.fixture
+def book(repos) -> str:
+    run(repos["books_repo"].insert_one({"id": "book-1", "title": "Batch"}))
+    run(repos["pages_repo"].insert_many([{"id": f"page-{number}", "book_id": "book-1", "page_number": number,
+                                          "photo": f"https://s3.invalid/page-{number}.jpg"}
+                                         for number in range(1, 4)]))
+    return "book-1"
+
+
+def _start(client, book_id, repos):
+    return service.start_book_document_ocr_service(book_id=book_id,
+                                                   language="en",
+                                                   client=client,
+                                                   model=client.name,
+                                                   s3=None,
+                                                   priority=Priority.BATCH,
+                                                   **repos)
+
+
+async def _finished(job_id: str, jobs_repo: JobRepo) -> Dict[str, Any]:
+    while True:
+        job = await jobs_repo.find_one({"id": job_id}, {"_id": 0})
+        if job["status"] != JobStatus.RUNNING:
+            return job
+        await asyncio.sleep(0.01)
+
+
+def test_batch_is_submitted_polled_and_collected(provider, saved, repos, book):
+    async def scenario():
+        job = await _start(provider, book, repos)
+        await asyncio.sleep(0.05)
+        provider.finish("page-2")
+        return await _finished(job.id, repos["jobs_repo"])
+
+    job = run(scenario())
+    assert job["status"] == JobStatus.SUCCEEDED
+    assert [page_id for page_id, _ in provider.submitted[0]] == ["page-1", "page-2", "page-3"]
+    assert provider.polls > 1
+    assert saved == {"page-1": "# page-1", "page-3": "# page-3"}
+    assert job["progress"]["provider_batch_id"] == "batch-1"
+    assert (job["progress"]["pages_done"], job["progress"]["pages_failed"]) == (2, 1)
+
+
+def test_failed_provider_batch_fails_the_job(provider, saved, repos, book):
+    provider.fail()
+
+    async def scenario():
+        job = await _start(provider, book, repos)
+        return await _finished(job.id, repos["jobs_repo"])
+
+    job = run(scenario())
+    assert (job["status"], job["error"]) == (JobStatus.FAILED, "provider gave up")
+    assert saved == {}
+
+
+def test_job_cancelled_by_a_shutdown_resumes_from_its_batch(provider, saved, repos, book):
+    async def scenario():
+        job = await _start(provider, book, repos)
+        await asyncio.sleep(0.05)
+        await stop_jobs()
+        interrupted = await repos["jobs_repo"].find_one({"id": job.id}, {"_id": 0})
+
+        provider.finish()
+        resumed = await service.resume_book_batch_ocr_service(job.id, repos["jobs_repo"], repos["pages_repo"], None)
+        return interrupted, resumed, await _finished(job.id, repos["jobs_repo"])
+
+    interrupted, resumed, job = run(scenario())
+    assert (interrupted["status"], interrupted["error"]) == (JobStatus.FAILED, "Interrupted by a server shutdown")
+    assert interrupted["progress"]["provider_batch_id"] == "batch-1"
+    assert resumed.id == job["id"]
+    assert job["status"] == JobStatus.SUCCEEDED
+    assert len(provider.submitted) == 1  # collected, not paid for again
+    assert saved == {"page-1": "# page-1", "page-2": "# page-2", "page-3": "# page-3"}
+
+
+def test_only_failed_batch_jobs_resume(provider, saved, repos, book):
+    async def scenario():
+        job = await _start(provider, book, repos)
+        await asyncio.sleep(0.05)
+        try:
+            await service.resume_book_batch_ocr_service(job.id, repos["jobs_repo"], repos["pages_repo"], None)
+        finally:
+            provider.finish()
+            await _finished(job.id, repos["jobs_repo"])
+
+    with pytest.raises(HTTPException) as running:
+        run(scenario())
+    assert running.value.status_code == 409
+
+    run(repos["jobs_repo"].insert_one({"id": "job-interactive", "kind": "book_ocr", "status": JobStatus.FAILED,
+                                       "progress": {"book_id": book, "pages_done": 1}}))
+    with pytest.raises(HTTPException) as interactive:
+        run(service.resume_book_batch_ocr_service("job-interactive", repos["jobs_repo"], repos["pages_repo"], None))
+    assert interactive.value.status_code == 400
@@ -0,0 +1,142 @@
+""" Single-flight of OCR/translation calls: sharing on one worker, leases across workers. """
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from conftest import run
+from jobs.flight_repo import FlightRepo
+from jobs.services import single_flight as sf
+from telemetry.services.tracing import get_current_span, span, start_trace, detach_trace
+
+
+@pytest.fixture(autouse=True)
+def short_leases(monkeypatch):
+    monkeypatch.setattr(sf, "SINGLE_FLIGHT_LEASE_SECONDS", 0.3)
+    monkeypatch.setattr(sf, "SINGLE_FLIGHT_POLL_SECONDS", 0.02)
+
+
+@pytest.fixture
+def flights(ctx) -> FlightRepo:
+    return FlightRepo(ctx)
+
+
+class Call:
+    """A provider call taking `seconds`, counting how often it was made."""
+    def __init__(self, seconds: float = 0.1, result: str = "text"):
+        self.seconds = seconds
+        self.result = result
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return {"text": self.result}
+
+
+def test_duplicates_on_a_worker_share_one_call(flights):
+    call = Call()
+
+    async def scenario():
+        return await asyncio.gather(*(sf.single_flight(flights, "ocr", "k-local", call) for _ in range(5)))
+
+    assert run(scenario()) == [{"text": "text"}] * 5
+    assert call.calls == 1
+
+
+def test_caller_going_away_does_not_cancel_the_call(flights):
+    call = Call(seconds=0.2)
+
+    async def scenario():
+        first = asyncio.create_task(sf.single_flight(flights, "ocr", "k-cancel", call))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(sf.single_flight(flights, "ocr", "k-cancel", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert run(scenario()) == {"text": "text"}
+    assert call.calls == 1
+
+
+def test_worker_follows_the_lease_of_another_worker(flights):
+    """`_fly` is what each worker runs; two of them stand for two processes sharing Mongo."""
+    leader, follower = Call(seconds=0.2, result="leader"), Call(result="follower")
+
+    async def scenario():
+        first = asyncio.create_task(sf._fly(flights, "ocr", "k-remote", leader))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, sf._fly(flights, "ocr", "k-remote", follower))
+
+    assert run(scenario()) == [{"text": "leader"}, {"text": "leader"}]
+    assert (leader.calls, follower.calls) == (1, 0)
+
+
+def test_follower_keeps_waiting_while_the_leader_renews_its_lease(flights):
+    """The leader runs for several lease periods: its renewals keep the follower from making the call too."""
+    leader, follower = Call(seconds=1.0, result="leader"), Call(result="follower")
+
+    async def scenario():
+        first = asyncio.create_task(sf._fly(flights, "ocr", "k-slow", leader))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, sf._fly(flights, "ocr", "k-slow", follower))
+
+    assert run(scenario()) == [{"text": "leader"}, {"text": "leader"}]
+    assert (leader.calls, follower.calls) == (1, 0)
+
+
+def test_expired_lease_of_a_crashed_worker_is_taken_over(flights):
+    call = Call(result="mine")
+    run(flights.update_one({"key": "k-crashed"}, {"$set": {
+        "owner": "crashed-worker", "done": False, "result": None,
+        "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1),
+    }}, upsert=True))
+
+    assert run(sf.single_flight(flights, "ocr", "k-crashed", call)) == {"text": "mine"}
+    assert call.calls == 1
+
+
+def test_follower_takes_over_once_an_unrenewed_lease_expires(flights):
+    """A worker that stops renewing (hung, killed) holds the call up for one lease period at most."""
+    call = Call(result="mine")
+    run(flights.update_one({"key": "k-hung"}, {"$set": {
+        "owner": "hung-worker", "done": False, "result": None,
+        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=0.3),
+    }}, upsert=True))
+
+    async def scenario():
+        started = asyncio.get_running_loop().time()
+        result = await sf.single_flight(flights, "ocr", "k-hung", call)
+        return result, asyncio.get_running_loop().time() - started
+
+    result, waited = run(scenario())
+    assert result == {"text": "mine"}
+    assert call.calls == 1
+    assert 0.2 <= waited < 2
+
+
+def test_failed_call_releases_the_lease(flights):
+    async def failing():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        run(sf.single_flight(flights, "ocr", "k-failed", failing))
+    assert run(flights.find_one({"key": "k-failed"})) is None
+
+
+def test_flight_is_not_part_of_the_request_trace(flights):
+    """The call may outlive the request: its spans must not go to the request's root, exported already."""
+    async def traced():
+        with span("ai.call"):
+            return {"span": get_current_span() is not None}
+
+    async def scenario():
+        root, token = start_trace("GET /ocr", force=True)
+        try:
+            return await sf.single_flight(flights, "ocr", "k-traced", traced), root
+        finally:
+            detach_trace(token)
+
+    result, root = run(scenario())
+    assert result == {"span": False}
+    assert root.children == []
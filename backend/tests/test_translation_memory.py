@@ -0,0 +1,97 @@
+""" Translation memory: what is learnt from an approved translation, and what a lookup serves as is
+(whole pages, paragraphs) or only passes to the model as hints (sentences, similar sentences).
+"""
+import pytest
+
+from conftest import run
+from translation_memory.translation_memory_repo import TranslationMemoryRepo
+from translation_memory.services import translation_memory_service as tm
+
+SOURCE = ("Gallia est omnis divisa in partes tres. Quarum unam incolunt Belgae.\n\n"
+          "Hi omnes lingua, institutis, legibus inter se differunt. Gallos ab Aquitanis Garumna flumen dividit.")
+TARGET = ("All Gaul is divided into three parts. One of them the Belgae inhabit.\n\n"
+          "All these differ from each other in language, customs and laws. The Garonne separates the Gauls from the Aquitani.")
+
+
+@pytest.fixture
+def memory(ctx, monkeypatch) -> TranslationMemoryRepo:
+    repo = TranslationMemoryRepo(ctx)
+
+    async def bulk_update(updates, ordered=False, upsert=False):
+        # mongomock's bulk_write predates the `sort` pymongo passes to it: the same writes one at a time
+        for filter, update in updates:
+            await repo.update_one(filter, update, upsert=upsert)
+
+    monkeypatch.setattr(repo, "bulk_update", bulk_update)
+    run(tm.learn_translation(SOURCE, TARGET, "Latin", "English", repo, book_id="book-1", page_id="page-1"))
+    return repo
+
+
+def _lookup(text: str, memory: TranslationMemoryRepo) -> tm.MemoryLookup:
+    return run(tm.lookup_translation(text, "Latin", "English", memory))
+
+
+def test_page_seen_before_is_served_whatever_its_whitespace(memory):
+    lookup = _lookup(SOURCE.replace(". ", ".  "), memory)
+
+    assert lookup.translation == TARGET
+    assert (lookup.segments, lookup.exact_hits) == (4, 4)
+
+
+def test_page_of_remembered_paragraphs_is_put_together(memory):
+    first, second = SOURCE.split("\n\n")
+    first_target, second_target = TARGET.split("\n\n")
+    lookup = _lookup(f"{second}\n\n— 12 —\n\n{first}", memory)
+
+    assert lookup.translation == f"{second_target}\n\n— 12 —\n\n{first_target}"
+    assert lookup.hints == []
+
+
+def test_remembered_sentences_are_only_hints(memory):
+    lookup = _lookup("Gallia est omnis divisa in partes tres. Caesar Rubiconem transiit.", memory)
+
+    assert lookup.translation is None
+    assert lookup.hints == [("Gallia est omnis divisa in partes tres.", "All Gaul is divided into three parts.")]
+    assert (lookup.segments, lookup.exact_hits) == (2, 1)
+
+
+def test_similar_sentence_is_a_fuzzy_hint(memory):
+    lookup = _lookup("Gallia est omnis divisa in partes quattuor.", memory)
+
+    assert lookup.translation is None
+    assert lookup.fuzzy_hits == 1
+    assert ("Gallia est omnis divisa in partes tres.", "All Gaul is divided into three parts.") in lookup.hints
+
+
+def test_other_language_pair_finds_nothing(memory):
+    lookup = run(tm.lookup_translation(SOURCE, "Latin", "French", memory))
+
+    assert lookup.translation is None
+    assert (lookup.exact_hits, lookup.fuzzy_hits, lookup.hints) == (0, 0, [])
+
+
+def test_newer_approval_replaces_the_remembered_translation(memory):
+    run(tm.learn_translation(SOURCE, TARGET.replace("All Gaul", "Gaul as a whole"), "Latin", "English", memory))
+
+    assert _lookup(SOURCE, memory).translation.startswith("Gaul as a whole is divided")
+    assert run(memory.count_documents({"source": "Gallia est omnis divisa in partes tres."})) == 1
+
+
+def test_sentences_are_paired_only_when_their_lengths_agree():
+    source = "Veni. Vidi vici, et omnia quae vidi tandem cepi."
+    aligned = "I came. I saw, I conquered, and all I saw I took at last."
+    # Split after the wrong sentence: same count, but the pairs are shifted
+    shifted = "I came, I saw, I conquered, and all I saw. I took."
+
+    assert ("Veni.", "I came.") in tm._align(source, aligned)
+    pairs = tm._align(source, shifted)
+    assert pairs == [(source, shifted), (source, shifted)]  # page and paragraph, no sentences
+
+
+def test_lengths_agree_within_the_allowed_deviation():
+    ratio = 1.0
+    limit = tm.TM_ALIGN_MAX_RATIO_DEVIATION
+
+    assert tm._lengths_agree(["a" * 10], ["b" * int(10 * limit)], ratio)
+    assert not tm._lengths_agree(["a" * 10], ["b" * (int(10 * limit) + 1)], ratio)
+    assert not tm._lengths_agree(["a" * 10, "a" * 10], ["b" * 10, "b" * 5], ratio)
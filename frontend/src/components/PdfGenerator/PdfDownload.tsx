@@ -9,7 +9,7 @@ import {
   Link,
 } from "@react-pdf/renderer";
 import { Book, Page as BookPage } from "../../types";
-import apiService from "../../services/api";
+import { coverImageKey, figureImageKey, figureUrl } from "./pdfImages";
 
 // Define styles for the PDF document
 const styles = StyleSheet.create({
@@ -149,10 +149,9 @@ const PdfDocument: React.FC<PdfDocumentProps & { imageMap: Record<string, string
     const elements: JSX.Element[] = [];
 
     lines.forEach((line, index) => {
-      const imageMatch = line.match(/!\[(.*?)\]\((.*?)\)/);
-      if (imageMatch) {
-        const imageUrl = apiService.getImageProxyUrl(imageMatch[2]);
-        const objectUrl = imageMap[imageUrl];
+      const imageUrl = figureUrl(line);
+      if (imageUrl) {
+        const objectUrl = imageMap[figureImageKey(imageUrl)];
         if (objectUrl) {
           elements.push(
             <View key={`img-${index}`}>
@@ -236,11 +235,11 @@ const PdfDocument: React.FC<PdfDocumentProps & { imageMap: Record<string, string
       creator="SourceLibrary.org"
     >
       {/* Cover Page with thumbnail */}
-      {bookDetails.thumbnail && imageMap[apiService.getImageProxyUrl(bookDetails.thumbnail)] && (
+      {bookDetails.thumbnail && imageMap[coverImageKey(bookDetails.thumbnail)] && (
         <Page size="A4" style={styles.coverPage}>
           <Image
             style={styles.fullPageImage}
-            src={imageMap[apiService.getImageProxyUrl(bookDetails.thumbnail)]}
+            src={imageMap[coverImageKey(bookDetails.thumbnail)]}
           />
         </Page>
       )}
@@ -0,0 +1,34 @@
+import apiService from "../../services/api";
+import { Page } from "../../types";
+
+// Images in the PDF are at most a page wide; the proxy downscales larger ones
+export const PDF_IMAGE_WIDTH = 1200;
+
+const FIGURE_PATTERN = /!\[(.*?)\]\((.*?)\)/;
+
+// URL of the figure a markdown line holds, if it holds one
+export function figureUrl(line: string): string | null {
+  const match = line.match(FIGURE_PATTERN);
+  return match ? match[2] : null;
+}
+
+// Keys of the preloaded image map. Preloading and rendering both go through these,
+// so a figure is looked up under the very proxy URL it was fetched with.
+export function figureImageKey(url: string): string {
+  return apiService.getImageProxyUrl(url, PDF_IMAGE_WIDTH);
+}
+
+export function coverImageKey(url: string): string {
+  return apiService.getImageProxyUrl(url);
+}
+
+// Image map keys of all figures in the pages' translations
+export function pageFigureKeys(pages: Page[]): string[] {
+  return pages.flatMap((page) =>
+    (page.translation?.data || "")
+      .split("\n")
+      .map(figureUrl)
+      .filter((url): url is string => url !== null)
+      .map(figureImageKey)
+  );
+}
@@ -2,6 +2,7 @@ import { pdf } from "@react-pdf/renderer";
 import PdfDownload from "./PdfDownload";
 import { Book, Page } from "../../types";
 import React from "react";
+import { coverImageKey, pageFigureKeys } from "./pdfImages";
 
 // bookDetails: Book object
 // allPages: array of Page objects
@@ -37,50 +38,35 @@ export async function createAndDownloadPdf(
 
     // Collect cover image
     if (bookDetails.thumbnail) {
-      imageUrls.push(apiService.getImageProxyUrl(bookDetails.thumbnail));
+      imageUrls.push(coverImageKey(bookDetails.thumbnail));
     }
 
-    // Collect markdown images
-    translatedPages.forEach((page) => {
-      const text = page.translation?.data || "";
-      const lines = text.split("\n");
-      lines.forEach((line) => {
-        const imageMatch = line.match(/!\[(.*?)\]\((.*?)\)/);
-        if (imageMatch) {
-          imageUrls.push(apiService.getImageProxyUrl(imageMatch[2]));
-        }
-      });
-    });
+    // Collect markdown images, keyed as PdfDownload looks them up
+    const figureKeys = pageFigureKeys(translatedPages);
+    imageUrls.push(...figureKeys);
 
     // Remove duplicates
     const uniqueUrls = Array.from(new Set(imageUrls));
 
     // Preload all images
     const imageMap: Record<string, string> = {};
-    const preloadResults = await Promise.allSettled(
+    await Promise.allSettled(
       uniqueUrls.map(async (url) => {
         try {
-          const resp = await fetch(url);
-          if (resp.ok) {
-            const blob = await resp.blob();
-            imageMap[url] = URL.createObjectURL(blob);
-            return { success: true, url };
-          }
-          return { success: false, url, error: 'Response not ok' };
-        } catch (error) {
-          return { success: false, url, error };
+          const blob = await apiService.fetchProxiedImage(url);
+          imageMap[url] = URL.createObjectURL(blob);
+        } catch {
+          // Missing figures are reported below
         }
       })
     );
 
-    // Optionally warn if some images failed to load
-    const failedImages = preloadResults.filter(
-      (result) => result.status === "rejected" || (result.status === "fulfilled" && !result.value.success)
-    );
-    if (failedImages.length > 0 && uniqueUrls.length > 0) {
+    // Warn about figures the PDF will be missing, whatever the cause
+    const missingFigures = figureKeys.filter((key) => !imageMap[key]).length;
+    if (missingFigures > 0) {
       showError(
         "Image Load Warning",
-        `Some images (${failedImages.length}) could not be loaded and will not appear in the PDF. PDF is still being generated.`
+        `Some images (${missingFigures}) could not be loaded and will not appear in the PDF. PDF is still being generated.`
       );
       // Continue PDF generation even if some images failed
     }
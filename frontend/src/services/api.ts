@@ -114,8 +114,15 @@ class ApiService {
     this.handleResponse<void>(response);
   }
 
-  getImageProxyUrl(imageUrl: string): string {
-    return `${API_URL.replace(/\/$/, '')}/pdf-create/?url=${encodeURIComponent(imageUrl)}`;
+  getImageProxyUrl(imageUrl: string, width?: number): string {
+    const widthParam = width ? `&width=${width}` : '';
+    return `${API_URL.replace(/\/$/, '')}/pdf-create/?url=${encodeURIComponent(imageUrl)}${widthParam}`;
+  }
+
+  // Fetched through axios so the proxy request carries the tenant and auth headers
+  async fetchProxiedImage(proxyUrl: string): Promise<Blob> {
+    const response = await this.axiosInstance.get(proxyUrl, { responseType: 'blob' });
+    return this.handleResponse<Blob>(response);
   }
 
   // Tenant Operations